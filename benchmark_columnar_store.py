@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列指向ストアのベンチマーク
+weekly_data 形式の大規模CSVを作成し、csv.DictReader で辞書のリストに読み込む場合と
+columnar_store で読み込む場合の読み込み時間・1人あたりのメモリ量を比較する
+
+メモリ量は tracemalloc で読み込み後に残っている確保量を計測する
+（tracemalloc は処理を遅くするため、時間の計測とは別に実行する）
+"""
+
+import argparse
+import csv
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from columnar_store import ColumnarUserStore
+from generate_weekly_data import addresses, first_names_female, last_names, notes
+
+def write_weekly_csv(path, rows, seed=0):
+    """weekly_data/*.csv と同じ列構成の大規模CSVを作成"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(addresses), size=rows)
+    jitter = rng.uniform(-0.005, 0.005, size=(rows, 2))
+    last = rng.integers(0, len(last_names), size=rows)
+    first = rng.integers(0, len(first_names_female), size=rows)
+    note = rng.integers(0, len(notes), size=rows)
+    wheelchair = rng.random(rows) < 0.3
+    minutes = rng.choice([0, 15, 30, 45], size=rows)
+
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "氏名", "住所", "緯度", "経度", "車椅子", "備考", "送迎時刻", "帰宅時刻"])
+        for i in range(rows):
+            address, lat, lng = addresses[picks[i]]
+            writer.writerow([
+                i + 1,
+                f"{last_names[last[i]]} {first_names_female[first[i]]}",
+                address,
+                round(lat + jitter[i, 0], 6),
+                round(lng + jitter[i, 1], 6),
+                "要" if wheelchair[i] else "",
+                notes[note[i]],
+                f"08:{int(minutes[i]):02d}",
+                "16:00",
+            ])
+
+def load_dicts(path):
+    """現行方式: csv.DictReader で辞書のリストに読み込む"""
+    with open(path, encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+def load_columnar(path):
+    """新方式: 列指向ストアに読み込む"""
+    store = ColumnarUserStore().load_csv(path, weekday=0)
+    store.lat  # 連結まで済ませる
+    return store
+
+def measure_time(loader, path):
+    gc.collect()
+    start = time.perf_counter()
+    result = loader(path)
+    elapsed = time.perf_counter() - start
+    del result
+    return elapsed
+
+def measure_memory(loader, path):
+    gc.collect()
+    tracemalloc.start()
+    result = loader(path)
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current
+
+def main():
+    parser = argparse.ArgumentParser(description='列指向ストアのベンチマーク')
+    parser.add_argument('--rows', type=int, default=1000000, help='読み込み時間を計測する行数')
+    parser.add_argument('--memory-rows', type=int, default=200000, help='メモリ量を計測する行数')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        time_path = os.path.join(tmp_dir, "time.csv")
+        memory_path = os.path.join(tmp_dir, "memory.csv")
+        write_weekly_csv(time_path, args.rows)
+        write_weekly_csv(memory_path, args.memory_rows)
+        print(f"CSV: {args.rows:,}行（{os.path.getsize(time_path) / 1024 / 1024:.1f}MB）\n")
+
+        print(f"{'方式':<14} {'読込(秒)':>9} {'行/秒':>12} {'メモリ/人(B)':>13}")
+        for label, loader in [("DictReader", load_dicts), ("列指向ストア", load_columnar)]:
+            elapsed = measure_time(loader, time_path)
+            per_user = measure_memory(loader, memory_path) / args.memory_rows
+            print(f"{label:<14} {elapsed:>9.2f} {args.rows / elapsed:>12,.0f} {per_user:>13,.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+厳密なルート順序（exact_route）のベンチマーク
+- 便の大きさごとの1便あたりの計算時間（ビットDP）
+- 1日分（plan_day の全便）の 最近傍法のみ（optimizeRoute.js 相当）・最近傍法 + 2-opt / Or-opt（optimize_route）・
+  厳密解の総距離・計算時間
+- 1週間分の全便のバッチ処理をプロセス数 1 / 2 / 4 で実行したときの計算時間
+を表示する。CPUコア数より多いプロセス数では速度は伸びない
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from benchmark_planner import make_synthetic_day
+from benchmark_snapshot import make_week
+from exact_route import MAX_EXACT_STOPS, order_plans_exact, solve_exact
+from route_optimizer import nearest_neighbor_tour, optimize_route
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES, build_distance_matrix, plan_day, route_distance
+
+def nearest_neighbor_distance(users, plan, dist):
+    """最近傍法だけで各便を並べたときの総距離"""
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    return sum(
+        route_distance(dist, nearest_neighbor_tour(dist, [index_by_id[u["id"]] for u in trip["users"]]))
+        for assignment in plan["assignments"].values() for trip in assignment["trips"]
+    )
+
+def heuristic_distance(facility, users, plan, dist):
+    """optimize_route で各便を並べたときの総距離"""
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    return sum(
+        optimize_route(facility, trip["users"], dist=dist, indices=[index_by_id[u["id"]] for u in trip["users"]])["totalDistance"]
+        for assignment in plan["assignments"].values() for trip in assignment["trips"]
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description='厳密なルート順序のベンチマーク')
+    parser.add_argument('--users', type=int, default=300, help='1日の利用者数')
+    parser.add_argument('--vehicles', type=int, default=25, help='車両数')
+    parser.add_argument('--week-users', type=int, default=600, help='週間データの利用者数')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='計測するプロセス数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    print(f"{'地点数':>6} {'1便(ミリ秒)':>11}")
+    for n in range(6, MAX_EXACT_STOPS + 1):
+        points = rng.random((n + 1, 2)) * 5
+        dist = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+        start = time.perf_counter()
+        for _ in range(5):
+            solve_exact(dist, range(1, n + 1))
+        print(f"{n:>6} {(time.perf_counter() - start) / 5 * 1000:>11.2f}")
+
+    facility, users, vehicles = make_synthetic_day(args.users, args.vehicles, seed=args.seed)
+    dist = build_distance_matrix(facility, users)
+    plan = plan_day(facility, users, vehicles, seed=args.seed, dist=dist)
+    start = time.perf_counter()
+    nearest = nearest_neighbor_distance(users, plan, dist)
+    nearest_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    heuristic = heuristic_distance(facility, users, plan, dist)
+    heuristic_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    summary = order_plans_exact(facility, [(users, plan)], dists=[dist], workers=1)
+    exact_seconds = time.perf_counter() - start
+
+    print(f"\n1日分: 利用者{args.users}名 / {summary['trips']}便（厳密解 {summary['exact']}便）")
+    print(f"{'方式':<26} {'秒':>7} {'総距離(km)':>10} {'厳密解との差':>12}")
+    for label, seconds, distance in [
+        ("最近傍法のみ", nearest_seconds, nearest),
+        ("最近傍法 + 2-opt / Or-opt", heuristic_seconds, heuristic),
+        ("厳密解（ビットDP）", exact_seconds, summary["distance"]),
+    ]:
+        gap = (distance - summary["distance"]) / summary["distance"]
+        print(f"{label:<26} {seconds:>7.3f} {distance:>10.2f} {gap:>11.2%}")
+
+    week_users, rosters, _ = make_week(args.week_users, seed=args.seed)
+    days = []
+    for day in sorted(rosters):
+        day_users = [week_users[row] for row in rosters[day]]
+        if day_users:
+            days.append((day_users, plan_day(DEFAULT_FACILITY, day_users, DEFAULT_VEHICLES, seed=args.seed)))
+    dists = [build_distance_matrix(DEFAULT_FACILITY, day_users) for day_users, _ in days]
+
+    print(f"\n1週間分: 利用者{args.week_users}名 / {len(days)}日 / CPUコア数: {os.cpu_count()}")
+    print(f"{'プロセス数':>10} {'秒':>7} {'便数':>6} {'総距離(km)':>10}")
+    for workers in args.workers:
+        start = time.perf_counter()
+        summary = order_plans_exact(DEFAULT_FACILITY, days, dists=dists, workers=workers)
+        print(f"{workers:>10} {time.perf_counter() - start:>7.3f} {summary['trips']:>6} {summary['distance']:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+車両構成のシナリオ評価（fleet_scenarios）のベンチマーク
+利用パターンに沿った週間データ（スナップショット）を作成し、
+既定のグリッド（台数 × 定員 × 車椅子枠）+ 現行の車両構成 × 全曜日 のシナリオを
+プロセス数 1 / 2 / 4 で評価したときの所要時間と1シナリオあたりの時間を比較する
+CPUコア数より多いプロセス数では速度は伸びない
+同じ定員・車椅子枠で台数の最も少ない構成は、最も多い構成より未割り当て人数が多いことも確かめる
+（各車両の行程を送迎時間帯に収めるため）
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmark_snapshot import make_week
+from fleet_scenarios import (
+    DEFAULT_CAPACITIES,
+    DEFAULT_COUNTS,
+    DEFAULT_WHEELCHAIR_CAPACITIES,
+    fleet_grid,
+    run_scenarios,
+    summarize,
+)
+from plan_snapshot import write_snapshot
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES
+
+def main():
+    parser = argparse.ArgumentParser(description='車両構成のシナリオ評価のベンチマーク')
+    parser.add_argument('--users', type=int, default=600, help='利用者数')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help='計測するプロセス数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    users, rosters, _ = make_week(args.users, seed=args.seed)
+    fleets = [{"name": "現行", "vehicles": DEFAULT_VEHICLES}] + fleet_grid()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, "week.dsplan")
+        write_snapshot(snapshot_path, DEFAULT_FACILITY, users, DEFAULT_VEHICLES, rosters)
+
+        print(f"利用者: {args.users}名 / 車両構成: {len(fleets)} / CPUコア数: {os.cpu_count()}\n")
+        print(f"{'プロセス数':>10} {'シナリオ数':>10} {'時間(秒)':>9} {'1シナリオ(ミリ秒)':>16} {'速度向上':>8}")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            results = run_scenarios(snapshot_path, fleets, workers=workers, seed=args.seed, work_dir=tmp_dir)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {len(results):>10} {elapsed:>9.2f} {elapsed / len(results) * 1000:>16.1f} "
+                  f"{baseline / elapsed:>7.2f}x")
+
+    print(f"\n{'車両構成':<22} {'便数':>5} {'総距離(km)':>10} {'未割当':>6} {'平均乗車(分)':>11} {'最長運行(分)':>11}")
+    table = summarize(results)
+    for row in table[:10]:
+        print(f"{row['fleet']:<22} {row['trips']:>5} {row['km']:>10.1f} {row['unassigned']:>6} "
+              f"{row['ride_mean_min']:>11.1f} {row['vehicle_max_min']:>11}")
+
+    unassigned = {row["fleet"]: row["unassigned"] for row in table}
+    smallest, largest = (
+        fleet_grid([count], DEFAULT_CAPACITIES[:1], DEFAULT_WHEELCHAIR_CAPACITIES[:1])[0]["name"]
+        for count in (min(DEFAULT_COUNTS), max(DEFAULT_COUNTS))
+    )
+    assert unassigned[smallest] > unassigned[largest], \
+        f"台数の少ない構成の未割り当てが増えていません: {smallest} {unassigned[smallest]}名 / {largest} {unassigned[largest]}名"
+    print(f"\n未割り当て: {smallest} {unassigned[smallest]}名 > {largest} {unassigned[largest]}名")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大規模サンプル利用者生成のベンチマーク
+1,000名 / 100,000名 / 1,000,000名で生成速度（名/秒）とピークメモリ（RSS）を計測
+各規模は別プロセスで実行し、ピークRSSが前の計測の影響を受けないようにする
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_SIZES = [1000, 100000, 1000000]
+
+def run_worker(count, chunk_size, output_file):
+    """子プロセス側: 生成して書き出し、計測結果をJSONで標準出力に返す"""
+    from generate_sample_users_v2 import generate_users_at_scale, write_users_stream
+
+    start = time.perf_counter()
+    chunks = generate_users_at_scale(count, chunk_size=chunk_size, seed=0)
+    write_users_stream(chunks, output_file)
+    elapsed = time.perf_counter() - start
+
+    # Linux の ru_maxrss は KB 単位
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        'count': count,
+        'seconds': elapsed,
+        'users_per_sec': count / elapsed if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb,
+        'file_mb': os.path.getsize(output_file) / (1024 * 1024)
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description='大規模サンプル利用者生成のベンチマーク')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='生成する利用者数')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='チャンクサイズ')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json', help='出力形式')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.chunk_size, args.output)
+        return
+
+    print(f"{'利用者数':>10} {'秒':>8} {'名/秒':>12} {'ピークRSS(MB)':>14} {'ファイル(MB)':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in args.sizes:
+            output_file = os.path.join(tmp_dir, f'users_{count}.{args.format}')
+            completed = subprocess.run(
+                [sys.executable, os.path.abspath(__file__),
+                 '--worker', str(count),
+                 '--chunk-size', str(args.chunk_size),
+                 '--output', output_file],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                capture_output=True, text=True, check=True
+            )
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{result['count']:>10} {result['seconds']:>8.2f} {result['users_per_sec']:>12,.0f} "
+                  f"{result['peak_rss_mb']:>14.1f} {result['file_mb']:>12.1f}")
+            os.remove(output_file)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ジオコーディングキャッシュのベンチマーク
+weekly_data の全曜日分の利用者（同じ住所が何度も出てくる）を取り込む想定で、
+- 現行方式: キャッシュなし・1件ずつ・0.1秒間隔（geocoding.js と同じ）
+- 新方式（初回）: 空のキャッシュ + 同時実行数を制限した並列問い合わせ
+- 新方式（2回目）: キャッシュ済み
+の所要時間・API呼び出し回数・ヒット率・1件あたり所要時間を比較する
+API応答はスタブプロバイダの待ち時間で模擬する
+"""
+
+import argparse
+import asyncio
+import glob
+import os
+import tempfile
+import time
+
+from geocoding_cache import GeocodeCache, Geocoder, StubGeocodingProvider, percentile
+from transport_planner import load_users_csv
+
+MIN_REQUEST_INTERVAL = 0.1  # geocoding.js のリクエスト間隔（秒）
+
+async def sequential_without_cache(items, provider):
+    """geocoding.js の geocodeAddresses と同じ逐次処理を模擬"""
+    latencies = []
+    last_request = 0.0
+    for item in items:
+        wait = MIN_REQUEST_INTERVAL - (time.perf_counter() - last_request)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        last_request = time.perf_counter()
+        started = time.perf_counter()
+        await provider.geocode(item["address"])
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description='ジオコーディングキャッシュのベンチマーク')
+    parser.add_argument('--latency', type=float, default=0.05, help='模擬API応答時間（秒）')
+    parser.add_argument('--concurrency', type=int, default=8, help='同時問い合わせ数')
+    parser.add_argument('--skip-sequential', action='store_true', help='現行方式の計測を省略')
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    items = []
+    for path in sorted(glob.glob(os.path.join(base_dir, "weekly_data", "*.csv"))):
+        for user in load_users_csv(path):
+            items.append({"id": user["id"], "address": user["address"]})
+    unique = len({item["address"] for item in items})
+    print(f"取り込み件数: {len(items)}件（ユニーク住所 {unique}件）\n")
+    print(f"{'方式':<18} {'秒':>7} {'API呼出':>8} {'ヒット率':>8} {'p50(ms)':>9} {'p90(ms)':>9} {'p99(ms)':>9}")
+
+    if not args.skip_sequential:
+        provider = StubGeocodingProvider(latency=args.latency)
+        start = time.perf_counter()
+        latencies = asyncio.run(sequential_without_cache(items, provider))
+        elapsed = time.perf_counter() - start
+        latencies_ms = [value * 1000 for value in latencies]
+        print(f"{'現行（逐次・なし）':<18} {elapsed:>7.2f} {provider.calls:>8} {0:>7.1f}% "
+              f"{percentile(latencies_ms, 50):>9.2f} {percentile(latencies_ms, 90):>9.2f} "
+              f"{percentile(latencies_ms, 99):>9.2f}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = GeocodeCache(os.path.join(tmp_dir, "cache.sqlite3"))
+        for label in ["新方式（初回）", "新方式（2回目）"]:
+            provider = StubGeocodingProvider(latency=args.latency)
+            geocoder = Geocoder(cache, provider, concurrency=args.concurrency)
+            start = time.perf_counter()
+            asyncio.run(geocoder.geocode_addresses(items))
+            elapsed = time.perf_counter() - start
+            stats = geocoder.stats.summary()
+            print(f"{label:<18} {elapsed:>7.2f} {provider.calls:>8} {stats['hit_rate'] * 100:>7.1f}% "
+                  f"{stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+        cache.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+差分再計画のベンチマーク
+300名・1日分の計画に対して、1名の欠席・追加・住所変更と車両1台の運休を
+- 全体再計画: plan_day で最初から作り直し、各便の順路を最適化
+- 差分再計画: IncrementalPlanner.apply
+で処理したときの所要時間・総距離・変わらなかった便の数を比較する
+
+最後に FIXED_EVERY 名に1名を順番固定にした計画に欠席・追加・住所変更をまとめて適用し、
+順番固定の利用者が同じ便の同じ位置に残っていることを確かめる
+（便が短くなって元の位置に収まらない場合を除く）
+"""
+
+import argparse
+import copy
+import time
+
+import numpy as np
+
+from benchmark_planner import make_synthetic_day
+from incremental_planner import IncrementalPlanner
+from transport_planner import build_distance_matrix
+
+# 順番固定にする利用者の間隔（確認用）
+FIXED_EVERY = 7
+
+def trip_signatures(planner):
+    """便ごとのメンバーと乗車順（変わらなかった便を数えるため）"""
+    return {tuple(u["id"] for u in trip["users"])
+            for assignment in planner.to_plan()["assignments"].values()
+            for trip in assignment["trips"]}
+
+def trip_positions(planner):
+    """利用者ID → (便, 便の中の位置)"""
+    return {planner.users[n - 1]["id"]: (trip_key, position)
+            for trip_key, nodes in planner.trips.items() for position, n in enumerate(nodes)}
+
+def moved_fixed_users(before, after):
+    """
+    同じ便に残った順番固定の利用者のうち、位置が変わったもの [(利用者ID, 前の位置, 後の位置)]
+
+    便が短くなって元の位置に収まらない利用者は除く
+    """
+    old = trip_positions(before)
+    new = trip_positions(after)
+    moved = []
+    for user in before.users:
+        if not user.get("is_order_fixed") or user["id"] not in new or user["id"] not in old:
+            continue
+        (old_trip, old_position), (new_trip, new_position) = old[user["id"]], new[user["id"]]
+        if old_trip == new_trip and old_position != new_position and old_position < len(after.trips[new_trip]):
+            moved.append((user["id"], old_position, new_position))
+    return moved
+
+def full_replan(facility, users, vehicles, seed):
+    """全体再計画（計画作成 + 各便の順路最適化）"""
+    return IncrementalPlanner(facility, users, vehicles, seed=seed)
+
+def main():
+    parser = argparse.ArgumentParser(description='差分再計画のベンチマーク')
+    parser.add_argument('--users', type=int, default=300, help='利用者数')
+    parser.add_argument('--vehicles', type=int, default=12, help='車両数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    facility, users, vehicles = make_synthetic_day(args.users + 1, args.vehicles, seed=args.seed)
+    newcomer = users.pop()
+    newcomer["id"] = "new-1"
+    rng = np.random.default_rng(args.seed)
+    target = users[int(rng.integers(len(users)))]
+    moved = {"id": target["id"], "lat": target["lat"] + 0.01, "lng": target["lng"] - 0.01}
+
+    base = IncrementalPlanner(facility, users, vehicles, seed=args.seed)
+    base_signatures = trip_signatures(base)
+    print(f"利用者: {args.users}名 / 車両: {args.vehicles}台 / 便: {len(base_signatures)}便"
+          f" / 総距離: {base.total_distance():.1f}km\n")
+
+    scenarios = [
+        ("1名欠席", {"absent": [target["id"]]}),
+        ("1名追加", {"added": [newcomer]}),
+        ("住所変更", {"address_changed": [moved]}),
+        ("車両運休", {"vehicle_disabled": [vehicles[0]["id"]]}),
+    ]
+
+    print(f"{'差分':<8} {'方式':<6} {'時間(ms)':>10} {'総距離(km)':>11} {'不変の便':>9}")
+    for label, delta in scenarios:
+        planner = copy.deepcopy(base)
+        result = planner.apply(delta)
+        kept = len(base_signatures & trip_signatures(planner))
+        print(f"{label:<8} {'差分':<6} {result['elapsed_ms']:>10.2f} {planner.total_distance():>11.1f} "
+              f"{kept:>5}/{len(base_signatures)}")
+
+        day_users = [u for u in users if u["id"] not in delta.get("absent", [])] + delta.get("added", [])
+        day_users = [{**u, **moved} if u["id"] == moved["id"] and "address_changed" in delta else u
+                     for u in day_users]
+        day_vehicles = [v for v in vehicles if v["id"] not in delta.get("vehicle_disabled", [])]
+        start = time.perf_counter()
+        build_distance_matrix(facility, day_users)
+        replanned = full_replan(facility, day_users, day_vehicles, args.seed)
+        elapsed = (time.perf_counter() - start) * 1000
+        kept = len(base_signatures & trip_signatures(replanned))
+        print(f"{'':<8} {'全体':<6} {elapsed:>10.2f} {replanned.total_distance():>11.1f} "
+              f"{kept:>5}/{len(base_signatures)}")
+
+    fixed_users = [{**u, "is_order_fixed": i % FIXED_EVERY == 0} for i, u in enumerate(users)]
+    fixed_base = IncrementalPlanner(facility, fixed_users, vehicles, seed=args.seed)
+    absent = [u["id"] for u in fixed_users[1::FIXED_EVERY * 3]]
+    changed = [{"id": u["id"], "lat": u["lat"] + 0.01, "lng": u["lng"] - 0.01} for u in fixed_users[2::FIXED_EVERY * 3]]
+    planner = copy.deepcopy(fixed_base)
+    result = planner.apply({"absent": absent, "added": [newcomer], "address_changed": changed})
+    moved = moved_fixed_users(fixed_base, planner)
+    fixed_count = sum(1 for u in fixed_users if u["is_order_fixed"])
+    print(f"\n順番固定 {fixed_count}名 / 欠席 {len(absent)}名・追加 1名・住所変更 {len(changed)}名 → "
+          f"{len(result['changed_trips'])}便を修正、位置が変わった順番固定の利用者 {len(moved)}名")
+    assert not moved, f"順番固定の利用者の位置が変わりました: {moved[:5]}"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+名簿CSVの一括正規化のベンチマーク
+weekly_data/*.csv 形式の合成名簿（全角数字・半角カナ・余分な空白などの表記ゆれを含む）を
+input_normalizer.normalize_csv で正規化し、1秒あたりの行数を
+- 値ごとの記憶なし（csv.DictReader の行ごとに各列の正規化関数を呼ぶ）
+- RosterNormalizer（csv.reader のリストのまま、値ごとの結果を記憶）
+で比較する。住所キーでまとめた件数も表示する
+"""
+
+import argparse
+import csv
+import os
+import random
+import tempfile
+import time
+
+from generate_weekly_data import addresses
+from input_normalizer import ADDRESS_KEY_COLUMN, COLUMN_KINDS, NORMALIZERS, address_key, normalize_csv
+
+FULL_WIDTH = str.maketrans("0123456789-", "０１２３４５６７８９－")
+HALF_KANA_NAMES = ["ｻﾄｳ ﾀﾛｳ", "ｽｽﾞｷ ﾊﾅｺ", "ﾀﾅｶ ｲﾁﾛｳ", "ﾔﾏﾀﾞ ｹｲｺ"]
+NAMES = ["佐藤 美咲", "鈴木　由美", "高橋  健一", "田中 花子", "伊藤 一郎"]
+TIMES = ["08:00", "８：３０", "9:00", "08:15", "８時４５分"]
+
+def write_roster(path, num_rows, seed):
+    """表記ゆれを含む合成名簿（weekly_data/*.csv 形式）"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "氏名", "住所", "緯度", "経度", "車椅子", "備考", "送迎時刻", "帰宅時刻"])
+        for i in range(num_rows):
+            address, lat, lng = rng.choice(addresses)
+            # 番地を変えて住所の種類を増やし、一部を全角・空白入りにする
+            address = f"{address}-{rng.randint(1, 40)}"
+            style = rng.random()
+            if style < 0.3:
+                address = address.translate(FULL_WIDTH)
+            elif style < 0.4:
+                address = " " + address.replace("区", "区 ") + "　"
+            name = rng.choice(HALF_KANA_NAMES if rng.random() < 0.2 else NAMES)
+            writer.writerow([i + 1, name, address, lat, lng, "要" if rng.random() < 0.2 else "", "",
+                             rng.choice(TIMES), "16:00"])
+
+def normalize_without_memo(input_path, output_path):
+    """比較用: 値ごとの記憶なしで各列の正規化関数を行ごとに呼ぶ"""
+    with open(input_path, encoding="utf-8", newline="") as src, \
+            open(output_path, "w", encoding="utf-8", newline="") as dst:
+        reader = csv.DictReader(src)
+        columns = [(name, NORMALIZERS[COLUMN_KINDS[name]]) for name in reader.fieldnames if name in COLUMN_KINDS]
+        writer = csv.DictWriter(dst, fieldnames=list(reader.fieldnames) + [ADDRESS_KEY_COLUMN])
+        writer.writeheader()
+        keys = set()
+        rows = 0
+        for row in reader:
+            for name, normalizer in columns:
+                row[name] = normalizer(row[name])
+            row[ADDRESS_KEY_COLUMN] = address_key(row["住所"])
+            keys.add(row[ADDRESS_KEY_COLUMN])
+            writer.writerow(row)
+            rows += 1
+    return rows, len(keys)
+
+def main():
+    parser = argparse.ArgumentParser(description='名簿CSVの一括正規化のベンチマーク')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000], help='行数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    print(f"{'行数':>8} {'方式':<16} {'秒':>7} {'行/秒':>10} {'住所キー':>8}")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for num_rows in args.rows:
+            input_path = os.path.join(work_dir, f"roster_{num_rows}.csv")
+            output_path = os.path.join(work_dir, "normalized.csv")
+            write_roster(input_path, num_rows, args.seed)
+
+            start = time.perf_counter()
+            _, plain_keys = normalize_without_memo(input_path, output_path)
+            seconds = time.perf_counter() - start
+            with open(output_path, "rb") as f:
+                plain_output = f.read()
+            print(f"{num_rows:>8} {'記憶なし':<16} {seconds:>7.2f} {num_rows / seconds:>10,.0f} {plain_keys:>8,}")
+
+            start = time.perf_counter()
+            normalizer = normalize_csv(input_path, output_path)
+            seconds = time.perf_counter() - start
+            with open(output_path, "rb") as f:
+                same = f.read() == plain_output
+            print(f"{num_rows:>8} {'RosterNormalizer':<16} {seconds:>7.2f} {num_rows / seconds:>10,.0f} "
+                  f"{len(normalizer.address_counts):>8,}  出力{'一致' if same else '不一致'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+計測（instrumentation.py）の負荷のベンチマーク
+- span() / count() 1回あたりの時間（記録なし・記録あり）
+- plan_day + 各便のルート改善を、記録なし・記録あり・メモリも記録の3通りで実行した時間
+を比較し、記録ありの場合の区間ごとの内訳も表示する
+"""
+
+import argparse
+import statistics
+import time
+
+import instrumentation
+from benchmark_planner import make_synthetic_day
+from route_optimizer import optimize_route
+from transport_planner import build_distance_matrix, plan_day
+
+def per_call_ns(func, calls):
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        func()
+    return (time.perf_counter_ns() - start) / calls
+
+def empty_span():
+    with instrumentation.span("bench"):
+        pass
+
+def count_once():
+    instrumentation.count("bench")
+
+def plan_and_route(facility, users, vehicles, seed):
+    """plan_day の後に各便の順路を改善する（計画作成の一連の処理）"""
+    dist = build_distance_matrix(facility, users)
+    plan = plan_day(facility, users, vehicles, seed=seed, dist=dist)
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    for assignment in plan["assignments"].values():
+        for trip in assignment["trips"]:
+            indices = [index_by_id[u["id"]] for u in trip["users"]]
+            optimize_route(facility, trip["users"], dist=dist, indices=indices)
+    return plan
+
+def main():
+    parser = argparse.ArgumentParser(description='計測の負荷のベンチマーク')
+    parser.add_argument('--users', type=int, default=500, help='利用者数')
+    parser.add_argument('--vehicles', type=int, default=40, help='車両数')
+    parser.add_argument('--repeat', type=int, default=5, help='計測回数（中央値をとる）')
+    parser.add_argument('--calls', type=int, default=200000, help='1回あたりの時間を測る呼び出し回数')
+    args = parser.parse_args()
+
+    print(f"{'呼び出し':<12} {'記録なし(ns)':>12} {'記録あり(ns)':>12}")
+    for label, func in [("span", empty_span), ("count", count_once)]:
+        disabled = per_call_ns(func, args.calls)
+        with instrumentation.recording():
+            enabled = per_call_ns(func, args.calls)
+        print(f"{label:<12} {disabled:>12.0f} {enabled:>12.0f}")
+
+    facility, users, vehicles = make_synthetic_day(args.users, args.vehicles, seed=0)
+    print(f"\n利用者{args.users}名 / 車両{args.vehicles}台（plan_day + ルート改善）")
+    print(f"{'方式':<16} {'秒':>8} {'比':>6}")
+    results = {}
+    recorder = None
+    for label, memory in [("記録なし", None), ("記録あり", False), ("メモリも記録", True)]:
+        seconds = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            if memory is None:
+                plan_and_route(facility, users, vehicles, seed=0)
+            else:
+                with instrumentation.recording(memory=memory) as recorder:
+                    plan_and_route(facility, users, vehicles, seed=0)
+            seconds.append(time.perf_counter() - start)
+        results[label] = statistics.median(seconds)
+        print(f"{label:<16} {results[label]:>8.3f} {results[label] / results['記録なし']:>6.2f}")
+
+    print()
+    print(instrumentation.format_breakdown(recorder))
+
+if __name__ == '__main__':
+    main()
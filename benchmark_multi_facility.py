@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数事業所・車両共有の計画のベンチマーク
+multi_facility_planner.make_multi_facility_day の合成データ（既定は5事業所 × 平均200名）で
+- 所属車両のみ: 各車両は所属事業所の便だけを担当（事業所ごとに独立した計画）
+- 車両共有: 事業所をまたいで便を配分し、不足分を調整して解き直す
+- 車両共有（並列）: 事業所ごとの計画をプロセスプールで並列に実行
+の便数・総距離（回送を含む）・未割当・所要時間を比較する
+"""
+
+import argparse
+import os
+
+from multi_facility_planner import MultiFacilityPlanner, make_multi_facility_day
+
+def main():
+    parser = argparse.ArgumentParser(description='複数事業所・車両共有の計画のベンチマーク')
+    parser.add_argument('--facilities', type=int, nargs='+', default=[5, 10], help='事業所数')
+    parser.add_argument('--users', type=int, default=200, help='事業所あたりの平均利用者数')
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2], help='合成データの乱数シード')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='並列実行のプロセス数')
+    args = parser.parse_args()
+
+    methods = [
+        ("所属車両のみ", {"share_vehicles": False}),
+        ("車両共有", {"share_vehicles": True}),
+        ("車両共有（並列）", {"share_vehicles": True, "workers": args.workers}),
+    ]
+    print(f"{'事業所':>6} {'シード':>6} {'方式':<18} {'秒':>6} {'便数':>5} {'総距離(km)':>11} "
+          f"{'回送(km)':>9} {'共有台数':>8} {'未割当':>6} {'調整回数':>8}")
+    for num_facilities in args.facilities:
+        totals = {}
+        for seed in args.seeds:
+            facilities, users, vehicles = make_multi_facility_day(num_facilities, args.users, seed=seed)
+            for label, options in methods:
+                stats = MultiFacilityPlanner(facilities, users, vehicles, seed=0, **options).solve().summary()
+                total = totals.setdefault(label, {"seconds": 0.0, "km": 0.0, "unassigned": 0})
+                for key in total:
+                    total[key] += stats[key]
+                print(f"{num_facilities:>6} {seed:>6} {label:<18} {stats['seconds']:>6.2f} {stats['trips']:>5} "
+                      f"{stats['km']:>11.1f} {stats['deadhead_km']:>9.1f} {stats['shared_vehicles']:>8} "
+                      f"{stats['unassigned']:>6} {stats['rounds']:>8}")
+        print(f"\n{num_facilities}事業所の合計（{len(users)}名前後 × {len(args.seeds)}日分）")
+        for label, total in totals.items():
+            print(f"  {label:<18} {total['seconds']:>6.2f}秒 / 総距離 {total['km']:>8.1f}km / 未割当 {total['unassigned']:>4}名")
+        print()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数初期値クラスタリング（multi_start_clustering）のベンチマーク
+1回だけ解く場合の初期値によるばらつき（最良・中央値・最悪）と、
+初期値の数・打ち切り条件・プロセス数を変えた場合の評価値と計算時間を比較する
+
+評価値はメドイドから各メンバーへの距離の合計（km、小さいほど良い）と未割り当て人数
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+import numpy as np
+
+from benchmark_planner import make_synthetic_day
+from multi_start_clustering import clustering_cost, multi_start_clustering
+from transport_planner import build_distance_matrix, build_trip_slots, capacitated_clustering
+
+def main():
+    parser = argparse.ArgumentParser(description='複数初期値クラスタリングのベンチマーク')
+    parser.add_argument('--users', type=int, default=500, help='利用者数')
+    parser.add_argument('--vehicles', type=int, default=40, help='車両数')
+    parser.add_argument('--starts', type=int, default=32, help='初期値の数の上限')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='並列実行のプロセス数')
+    parser.add_argument('--time-budget', type=float, default=1.0, help='時間制限ありの場合の上限（秒）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    facility, users, vehicles = make_synthetic_day(args.users, args.vehicles, seed=args.seed)
+    dist = build_distance_matrix(facility, users)[1:, 1:]
+    wheelchair = np.array([u["wheelchair"] for u in users])
+    _, capacities, wheelchair_capacities = build_trip_slots(vehicles, len(users), int(wheelchair.sum()))
+    problem = (dist, wheelchair, capacities, wheelchair_capacities)
+    print(f"利用者{args.users}名 / 車両{args.vehicles}台 / 便{len(capacities)}")
+
+    # 1回だけ解く場合のばらつき
+    costs = []
+    start = time.perf_counter()
+    for seed in range(args.starts):
+        labels = capacitated_clustering(*problem, rng=np.random.default_rng(seed))
+        costs.append(clustering_cost(dist, labels))
+    per_start = (time.perf_counter() - start) / args.starts
+    totals = sorted(cost for _, cost in costs)
+    print(f"\n1回だけ解く場合（{args.starts}通りの初期値、1回 {per_start:.3f}秒）")
+    print(f"  距離の合計 最良 {totals[0]:.1f}km / 中央値 {statistics.median(totals):.1f}km / 最悪 {totals[-1]:.1f}km"
+          f"  未割り当ての最大 {max(u for u, _ in costs)}名")
+
+    print(f"\n{'方式':<28} {'解いた回数':>8} {'停止理由':<12} {'距離の合計':>10} {'未割当':>6} {'秒':>7}")
+    cases = [
+        ("全初期値（打ち切りなし）", dict(patience=None, workers=1)),
+        ("改善が止まったら打ち切り", dict(workers=1)),
+        (f"時間制限 {args.time_budget:g}秒", dict(patience=None, time_budget=args.time_budget, workers=1)),
+    ]
+    if args.workers > 1:
+        cases.append((f"全初期値・{args.workers}プロセス", dict(patience=None, workers=args.workers)))
+    results = {}
+    for label, options in cases:
+        labels, info = multi_start_clustering(*problem, starts=args.starts, seed=args.seed, **options)
+        results[label] = labels
+        print(f"{label:<28} {info['starts']:>8} {info['stopped']:<12} {info['cost_km']:>10.1f} "
+              f"{info['unassigned']:>6} {info['seconds']:>7.2f}")
+    if args.workers > 1:
+        same = np.array_equal(results[cases[0][0]], results[cases[-1][0]])
+        print(f"\n1プロセスと{args.workers}プロセスの結果: {'一致' if same else '不一致'}"
+              f"（CPUコア数 {os.cpu_count()}）")
+
+if __name__ == '__main__':
+    main()
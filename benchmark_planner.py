@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送迎計画エンジンのベンチマーク
+定員制約付きクラスタリング（transport_planner）と
+現行JSアルゴリズムの移植版（legacy_planner）を同じ入力で比較する
+
+計測項目: 計算時間、便数、総走行距離（各便を最近傍法で巡回した場合）、定員超過便数
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from generate_weekly_data import addresses
+from legacy_planner import assign_users_to_vehicles_with_clustering
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES, build_distance_matrix, plan_day, route_distance
+
+def make_synthetic_day(num_users, num_vehicles, seed=0, wheelchair_rate=0.3):
+    """
+    週間データの住所プールから座標を少しずらして1日分の利用者・車両を作る
+
+    Returns:
+        (facility, users, vehicles)
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(addresses), size=num_users)
+    jitter = rng.uniform(-0.005, 0.005, size=(num_users, 2))
+    wheelchair = rng.random(num_users) < wheelchair_rate
+    minutes = rng.choice([0, 15, 30, 45], size=num_users)
+
+    users = []
+    for i in range(num_users):
+        address, lat, lng = addresses[picks[i]]
+        users.append({
+            "id": i + 1,
+            "name": f"利用者{i + 1}",
+            "address": address,
+            "lat": round(lat + jitter[i, 0], 6),
+            "lng": round(lng + jitter[i, 1], 6),
+            "wheelchair": bool(wheelchair[i]),
+            "notes": "",
+            "pickup_time": f"08:{int(minutes[i]):02d}",
+            "return_time": "16:00",
+        })
+
+    vehicles = []
+    for i in range(num_vehicles):
+        template = DEFAULT_VEHICLES[i % len(DEFAULT_VEHICLES)]
+        vehicles.append({**template, "id": i + 1, "name": f"送迎車{i + 1}号"})
+
+    return dict(DEFAULT_FACILITY), users, vehicles
+
+def nearest_neighbor_km(dist, indices):
+    """便の利用者を最近傍法で巡回した場合の総距離（km）"""
+    unvisited = list(indices)
+    order = []
+    current = 0
+    while unvisited:
+        nearest = min(unvisited, key=lambda i: dist[current, i])
+        order.append(nearest)
+        unvisited.remove(nearest)
+        current = nearest
+    return route_distance(dist, order)
+
+def evaluate(assignments, vehicles, dist, index_by_id):
+    """割り当て結果の便数・総距離・定員超過便数を集計"""
+    vehicle_by_id = {v["id"]: v for v in vehicles}
+    trips = 0
+    total_km = 0.0
+    violations = 0
+    assigned = 0
+
+    for vehicle_id, assignment in assignments.items():
+        vehicle = vehicle_by_id[vehicle_id]
+        for trip in assignment["trips"]:
+            members = trip["users"]
+            if not members:
+                continue
+            trips += 1
+            assigned += len(members)
+            wheelchair_count = sum(1 for u in members if u["wheelchair"])
+            if len(members) > vehicle["capacity"] or wheelchair_count > vehicle["wheelchair_capacity"]:
+                violations += 1
+            total_km += nearest_neighbor_km(dist, [index_by_id[u["id"]] for u in members])
+
+    return {"trips": trips, "km": total_km, "violations": violations, "assigned": assigned}
+
+def main():
+    parser = argparse.ArgumentParser(description='送迎計画エンジンのベンチマーク')
+    parser.add_argument('--users', type=int, default=500, help='利用者数')
+    parser.add_argument('--vehicles', type=int, default=40, help='車両数')
+    parser.add_argument('--repeat', type=int, default=3, help='計測回数（シードを変えて実行）')
+    args = parser.parse_args()
+
+    print(f"利用者{args.users}名 / 車両{args.vehicles}台")
+    print(f"{'手法':<14} {'秒':>8} {'便数':>6} {'総距離(km)':>11} {'定員超過便':>10} {'割当人数':>8}")
+
+    for seed in range(args.repeat):
+        facility, users, vehicles = make_synthetic_day(args.users, args.vehicles, seed=seed)
+        index_by_id = {u["id"]: i + 1 for i, u in enumerate(users)}
+
+        start = time.perf_counter()
+        dist = build_distance_matrix(facility, users)
+        result = plan_day(facility, users, vehicles, seed=seed, dist=dist)
+        new_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy = assign_users_to_vehicles_with_clustering(users, vehicles, rng=random.Random(seed))
+        legacy_seconds = time.perf_counter() - start
+
+        for label, seconds, assignments in [
+            ("新エンジン", new_seconds, result["assignments"]),
+            ("現行JS移植", legacy_seconds, legacy),
+        ]:
+            stats = evaluate(assignments, vehicles, dist, index_by_id)
+            print(f"{label:<14} {seconds:>8.3f} {stats['trips']:>6} {stats['km']:>11.1f} "
+                  f"{stats['violations']:>10} {stats['assigned']:>8}")
+
+if __name__ == '__main__':
+    main()
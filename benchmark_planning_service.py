@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送迎計画サービス（planning_service）のベンチマーク
+同じサーバーに多数の配車担当者が同時に計画を依頼した場合の、計算回数・待ち時間を計測する
+
+1. 配車担当者 N 人が、D 通りの日のどれかを同時に依頼する（同じ日の依頼は1回の計算にまとめられるはず）
+2. 同じ依頼をもう一度行う（すべてキャッシュから返るはず）
+3. ワーカー数より多い新しい日を短い期限で依頼する
+   （すべて 504 を返し、まだ始まっていない計算は取り消されるはず）
+同じ日の結果がすべて一致することと、計算回数が D 回であることを確かめる
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from benchmark_planner import make_synthetic_day
+from geocoding_cache import percentile
+from planning_service import PlanningService, request_json, start_server
+
+async def dispatch_wave(port, days, dispatchers, deadline=None):
+    """各担当者が days[i % len(days)] を依頼し、(日, status, 結果, キャッシュ, 秒) を返す"""
+    async def one(index):
+        day = index % len(days)
+        body = dict(days[day], deadline_seconds=deadline)
+        start = time.perf_counter()
+        status, result, headers = await request_json("127.0.0.1", port, "POST", "/plan", body)
+        return day, status, result, headers.get("x-plan-cache"), time.perf_counter() - start
+    return await asyncio.gather(*(one(i) for i in range(dispatchers)))
+
+def report(label, responses):
+    latencies_ms = [seconds * 1000 for *_, seconds in responses]
+    sources = [source for _, _, _, source, _ in responses]
+    print(f"{label:<16} {len(responses):>6} {sources.count('miss'):>6} {sources.count('coalesced'):>8} "
+          f"{sources.count('hit'):>8} {percentile(latencies_ms, 50):>9.1f} {percentile(latencies_ms, 99):>9.1f}")
+
+async def run(args):
+    days = []
+    for seed in range(args.days):
+        facility, users, vehicles = make_synthetic_day(args.users, args.vehicles, seed=seed)
+        days.append({"facility": facility, "users": users, "vehicles": vehicles, "params": {"seed": seed}})
+
+    service = PlanningService(workers=args.workers)
+    server = await start_server(service, port=0)
+    port = server.sockets[0].getsockname()[1]
+    try:
+        print(f"利用者{args.users}名 / 車両{args.vehicles}台 × {args.days}日、担当者{args.dispatchers}人、"
+              f"ワーカー{args.workers}")
+        print(f"\n{'依頼':<16} {'件数':>6} {'計算':>6} {'共有':>8} {'キャッシュ':>8} {'p50(ms)':>9} {'p99(ms)':>9}")
+        first = await dispatch_wave(port, days, args.dispatchers)
+        report("同時に依頼", first)
+        second = await dispatch_wave(port, days, args.dispatchers)
+        report("同じ依頼をもう一度", second)
+
+        # 同じ日の結果はすべて一致する
+        expected = {}
+        mismatches = 0
+        for day, status, result, _, _ in first + second:
+            assert status == 200, (status, result)
+            if expected.setdefault(day, result) != result:
+                mismatches += 1
+
+        solves = service.stats()["solves"]
+
+        # 期限切れ: ワーカー数より多い新しい日を短い期限で依頼する
+        late_days = []
+        for seed in range(args.days, args.days + args.workers + 2):
+            facility, users, vehicles = make_synthetic_day(args.users, args.vehicles, seed=seed)
+            late_days.append({"facility": facility, "users": users, "vehicles": vehicles, "params": {"seed": seed}})
+        timeouts = await dispatch_wave(port, late_days, len(late_days), deadline=1e-3)
+        stats = service.stats()
+    finally:
+        server.close()
+        await server.wait_closed()
+        service.close()
+
+    print(f"\n計算回数: {solves}回（日の数 {args.days}）"
+          f"、結果の不一致: {mismatches}件")
+    print(f"期限切れ: {sum(1 for _, status, *_ in timeouts if status == 504)}/{len(timeouts)}件が504"
+          f"（timeouts={stats['timeouts']}, cancelled={stats['cancelled']}）")
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='送迎計画サービスのベンチマーク')
+    parser.add_argument('--users', type=int, default=300, help='1日の利用者数')
+    parser.add_argument('--vehicles', type=int, default=25, help='車両数')
+    parser.add_argument('--days', type=int, default=4, help='依頼される日の数')
+    parser.add_argument('--dispatchers', type=int, default=48, help='同時に依頼する配車担当者の数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='計算に使うプロセス数')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送迎計画エンジンの回帰ベンチマーク
+generate_dataset.py で作った標準データセット（day/）に対して各エンジンを実行し、
+- 計算時間（repeat 回の中央値）とピークメモリ（tracemalloc）
+- 総走行距離・便数・座席の利用率・使用車両数
+- 制約違反（定員超過便・車椅子枠超過便・重複割り当て・送迎時間帯の超過車両）と未割り当て人数
+を履歴ファイル（JSON Lines、1行1計測）に記録する。
+
+同じデータセット（corpus_sha256）・同じエンジンの基準の記録と比べ、
+しきい値を超えて悪化した項目があれば終了コード1で終わる（その結果は履歴に残さない）。
+基準は --set-baseline で記録したもの（複数あれば最後のもの）、無ければ最初の記録で、
+直近の記録とは比べない（しきい値内の悪化が積み重なって基準がずれていかないようにする）。
+時間とメモリは同じホストの基準とだけ比べる
+
+エンジン:
+    legacy   現行JSの移植（kMeansClustering → splitIntoTrips → optimizeRoute）
+    planner  定員制約付きクラスタリング（plan_day）+ 最近傍法・2-opt / Or-opt
+    multistart  planner のクラスタリングを複数の初期値から行う（multi_start_clustering）
+    vrptw    時間枠付きVRP（反復回数を固定して結果を再現可能にする）
+
+使い方:
+    python benchmark_regression.py --profiles small medium
+    python benchmark_regression.py --corpus corpus/large_seed0 --engines planner vrptw --max-slowdown 0.1
+    python benchmark_regression.py --profiles small --set-baseline   # 意図した変更のあとに基準を更新
+"""
+
+import argparse
+import functools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import legacy_planner
+from generate_dataset import MANIFEST_NAME, generate_dataset, verify_dataset
+from multi_facility_planner import MORNING_WINDOW_MIN
+from route_optimizer import optimize_route
+from transport_planner import build_distance_matrix, estimate_time, load_dataset, plan_day, route_distance
+from vrptw_solver import VrptwSolver
+
+DEFAULT_HISTORY = "benchmark_history.jsonl"
+VRPTW_ITERATIONS = 200
+MULTI_START_STARTS = 16
+
+# 悪化とみなす割合の既定値
+DEFAULT_MAX_SLOWDOWN = 0.25
+DEFAULT_MAX_MEMORY_GROWTH = 0.25
+DEFAULT_MAX_KM_GROWTH = 0.01
+# これより小さい差は計測のばらつきとして無視する（秒 / MB）
+MIN_SECONDS_DELTA = 0.05
+MIN_MEMORY_DELTA_MB = 1.0
+
+# 増えたら悪化とみなす品質の項目（しきい値なし）
+COUNT_METRICS = ["trips", "unassigned", "violations"]
+
+def run_legacy(facility, users, vehicles, seed):
+    assignments = legacy_planner.assign_users_to_vehicles_with_clustering(users, vehicles, rng=random.Random(seed))
+    for assignment in assignments.values():
+        for trip in assignment["trips"]:
+            trip["users"] = legacy_planner.optimize_route(facility, trip["users"])["order"]
+    return {"assignments": assignments}
+
+def run_planner(facility, users, vehicles, seed, starts=1):
+    dist = build_distance_matrix(facility, users)
+    plan = plan_day(facility, users, vehicles, seed=seed, dist=dist, starts=starts)
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    for assignment in plan["assignments"].values():
+        for trip in assignment["trips"]:
+            indices = [index_by_id[u["id"]] for u in trip["users"]]
+            trip["users"] = optimize_route(facility, trip["users"], dist=dist, indices=indices)["order"]
+    return plan
+
+def run_vrptw(facility, users, vehicles, seed, iterations=VRPTW_ITERATIONS):
+    solver = VrptwSolver(facility, users, vehicles, seed=seed)
+    return solver.solve(time_limit=float("inf"), max_iterations=iterations).to_plan()
+
+ENGINES = {
+    "legacy": run_legacy,
+    "planner": run_planner,
+    "multistart": functools.partial(run_planner, starts=MULTI_START_STARTS),
+    "vrptw": run_vrptw,
+}
+
+def evaluate_plan(facility, users, vehicles, plan, dist=None, window_min=MORNING_WINDOW_MIN):
+    """
+    計画を同じ基準（ハバーサイン距離、平均速度20km/h + 停車3分）で評価する
+
+    便の users の並びを訪問順とみなす。違反の内訳も返す
+    """
+    if dist is None:
+        dist = build_distance_matrix(facility, users)
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    vehicle_by_id = {v["id"]: v for v in vehicles}
+    seen = set()
+    km = 0.0
+    trips = 0
+    riders = 0
+    seats = 0
+    breakdown = {"over_capacity": 0, "over_wheelchair": 0, "duplicate": 0, "unknown_vehicle": 0, "overtime": 0}
+
+    for vehicle_id, assignment in plan["assignments"].items():
+        vehicle = vehicle_by_id.get(vehicle_id)
+        if vehicle is None:
+            breakdown["unknown_vehicle"] += 1
+            continue
+        vehicle_minutes = 0
+        for trip in assignment["trips"]:
+            members = trip["users"]
+            if not members:
+                continue
+            order = [index_by_id[u["id"]] for u in members]
+            trip_km = route_distance(dist, order)
+            trips += 1
+            riders += len(members)
+            seats += vehicle["capacity"]
+            km += trip_km
+            vehicle_minutes += estimate_time(trip_km, len(members))
+            if len(members) > vehicle["capacity"]:
+                breakdown["over_capacity"] += 1
+            if sum(1 for u in members if u["wheelchair"]) > vehicle["wheelchair_capacity"]:
+                breakdown["over_wheelchair"] += 1
+            for user in members:
+                if user["id"] in seen:
+                    breakdown["duplicate"] += 1
+                seen.add(user["id"])
+        if vehicle_minutes > window_min:
+            breakdown["overtime"] += 1
+
+    active = sum(1 for v in vehicles if v.get("is_active", True))
+    return {
+        "km": round(km, 3),
+        "trips": trips,
+        "seat_utilization": round(riders / seats, 4) if seats else 0.0,
+        "vehicles_used": sum(1 for a in plan["assignments"].values() if any(t["users"] for t in a["trips"])),
+        "vehicles_active": active,
+        "unassigned": len(users) - len(seen),
+        "violations": sum(breakdown.values()),
+        "violation_breakdown": breakdown,
+    }
+
+def measure(engine, facility, users, vehicles, seed, repeat, options=None):
+    """
+    計算時間（中央値）・ピークメモリ・品質を計測する。メモリは時間を測らない別の実行で測る
+
+    options はエンジンに渡す追加の引数
+    """
+    run = functools.partial(ENGINES[engine], **(options or {}))
+    seconds = []
+    plan = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        plan = run(facility, users, vehicles, seed)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run(facility, users, vehicles, seed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    metrics = evaluate_plan(facility, users, vehicles, plan)
+    metrics["seconds"] = round(statistics.median(seconds), 4)
+    metrics["peak_mb"] = round(peak / (1024 * 1024), 2)
+    return metrics
+
+def find_regressions(metrics, baseline, host_baseline=None, max_slowdown=DEFAULT_MAX_SLOWDOWN,
+                     max_memory_growth=DEFAULT_MAX_MEMORY_GROWTH, max_km_growth=DEFAULT_MAX_KM_GROWTH):
+    """
+    基準の記録より悪化した項目 [(項目, 基準, 今回)]
+
+    品質は baseline（同じデータセット・エンジンの基準）、時間とメモリは host_baseline
+    （同じホストの基準。None なら比べない）と比べる
+    """
+    problems = []
+    before = baseline["metrics"]
+    if metrics["km"] > before["km"] * (1 + max_km_growth):
+        problems.append(("km", before["km"], metrics["km"]))
+    for name in COUNT_METRICS:
+        if metrics[name] > before[name]:
+            problems.append((name, before[name], metrics[name]))
+    if host_baseline is not None:
+        before = host_baseline["metrics"]
+        if (metrics["seconds"] > before["seconds"] * (1 + max_slowdown)
+                and metrics["seconds"] - before["seconds"] > MIN_SECONDS_DELTA):
+            problems.append(("seconds", before["seconds"], metrics["seconds"]))
+        if (metrics["peak_mb"] > before["peak_mb"] * (1 + max_memory_growth)
+                and metrics["peak_mb"] - before["peak_mb"] > MIN_MEMORY_DELTA_MB):
+            problems.append(("peak_mb", before["peak_mb"], metrics["peak_mb"]))
+    return problems
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def baseline_record(history, corpus_sha256, engine, options=None, host=None):
+    """
+    同じデータセット・エンジン・エンジンの引数（host を指定した場合は同じホスト）での基準の記録
+
+    --set-baseline で記録したもの（複数あれば最後のもの）、無ければ最初の記録
+    """
+    matches = [
+        record for record in history
+        if record["corpus_sha256"] == corpus_sha256 and record["engine"] == engine
+        and record.get("options", {}) == (options or {}) and (host is None or record.get("host") == host)
+    ]
+    pinned = [record for record in matches if record.get("baseline")]
+    if pinned:
+        return pinned[-1]
+    return matches[0] if matches else None
+
+def git_revision():
+    """計測したコードのコミット（git がない場合は None）と未コミットの変更の有無"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+def prepare_corpora(args):
+    """計測するデータセットのディレクトリ。プロファイル指定の場合は無ければ生成する"""
+    directories = list(args.corpus or [])
+    for profile in args.profiles or []:
+        directory = os.path.join(args.corpus_root, f"{profile}_seed{args.seed}")
+        if not os.path.exists(os.path.join(directory, MANIFEST_NAME)) or verify_dataset(directory):
+            print(f"データセットを生成しています: {directory}")
+            generate_dataset(directory, profile, args.seed)
+        directories.append(directory)
+    for directory in directories:
+        problems = verify_dataset(directory)
+        if problems:
+            sys.exit(f"❌ {directory} が manifest と一致しません: {problems[:3]}")
+    return directories
+
+def main():
+    parser = argparse.ArgumentParser(description='送迎計画エンジンの回帰ベンチマーク')
+    parser.add_argument('--corpus', nargs='+', help='generate_dataset.py で作ったデータセットのディレクトリ')
+    parser.add_argument('--profiles', nargs='+', help='プロファイル名（無ければ corpus-root 以下に生成）')
+    parser.add_argument('--corpus-root', default='corpus', help='プロファイル指定時のデータセットの置き場所')
+    parser.add_argument('--seed', type=int, default=0, help='データセットとエンジンの乱数シード')
+    parser.add_argument('--engines', nargs='+', choices=list(ENGINES), default=list(ENGINES), help='エンジン')
+    parser.add_argument('--repeat', type=int, default=3, help='計算時間の計測回数（中央値をとる）')
+    parser.add_argument('--vrptw-iterations', type=int, default=VRPTW_ITERATIONS, help='vrptw の改善の反復回数')
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='履歴ファイル（JSON Lines）')
+    parser.add_argument('--no-record', action='store_true', help='履歴に記録しない')
+    parser.add_argument('--set-baseline', action='store_true',
+                        help='悪化を判定せずに記録し、以後の比較の基準にする（意図した変更のあとに使う）')
+    parser.add_argument('--max-slowdown', type=float, default=DEFAULT_MAX_SLOWDOWN, help='許容する計算時間の増加率')
+    parser.add_argument('--max-memory-growth', type=float, default=DEFAULT_MAX_MEMORY_GROWTH,
+                        help='許容するピークメモリの増加率')
+    parser.add_argument('--max-km-growth', type=float, default=DEFAULT_MAX_KM_GROWTH, help='許容する総距離の増加率')
+    args = parser.parse_args()
+    if not args.corpus and not args.profiles:
+        args.profiles = ['small', 'medium']
+
+    directories = prepare_corpora(args)
+    history = load_history(args.history)
+    commit, dirty = git_revision()
+    host = platform.node()
+    engine_options = {"vrptw": {"iterations": args.vrptw_iterations}}
+    records = []
+    regressions = []
+
+    print(f"\n{'データセット':<20} {'エンジン':<10} {'秒':>8} {'MB':>7} {'総距離(km)':>11} {'便数':>6} "
+          f"{'利用率':>6} {'車両':>7} {'未割当':>6} {'違反':>5}  基準比")
+    for directory in directories:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+        facility, users, vehicles = load_dataset(os.path.join(directory, "day"))
+        name = os.path.basename(os.path.normpath(directory))
+
+        for engine in args.engines:
+            options = engine_options.get(engine, {})
+            metrics = measure(engine, facility, users, vehicles, args.seed, args.repeat, options)
+            baseline = baseline_record(history, manifest["corpus_sha256"], engine, options)
+            host_baseline = baseline_record(history, manifest["corpus_sha256"], engine, options, host=host)
+            problems = []
+            note = "（初回）"
+            if args.set_baseline:
+                note = "（基準に設定）"
+            elif baseline is not None:
+                problems = find_regressions(metrics, baseline, host_baseline, args.max_slowdown,
+                                            args.max_memory_growth, args.max_km_growth)
+                note = ""
+                if host_baseline is not None and host_baseline["metrics"]["seconds"] > 0:
+                    note = f"{metrics['seconds'] / host_baseline['metrics']['seconds']:.2f}倍"
+            print(f"{name:<20} {engine:<10} {metrics['seconds']:>8.3f} {metrics['peak_mb']:>7.1f} "
+                  f"{metrics['km']:>11.1f} {metrics['trips']:>6} {metrics['seat_utilization']:>6.0%} "
+                  f"{metrics['vehicles_used']:>3}/{metrics['vehicles_active']:<3} {metrics['unassigned']:>6} "
+                  f"{metrics['violations']:>5}  {note}")
+            regressions += [(name, engine) + problem for problem in problems]
+            records.append({
+                "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                "commit": commit,
+                "dirty": dirty,
+                "host": host,
+                "python": platform.python_version(),
+                "corpus": name,
+                "profile": manifest["profile"],
+                "corpus_sha256": manifest["corpus_sha256"],
+                "engine": engine,
+                "options": options,
+                "seed": args.seed,
+                "repeat": args.repeat,
+                "metrics": metrics,
+                "baseline": args.set_baseline,
+            })
+
+    if regressions:
+        print("\n❌ 基準の記録より悪化した項目があります（履歴には記録しません）")
+        for name, engine, metric, before, after in regressions:
+            print(f"  {name} / {engine}: {metric} {before} → {after}")
+        sys.exit(1)
+
+    if not args.no_record:
+        with open(args.history, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, sort_keys=True) + "\n")
+        print(f"\n✅ {len(records)}件の計測結果を記録しました")
+        print(f"📁 ファイル: {args.history}")
+
+if __name__ == '__main__':
+    main()
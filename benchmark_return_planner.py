@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送りの計画（return_planner）のベンチマーク
+迎えを計画したあと、送りを
+- ゼロから: VrptwSolver（mode="return"）の挿入法 + 大近傍探索
+- 迎えの計画から（修正のみ）: 迎えの便を逆順にして時間枠を守れない利用者だけ挿入し直す（return_planner の既定）
+- 迎えの計画から + 大近傍探索: 上の解から --time-limit 秒の大近傍探索を行う
+で計画し、計算時間と総距離・遅れを比較する
+
+帰宅時刻は 15:00〜16:30 の30分刻みでばらつかせる。--asymmetric を付けると、
+事業所から遠ざかる向きの移動を RUSH_FACTOR 倍遅くした非対称の移動時間で計画する（夕方の渋滞を想定）
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from benchmark_planner import make_synthetic_day
+from return_planner import order_pickup_trips, plan_return
+from transport_planner import AVERAGE_SPEED_KMH, build_distance_matrix, plan_day
+from vrptw_solver import VrptwSolver
+
+RETURN_TIMES = ["15:00", "15:30", "16:00", "16:30"]
+RUSH_FACTOR = 1.3
+# ゼロからの計画と大近傍探索の時間上限（秒）
+LNS_TIME_LIMIT = 0.2
+
+def make_day(num_users, num_vehicles, seed):
+    facility, users, vehicles = make_synthetic_day(num_users, num_vehicles, seed=seed)
+    rng = np.random.default_rng(seed)
+    for user in users:
+        user["return_time"] = str(rng.choice(RETURN_TIMES))
+    return facility, users, vehicles
+
+def asymmetric_travel(dist):
+    """事業所から遠ざかる向きの移動を RUSH_FACTOR 倍遅くした移動時間（分）"""
+    travel = dist / AVERAGE_SPEED_KMH * 60
+    outbound = dist[0][None, :] > dist[0][:, None]
+    return np.where(outbound, travel * RUSH_FACTOR, travel)
+
+def main():
+    parser = argparse.ArgumentParser(description='送りの計画のベンチマーク')
+    parser.add_argument('--users', type=int, default=300, help='利用者数')
+    parser.add_argument('--vehicles', type=int, default=25, help='車両数')
+    parser.add_argument('--time-limit', type=float, default=LNS_TIME_LIMIT, help='大近傍探索の時間上限（秒）')
+    parser.add_argument('--repeat', type=int, default=3, help='シードを変えて実行する回数（平均を表示）')
+    parser.add_argument('--asymmetric', action='store_true', help='非対称の移動時間で計画する')
+    args = parser.parse_args()
+
+    rows = {}
+    for seed in range(args.repeat):
+        facility, users, vehicles = make_day(args.users, args.vehicles, seed)
+
+        start = time.perf_counter()
+        dist = build_distance_matrix(facility, users)
+        pickup = order_pickup_trips(facility, users, plan_day(facility, users, vehicles, seed=seed, dist=dist), dist)
+        pickup_seconds = time.perf_counter() - start
+        travel = asymmetric_travel(dist) if args.asymmetric else None
+        rows.setdefault("迎え（plan_day + ルート改善）", []).append({"seconds": pickup_seconds})
+
+        start = time.perf_counter()
+        solver = VrptwSolver(facility, users, vehicles, mode="return", dist=dist, travel=travel, seed=seed)
+        solver.solve(time_limit=args.time_limit)
+        rows.setdefault("送り: ゼロから", []).append(dict(solver.summary(), seconds=time.perf_counter() - start))
+
+        for label, time_limit in [("送り: 迎えから（修正のみ）", 0), ("送り: 迎えから + 大近傍探索", args.time_limit)]:
+            start = time.perf_counter()
+            _, summary = plan_return(facility, users, vehicles, pickup, dist=dist, travel=travel, seed=seed,
+                                     time_limit=time_limit)
+            rows.setdefault(label, []).append(dict(summary, seconds=time.perf_counter() - start))
+
+    print(f"利用者{args.users}名 / 車両{args.vehicles}台 / 帰宅時刻 {'・'.join(RETURN_TIMES)}"
+          f"{' / 非対称の移動時間' if args.asymmetric else ''}")
+    print(f"{'方式':<28} {'秒':>7} {'便数':>6} {'総距離(km)':>10} {'遅れ地点':>8} {'遅れ(分)':>9} {'未割当':>6}")
+    for label, runs in rows.items():
+        mean = {key: statistics.mean(float(run[key]) for run in runs) for key in runs[0]}
+        if len(mean) == 1:
+            print(f"{label:<28} {mean['seconds']:>7.3f}")
+            continue
+        print(f"{label:<28} {mean['seconds']:>7.3f} {mean['trips']:>6.1f} {mean['km']:>10.1f} "
+              f"{mean['late_stops']:>8.1f} {mean['lateness_min']:>9.1f} {mean['unassigned']:>6.1f}")
+
+if __name__ == '__main__':
+    main()
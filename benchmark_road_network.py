@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+道路ネットワークによる移動時間行列のベンチマーク
+荒川区周辺に格子状の道路網（幹線道路を含む）と、数か所の橋でしか渡れない川を持つ
+合成の OSM XML を作り、road_network.TravelTimeMatrix で
+- 初回計算（ダイクストラ法）
+- メモリキャッシュ
+- ディスクキャッシュ（別インスタンスから読み込み）
+- ハバーサイン距離へのフォールバック
+の所要時間を比較し、川の同じ側 / 対岸への移動でハバーサイン距離との差を確認する
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from generate_weekly_data import addresses
+from road_network import RoadGraph, TravelTimeMatrix
+
+# 合成道路網の範囲と間隔（度）
+LAT_RANGE = (35.712, 35.760)
+LNG_RANGE = (139.750, 139.825)
+SPACING = 0.0018  # 約200m
+ARTERIAL_EVERY = 5  # 5本に1本を幹線道路（primary）にする
+RIVER_LAT = 35.7415  # 川（東西方向）の位置
+BRIDGE_LNGS = (139.7655, 139.7960, 139.8140)  # 橋の経度
+
+def write_synthetic_osm(path):
+    """格子状の道路網と川を持つ OSM XML を作成。ノード数を返す"""
+    lats = np.arange(LAT_RANGE[0], LAT_RANGE[1], SPACING)
+    lngs = np.arange(LNG_RANGE[0], LNG_RANGE[1], SPACING)
+    bridge_columns = {int(np.argmin(np.abs(lngs - b))) for b in BRIDGE_LNGS}
+    river_row = int(np.searchsorted(lats, RIVER_LAT))  # river_row-1 と river_row の間に川がある
+
+    def node_id(row, col):
+        return row * len(lngs) + col + 1
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6" generator="benchmark_road_network">']
+    for row, lat in enumerate(lats):
+        for col, lng in enumerate(lngs):
+            lines.append(f'  <node id="{node_id(row, col)}" lat="{lat:.6f}" lon="{lng:.6f}"/>')
+
+    way_id = 1
+
+    def add_way(refs, highway):
+        nonlocal way_id
+        lines.append(f'  <way id="{way_id}">')
+        lines.extend(f'    <nd ref="{ref}"/>' for ref in refs)
+        lines.append(f'    <tag k="highway" v="{highway}"/>')
+        lines.append('  </way>')
+        way_id += 1
+
+    for row in range(len(lats)):
+        add_way([node_id(row, col) for col in range(len(lngs))],
+                "primary" if row % ARTERIAL_EVERY == 0 else "residential")
+    for col in range(len(lngs)):
+        highway = "primary" if col % ARTERIAL_EVERY == 0 else "residential"
+        if col in bridge_columns:
+            add_way([node_id(row, col) for row in range(len(lats))], highway)
+        else:
+            add_way([node_id(row, col) for row in range(river_row)], highway)
+            add_way([node_id(row, col) for row in range(river_row, len(lats))], highway)
+    lines.append('</osm>')
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return len(lats) * len(lngs)
+
+def make_stops(size, seed):
+    """荒川区周辺の地点（generate_weekly_data.addresses の周囲にばらつかせる）"""
+    rng = random.Random(seed)
+    lats, lngs = [], []
+    for _ in range(size):
+        _, lat, lng = rng.choice(addresses)
+        lats.append(lat + rng.uniform(-0.006, 0.006))
+        lngs.append(lng + rng.uniform(-0.006, 0.006))
+    return np.array(lats), np.array(lngs)
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description='道路ネットワークによる移動時間行列のベンチマーク')
+    parser.add_argument('--size', type=int, default=500, help='地点数')
+    parser.add_argument('--depart', default='08:00', help='出発時刻（時間帯の混雑係数に使用）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        osm_path = os.path.join(work_dir, "arakawa_synthetic.osm")
+        nodes = write_synthetic_osm(osm_path)
+        load_seconds, graph = timed(lambda: RoadGraph.from_osm(osm_path))
+        print(f"道路グラフ: {nodes:,}ノード / {len(graph.targets):,}辺（読み込み {load_seconds:.2f}秒）\n")
+
+        lats, lngs = make_stops(args.size, args.seed)
+        cache_dir = os.path.join(work_dir, "cache")
+        service = TravelTimeMatrix(graph, cache_dir=cache_dir)
+        shuffled = np.random.default_rng(args.seed).permutation(args.size)
+
+        print(f"{'処理':<28} {'秒':>10}")
+        cold_seconds, (minutes, km) = timed(lambda: service.matrices(lats, lngs, args.depart))
+        print(f"{'初回計算（ダイクストラ法）':<28} {cold_seconds:>10.3f}")
+        warm_seconds, _ = timed(lambda: service.matrices(lats, lngs, args.depart))
+        print(f"{'メモリキャッシュ':<28} {warm_seconds:>10.4f}")
+        reorder_seconds, (reordered, _) = timed(lambda: service.matrices(lats[shuffled], lngs[shuffled], args.depart))
+        print(f"{'メモリキャッシュ（順序違い）':<28} {reorder_seconds:>10.4f}")
+        disk_seconds, _ = timed(lambda: TravelTimeMatrix(graph, cache_dir=cache_dir).matrices(lats, lngs, args.depart))
+        print(f"{'ディスクキャッシュ':<28} {disk_seconds:>10.4f}")
+        fallback_seconds, (straight_minutes, straight_km) = timed(
+            lambda: TravelTimeMatrix().matrices(lats, lngs, args.depart))
+        print(f"{'ハバーサイン距離':<28} {fallback_seconds:>10.4f}")
+
+        same = np.array_equal(reordered, minutes[np.ix_(shuffled, shuffled)])
+        print(f"\n順序を変えた問い合わせの結果: {'一致' if same else '不一致'}")
+        print(f"キャッシュ: {service.stats()}")
+
+    north = lats >= RIVER_LAT
+    crossing = north[:, None] != north[None, :]
+    off_diagonal = ~np.eye(args.size, dtype=bool)
+    print(f"\n{'組み合わせ':<12} {'組数':>8} {'道路/直線 距離':>14} {'道路/直線 時間':>14} {'時間差の最大(分)':>16}")
+    for label, mask in (("同じ側", ~crossing & off_diagonal), ("対岸", crossing)):
+        if not mask.any():
+            continue
+        km_ratio = np.mean(km[mask] / np.maximum(straight_km[mask], 1e-9))
+        minute_ratio = np.mean(minutes[mask] / np.maximum(straight_minutes[mask], 1e-9))
+        gap = np.max(minutes[mask] - straight_minutes[mask])
+        print(f"{label:<12} {int(mask.sum()):>8} {km_ratio:>14.2f} {minute_ratio:>14.2f} {gap:>16.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ルート改善エンジンのベンチマーク
+sample_data_30 と weekly_data の各曜日について、現行の最近傍法（legacy_planner）と
+2-opt / Or-opt 改善（route_optimizer）の総距離・計算時間を比較する
+
+比較は2通り:
+- 便ごと: transport_planner で作った便をそれぞれ最適化した合計
+- 1ルート: その日の全利用者を1台で回る場合（停車地が多いほど差が出る）
+"""
+
+import argparse
+import glob
+import os
+import time
+
+from legacy_planner import optimize_route as legacy_optimize_route
+from route_optimizer import optimize_route
+from transport_planner import build_distance_matrix, load_dataset, plan_day
+
+def compare(facility, routes, dist, index_by_id):
+    """各ルートを両方式で計算し、総距離と計算時間を返す"""
+    legacy_km = new_km = 0.0
+    legacy_seconds = new_seconds = 0.0
+
+    for users in routes:
+        start = time.perf_counter()
+        legacy = legacy_optimize_route(facility, users)
+        legacy_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        improved = optimize_route(facility, users, dist=dist, indices=[index_by_id[u["id"]] for u in users])
+        new_seconds += time.perf_counter() - start
+
+        legacy_km += legacy["totalDistance"]
+        new_km += improved["totalDistance"]
+
+    return legacy_km, new_km, legacy_seconds, new_seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='ルート改善エンジンのベンチマーク')
+    parser.add_argument('--seed', type=int, default=0, help='便割り当ての乱数シード')
+    args = parser.parse_args()
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    inputs = [os.path.join(base_dir, "sample_data_30")]
+    inputs += sorted(glob.glob(os.path.join(base_dir, "weekly_data", "*.csv")))
+
+    print(f"{'入力':<16} {'方式':<6} {'ルート数':>8} {'最近傍(km)':>11} {'改善後(km)':>11} "
+          f"{'削減率':>7} {'最近傍(ms)':>11} {'改善(ms)':>9}")
+
+    total_saved = total_legacy = 0.0
+    for path in inputs:
+        facility, users, vehicles = load_dataset(path)
+        if not users:
+            continue
+        dist = build_distance_matrix(facility, users)
+        index_by_id = {u["id"]: i + 1 for i, u in enumerate(users)}
+
+        plan = plan_day(facility, users, vehicles, seed=args.seed, dist=dist)
+        trips = [trip["users"] for a in plan["assignments"].values() for trip in a["trips"]]
+
+        label = os.path.splitext(os.path.basename(path))[0]
+        for mode, routes in [("便ごと", trips), ("1ルート", [users])]:
+            legacy_km, new_km, legacy_seconds, new_seconds = compare(facility, routes, dist, index_by_id)
+            saved = (legacy_km - new_km) / legacy_km * 100 if legacy_km else 0.0
+            total_legacy += legacy_km
+            total_saved += legacy_km - new_km
+            print(f"{label:<16} {mode:<6} {len(routes):>8} {legacy_km:>11.2f} {new_km:>11.2f} "
+                  f"{saved:>6.1f}% {legacy_seconds * 1000:>11.1f} {new_seconds * 1000:>9.1f}")
+
+    if total_legacy:
+        print(f"\n全体の削減率: {total_saved / total_legacy * 100:.1f}%")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+バイナリスナップショットのベンチマーク
+大規模な週間データ（利用者・曜日ごとの名簿・便割り当て）を作成し、
+- JSON（generate_sample_users_v2.py と同じ indent=2）
+- JSON（インデントなし）
+- weeklyData.js（generate_weekly_data.py の出力形式）
+- バイナリスナップショット
+のファイルサイズと読み込み時間を比較する
+
+スナップショットは「開くだけ（mmap）」「1日分の名簿の座標を読む」「全利用者を辞書に展開」を別々に計測する
+weeklyData.js はブラウザで読み込まれるため、ファイルの読み込み時間のみ参考値として示す
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_planner import make_synthetic_day
+from generate_weekly_data import usage_patterns, weekdays
+from plan_snapshot import PlanSnapshot, export_javascript, write_snapshot
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES
+
+def make_week(num_users, seed=0):
+    """利用パターンに沿って曜日ごとの名簿と、名簿を順に区切った便割り当てを作成"""
+    rng = np.random.default_rng(seed)
+    _, users, _ = make_synthetic_day(num_users, 1, seed=seed)
+
+    picks = rng.integers(0, len(usage_patterns), size=num_users)
+    rosters = {day: [] for day in range(len(weekdays))}
+    for row, pick in enumerate(picks):
+        for day in usage_patterns[pick]:
+            rosters[day].append(row)
+
+    plans = {}
+    for day, members in rosters.items():
+        assignments = {}
+        for trip_no, start in enumerate(range(0, len(members), 8)):
+            vehicle = DEFAULT_VEHICLES[trip_no % len(DEFAULT_VEHICLES)]
+            trip_users = [users[row] for row in members[start:start + 8]]
+            assignments.setdefault(vehicle["id"], {"trips": []})["trips"].append(
+                {"users": trip_users, "distance": 10.0, "duration": 40.0}
+            )
+        plans[day] = {"assignments": assignments, "unassigned": []}
+    return users, rosters, plans
+
+def to_json_data(users, rosters, plans):
+    """スナップショットと同じ内容をJSONで表現（名簿と便は利用者IDで参照）"""
+    return {
+        "facility": DEFAULT_FACILITY,
+        "vehicles": DEFAULT_VEHICLES,
+        "userMaster": users,
+        "weeklyRosters": {weekdays[day]: [users[row]["id"] for row in members] for day, members in rosters.items()},
+        "plans": {
+            weekdays[day]: {
+                vehicle_id: {"trips": [
+                    {"userIds": [u["id"] for u in trip["users"]], "distance": trip["distance"], "duration": trip["duration"]}
+                    for trip in assignment["trips"]
+                ]}
+                for vehicle_id, assignment in plan["assignments"].items()
+            }
+            for day, plan in plans.items()
+        },
+    }
+
+def timed(func, repeat=3):
+    """最短の所要時間（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def read_text(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+def open_snapshot(path):
+    PlanSnapshot(path).close()
+
+def read_roster_coordinates(path):
+    with PlanSnapshot(path) as snapshot:
+        rows = snapshot.roster(0)
+        float(snapshot.users["lat"][rows].sum() + snapshot.users["lng"][rows].sum())
+
+def materialize_snapshot(path):
+    with PlanSnapshot(path) as snapshot:
+        snapshot.to_users()
+
+def main():
+    parser = argparse.ArgumentParser(description='バイナリスナップショットのベンチマーク')
+    parser.add_argument('--users', type=int, default=100000, help='利用者数')
+    args = parser.parse_args()
+
+    users, rosters, plans = make_week(args.users)
+    data = to_json_data(users, rosters, plans)
+    members = sum(len(m) for m in rosters.values())
+    print(f"利用者: {args.users:,}名 / 週の延べ利用: {members:,}件\n")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = {
+            "json_indent": os.path.join(tmp_dir, "plan_indent.json"),
+            "json_compact": os.path.join(tmp_dir, "plan.json"),
+            "js": os.path.join(tmp_dir, "weeklyData.js"),
+            "snapshot": os.path.join(tmp_dir, "plan.dsplan"),
+        }
+        write_snapshot(paths["snapshot"], DEFAULT_FACILITY, users, DEFAULT_VEHICLES, rosters, plans)
+        with open(paths["json_indent"], "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        with open(paths["json_compact"], "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        with PlanSnapshot(paths["snapshot"]) as snapshot:
+            export_javascript(snapshot, paths["js"])
+
+        results = [
+            ("JSON (indent=2)", paths["json_indent"], lambda: load_json(paths["json_indent"])),
+            ("JSON (compact)", paths["json_compact"], lambda: load_json(paths["json_compact"])),
+            ("weeklyData.js ※", paths["js"], lambda: read_text(paths["js"])),
+            ("snapshot 開く", paths["snapshot"], lambda: open_snapshot(paths["snapshot"])),
+            ("snapshot 1日の座標", paths["snapshot"], lambda: read_roster_coordinates(paths["snapshot"])),
+            ("snapshot 全件展開", paths["snapshot"], lambda: materialize_snapshot(paths["snapshot"])),
+        ]
+        print(f"{'形式':<20} {'サイズ(MB)':>11} {'読込(ms)':>10}")
+        for label, path, loader in results:
+            size = os.path.getsize(path) / 1024 / 1024
+            print(f"{label:<20} {size:>11.2f} {timed(loader) * 1000:>10.2f}")
+        print("\n※ weeklyData.js はブラウザで解析されるため、ファイル読み込みのみの参考値")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+空間インデックスのベンチマーク
+1万地点以上で、総当たり（ハバーサイン距離を全点に対して計算）と
+spatial_index.GridIndex の
+- k近傍（k=8、全点を問い合わせ）
+- 半径1km以内の検索
+- 未訪問の最寄りをたどる最近傍法の巡回
+の所要時間を比較し、さらに距離行列を使う plan_day と空間インデックスを使う
+capacitated_kmeans のクラスタリング結果（時間・便数・総距離）を比較する
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from benchmark_planner import make_synthetic_day
+from spatial_index import GridIndex, capacitated_kmeans, haversine_to_point, nearest_neighbor_order, path_distance
+from transport_planner import (
+    build_distance_matrix,
+    build_trip_slots,
+    capacitated_clustering,
+    haversine_matrix,
+)
+
+def brute_knn(lats, lngs, k, chunk=200):
+    """総当たりの k 近傍（メモリを抑えるため問い合わせを分割）"""
+    result = []
+    for start in range(0, len(lats), chunk):
+        dist = haversine_matrix(lats[start:start + chunk], lngs[start:start + chunk], lats, lngs)
+        result.append(np.argpartition(dist, k - 1, axis=1)[:, :k].copy())
+    return np.concatenate(result)
+
+def brute_nearest_neighbor(start_lat, start_lng, lats, lngs):
+    """総当たりの最近傍法（毎回、未訪問の全点との距離を計算）"""
+    remaining = np.arange(len(lats))
+    order = []
+    lat, lng = start_lat, start_lng
+    while len(remaining):
+        position = int(np.argmin(haversine_to_point(lat, lng, lats[remaining], lngs[remaining])))
+        point = remaining[position]
+        remaining = np.delete(remaining, position)
+        order.append(int(point))
+        lat, lng = lats[point], lngs[point]
+    return order
+
+def clustering_km(facility, lats, lngs, labels):
+    """便ごとに最近傍法で巡回した総距離（km）と便数"""
+    total = 0.0
+    trips = 0
+    for cluster in np.unique(labels[labels >= 0]):
+        members = np.flatnonzero(labels == cluster)
+        order = nearest_neighbor_order(facility["lat"], facility["lng"], lats[members], lngs[members])
+        total += path_distance(facility["lat"], facility["lng"], lats[members], lngs[members], order)
+        trips += 1
+    return total, trips
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description='空間インデックスのベンチマーク')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000], help='地点数')
+    parser.add_argument('--route-size', type=int, default=10000, help='最近傍法の地点数')
+    parser.add_argument('--plan-sizes', type=int, nargs='+', default=[3000, 10000, 20000], help='クラスタリングの利用者数')
+    args = parser.parse_args()
+
+    print(f"{'地点数':>8} {'処理':<14} {'総当たり(秒)':>12} {'インデックス(秒)':>16} {'一致':>6}")
+    for size in args.sizes:
+        _, users, _ = make_synthetic_day(size, 1, seed=size)
+        lats = np.array([u["lat"] for u in users])
+        lngs = np.array([u["lng"] for u in users])
+
+        brute_seconds, brute = timed(lambda: brute_knn(lats, lngs, 8))
+        index_seconds, (indexed, _) = timed(lambda: GridIndex(lats, lngs).knn_batch(lats, lngs, 8))
+        same = np.mean(np.sort(brute, axis=1) == np.sort(indexed, axis=1)) * 100
+        print(f"{size:>8} {'k近傍(k=8)':<14} {brute_seconds:>12.3f} {index_seconds:>16.3f} {same:>5.1f}%")
+
+        queries = np.arange(0, size, size // 1000)
+        brute_seconds, _ = timed(lambda: [np.flatnonzero(haversine_to_point(lats[q], lngs[q], lats, lngs) <= 1.0)
+                                          for q in queries])
+        index = GridIndex(lats, lngs)
+        index_seconds, _ = timed(lambda: [index.radius(lats[q], lngs[q], 1.0) for q in queries])
+        print(f"{size:>8} {'半径1km×1000':<14} {brute_seconds:>12.3f} {index_seconds:>16.3f}")
+
+    facility, users, _ = make_synthetic_day(args.route_size, 1, seed=1)
+    lats = np.array([u["lat"] for u in users])
+    lngs = np.array([u["lng"] for u in users])
+    brute_seconds, brute = timed(lambda: brute_nearest_neighbor(facility["lat"], facility["lng"], lats, lngs))
+    index_seconds, indexed = timed(lambda: nearest_neighbor_order(facility["lat"], facility["lng"], lats, lngs))
+    print(f"{args.route_size:>8} {'最近傍法':<14} {brute_seconds:>12.3f} {index_seconds:>16.3f} "
+          f"{'同じ' if brute == indexed else '異なる':>6}")
+
+    print(f"\n{'利用者数':>8} {'クラスタリング':<16} {'秒':>8} {'便数':>6} {'総距離(km)':>11} {'割当人数':>8}")
+    for size in args.plan_sizes:
+        facility, users, vehicles = make_synthetic_day(size, max(size // 25, 1), seed=size)
+        lats = np.array([u["lat"] for u in users])
+        lngs = np.array([u["lng"] for u in users])
+        wheelchair = np.array([u["wheelchair"] for u in users])
+        _, capacities, wheelchair_capacities = build_trip_slots(vehicles, size, int(wheelchair.sum()))
+
+        methods = [("空間インデックス", lambda: capacitated_kmeans(
+            lats, lngs, wheelchair, capacities, wheelchair_capacities))]
+        if size <= 5000:
+            methods.insert(0, ("距離行列", lambda: capacitated_clustering(
+                build_distance_matrix(facility, users)[1:, 1:], wheelchair, capacities, wheelchair_capacities,
+                rng=np.random.default_rng(0))))
+        for label, method in methods:
+            seconds, labels = timed(method)
+            km, trips = clustering_km(facility, lats, lngs, labels)
+            print(f"{size:>8} {label:<16} {seconds:>8.2f} {trips:>6} {km:>11.1f} {int((labels >= 0).sum()):>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+停車地へのまとめ（stop_aggregation）のベンチマーク
+同じ名簿を利用者ごと（plan_day / optimize_route）と停車地ごと（plan_day_aggregated /
+optimize_route_aggregated）で計画し、問題の大きさ・計算時間・実行可能性を比較する
+
+名簿: weekly_data/*.csv（利用者のいる曜日）と、generate_weekly_data で生成した
+medium / large プロファイル相当の名簿（最も利用者の多い曜日）
+
+計測項目: 停車地の数（削減率）、計画の計算時間（距離行列を含む）、各便のルート順序の計算時間、
+未割り当て人数・定員や車椅子枠を超えた便（シードごとの最大）、総走行距離
+"""
+
+import argparse
+import glob
+import os
+import random
+import statistics
+import time
+
+from benchmark_planner import make_synthetic_day
+from generate_dataset import PROFILES
+from generate_weekly_data import generate_weekly_users
+from route_optimizer import optimize_route
+from stop_aggregation import (
+    DEFAULT_TOLERANCE_M, aggregate_stops, optimize_route_aggregated, plan_day_aggregated, stop_limits,
+)
+from transport_planner import load_dataset, plan_day
+
+def rosters(seed):
+    """(名前, 事業所, 利用者, 車両) を返す"""
+    for path in sorted(glob.glob(os.path.join("weekly_data", "*.csv"))):
+        facility, users, vehicles = load_dataset(path)
+        if users:
+            yield os.path.basename(path), facility, users, vehicles
+    for profile in ("medium", "large"):
+        params = PROFILES[profile]
+        weekly = generate_weekly_users(random.Random(seed), tuple(params["weekly_users_per_pattern"]),
+                                       params["weekly_max_per_day"])
+        weekday, users = max(weekly.items(), key=lambda item: len(item[1]))
+        facility, _, vehicles = make_synthetic_day(0, params["day_vehicles"])
+        yield f"{profile}（{weekday}）", facility, users, vehicles
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def evaluate(facility, plan, vehicles, aggregated):
+    """便数・定員超過便・未割り当て人数と、各便のルート順序の総距離・計算時間"""
+    vehicle_by_id = {v["id"]: v for v in vehicles}
+    trips = [(vehicle_by_id[vehicle_id], trip["users"])
+             for vehicle_id, assignment in plan["assignments"].items() for trip in assignment["trips"]]
+    violations = sum(1 for vehicle, members in trips
+                     if len(members) > vehicle["capacity"]
+                     or sum(1 for u in members if u["wheelchair"]) > vehicle["wheelchair_capacity"])
+    route = optimize_route_aggregated if aggregated else optimize_route
+    routes, seconds = timed(lambda: [route(facility, members) for _, members in trips])
+    return {
+        "trips": len(trips),
+        "violations": violations,
+        "unassigned": len(plan["unassigned"]),
+        "km": sum(r["totalDistance"] for r in routes),
+        "route_seconds": seconds,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='停車地へのまとめのベンチマーク')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    parser.add_argument('--repeat', type=int, default=3, help='シードを変えて計画する回数（平均を表示）')
+    args = parser.parse_args()
+
+    print(f"{'名簿':<18} {'方式':<8} {'地点':>6} {'削減率':>7} {'計画秒':>8} {'ルート秒':>8} "
+          f"{'便数':>5} {'未割当':>6} {'超過便':>6} {'総距離(km)':>10}")
+    for name, facility, users, vehicles in rosters(args.seed):
+        stops = aggregate_stops(users, "address", DEFAULT_TOLERANCE_M, *stop_limits(vehicles))
+        reduction = 1 - len(stops) / len(users)
+        for label, nodes, planner, aggregated in [
+            ("利用者", len(users), plan_day, False),
+            ("停車地", len(stops), plan_day_aggregated, True),
+        ]:
+            runs = []
+            for seed in range(args.seed, args.seed + args.repeat):
+                plan, seconds = timed(lambda: planner(facility, users, vehicles, seed=seed))
+                runs.append(dict(evaluate(facility, plan, vehicles, aggregated), seconds=seconds))
+            mean = {key: statistics.mean(run[key] for run in runs) for key in runs[0]}
+            print(f"{name:<18} {label:<8} {nodes:>6} {reduction * 100 if aggregated else 0:>6.0f}% "
+                  f"{mean['seconds']:>8.3f} {mean['route_seconds']:>8.3f} {mean['trips']:>5.1f} "
+                  f"{max(run['unassigned'] for run in runs):>6} {max(run['violations'] for run in runs):>6} "
+                  f"{mean['km']:>10.1f}")
+
+if __name__ == '__main__':
+    main()
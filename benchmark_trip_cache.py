@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+便の訪問順キャッシュ（trip_cache）のベンチマーク
+利用パターンに沿った週間の名簿を作成し、同じ名簿を複数週計画したときの
+- キャッシュなし（optimize_route で毎回計算）
+- キャッシュあり（1週目は空のキャッシュから）
+のルート順序の計算時間・総距離と、ヒット / ウォームスタート / 計算の便数を週ごとに比較する
+2週目以降は曜日ごとに利用者の --absence の割合が欠席する（便の顔ぶれが少し変わる）
+欠席率 0 は同じ名簿を毎週計画する場合で、2週目以降はすべてキャッシュから返る
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark_snapshot import make_week
+from route_optimizer import optimize_route
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES, build_distance_matrix, plan_day
+from trip_cache import TripCache, order_plan_cached
+
+def weekly_rosters(users, rosters, weeks, absence, seed):
+    """週ごとの曜日別名簿（1週目は全員、2週目以降は欠席者を除く）"""
+    rng = np.random.default_rng(seed)
+    result = [rosters]
+    for _ in range(1, weeks):
+        result.append({day: [row for row in members if rng.random() >= absence] for day, members in rosters.items()})
+    return result
+
+def run(users, rosters, args, absence):
+    """欠席率 absence で args.weeks 週分を計画し、週ごとの結果を表示"""
+    weeks = weekly_rosters(users, rosters, args.weeks, absence, args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = TripCache(os.path.join(tmp_dir, "trip_cache.sqlite3"))
+        print(f"利用者{args.users}名 / {args.weeks}週 / 2週目以降の欠席率 {absence:.0%}")
+        print(f"{'週':>3} {'便数':>6} {'なし(秒)':>9} {'あり(秒)':>9} {'速度向上':>8} {'ヒット':>6} {'ウォーム':>8} "
+              f"{'計算':>6} {'なし(km)':>9} {'あり(km)':>9}")
+        for week, week_rosters in enumerate(weeks, start=1):
+            plain_seconds = cached_seconds = plain_km = cached_km = 0.0
+            counts = {"hit": 0, "near": 0, "miss": 0, "skip": 0}
+            trips = 0
+            for day in sorted(week_rosters):
+                day_users = [users[row] for row in week_rosters[day]]
+                if not day_users:
+                    continue
+                dist = build_distance_matrix(DEFAULT_FACILITY, day_users)
+                plan = plan_day(DEFAULT_FACILITY, day_users, DEFAULT_VEHICLES, seed=args.seed, dist=dist)
+                index_by_id = {u["id"]: i for i, u in enumerate(day_users, start=1)}
+
+                start = time.perf_counter()
+                for assignment in plan["assignments"].values():
+                    for trip in assignment["trips"]:
+                        indices = [index_by_id[u["id"]] for u in trip["users"]]
+                        plain_km += optimize_route(DEFAULT_FACILITY, trip["users"], dist=dist, indices=indices)["totalDistance"]
+                        trips += 1
+                plain_seconds += time.perf_counter() - start
+
+                start = time.perf_counter()
+                day_counts = order_plan_cached(DEFAULT_FACILITY, day_users, DEFAULT_VEHICLES, plan, cache, dist=dist)
+                cached_seconds += time.perf_counter() - start
+                cached_km += sum(trip["distance"] for a in plan["assignments"].values() for trip in a["trips"])
+                for status, value in day_counts.items():
+                    counts[status] += value
+
+            print(f"{week:>3} {trips:>6} {plain_seconds:>9.3f} {cached_seconds:>9.3f} {plain_seconds / cached_seconds:>7.2f}x "
+                  f"{counts['hit']:>6} {counts['near']:>8} {counts['miss'] + counts['skip']:>6} "
+                  f"{plain_km:>9.1f} {cached_km:>9.1f}")
+        stats = cache.stats()
+        cache.close()
+    print(f"\nキャッシュ: {stats['entries']}件 / ヒット率 {stats['hit_rate']:.0%} "
+          f"（ヒット {stats['hits']} / ウォームスタート {stats['warm_starts']} / ミス {stats['misses']}）\n")
+
+def main():
+    parser = argparse.ArgumentParser(description='便の訪問順キャッシュのベンチマーク')
+    parser.add_argument('--users', type=int, default=600, help='利用者数')
+    parser.add_argument('--weeks', type=int, default=4, help='計画する週の数')
+    parser.add_argument('--absence', type=float, nargs='+', default=[0.0, 0.01], help='2週目以降の欠席率')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    users, rosters, _ = make_week(args.users, seed=args.seed)
+    for absence in args.absence:
+        run(users, rosters, args, absence)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+便分割（trip_packing）のベンチマーク
+現行JSの移植（kMeansClustering で車両に分け、splitIntoTrips で到着順に便へ分割し、
+一般利用者を既存の便の空きに追加）の車両ごとの利用者を、trip_packing で詰め直した場合と比較する
+
+計測項目: 便数（と必要最少の便数）、車椅子枠を超えた便、総走行距離、計算時間
+総走行距離はどちらも各便の順路を最近傍法 + 2-opt / Or-opt で改善して計算する
+"""
+
+import argparse
+import random
+import time
+
+from benchmark_planner import make_synthetic_day
+from legacy_planner import assign_users_to_vehicles_with_clustering
+from route_optimizer import improve_tour, nearest_neighbor_tour
+from transport_planner import build_distance_matrix
+from trip_packing import min_trip_count, repack_assignments, trips_distance
+
+def summarize(assignments, vehicles, dist, index_by_id):
+    """便数・車椅子枠を超えた便・総距離（各便の順路を改善）"""
+    vehicle_by_id = {v["id"]: v for v in vehicles}
+    trips = 0
+    over_wheelchair = 0
+    tours = []
+    for vehicle_id, assignment in assignments.items():
+        vehicle = vehicle_by_id[vehicle_id]
+        for trip in assignment["trips"]:
+            if not trip["users"]:
+                continue
+            trips += 1
+            if sum(1 for u in trip["users"] if u["wheelchair"]) > vehicle["wheelchair_capacity"]:
+                over_wheelchair += 1
+            nodes = [index_by_id[u["id"]] for u in trip["users"]]
+            tours.append(improve_tour(dist, nearest_neighbor_tour(dist, nodes)))
+    return trips, over_wheelchair, trips_distance(dist, tours)
+
+def lower_bound(assignments, vehicles):
+    vehicle_by_id = {v["id"]: v for v in vehicles}
+    total = 0
+    for vehicle_id, assignment in assignments.items():
+        members = [u for trip in assignment["trips"] for u in trip["users"]]
+        vehicle = vehicle_by_id[vehicle_id]
+        total += min_trip_count(len(members), sum(1 for u in members if u["wheelchair"]),
+                                vehicle["capacity"], vehicle["wheelchair_capacity"]) or 0
+    return total
+
+def main():
+    parser = argparse.ArgumentParser(description='便分割のベンチマーク')
+    parser.add_argument('--sizes', nargs='+', default=['100:8', '300:20', '500:40'], help='利用者数:車両数')
+    parser.add_argument('--repeat', type=int, default=3, help='シードを変えて実行する回数')
+    args = parser.parse_args()
+
+    print(f"{'規模':<10} {'方式':<14} {'便数':>6} {'最少便数':>8} {'車椅子枠超過':>12} {'総距離(km)':>11} {'秒':>7}")
+    for size in args.sizes:
+        num_users, num_vehicles = (int(value) for value in size.split(':'))
+        totals = {label: [0, 0, 0.0, 0.0] for label in ("splitIntoTrips", "trip_packing")}
+        bound = 0
+        for seed in range(args.repeat):
+            facility, users, vehicles = make_synthetic_day(num_users, num_vehicles, seed=seed)
+            dist = build_distance_matrix(facility, users)
+            index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+
+            start = time.perf_counter()
+            legacy = assign_users_to_vehicles_with_clustering(users, vehicles, rng=random.Random(seed))
+            legacy_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            packed, _ = repack_assignments(facility, users, vehicles, legacy, dist=dist)
+            packed_seconds = time.perf_counter() - start
+
+            bound += lower_bound(legacy, vehicles)
+            for label, assignments, seconds in [("splitIntoTrips", legacy, legacy_seconds),
+                                                ("trip_packing", packed, packed_seconds)]:
+                trips, over, km = summarize(assignments, vehicles, dist, index_by_id)
+                total = totals[label]
+                total[0] += trips
+                total[1] += over
+                total[2] += km
+                total[3] += seconds
+
+        label_size = f"{num_users}名/{num_vehicles}台"
+        for label, (trips, over, km, seconds) in totals.items():
+            print(f"{label_size:<10} {label:<14} {trips / args.repeat:>6.1f} {bound / args.repeat:>8.1f} "
+                  f"{over / args.repeat:>12.1f} {km / args.repeat:>11.1f} {seconds / args.repeat:>7.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+利用実績ストアのベンチマーク
+複数事業所・1年分の合成利用実績を usage_records.UsageRecordStore に月ごとに追記し、
+- 利用者 × サービスコードの年間集計（加算ごとの算定日数つき）
+- 事業所 × 月の集計
+の所要時間を、localStorage と同じ JSON 配列（UsageRecord.toJSON() のリスト）を読み込んで
+辞書で集計する方法と比較する。JSON 方式はメモリを多く使うため件数を絞って計測する
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+from usage_records import ADDITIONAL_SERVICES, STATUSES, UsageRecordStore
+
+START_DATE = np.datetime64("2025-01-01")
+DAYS = 365
+
+def make_records(num_records, num_facilities, users_per_facility, seed):
+    """合成の利用実績（列ごとの配列）。約1割を同じ利用者・利用日への上書き保存にする"""
+    rng = np.random.default_rng(seed)
+    facility = rng.integers(0, num_facilities, size=num_records)
+    user = facility * users_per_facility + rng.integers(0, users_per_facility, size=num_records)
+    days = START_DATE + rng.integers(0, DAYS, size=num_records)
+    status = rng.choice(len(STATUSES), size=num_records, p=[0.1, 0.8, 0.07, 0.03])
+    masks = (rng.random((num_records, len(ADDITIONAL_SERVICES))) < 0.4) @ (1 << np.arange(len(ADDITIONAL_SERVICES)))
+    rewrite = rng.random(num_records) < 0.1
+    user[rewrite] = np.roll(user, 1)[rewrite]
+    days[rewrite] = np.roll(days, 1)[rewrite]
+    return {
+        "days": days,
+        "user_ids": np.char.add("user_", user.astype("U7")),
+        "facilities": np.char.add("facility_", facility.astype("U2")),
+        "statuses": np.array(STATUSES)[status],
+        "masks": masks.astype(np.uint16),
+    }
+
+def append_by_month(store, data):
+    """月ごと・事業所ごとに追記（保存の単位を模す）"""
+    months = data["days"].astype("datetime64[M]")
+    for month in np.unique(months):
+        in_month = months == month
+        for facility in np.unique(data["facilities"][in_month]):
+            take = np.flatnonzero(in_month & (data["facilities"] == facility))
+            store.append_columns(data["days"][take], data["user_ids"][take].tolist(), facility=str(facility),
+                                 additional_masks=data["masks"][take], statuses=data["statuses"][take].tolist())
+
+def to_json_records(data):
+    codes = [code for _, code in ADDITIONAL_SERVICES]
+    return [{
+        "usage_record_id": f"usage_{i}",
+        "user_id": user_id,
+        "usage_date": str(day),
+        "service_type": "通常規模型デイサービス",
+        "service_code": "321111",
+        "additional_codes": [code for bit, code in enumerate(codes) if mask >> bit & 1],
+        "status": status,
+        "facility": facility,
+        "sequence": i,
+    } for i, (day, user_id, facility, status, mask) in enumerate(zip(
+        data["days"].tolist(), data["user_ids"].tolist(), data["facilities"].tolist(),
+        data["statuses"].tolist(), data["masks"].tolist()))]
+
+def json_aggregate(path):
+    """現行方式: JSON 配列を読み込み、saveUsageRecords と同じく後勝ちで重複をまとめて辞書で集計"""
+    with open(path, encoding="utf-8") as f:
+        records = json.load(f)
+    latest = {}
+    for record in records:
+        latest[(record["facility"], record["user_id"], record["usage_date"])] = record
+    days = Counter()
+    additional = Counter()
+    for record in latest.values():
+        if record["status"] != "利用済":
+            continue
+        key = (record["user_id"], record["service_code"])
+        days[key] += 1
+        for code in record["additional_codes"]:
+            additional[key + (code,)] += 1
+    return days
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def main():
+    parser = argparse.ArgumentParser(description='利用実績ストアのベンチマーク')
+    parser.add_argument('--records', type=int, default=1000000, help='利用実績の件数')
+    parser.add_argument('--json-records', type=int, default=200000, help='JSON方式で計測する件数')
+    parser.add_argument('--facilities', type=int, default=5, help='事業所数')
+    parser.add_argument('--users', type=int, default=400, help='事業所あたりの利用者数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    data = make_records(args.records, args.facilities, args.users, args.seed)
+    with tempfile.TemporaryDirectory() as work_dir:
+        store_dir = os.path.join(work_dir, "store")
+        store = UsageRecordStore(store_dir)
+        append_seconds, _ = timed(lambda: append_by_month(store, data))
+        print(f"{args.records:,}件を追記: {append_seconds:.2f}秒 / ディスク {directory_size(store_dir) / 1e6:.1f}MB")
+
+        print(f"\n{'方式':<10} {'集計':<22} {'件数':>10} {'秒':>7} {'行数':>7}")
+        seconds, rows = timed(lambda: UsageRecordStore(store_dir).aggregate(by=["user", "service_code"]))
+        print(f"{'ストア':<10} {'利用者×サービスコード':<22} {args.records:>10,} {seconds:>7.2f} {len(rows):>7,}")
+        seconds, monthly = timed(lambda: UsageRecordStore(store_dir).aggregate(by=["facility", "month"]))
+        print(f"{'ストア':<10} {'事業所×月':<22} {args.records:>10,} {seconds:>7.2f} {len(monthly):>7,}")
+        store_rows = UsageRecordStore(store_dir)
+        seconds, _ = timed(lambda: [store_rows.compact(month) for month in store_rows.months()])
+        compacted = directory_size(store_dir) / 1e6
+        seconds_after, _ = timed(lambda: UsageRecordStore(store_dir).aggregate(by=["user", "service_code"]))
+        print(f"{'ストア':<10} {'compact 後に再集計':<22} {args.records:>10,} {seconds_after:>7.2f} "
+              f"（compact {seconds:.2f}秒 / {compacted:.1f}MB）")
+
+        # 同じ件数で JSON 方式と比較し、集計結果が一致するか確認する
+        subset = {key: values[:args.json_records] for key, values in data.items()}
+        json_path = os.path.join(work_dir, "usage_records.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(to_json_records(subset), f, ensure_ascii=False)
+        json_seconds, expected = timed(lambda: json_aggregate(json_path))
+        subset_store = UsageRecordStore(os.path.join(work_dir, "subset"))
+        append_by_month(subset_store, subset)
+        store_seconds, actual = timed(lambda: subset_store.aggregate(by=["user", "service_code"]))
+        same = expected == Counter({(row["user"], row["service_code"]): row["days"] for row in actual})
+        print(f"{'JSON配列':<10} {'利用者×サービスコード':<22} {args.json_records:>10,} {json_seconds:>7.2f} "
+              f"{len(expected):>7,}  （{os.path.getsize(json_path) / 1e6:.1f}MB）")
+        print(f"{'ストア':<10} {'利用者×サービスコード':<22} {args.json_records:>10,} {store_seconds:>7.2f} "
+              f"{len(actual):>7,}  集計結果{'一致' if same else '不一致'}")
+
+if __name__ == '__main__':
+    main()
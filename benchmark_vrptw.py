@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+時間枠付き配車計画（VRPTW）のベンチマーク
+同じ時刻表の計算（vrptw_solver.VrptwSolver.load_plan）で、
+- 現行JS移植: assignUsersToVehiclesWithClustering（クラスタリング → 定員で分割）+ optimizeRoute の最近傍法
+- 新エンジン: plan_day（定員制約付きクラスタリング）+ 便ごとのルート改善
+- VRPTW: 挿入法 + 大近傍探索
+の遅れ（時間枠を守れなかった地点数・分）と総距離・便数を比較する
+"""
+
+import argparse
+import glob
+import os
+import random
+import time
+
+from benchmark_planner import make_synthetic_day
+from incremental_planner import IncrementalPlanner
+from legacy_planner import assign_users_to_vehicles_with_clustering, optimize_route
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES, build_distance_matrix, load_users_csv
+from vrptw_solver import VrptwSolver
+
+def legacy_plan(facility, users, vehicles, seed):
+    """現行JS移植: クラスタリングして定員で分割し、便ごとに最近傍法で並べる"""
+    assignments = assign_users_to_vehicles_with_clustering(users, vehicles, rng=random.Random(seed))
+    for assignment in assignments.values():
+        for trip in assignment["trips"]:
+            trip["users"] = optimize_route(facility, trip["users"])["order"]
+    return {"assignments": assignments, "unassigned": []}
+
+def cases(synthetic_sizes):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for path in sorted(glob.glob(os.path.join(base_dir, "weekly_data", "*.csv"))):
+        users = load_users_csv(path)
+        if users:
+            yield os.path.splitext(os.path.basename(path))[0], dict(DEFAULT_FACILITY), users, DEFAULT_VEHICLES
+    for size, num_vehicles in synthetic_sizes:
+        facility, users, vehicles = make_synthetic_day(size, num_vehicles, seed=size)
+        yield f"合成{size}名", facility, users, vehicles
+
+def main():
+    parser = argparse.ArgumentParser(description='時間枠付き配車計画のベンチマーク')
+    parser.add_argument('--time-limit', type=float, default=1.0, help='VRPTWの改善計算の時間上限（秒）')
+    parser.add_argument('--mode', choices=['pickup', 'return'], default='pickup', help='迎え / 送り')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    print(f"{'データ':<10} {'手法':<12} {'秒':>6} {'便数':>5} {'総距離(km)':>11} {'遅れ地点':>8} {'遅れ(分)':>9} {'未割当':>6}")
+    totals = {}
+    for label, facility, users, vehicles in cases([(150, 20), (300, 40)]):
+        dist = build_distance_matrix(facility, users)
+        methods = [
+            ("現行JS移植", lambda: VrptwSolver(facility, users, vehicles, mode=args.mode, dist=dist)
+             .load_plan(legacy_plan(facility, users, vehicles, args.seed))),
+            ("新エンジン", lambda: VrptwSolver(facility, users, vehicles, mode=args.mode, dist=dist)
+             .load_plan(IncrementalPlanner(facility, users, vehicles, seed=args.seed, dist=dist).to_plan())),
+            ("VRPTW", lambda: VrptwSolver(facility, users, vehicles, mode=args.mode, dist=dist, seed=args.seed)
+             .solve(time_limit=args.time_limit)),
+        ]
+        for method, run in methods:
+            start = time.perf_counter()
+            solver = run()
+            seconds = time.perf_counter() - start
+            stats = solver.summary()
+            total = totals.setdefault(method, {"km": 0.0, "late_stops": 0, "lateness_min": 0.0})
+            for key in total:
+                total[key] += stats[key]
+            print(f"{label:<10} {method:<12} {seconds:>6.2f} {stats['trips']:>5} {stats['km']:>11.1f} "
+                  f"{stats['late_stops']:>8} {stats['lateness_min']:>9.0f} {stats['unassigned']:>6}")
+
+    print("\n合計")
+    for method, total in totals.items():
+        print(f"  {method:<12} 総距離 {total['km']:>8.1f}km / 遅れ {total['late_stops']:>4}地点 {total['lateness_min']:>7.0f}分")
+
+if __name__ == '__main__':
+    main()
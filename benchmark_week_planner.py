@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+週間一括送迎計画のベンチマーク
+複数事業所分の週間データ（スナップショット）を作成し、
+week_planner.plan_week をプロセス数 1 / 2 / 4 / 8 で実行したときの所要時間と速度向上率を比較する
+CPUコア数より多いプロセス数では速度は伸びない
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmark_snapshot import make_week
+from plan_snapshot import write_snapshot
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES
+from week_planner import plan_week
+
+def main():
+    parser = argparse.ArgumentParser(description='週間一括送迎計画のベンチマーク')
+    parser.add_argument('--facilities', type=int, default=4, help='事業所数')
+    parser.add_argument('--users', type=int, default=600, help='1事業所あたりの利用者数')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='計測するプロセス数')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_paths = []
+        for i in range(args.facilities):
+            users, rosters, _ = make_week(args.users, seed=args.seed + i)
+            path = os.path.join(tmp_dir, f"facility{i + 1}.dsplan")
+            write_snapshot(path, DEFAULT_FACILITY, users, DEFAULT_VEHICLES, rosters)
+            snapshot_paths.append(path)
+
+        print(f"事業所: {args.facilities} / 1事業所あたり利用者: {args.users}名 / CPUコア数: {os.cpu_count()}\n")
+        print(f"{'プロセス数':>10} {'時間(秒)':>9} {'速度向上':>8} {'タスク数':>8}")
+        baseline = None
+        for workers in args.workers:
+            output_dir = os.path.join(tmp_dir, f"plans_{workers}")
+            start = time.perf_counter()
+            summaries = plan_week(snapshot_paths, output_dir, workers=workers, seed=args.seed)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>10} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x {len(summaries):>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+利用者データの列指向ストア
+
+users.csv / schedules.csv / weekly_data/*.csv（および generate_sample_users_v2.py の
+大規模CSV）をチャンク単位で読み込み、辞書のリストではなく列ごとの配列として保持する
+- 緯度・経度・車椅子・時刻: NumPy配列
+- 氏名・住所・備考などの文字列: 重複をまとめた文字列表（インターン）への番号
+- 利用曜日: ビットマスク（bit0=月曜日 … bit6=日曜日）
+"""
+
+import csv
+import gc
+import glob
+import os
+import sys
+from itertools import islice
+
+import numpy as np
+
+from transport_planner import TRUE_VALUES
+
+DEFAULT_CHUNK_SIZE = 50000
+
+WEEKDAY_NAMES = ["月曜日", "火曜日", "水曜日", "木曜日", "金曜日", "土曜日", "日曜日"]
+WEEKDAY_KEYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# 各CSV形式の列名 → ストアの列名
+USERS_COLUMNS = {
+    "user_id": "id", "name": "name", "address": "address", "phone": "phone",
+    "wheelchair": "wheelchair", "notes": "notes", "lat": "lat", "lng": "lng",
+}
+WEEKLY_COLUMNS = {
+    "ID": "id", "氏名": "name", "住所": "address", "緯度": "lat", "経度": "lng",
+    "車椅子": "wheelchair", "備考": "notes", "送迎時刻": "pickup_time", "帰宅時刻": "return_time",
+}
+SCALE_COLUMNS = {
+    "id": "id", "name": "name", "address": "address", "wheelchair": "wheelchair",
+    "pickupTime": "pickup_time", "notes": "notes",
+}
+
+STRING_COLUMNS = ["name", "address", "phone", "notes"]
+
+class StringTable:
+    """文字列を番号に置き換えて重複を1つにまとめる表"""
+
+    def __init__(self):
+        self.index = {"": 0}
+        self.values = [""]
+
+    def add(self, value):
+        """文字列を登録して番号を返す"""
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.index[value] = code
+            self.values.append(value)
+        return code
+
+    def add_many(self, values):
+        """文字列の配列を番号の配列（int32）に変換"""
+        index = self.index
+        # 未登録の文字列だけを先に登録し、変換自体はC実装の map で行う
+        for value in set(values).difference(index):
+            index[value] = len(self.values)
+            self.values.append(value)
+        return np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def __getitem__(self, code):
+        return self.values[code]
+
+    def __len__(self):
+        return len(self.values)
+
+    def nbytes(self):
+        """文字列本体と索引のおおよそのメモリ量（バイト）"""
+        strings = sum(sys.getsizeof(value) for value in self.values)
+        return strings + sys.getsizeof(self.values) + sys.getsizeof(self.index)
+
+def _map_unique(values, convert, dtype):
+    """値の種類が少ない列を、種類ごとに1回だけ変換して配列にする"""
+    table = {value: convert(value) for value in set(values)}
+    return np.fromiter(map(table.__getitem__, values), dtype=dtype, count=len(values))
+
+def _to_minutes(value):
+    if not value:
+        return -1
+    hour, _, minute = value.partition(":")
+    return int(hour) * 60 + int(minute or 0)
+
+def parse_minutes(values):
+    """"HH:MM" の配列を0時からの分（int16、空欄は -1）に変換"""
+    return _map_unique(values, _to_minutes, np.int16)
+
+def parse_coordinates(values):
+    """座標文字列の配列を float64 に変換（空欄は NaN）"""
+    if "" in values:
+        return np.array([float(value) if value else np.nan for value in values], dtype=np.float64)
+    return np.fromiter(map(float, values), dtype=np.float64, count=len(values))
+
+def parse_flags(values):
+    """真偽値表記の配列を bool 配列に変換"""
+    return _map_unique(values, lambda value: value.strip().lower() in TRUE_VALUES, bool)
+
+def iter_csv_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """CSVを (ヘッダ, 行のリスト) のチャンクで順に返す"""
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        while True:
+            chunk = list(islice(reader, chunk_size))
+            if not chunk:
+                break
+            yield header, chunk
+
+def weekday_from_filename(path):
+    """weekly_data/月曜日.csv のようなファイル名から曜日番号を返す（不明なら None）"""
+    name = os.path.splitext(os.path.basename(path))[0]
+    return WEEKDAY_NAMES.index(name) if name in WEEKDAY_NAMES else None
+
+class ColumnarUserStore:
+    """
+    利用者の列指向ストア
+
+    行番号 i の利用者は ids[i], lat[i], ... で参照する
+    文字列列は StringTable の番号で保持し、row(i) で元の辞書形式に戻せる
+    """
+
+    def __init__(self):
+        self.ids = []
+        self.row_by_id = {}
+        self.strings = StringTable()
+        self._chunks = {name: [] for name in
+                        ["lat", "lng", "wheelchair", "weekday_mask", "pickup_minutes", "return_minutes"]
+                        + [f"{name}_code" for name in STRING_COLUMNS]}
+        self._pending_masks = []
+        self._finalized = None
+
+    # -- 読み込み ---------------------------------------------------------
+
+    def _register_ids(self, ids, weekday_mask):
+        """IDを1件ずつ登録し、新規利用者の位置を返す（重複を含むチャンク用）"""
+        new_rows = []
+        for offset, user_id in enumerate(ids):
+            row = self.row_by_id.get(user_id)
+            if row is None:
+                self.row_by_id[user_id] = len(self.ids)
+                self.ids.append(user_id)
+                new_rows.append(offset)
+            elif weekday_mask is not None:
+                # 別の曜日ファイルに同じ利用者が出てきた場合は曜日ビットを追加
+                self._pending_masks.append((row, weekday_mask[offset]))
+        return new_rows
+
+    def _append_chunk(self, columns, count, weekday_mask=None):
+        """列の辞書（CSVの列名はストアの列名に変換済み）を1チャンクとして追加"""
+        empty = [""] * count
+        ids = columns["id"]
+        unique_ids = set(ids)
+
+        if len(unique_ids) == count and unique_ids.isdisjoint(self.row_by_id):
+            # 重複のない新規利用者だけのチャンク（大規模CSVの通常ケース）
+            self.row_by_id.update(zip(ids, range(len(self.ids), len(self.ids) + count)))
+            self.ids.extend(ids)
+            new_rows = range(count)
+        else:
+            new_rows = self._register_ids(ids, weekday_mask)
+
+        if len(new_rows) != count:
+            take = np.array(new_rows, dtype=np.int64)
+            columns = {key: [values[i] for i in new_rows] for key, values in columns.items()}
+            if weekday_mask is not None:
+                weekday_mask = weekday_mask[take]
+            count = len(new_rows)
+            empty = [""] * count
+        if count == 0:
+            return
+
+        chunks = self._chunks
+        chunks["lat"].append(parse_coordinates(columns.get("lat", empty)))
+        chunks["lng"].append(parse_coordinates(columns.get("lng", empty)))
+        chunks["wheelchair"].append(parse_flags(columns.get("wheelchair", empty)))
+        chunks["pickup_minutes"].append(parse_minutes(columns.get("pickup_time", empty)))
+        chunks["return_minutes"].append(parse_minutes(columns.get("return_time", empty)))
+        chunks["weekday_mask"].append(
+            weekday_mask if weekday_mask is not None else np.zeros(count, dtype=np.uint8)
+        )
+        for name in STRING_COLUMNS:
+            chunks[f"{name}_code"].append(self.strings.add_many(columns.get(name, empty)))
+        self._finalized = None
+
+    def load_csv(self, path, chunk_size=DEFAULT_CHUNK_SIZE, weekday=None):
+        """
+        利用者CSVをチャンク単位で追加読み込み
+
+        weekday を省略した場合、weekly_data のファイル名（月曜日.csv など）から推定する
+        """
+        if weekday is None:
+            weekday = weekday_from_filename(path)
+        self._pending_masks = []
+
+        # 行のリストを大量に作るため、読み込み中は循環参照GCの走査を止める
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for header, rows in iter_csv_chunks(path, chunk_size):
+                if "ID" in header:
+                    mapping = WEEKLY_COLUMNS
+                elif "monday" in header:
+                    mapping = SCALE_COLUMNS
+                else:
+                    mapping = USERS_COLUMNS
+
+                raw = list(zip(*rows))
+                columns = {mapping[name]: raw[i] for i, name in enumerate(header) if name in mapping}
+
+                if "monday" in header:
+                    mask = np.zeros(len(rows), dtype=np.uint8)
+                    for bit, key in enumerate(WEEKDAY_KEYS):
+                        mask |= parse_flags(raw[header.index(key)]).astype(np.uint8) << bit
+                elif weekday is not None:
+                    mask = np.full(len(rows), 1 << weekday, dtype=np.uint8)
+                else:
+                    mask = None
+                self._append_chunk(columns, len(rows), mask)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+        if self._pending_masks:
+            self._finalize()
+            for row, bits in self._pending_masks:
+                self._finalized["weekday_mask"][row] |= bits
+        self._pending_masks = []
+        return self
+
+    def load_weekly_dir(self, directory, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        weekly_data ディレクトリの全曜日ファイルを読み込み、利用曜日をビットマスクにまとめる
+        （ファイル名が曜日でないCSVは読み込まない）
+        """
+        paths = [p for p in glob.glob(os.path.join(directory, "*.csv")) if weekday_from_filename(p) is not None]
+        for path in sorted(paths, key=weekday_from_filename):
+            self.load_csv(path, chunk_size=chunk_size)
+        return self
+
+    def load_schedules_csv(self, path, chunk_size=DEFAULT_CHUNK_SIZE):
+        """schedules.csv の送迎時刻・帰宅時刻を該当する利用者に反映"""
+        self._finalize()
+        pickup = self._finalized["pickup_minutes"]
+        return_minutes = self._finalized["return_minutes"]
+        for header, rows in iter_csv_chunks(path, chunk_size):
+            raw = dict(zip(header, zip(*rows)))
+            targets = [self.row_by_id.get(user_id, -1) for user_id in raw["user_id"]]
+            keep = np.array([t >= 0 for t in targets], dtype=bool)
+            rows_index = np.array(targets, dtype=np.int64)[keep]
+            pickup[rows_index] = parse_minutes(raw["pickup_time"])[keep]
+            return_minutes[rows_index] = parse_minutes(raw["return_time"])[keep]
+        return self
+
+    # -- 参照 -----------------------------------------------------------
+
+    def _finalize(self):
+        """チャンクごとの配列を連結（読み込み後の最初の参照時に1回だけ）"""
+        if self._finalized is None:
+            self._finalized = {
+                name: np.concatenate(parts) if parts else np.zeros(0)
+                for name, parts in self._chunks.items()
+            }
+            # 連結後はチャンクを1つにまとめ、追加読み込みにも対応できるようにする
+            self._chunks = {name: [array] for name, array in self._finalized.items()}
+        return self._finalized
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        columns = self._finalize()
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, i):
+        """i 行目の利用者を transport_planner と同じ辞書形式で返す"""
+        columns = self._finalize()
+        user = {"id": self.ids[i]}
+        for name in STRING_COLUMNS:
+            user[name] = self.strings[int(columns[f"{name}_code"][i])]
+        lat, lng = columns["lat"][i], columns["lng"][i]
+        user["lat"] = None if np.isnan(lat) else float(lat)
+        user["lng"] = None if np.isnan(lng) else float(lng)
+        user["wheelchair"] = bool(columns["wheelchair"][i])
+        for key, column in [("pickup_time", "pickup_minutes"), ("return_time", "return_minutes")]:
+            minutes = int(columns[column][i])
+            user[key] = f"{minutes // 60:02d}:{minutes % 60:02d}" if minutes >= 0 else ""
+        mask = int(columns["weekday_mask"][i])
+        user["weekdays"] = [WEEKDAY_NAMES[d] for d in range(7) if mask >> d & 1]
+        return user
+
+    def rows_on(self, weekday):
+        """指定した曜日（0=月曜日）に利用する利用者の行番号"""
+        return np.flatnonzero(self._finalize()["weekday_mask"] & (1 << weekday))
+
+    def to_users(self, rows=None):
+        """行番号の配列（省略時は全員）を辞書のリストに変換"""
+        rows = range(len(self)) if rows is None else rows
+        return [self.row(int(i)) for i in rows]
+
+    def nbytes(self):
+        """配列・文字列表・ID表のおおよそのメモリ量（バイト）"""
+        columns = self._finalize()
+        arrays = sum(array.nbytes for array in columns.values())
+        ids = sum(sys.getsizeof(value) for value in self.ids) + sys.getsizeof(self.ids)
+        return arrays + ids + sys.getsizeof(self.row_by_id) + self.strings.nbytes()
+
+def load_user_store(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    ファイルまたはディレクトリから列指向ストアを作成
+
+    - weekly_data のようなディレクトリ: 全曜日のCSVを統合
+    - sample_data_30 のようなディレクトリ: users.csv + schedules.csv
+    - CSVファイル: そのまま読み込み
+    """
+    store = ColumnarUserStore()
+    if os.path.isdir(path):
+        users_path = os.path.join(path, "users.csv")
+        if os.path.exists(users_path):
+            store.load_csv(users_path, chunk_size=chunk_size)
+            schedules_path = os.path.join(path, "schedules.csv")
+            if os.path.exists(schedules_path):
+                store.load_schedules_csv(schedules_path, chunk_size=chunk_size)
+        else:
+            store.load_weekly_dir(path, chunk_size=chunk_size)
+    else:
+        store.load_csv(path, chunk_size=chunk_size)
+    return store
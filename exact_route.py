@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+小さい便の厳密なルート順序（Held-Karp のビットDP）
+
+便の人数は車両の定員（6〜8名）までなので、最近傍法 + 2-opt / Or-opt（route_optimizer）の
+近似ではなく、訪問順を厳密に最適化できる。ここでは
+- 訪問済みの集合（ビットマスク）× 最後に訪問した地点 の最短距離を NumPy の表に持ち、
+  訪問数ごとの層で一度に更新する（計算量 O(2^n · n^2)、n = MAX_EXACT_STOPS で数ミリ秒）
+- 順番固定（is_order_fixed / isOrderFixed）の利用者は、訪問数がその位置に達したときだけ訪問できる
+  （固定でない利用者は固定位置では訪問できない）とすることで、元の位置を守った最適解を求める
+- 1日・1週間の全便をまとめて解くバッチ処理（プロセスプールで並列）
+を行う。MAX_EXACT_STOPS を超える便は route_optimizer.optimize_route で計算する
+距離行列は非対称でもよい
+
+    python exact_route.py sample_data_30
+"""
+
+import argparse
+import functools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import instrumentation
+from route_optimizer import build_route_result, improve_tour, is_order_fixed, nearest_neighbor_tour, optimize_route
+from transport_planner import build_distance_matrix, load_dataset, plan_day, route_distance
+
+# 厳密に解く最大の地点数（表の大きさは 2^n × n）
+MAX_EXACT_STOPS = 12
+# バッチ処理で1タスクにまとめる便の数（プロセス間の受け渡しを減らす）
+BATCH_CHUNK_SIZE = 16
+
+@functools.lru_cache(maxsize=None)
+def _layers(n):
+    """訪問数ごとのビットマスクの配列（layers[k] は k ビット立っている集合）"""
+    masks = np.arange(1 << n)
+    popcount = np.zeros(1 << n, dtype=np.int64)
+    for j in range(n):
+        popcount += (masks >> j) & 1
+    return [np.flatnonzero(popcount == k) for k in range(n + 1)]
+
+def solve_exact(dist, nodes, fixed_positions=None):
+    """
+    事業所(0) → nodes の全地点 → 事業所 の最短の訪問順を求める
+
+    Args:
+        dist: 事業所をインデックス0とする距離行列
+        nodes: 訪問する地点（距離行列のインデックス）の元の並び
+        fixed_positions: 動かさないルート上の位置の集合（nodes の位置）
+
+    Returns:
+        (訪問順（事業所を含まない）, 総距離)
+    """
+    nodes = [int(n) for n in nodes]
+    n = len(nodes)
+    if n == 0:
+        return [], 0.0
+    if n > MAX_EXACT_STOPS:
+        raise ValueError(f"厳密解は {MAX_EXACT_STOPS} 地点までです: {n}")
+    fixed_positions = fixed_positions or set()
+
+    rows = np.array([0] + nodes)
+    sub = np.asarray(dist, dtype=np.float64)[np.ix_(rows, rows)]
+    outbound, inbound, between = sub[0, 1:], sub[1:, 0], sub[1:, 1:]
+
+    # allowed[k, j]: 訪問数 k のときに地点 j を次に訪問できるか
+    allowed = np.zeros((n, n), dtype=bool)
+    flexible = np.array([p not in fixed_positions for p in range(n)])
+    for k in range(n):
+        if k in fixed_positions:
+            allowed[k, k] = True
+        else:
+            allowed[k, flexible] = True
+
+    size = 1 << n
+    cost = np.full((size, n), np.inf)
+    parent = np.full((size, n), -1, dtype=np.int8)
+    starts = np.flatnonzero(allowed[0])
+    cost[1 << starts, starts] = outbound[starts]
+
+    bits = 1 << np.arange(n)
+    for k, masks in enumerate(_layers(n)[1:n], start=1):
+        # (集合, 最後の地点, 次の地点) の距離
+        total = cost[masks][:, :, None] + between[None, :, :]
+        best_last = np.argmin(total, axis=1)
+        best = np.take_along_axis(total, best_last[:, None, :], axis=1)[:, 0, :]
+        for j in np.flatnonzero(allowed[k]):
+            open_masks = (masks & bits[j]) == 0
+            targets = masks[open_masks] | bits[j]
+            cost[targets, j] = best[open_masks, j]
+            parent[targets, j] = best_last[open_masks, j]
+
+    full = size - 1
+    closing = cost[full] + inbound
+    last = int(np.argmin(closing))
+    total_distance = float(closing[last])
+    if not np.isfinite(total_distance):
+        raise ValueError("固定位置を守る訪問順がありません")
+
+    order = []
+    mask = full
+    while last >= 0:
+        order.append(nodes[last])
+        previous = int(parent[mask, last])
+        mask ^= 1 << last
+        last = previous
+    return order[::-1], total_distance
+
+def optimize_route_exact(facility, users, dist=None, indices=None, max_route_time=None):
+    """
+    optimize_route と同じ形 {route, totalDistance, order, estimatedTime} で厳密な訪問順を返す
+
+    MAX_EXACT_STOPS 名を超える場合は optimize_route で計算する
+    """
+    if len(users) > MAX_EXACT_STOPS or not users:
+        return optimize_route(facility, users, dist=dist, indices=indices, max_route_time=max_route_time)
+    if dist is None:
+        dist = build_distance_matrix(facility, users)
+    elif indices is not None:
+        rows = [0] + list(indices)
+        dist = dist[np.ix_(rows, rows)]
+
+    fixed_positions = {p for p, u in enumerate(users) if is_order_fixed(u)}
+    with instrumentation.span("exact_route_ordering", stops=len(users)):
+        tour, _ = solve_exact(dist, range(1, len(users) + 1), fixed_positions)
+    return build_route_result(facility, users, [n - 1 for n in tour], dist, max_route_time)
+
+def solve_trip(sub, fixed_positions=None):
+    """
+    1便分の距離行列（事業所がインデックス0、利用者は1..n）の訪問順と総距離
+
+    MAX_EXACT_STOPS 地点を超える便は最近傍法 + 2-opt / Or-opt で計算する
+    """
+    nodes = list(range(1, len(sub)))
+    if len(nodes) <= MAX_EXACT_STOPS:
+        return solve_exact(sub, nodes, fixed_positions)
+    tour = improve_tour(sub, nearest_neighbor_tour(sub, nodes, fixed_positions), fixed_positions)
+    return tour, route_distance(sub, tour)
+
+def _solve_chunk(problems):
+    """(便の距離行列, 固定位置) の配列を解く（ワーカープロセスで実行）"""
+    return [solve_trip(sub, fixed_positions) for sub, fixed_positions in problems]
+
+def solve_trips(problems, workers=None, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    多数の便をまとめて解く
+
+    Args:
+        problems: [(便の距離行列, 固定位置の集合), ...]
+        workers: プロセス数（1 の場合はプロセスプールを使わずに実行）
+        chunk_size: 1タスクにまとめる便の数
+
+    Returns:
+        problems と同じ並びの [(訪問順（便の距離行列のインデックス）, 総距離), ...]
+    """
+    chunks = [problems[i:i + chunk_size] for i in range(0, len(problems), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return [result for chunk in chunks for result in _solve_chunk(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [result for results in executor.map(_solve_chunk, chunks) for result in results]
+
+def order_plans_exact(facility, days, dists=None, workers=None):
+    """
+    1日または1週間分の計画の全便を厳密な訪問順に並べ替え、便に距離を付ける
+
+    Args:
+        days: [(その日の利用者, plan_day の計画), ...]（計画は書き換える）
+        dists: 日ごとの距離行列（省略時は計算）
+        workers: プロセス数（1 の場合はプロセスプールを使わずに実行）
+
+    Returns:
+        {trips: 便数, exact: 厳密に解いた便数, distance: 総距離}
+    """
+    problems = []
+    trips = []
+    for day, (users, plan) in enumerate(days):
+        dist = dists[day] if dists is not None else build_distance_matrix(facility, users)
+        index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+        for assignment in plan["assignments"].values():
+            for trip in assignment["trips"]:
+                rows = [0] + [index_by_id[u["id"]] for u in trip["users"]]
+                fixed_positions = {p for p, u in enumerate(trip["users"]) if is_order_fixed(u)}
+                problems.append((dist[np.ix_(rows, rows)], fixed_positions))
+                trips.append(trip)
+
+    with instrumentation.span("exact_route_batch", trips=len(trips)):
+        results = solve_trips(problems, workers=workers)
+    total = 0.0
+    for trip, (tour, distance) in zip(trips, results):
+        trip["users"] = [trip["users"][n - 1] for n in tour]
+        trip["distance"] = round(distance, 2)
+        total += distance
+    exact = sum(1 for trip in trips if len(trip["users"]) <= MAX_EXACT_STOPS)
+    return {"trips": len(trips), "exact": exact, "distance": total}
+
+def main():
+    """CSVを読み込んで1日分を計画し、全便を厳密な訪問順に並べ替えて近似解と比べる"""
+    parser = argparse.ArgumentParser(description='便ごとの厳密なルート順序（ビットDP）')
+    parser.add_argument('input', help='データディレクトリ（sample_data_30 など）または週間データのCSV')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    parser.add_argument('--workers', type=int, default=1, help='プロセス数')
+    args = parser.parse_args()
+
+    facility, users, vehicles = load_dataset(args.input)
+    dist = build_distance_matrix(facility, users)
+    plan = plan_day(facility, users, vehicles, seed=args.seed, dist=dist)
+
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    heuristic = sum(
+        optimize_route(facility, trip["users"], dist=dist, indices=[index_by_id[u["id"]] for u in trip["users"]])["totalDistance"]
+        for assignment in plan["assignments"].values() for trip in assignment["trips"]
+    )
+    start = time.perf_counter()
+    summary = order_plans_exact(facility, [(users, plan)], dists=[dist], workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ {summary['trips']}便の訪問順を求めました（厳密解 {summary['exact']}便, {elapsed:.3f}秒）")
+    print(f"   総距離: {summary['distance']:.2f}km（最近傍法 + 2-opt / Or-opt: {heuristic:.2f}km）")
+
+if __name__ == "__main__":
+    main()
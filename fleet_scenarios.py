@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+車両構成（台数・定員・車椅子枠）のシナリオ評価
+
+車両を増やすか、定員・車椅子枠の組み合わせを変えるかの検討材料は、
+generate_sample_data.py や save_as_javascript に手書きされた車両リストしかなかった。ここでは
+車両構成のグリッド × 曜日ごとの名簿 の全シナリオについて
+    plan_day（便の割り当て）→ optimize_route（便ごとの訪問順）
+で1日分を計画し、総距離・便数・未割り当て人数・乗車時間と、最も長く走る車両の運行時間を比較する
+plan_day は1台に何便でも割り当てるため、multi_facility_planner と同じく各車両の行程を送迎時間帯
+（--window、既定は MORNING_WINDOW_MIN 分）に収め、収まらない後ろの便の利用者は未割り当てとして数える
+（台数が少ないほど未割り当てが増える）
+
+- 利用者データはバイナリスナップショット（plan_snapshot.py）を各プロセスが mmap して共有する
+- 全利用者の距離行列は1回だけ計算して .npy に保存し、各プロセスが読み取り専用で mmap する
+  （シナリオごとに渡すのは車両構成と曜日番号だけ）
+- シナリオはプロセスプールで並列に評価する（workers=1 ならプロセスプールを使わない）
+
+乗車時間は迎えの便で、利用者が乗ってから事業所に着くまでの時間（分）。
+平均速度 AVERAGE_SPEED_KMH と停車時間 STOP_TIME_MIN から estimate_time と同じ考え方で求める
+
+    python fleet_scenarios.py weekly_data --counts 4 5 6 --capacities 6 8 --output scenarios.csv
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from generate_weekly_data import weekdays as WEEKDAY_NAMES
+from multi_facility_planner import MORNING_WINDOW_MIN
+from plan_snapshot import PlanSnapshot
+from route_optimizer import optimize_route
+from transport_planner import AVERAGE_SPEED_KMH, STOP_TIME_MIN, build_distance_matrix, plan_day
+from week_planner import prepare_snapshots
+
+DEFAULT_COUNTS = (3, 4, 5, 6, 7, 8)
+DEFAULT_CAPACITIES = (6, 7, 8)
+DEFAULT_WHEELCHAIR_CAPACITIES = (1, 2)
+
+CSV_COLUMNS = ["fleet", "weekday", "vehicles", "seats", "users", "trips", "km", "unassigned",
+               "ride_mean_min", "ride_max_min", "vehicle_max_min", "seconds"]
+
+def fleet_grid(counts=DEFAULT_COUNTS, capacities=DEFAULT_CAPACITIES,
+               wheelchair_capacities=DEFAULT_WHEELCHAIR_CAPACITIES):
+    """
+    台数 × 定員 × 車椅子枠 の同じ車両をそろえた車両構成の一覧
+
+    Returns:
+        [{"name": "5台×定員8（車椅子2）", "vehicles": [...]}, ...]
+    """
+    fleets = []
+    for count, capacity, wheelchair_capacity in itertools.product(counts, capacities, wheelchair_capacities):
+        if wheelchair_capacity > capacity:
+            continue
+        vehicles = [
+            {"id": i + 1, "name": f"送迎車{i + 1}号", "capacity": capacity, "wheelchair_capacity": wheelchair_capacity}
+            for i in range(count)
+        ]
+        fleets.append({"name": f"{count}台×定員{capacity}（車椅子{wheelchair_capacity}）", "vehicles": vehicles})
+    return fleets
+
+def load_fleets(path):
+    """
+    車両構成をJSONから読み込む
+
+    形式: [{"name": "現行+1台", "vehicles": [{"id", "capacity", "wheelchair_capacity", ...}, ...]}, ...]
+    """
+    with open(path, encoding="utf-8") as f:
+        fleets = json.load(f)
+    for number, fleet in enumerate(fleets, start=1):
+        fleet.setdefault("name", f"構成{number}")
+        for i, vehicle in enumerate(fleet["vehicles"]):
+            vehicle.setdefault("id", i + 1)
+    return fleets
+
+def ride_minutes(dist, tour):
+    """
+    迎えの便の各利用者の乗車時間（分）: 乗車してから事業所に着くまでの走行時間 + 以降の停車時間
+
+    tour は事業所を含まない訪問順（距離行列のインデックス）
+    """
+    path = np.concatenate((np.asarray(tour, dtype=np.int64), [0]))
+    legs = dist[path[:-1], path[1:]]
+    remaining_km = np.cumsum(legs[::-1])[::-1]
+    later_stops = np.arange(len(tour) - 1, -1, -1)
+    return remaining_km / AVERAGE_SPEED_KMH * 60 + later_stops * STOP_TIME_MIN
+
+# ワーカープロセスごとの共有データ（スナップショット・距離行列・全利用者）
+_shared = {}
+
+def _init_worker(snapshot_path, matrix_path):
+    snapshot = PlanSnapshot(snapshot_path)
+    _shared["snapshot"] = snapshot
+    _shared["facility"] = snapshot.facility_dict()
+    _shared["users"] = snapshot.to_users()
+    _shared["dist"] = np.load(matrix_path, mmap_mode="r")
+
+def evaluate_scenario(fleet, weekday, seed=None, window_min=MORNING_WINDOW_MIN):
+    """
+    1つの車両構成で1曜日分を計画して集計する（_init_worker のあとに実行）
+
+    各車両の便を順に走らせ、運行時間の合計が window_min 分を超える便からあとは走らせない
+    （その便の利用者は未割り当て）
+
+    Returns:
+        CSV_COLUMNS の辞書
+    """
+    start = time.perf_counter()
+    rows = np.asarray(_shared["snapshot"].roster(weekday), dtype=np.int64)
+    users = [_shared["users"][row] for row in rows]
+    vehicles = fleet["vehicles"]
+    result = {
+        "fleet": fleet["name"], "weekday": WEEKDAY_NAMES[weekday], "vehicles": len(vehicles),
+        "seats": sum(v["capacity"] for v in vehicles), "users": len(users),
+        "trips": 0, "km": 0.0, "unassigned": 0, "ride_mean_min": 0.0, "ride_max_min": 0.0,
+        "vehicle_max_min": 0,
+    }
+    if users:
+        index = np.concatenate(([0], rows + 1))
+        dist = np.asarray(_shared["dist"][np.ix_(index, index)])
+        facility = _shared["facility"]
+        plan = plan_day(facility, users, vehicles, seed=seed, dist=dist)
+
+        position = {u["id"]: i for i, u in enumerate(users, start=1)}
+        rides = []
+        dropped = 0
+        for assignment in plan["assignments"].values():
+            vehicle_minutes = 0
+            for number, trip in enumerate(assignment["trips"]):
+                route = optimize_route(facility, trip["users"], dist=dist,
+                                       indices=[position[u["id"]] for u in trip["users"]])
+                if vehicle_minutes + route["estimatedTime"] > window_min:
+                    # 送迎時間帯に収まらない便からあとは走らせない
+                    dropped += sum(len(t["users"]) for t in assignment["trips"][number:])
+                    break
+                tour = [position[u["id"]] for u in route["order"]]
+                result["trips"] += 1
+                result["km"] += route["totalDistance"]
+                rides.append(ride_minutes(dist, tour))
+                vehicle_minutes += route["estimatedTime"]
+            result["vehicle_max_min"] = max(result["vehicle_max_min"], vehicle_minutes)
+        rides = np.concatenate(rides) if rides else np.zeros(0)
+        result["unassigned"] = len(plan["unassigned"]) + dropped
+        result["km"] = round(result["km"], 2)
+        result["ride_mean_min"] = round(float(rides.mean()), 1) if len(rides) else 0.0
+        result["ride_max_min"] = round(float(rides.max()), 1) if len(rides) else 0.0
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def _evaluate_task(task):
+    return evaluate_scenario(*task)
+
+def run_scenarios(snapshot_path, fleets, weekdays=None, workers=None, seed=0, work_dir=None,
+                  window_min=MORNING_WINDOW_MIN):
+    """
+    車両構成 × 曜日 の全シナリオを評価する
+
+    Args:
+        snapshot_path: スナップショット（.dsplan）のパス
+        fleets: 車両構成の配列 [{"name", "vehicles"}, ...]
+        weekdays: 評価する曜日番号（省略時は名簿のある全曜日）
+        workers: プロセス数（1 の場合はプロセスプールを使わずに実行）
+        seed: 乱数シード（全シナリオで同じ値を使い、車両構成の違いだけを比べる）
+        work_dir: 距離行列を保存するディレクトリ（省略時は一時ディレクトリ）
+        window_min: 送迎時間帯の長さ（分）。各車両の行程をこの中に収める
+
+    Returns:
+        シナリオごとの集計の配列（fleets × weekdays の順）
+    """
+    with PlanSnapshot(snapshot_path) as snapshot:
+        if weekdays is None:
+            weekdays = [day for day in range(len(WEEKDAY_NAMES)) if len(snapshot.roster(day))]
+        dist = build_distance_matrix(snapshot.facility_dict(), snapshot.to_users())
+
+    tasks = [(fleet, day, seed, window_min) for fleet in fleets for day in weekdays]
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        matrix_path = os.path.join(tmp_dir, "distance.npy")
+        np.save(matrix_path, dist)
+        del dist
+        if workers == 1:
+            _init_worker(snapshot_path, matrix_path)
+            try:
+                return [_evaluate_task(task) for task in tasks]
+            finally:
+                _shared.pop("snapshot").close()
+                _shared.clear()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(snapshot_path, matrix_path)) as executor:
+            return list(executor.map(_evaluate_task, tasks, chunksize=4))
+
+def summarize(results):
+    """
+    車両構成ごとに全曜日を合計した比較表（未割り当て人数・総距離の少ない順）
+
+    Returns:
+        [{fleet, vehicles, seats, users, trips, km, unassigned, ride_mean_min, ride_max_min, vehicle_max_min}, ...]
+        ride_max_min / vehicle_max_min は全曜日の最大
+    """
+    by_fleet = {}
+    for row in results:
+        summary = by_fleet.setdefault(row["fleet"], {
+            "fleet": row["fleet"], "vehicles": row["vehicles"], "seats": row["seats"],
+            "users": 0, "trips": 0, "km": 0.0, "unassigned": 0, "ride_total": 0.0, "ride_max_min": 0.0,
+            "vehicle_max_min": 0,
+        })
+        summary["users"] += row["users"]
+        summary["trips"] += row["trips"]
+        summary["km"] += row["km"]
+        summary["unassigned"] += row["unassigned"]
+        summary["ride_total"] += row["ride_mean_min"] * (row["users"] - row["unassigned"])
+        summary["ride_max_min"] = max(summary["ride_max_min"], row["ride_max_min"])
+        summary["vehicle_max_min"] = max(summary["vehicle_max_min"], row["vehicle_max_min"])
+    table = []
+    for summary in by_fleet.values():
+        riders = summary["users"] - summary["unassigned"]
+        summary["ride_mean_min"] = summary.pop("ride_total") / riders if riders else 0.0
+        table.append(summary)
+    return sorted(table, key=lambda s: (s["unassigned"], s["km"], s["vehicle_max_min"]))
+
+def write_csv(results, path):
+    """シナリオごとの集計をCSVに書き出す（Excelで開けるよう BOM 付き UTF-8）"""
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(results)
+
+def main():
+    parser = argparse.ArgumentParser(description='車両構成のシナリオを曜日ごとに並列評価')
+    parser.add_argument('input', help='スナップショット（.dsplan）または weekly_data 形式のディレクトリ')
+    parser.add_argument('--fleets', help='車両構成のJSON（指定時はグリッドの代わりに使う）')
+    parser.add_argument('--counts', type=int, nargs='+', default=list(DEFAULT_COUNTS), help='台数')
+    parser.add_argument('--capacities', type=int, nargs='+', default=list(DEFAULT_CAPACITIES), help='定員')
+    parser.add_argument('--wheelchair-capacities', type=int, nargs='+', default=list(DEFAULT_WHEELCHAIR_CAPACITIES),
+                        help='車椅子枠')
+    parser.add_argument('--window', type=int, default=MORNING_WINDOW_MIN, help='送迎時間帯の長さ（分）')
+    parser.add_argument('--workers', type=int, default=None, help='プロセス数（省略時はCPUコア数）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    parser.add_argument('--output', help='シナリオごとの集計のCSV')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        snapshot_path = prepare_snapshots([args.input], work_dir)[0]
+        with PlanSnapshot(snapshot_path) as snapshot:
+            current = {"name": "現行", "vehicles": [snapshot.vehicle_dict(i) for i in range(len(snapshot.vehicles))]}
+        fleets = load_fleets(args.fleets) if args.fleets else [current] + fleet_grid(
+            args.counts, args.capacities, args.wheelchair_capacities)
+
+        start = time.perf_counter()
+        results = run_scenarios(snapshot_path, fleets, workers=args.workers, seed=args.seed, work_dir=work_dir,
+                                window_min=args.window)
+        elapsed = time.perf_counter() - start
+
+    print(f"{'車両構成':<22} {'座席':>4} {'便数':>5} {'総距離(km)':>10} {'未割当':>6} {'平均乗車(分)':>11} {'最長乗車(分)':>11} {'最長運行(分)':>11}")
+    for row in summarize(results):
+        print(f"{row['fleet']:<22} {row['seats']:>4} {row['trips']:>5} {row['km']:>10.1f} {row['unassigned']:>6} "
+              f"{row['ride_mean_min']:>11.1f} {row['ride_max_min']:>11.1f} {row['vehicle_max_min']:>11}")
+    print(f"✅ {len(fleets)}構成 × {len(results) // max(len(fleets), 1)}曜日 = {len(results)}シナリオを評価しました（{elapsed:.2f}秒）")
+    if args.output:
+        write_csv(results, args.output)
+        print(f"📁 ファイル: {args.output}")
+
+if __name__ == "__main__":
+    main()
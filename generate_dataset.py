@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ベンチマーク用の標準データセットを生成する統合CLI
+
+各生成スクリプト（generate_sample_data.py / generate_weekly_data.py /
+generate_sample_users_v2.py / multi_facility_planner.py）を、
+シード・作成日時・利用日をすべて固定して呼び出し、1つのディレクトリにまとめる。
+同じプロファイルとシードなら出力はバイト単位で一致するため、
+manifest.json の corpus_sha256 が同じなら同じ入力で計測したとみなせる
+
+出力:
+    day/             1日分の送迎計画の入力（sample_data_30 と同じ形式）
+    weekly/          曜日ごとのCSVと weeklyData.js
+    user_master.json 利用者マスタ（userMaster 形式）
+    multi_facility/  複数事業所の1日分
+    manifest.json    プロファイル・シード・各ファイルのSHA-256
+
+使い方:
+    python generate_dataset.py generate --profile medium --seed 0 --output-dir corpus/medium
+    python generate_dataset.py verify corpus/medium
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import generate_sample_data
+import generate_weekly_data
+from generate_sample_users_v2 import generate_users_at_scale, write_users_stream
+from multi_facility_planner import make_multi_facility_day, save_dataset as save_multi_facility_dataset
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# 作成日時・利用日の既定値（実行日に依存させない）
+DEFAULT_TIMESTAMP = "2025-10-01T09:00:00"
+DEFAULT_DATE = generate_sample_data.SCHEDULE_DATE
+
+# 規模ごとのパラメータ
+PROFILES = {
+    "small": {
+        "day_users": 30, "day_vehicles": 5,
+        "weekly_users_per_pattern": [10, 15], "weekly_max_per_day": 30,
+        "master_users": 80,
+        "facilities": 2, "users_per_facility": 50,
+    },
+    "medium": {
+        "day_users": 200, "day_vehicles": 15,
+        "weekly_users_per_pattern": [50, 70], "weekly_max_per_day": 200,
+        "master_users": 10000,
+        "facilities": 5, "users_per_facility": 200,
+    },
+    "large": {
+        "day_users": 1000, "day_vehicles": 75,
+        "weekly_users_per_pattern": [250, 350], "weekly_max_per_day": 1000,
+        "master_users": 100000,
+        "facilities": 10, "users_per_facility": 500,
+    },
+    "xl": {
+        "day_users": 5000, "day_vehicles": 360,
+        "weekly_users_per_pattern": [1250, 1750], "weekly_max_per_day": 5000,
+        "master_users": 1000000,
+        "facilities": 20, "users_per_facility": 1000,
+    },
+}
+
+def component_seed(seed, name):
+    """データの種類ごとのシード（種類を追加しても他の出力が変わらないよう名前から導く）"""
+    return int(hashlib.sha256(f"{seed}:{name}".encode("utf-8")).hexdigest()[:16], 16)
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def corpus_sha256(files):
+    """ファイルのパスとハッシュの一覧から、データセット全体のハッシュを作る"""
+    digest = hashlib.sha256()
+    for entry in files:
+        digest.update(f"{entry['path']}\t{entry['sha256']}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+def generate_day(output_dir, params, seed, date):
+    rng = random.Random(component_seed(seed, "day"))
+    users = generate_sample_data.generate_users(params["day_users"], rng)
+    schedules = generate_sample_data.generate_schedules(users, date, rng)
+    vehicles = generate_sample_data.generate_vehicles(params["day_vehicles"])
+    generate_sample_data.save_dataset(os.path.join(output_dir, "day"), users, schedules, vehicles)
+
+def generate_weekly(output_dir, params, seed):
+    rng = random.Random(component_seed(seed, "weekly"))
+    weekly_data = generate_weekly_data.generate_weekly_users(
+        rng, tuple(params["weekly_users_per_pattern"]), params["weekly_max_per_day"])
+    weekly_dir = os.path.join(output_dir, "weekly")
+    os.makedirs(weekly_dir, exist_ok=True)
+    for weekday, users in weekly_data.items():
+        generate_weekly_data.write_weekly_csv(os.path.join(weekly_dir, f"{weekday}.csv"), users)
+    with open(os.path.join(weekly_dir, "weeklyData.js"), "w", encoding="utf-8", newline="") as f:
+        f.write(generate_weekly_data.build_javascript(weekly_data))
+
+def generate_user_master(output_dir, params, seed, now):
+    chunks = generate_users_at_scale(params["master_users"], seed=component_seed(seed, "user_master"), now=now)
+    write_users_stream(chunks, os.path.join(output_dir, "user_master.json"), generated_at=now)
+
+def generate_multi_facility(output_dir, params, seed, date):
+    facilities, users, vehicles = make_multi_facility_day(
+        params["facilities"], params["users_per_facility"], seed=component_seed(seed, "multi_facility"))
+    save_multi_facility_dataset(os.path.join(output_dir, "multi_facility"), facilities, users, vehicles, date=date)
+
+def list_files(output_dir):
+    """マニフェスト以外の出力ファイル（'/' 区切りの相対パス、名前順）"""
+    paths = []
+    for root, dirs, names in os.walk(output_dir):
+        dirs.sort()
+        for name in names:
+            path = os.path.relpath(os.path.join(root, name), output_dir).replace(os.sep, "/")
+            if path != MANIFEST_NAME:
+                paths.append(path)
+    return sorted(paths)
+
+def generate_dataset(output_dir, profile="small", seed=0, timestamp=DEFAULT_TIMESTAMP, date=DEFAULT_DATE,
+                     overrides=None):
+    """
+    データセットを生成して manifest を書き出す
+
+    overrides でプロファイルの一部のパラメータを上書きできる（manifest に記録する）。
+    Returns:
+        (manifest, データの種類ごとの生成秒数)
+    """
+    params = dict(PROFILES[profile], **(overrides or {}))
+    now = datetime.fromisoformat(timestamp)
+    os.makedirs(output_dir, exist_ok=True)
+    seconds = {}
+    for name, generate in [
+        ("day", lambda: generate_day(output_dir, params, seed, date)),
+        ("weekly", lambda: generate_weekly(output_dir, params, seed)),
+        ("user_master", lambda: generate_user_master(output_dir, params, seed, now)),
+        ("multi_facility", lambda: generate_multi_facility(output_dir, params, seed, date)),
+    ]:
+        start = time.perf_counter()
+        generate()
+        seconds[name] = time.perf_counter() - start
+
+    files = [{
+        "path": path,
+        "bytes": os.path.getsize(os.path.join(output_dir, path)),
+        "sha256": file_sha256(os.path.join(output_dir, path)),
+    } for path in list_files(output_dir)]
+    manifest = {
+        "format_version": MANIFEST_VERSION,
+        "profile": profile,
+        "seed": seed,
+        "timestamp": timestamp,
+        "date": date,
+        "parameters": params,
+        "files": files,
+        "corpus_sha256": corpus_sha256(files),
+    }
+    # 所要時間は実行ごとに変わるため manifest には含めない
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w", encoding="utf-8", newline="\n") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    return manifest, seconds
+
+def verify_dataset(output_dir):
+    """
+    manifest と実際のファイルを照合する
+
+    Returns:
+        問題のリスト（(パス, 内容) のタプル）。空なら一致
+    """
+    with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+        manifest = json.load(f)
+    problems = []
+    expected = {entry["path"]: entry for entry in manifest["files"]}
+    for path in list_files(output_dir):
+        if path not in expected:
+            problems.append((path, "manifest にないファイル"))
+    for path, entry in expected.items():
+        full_path = os.path.join(output_dir, path)
+        if not os.path.exists(full_path):
+            problems.append((path, "ファイルがない"))
+        elif file_sha256(full_path) != entry["sha256"]:
+            problems.append((path, "ハッシュ不一致"))
+    if corpus_sha256(manifest["files"]) != manifest["corpus_sha256"]:
+        problems.append((MANIFEST_NAME, "corpus_sha256 不一致"))
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description='ベンチマーク用の標準データセットを生成')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    gen = subparsers.add_parser('generate', help='データセットを生成')
+    gen.add_argument('--profile', choices=list(PROFILES), default='small', help='規模')
+    gen.add_argument('--seed', type=int, default=0, help='乱数シード')
+    gen.add_argument('--timestamp', default=DEFAULT_TIMESTAMP, help='作成日時（ISO形式）')
+    gen.add_argument('--date', default=DEFAULT_DATE, help='利用日')
+    gen.add_argument('--output-dir', help='出力先（省略時は corpus/<profile>_seed<seed>）')
+
+    ver = subparsers.add_parser('verify', help='manifest とファイルを照合')
+    ver.add_argument('directory', help='データセットのディレクトリ')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        output_dir = args.output_dir or os.path.join('corpus', f'{args.profile}_seed{args.seed}')
+        manifest, seconds = generate_dataset(output_dir, args.profile, args.seed, args.timestamp, args.date)
+        print(f"✅ {args.profile} プロファイルのデータセットを生成しました（シード {args.seed}）")
+        print(f"📁 ディレクトリ: {output_dir}")
+        print(f"\n{'データ':<16} {'秒':>7}")
+        for name, value in seconds.items():
+            print(f"{name:<16} {value:>7.2f}")
+        print(f"\n{'ファイル':<32} {'バイト':>12}  SHA-256")
+        for entry in manifest["files"]:
+            print(f"{entry['path']:<32} {entry['bytes']:>12,}  {entry['sha256'][:16]}")
+        print(f"\ncorpus_sha256: {manifest['corpus_sha256']}")
+    else:
+        problems = verify_dataset(args.directory)
+        for path, reason in problems:
+            print(f"❌ {path}: {reason}")
+        if problems:
+            sys.exit(1)
+        print(f"✅ manifest と一致しました: {args.directory}")
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,12 @@
 # -*- coding: utf-8 -*-
 """
 荒川区及び近隣エリアの30名の利用者データと5台の車両データを生成
+--seed を指定すると同じ内容を再現できる（人数・台数も変更可）
 """
 
+import argparse
 import csv
+import os
 import random
 
 # 荒川区及び近隣エリアの実在する地名と座標
@@ -36,98 +39,19 @@ male_names = ["太郎", "次郎", "三郎", "健太", "大輔", "一郎", "勇",
 female_names = ["花子", "美咲", "由美", "恵子", "陽子", "久美子", "洋子", "幸子", "和子", "京子",
                 "良子", "明子", "千代", "春子", "秋子", "夏子", "冬子", "愛", "優子", "真理子"]
 
-# 30名の利用者データを生成
-users = []
-for i in range(1, 31):
-    user_id = f"U{i:03d}"
-    
-    # 性別をランダムに決定
-    is_male = random.choice([True, False])
-    surname = surnames[i-1]
-    name = male_names[i % len(male_names)] if is_male else female_names[i % len(female_names)]
-    full_name = f"{surname} {name}"
-    
-    # 住所を選択
-    location = random.choice(arakawa_locations)
-    # 座標に少しランダム性を加える（同じ地域内でも少し分散させる）
-    lat = location["lat"] + random.uniform(-0.005, 0.005)
-    lng = location["lng"] + random.uniform(-0.005, 0.005)
-    
-    # 番地をランダム生成
-    chome = random.randint(1, 5)
-    banchi = random.randint(1, 20)
-    go = random.randint(1, 15)
-    address = f"{location['area']}{chome}-{banchi}-{go}"
-    
-    # 電話番号
-    phone = f"03-{random.randint(1000, 9999)}-{random.randint(1000, 9999)}"
-    
-    # 車椅子対応（約30%の確率）
-    wheelchair = "TRUE" if random.random() < 0.3 else "FALSE"
-    
-    # 備考（一部の利用者のみ）
-    notes_options = ["", "", "", "玄関まで介助必要", "2階まで介助必要", "認知症あり"]
-    notes = random.choice(notes_options)
-    
-    users.append({
-        "user_id": user_id,
-        "name": full_name,
-        "address": address,
-        "phone": phone,
-        "wheelchair": wheelchair,
-        "notes": notes,
-        "lat": round(lat, 6),
-        "lng": round(lng, 6)
-    })
-
-# 利用予定データを生成（全員が今日利用）
-schedules = []
-for user in users:
-    schedules.append({
-        "user_id": user["user_id"],
-        "date": "2025-10-14",
-        "pickup_time": f"08:{random.choice(['00', '15', '30', '45'])}",
-        "return_time": "16:00",
-        "status": "予定"
-    })
-
-# 5台の車両データを生成
-vehicles = [
-    {
-        "vehicle_id": "V001",
-        "vehicle_name": "送迎車1号",
-        "capacity": 8,
-        "wheelchair_capacity": 2,
-        "driver_name": "佐藤 花子"
-    },
-    {
-        "vehicle_id": "V002",
-        "vehicle_name": "送迎車2号",
-        "capacity": 6,
-        "wheelchair_capacity": 1,
-        "driver_name": "中村 次郎"
-    },
-    {
-        "vehicle_id": "V003",
-        "vehicle_name": "送迎車3号",
-        "capacity": 8,
-        "wheelchair_capacity": 2,
-        "driver_name": "田中 三郎"
-    },
-    {
-        "vehicle_id": "V004",
-        "vehicle_name": "送迎車4号",
-        "capacity": 7,
-        "wheelchair_capacity": 1,
-        "driver_name": "山田 美咲"
-    },
-    {
-        "vehicle_id": "V005",
-        "vehicle_name": "送迎車5号",
-        "capacity": 6,
-        "wheelchair_capacity": 1,
-        "driver_name": "鈴木 健太"
-    }
+# 備考（一部の利用者のみ）
+notes_options = ["", "", "", "玄関まで介助必要", "2階まで介助必要", "認知症あり"]
+
+# 利用日（固定）
+SCHEDULE_DATE = "2025-10-14"
+
+# 車両の型（台数を増やす場合は順に繰り返す）
+vehicle_templates = [
+    {"capacity": 8, "wheelchair_capacity": 2, "driver_name": "佐藤 花子"},
+    {"capacity": 6, "wheelchair_capacity": 1, "driver_name": "中村 次郎"},
+    {"capacity": 8, "wheelchair_capacity": 2, "driver_name": "田中 三郎"},
+    {"capacity": 7, "wheelchair_capacity": 1, "driver_name": "山田 美咲"},
+    {"capacity": 6, "wheelchair_capacity": 1, "driver_name": "鈴木 健太"},
 ]
 
 # 事業所情報（荒川区内）
@@ -139,31 +63,118 @@ facility = {
     "lng": 139.7670
 }
 
-# CSVファイルに書き出し
-with open('/home/ubuntu/dayservice-transport-app/sample_data_30/users.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=["user_id", "name", "address", "phone", "wheelchair", "notes", "lat", "lng"])
-    writer.writeheader()
-    writer.writerows(users)
-
-with open('/home/ubuntu/dayservice-transport-app/sample_data_30/schedules.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=["user_id", "date", "pickup_time", "return_time", "status"])
-    writer.writeheader()
-    writer.writerows(schedules)
-
-with open('/home/ubuntu/dayservice-transport-app/sample_data_30/vehicles.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=["vehicle_id", "vehicle_name", "capacity", "wheelchair_capacity", "driver_name"])
-    writer.writeheader()
-    writer.writerows(vehicles)
-
-with open('/home/ubuntu/dayservice-transport-app/sample_data_30/facility.csv', 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=["facility_name", "address", "phone", "lat", "lng"])
-    writer.writeheader()
-    writer.writerow(facility)
-
-print("✅ 30名の利用者データと5台の車両データを生成しました")
-print(f"利用者数: {len(users)}名")
-print(f"車椅子対応が必要な利用者: {sum(1 for u in users if u['wheelchair'] == 'TRUE')}名")
-print(f"車両数: {len(vehicles)}台")
-print(f"総定員: {sum(v['capacity'] for v in vehicles)}名")
-print(f"総車椅子対応可能数: {sum(v['wheelchair_capacity'] for v in vehicles)}台")
+DEFAULT_OUTPUT_DIR = '/home/ubuntu/dayservice-transport-app/sample_data_30'
+
+def generate_users(count=30, rng=random):
+    """利用者データを生成（rng に random.Random(seed) を渡すと再現可能）"""
+    users = []
+    for i in range(1, count + 1):
+        user_id = f"U{i:03d}"
+        
+        # 性別をランダムに決定
+        is_male = rng.choice([True, False])
+        surname = surnames[(i - 1) % len(surnames)]
+        name = male_names[i % len(male_names)] if is_male else female_names[i % len(female_names)]
+        full_name = f"{surname} {name}"
+        
+        # 住所を選択
+        location = rng.choice(arakawa_locations)
+        # 座標に少しランダム性を加える（同じ地域内でも少し分散させる）
+        lat = location["lat"] + rng.uniform(-0.005, 0.005)
+        lng = location["lng"] + rng.uniform(-0.005, 0.005)
+        
+        # 番地をランダム生成
+        chome = rng.randint(1, 5)
+        banchi = rng.randint(1, 20)
+        go = rng.randint(1, 15)
+        address = f"{location['area']}{chome}-{banchi}-{go}"
+        
+        # 電話番号
+        phone = f"03-{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}"
+        
+        # 車椅子対応（約30%の確率）
+        wheelchair = "TRUE" if rng.random() < 0.3 else "FALSE"
+        
+        # 備考（一部の利用者のみ）
+        notes = rng.choice(notes_options)
+        
+        users.append({
+            "user_id": user_id,
+            "name": full_name,
+            "address": address,
+            "phone": phone,
+            "wheelchair": wheelchair,
+            "notes": notes,
+            "lat": round(lat, 6),
+            "lng": round(lng, 6)
+        })
+    return users
+
+def generate_schedules(users, date=SCHEDULE_DATE, rng=random):
+    """利用予定データを生成（全員が date に利用）"""
+    return [{
+        "user_id": user["user_id"],
+        "date": date,
+        "pickup_time": f"08:{rng.choice(['00', '15', '30', '45'])}",
+        "return_time": "16:00",
+        "status": "予定"
+    } for user in users]
+
+def generate_vehicles(count=5):
+    """車両データを生成（5台までは従来の送迎車1〜5号と同じ）"""
+    return [{
+        "vehicle_id": f"V{i:03d}",
+        "vehicle_name": f"送迎車{i}号",
+        "capacity": vehicle_templates[(i - 1) % len(vehicle_templates)]["capacity"],
+        "wheelchair_capacity": vehicle_templates[(i - 1) % len(vehicle_templates)]["wheelchair_capacity"],
+        "driver_name": vehicle_templates[(i - 1) % len(vehicle_templates)]["driver_name"]
+    } for i in range(1, count + 1)]
+
+def save_dataset(output_dir, users, schedules, vehicles, facility=facility):
+    """sample_data_30 と同じ形式の4つのCSVを書き出す"""
+    os.makedirs(output_dir, exist_ok=True)
+    
+    with open(os.path.join(output_dir, 'users.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=["user_id", "name", "address", "phone", "wheelchair", "notes", "lat", "lng"])
+        writer.writeheader()
+        writer.writerows(users)
+    
+    with open(os.path.join(output_dir, 'schedules.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=["user_id", "date", "pickup_time", "return_time", "status"])
+        writer.writeheader()
+        writer.writerows(schedules)
+    
+    with open(os.path.join(output_dir, 'vehicles.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=["vehicle_id", "vehicle_name", "capacity", "wheelchair_capacity", "driver_name"])
+        writer.writeheader()
+        writer.writerows(vehicles)
+    
+    with open(os.path.join(output_dir, 'facility.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=["facility_name", "address", "phone", "lat", "lng"])
+        writer.writeheader()
+        writer.writerow(facility)
+
+def main():
+    parser = argparse.ArgumentParser(description='利用者・車両のサンプルデータを生成')
+    parser.add_argument('--users', type=int, default=30, help='利用者数')
+    parser.add_argument('--vehicles', type=int, default=5, help='車両数')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード（省略時は毎回異なる）')
+    parser.add_argument('--date', default=SCHEDULE_DATE, help='利用日')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR, help='出力先ディレクトリ')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    users = generate_users(args.users, rng)
+    schedules = generate_schedules(users, args.date, rng)
+    vehicles = generate_vehicles(args.vehicles)
+    save_dataset(args.output_dir, users, schedules, vehicles)
+    
+    print(f"✅ {len(users)}名の利用者データと{len(vehicles)}台の車両データを生成しました")
+    print(f"利用者数: {len(users)}名")
+    print(f"車椅子対応が必要な利用者: {sum(1 for u in users if u['wheelchair'] == 'TRUE')}名")
+    print(f"車両数: {len(vehicles)}台")
+    print(f"総定員: {sum(v['capacity'] for v in vehicles)}名")
+    print(f"総車椅子対応可能数: {sum(v['wheelchair_capacity'] for v in vehicles)}台")
 
+if __name__ == "__main__":
+    main()
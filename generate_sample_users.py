@@ -5,6 +5,7 @@
 曜日ごとに人数を変える
 """
 
+import argparse
 import json
 import random
 from datetime import datetime
@@ -78,15 +79,21 @@ notes_options = [
     ""
 ]
 
-def generate_user_id():
+def generate_user_id(rng=random):
     """ユニークなIDを生成"""
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-    random_num = random.randint(1000, 9999)
+    random_num = rng.randint(1000, 9999)
     return f"user_{timestamp}_{random_num}"
 
-def generate_users(count=80):
-    """指定された数の利用者データを生成"""
+def generate_users(count=80, rng=random, now=None):
+    """
+    指定された数の利用者データを生成
+    
+    rng に random.Random(seed)、now に固定の日時を渡すと同じ内容を再現できる
+    （このときIDは日時と連番で一意にする）
+    """
     users = []
+    timestamp = now.isoformat() if now else None
     
     # 曜日ごとの利用者数を設定
     # 月曜: 30名, 火曜: 28名, 水曜: 32名, 木曜: 29名, 金曜: 31名, 土曜: 25名
@@ -101,26 +108,26 @@ def generate_users(count=80):
     
     for i in range(count):
         # 性別をランダムに選択
-        is_male = random.choice([True, False])
-        surname = random.choice(surnames)
-        given_name = random.choice(given_names_male if is_male else given_names_female)
+        is_male = rng.choice([True, False])
+        surname = rng.choice(surnames)
+        given_name = rng.choice(given_names_male if is_male else given_names_female)
         name = f"{surname} {given_name}"
         
         # 車椅子利用者は20%
-        wheelchair = random.random() < 0.2
+        wheelchair = rng.random() < 0.2
         
         # 住所、ピックアップ時間、メモをランダムに選択
-        address = random.choice(addresses)
-        pickup_time = random.choice(pickup_times)
-        notes = random.choice(notes_options)
+        address = rng.choice(addresses)
+        pickup_time = rng.choice(pickup_times)
+        notes = rng.choice(notes_options)
         
         # 曜日の割り当て（各利用者は2-4曜日に登録）
-        num_days = random.randint(2, 4)
+        num_days = rng.randint(2, 4)
         available_days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday']
-        selected_days = random.sample(available_days, num_days)
+        selected_days = rng.sample(available_days, num_days)
         
         user = {
-            'id': generate_user_id(),
+            'id': f"user_{now.strftime('%Y%m%d%H%M%S')}_{i:04d}" if now else generate_user_id(rng),
             'name': name,
             'address': address,
             'wheelchair': wheelchair,
@@ -144,13 +151,13 @@ def generate_users(count=80):
                 'sunday': '7-8h'
             },
             'additionalServices': {
-                'bathing': random.choice([True, False]),
-                'training': random.choice([True, False]),
-                'nutrition': random.choice([True, False]),
-                'oral': random.choice([True, False])
+                'bathing': rng.choice([True, False]),
+                'training': rng.choice([True, False]),
+                'nutrition': rng.choice([True, False]),
+                'oral': rng.choice([True, False])
             },
-            'createdAt': datetime.now().isoformat(),
-            'updatedAt': datetime.now().isoformat()
+            'createdAt': timestamp or datetime.now().isoformat(),
+            'updatedAt': timestamp or datetime.now().isoformat()
         }
         
         users.append(user)
@@ -159,17 +166,25 @@ def generate_users(count=80):
 
 def main():
     """メイン処理"""
-    users = generate_users(80)
+    parser = argparse.ArgumentParser(description='サンプル利用者データを生成')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    parser.add_argument('--timestamp', default=None, help='作成日時を固定する（ISO形式）')
+    parser.add_argument('--output', default='/home/ubuntu/dayservice-transport-app/sample_users_80.json',
+                        help='出力ファイル')
+    args = parser.parse_args()
+    
+    now = datetime.fromisoformat(args.timestamp) if args.timestamp else None
+    users = generate_users(80, random.Random(args.seed), now)
     
     # JSON形式で出力
     output = {
         'userMaster': users,
-        'generated_at': datetime.now().isoformat(),
+        'generated_at': (now or datetime.now()).isoformat(),
         'total_count': len(users)
     }
     
     # ファイルに保存
-    output_file = '/home/ubuntu/dayservice-transport-app/sample_users_80.json'
+    output_file = args.output
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(output, f, ensure_ascii=False, indent=2)
     
@@ -5,10 +5,14 @@
 曜日ごとに人数を制御（最大定員33名）
 """
 
+import argparse
+import csv
 import json
 import random
 from datetime import datetime
 
+import numpy as np
+
 # 日本の姓と名のリスト
 surnames = [
     "佐藤", "鈴木", "高橋", "田中", "伊藤", "渡辺", "山本", "中村", "小林", "加藤",
@@ -77,16 +81,19 @@ notes_options = [
     ""
 ]
 
-def generate_user_id():
+def generate_user_id(rng=random):
     """ユニークなIDを生成"""
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S%f")
-    random_num = random.randint(1000, 9999)
+    random_num = rng.randint(1000, 9999)
     return f"user_{timestamp}_{random_num}"
 
-def generate_users_with_weekday_control(total_count=80):
+def generate_users_with_weekday_control(total_count=80, rng=random, now=None):
     """
     曜日ごとの人数を制御してサンプルデータを生成
     
+    rng に random.Random(seed)、now に固定の日時を渡すと同じ内容を再現できる
+    （このときIDは日時と連番で一意にする）
+    
     目標人数:
     - 月曜日: 33名
     - 火曜日: 30名
@@ -113,11 +120,11 @@ def generate_users_with_weekday_control(total_count=80):
     # 各利用者を1-3曜日にランダムに割り当て
     for i in range(total_count):
         # 利用曜日数（1-3曜日）
-        num_days = random.randint(1, 3)
+        num_days = rng.randint(1, 3)
         
         # 利用可能な曜日をランダムに選択
         available_days = list(target_counts.keys())
-        selected_days = random.sample(available_days, num_days)
+        selected_days = rng.sample(available_days, num_days)
         
         for day in selected_days:
             weekday_assignments[day].append(i)
@@ -129,45 +136,50 @@ def generate_users_with_weekday_control(total_count=80):
         if current_count < target:
             # 不足している場合、他の利用者を追加
             diff = target - current_count
-            available_users = [i for i in range(total_count) if i not in weekday_assignments[day]]
+            assigned = set(weekday_assignments[day])
+            available_users = [i for i in range(total_count) if i not in assigned]
             if available_users:
-                additional_users = random.sample(available_users, min(diff, len(available_users)))
+                additional_users = rng.sample(available_users, min(diff, len(available_users)))
                 weekday_assignments[day].extend(additional_users)
         
         elif current_count > target:
             # 超過している場合、ランダムに削除
             diff = current_count - target
-            weekday_assignments[day] = random.sample(weekday_assignments[day], target)
+            weekday_assignments[day] = rng.sample(weekday_assignments[day], target)
+    
+    # 所属判定を O(1) にするため曜日ごとに集合化
+    weekday_sets = {day: set(indices) for day, indices in weekday_assignments.items()}
+    timestamp = (now or datetime.now()).isoformat()
     
     # 利用者データを生成
     for i in range(total_count):
         # 性別をランダムに選択
-        is_male = random.choice([True, False])
-        surname = random.choice(surnames)
-        given_name = random.choice(given_names_male if is_male else given_names_female)
+        is_male = rng.choice([True, False])
+        surname = rng.choice(surnames)
+        given_name = rng.choice(given_names_male if is_male else given_names_female)
         name = f"{surname} {given_name}"
         
         # 車椅子利用者は20%
-        wheelchair = random.random() < 0.2
+        wheelchair = rng.random() < 0.2
         
         # 住所、ピックアップ時間、メモをランダムに選択
-        address = random.choice(addresses)
-        pickup_time = random.choice(pickup_times)
-        notes = random.choice(notes_options)
+        address = rng.choice(addresses)
+        pickup_time = rng.choice(pickup_times)
+        notes = rng.choice(notes_options)
         
         # この利用者が登録されている曜日を確認
         user_weekdays = {
-            'monday': i in weekday_assignments['monday'],
-            'tuesday': i in weekday_assignments['tuesday'],
-            'wednesday': i in weekday_assignments['wednesday'],
-            'thursday': i in weekday_assignments['thursday'],
-            'friday': i in weekday_assignments['friday'],
-            'saturday': i in weekday_assignments['saturday'],
+            'monday': i in weekday_sets['monday'],
+            'tuesday': i in weekday_sets['tuesday'],
+            'wednesday': i in weekday_sets['wednesday'],
+            'thursday': i in weekday_sets['thursday'],
+            'friday': i in weekday_sets['friday'],
+            'saturday': i in weekday_sets['saturday'],
             'sunday': False
         }
         
         user = {
-            'id': generate_user_id(),
+            'id': f"user_{now.strftime('%Y%m%d%H%M%S')}_{i:04d}" if now else generate_user_id(rng),
             'name': name,
             'address': address,
             'wheelchair': wheelchair,
@@ -185,22 +197,223 @@ def generate_users_with_weekday_control(total_count=80):
                 'sunday': '7-8h'
             },
             'additionalServices': {
-                'bathing': random.choice([True, False]),
-                'training': random.choice([True, False]),
-                'nutrition': random.choice([True, False]),
-                'oral': random.choice([True, False])
+                'bathing': rng.choice([True, False]),
+                'training': rng.choice([True, False]),
+                'nutrition': rng.choice([True, False]),
+                'oral': rng.choice([True, False])
             },
-            'createdAt': datetime.now().isoformat(),
-            'updatedAt': datetime.now().isoformat()
+            'createdAt': timestamp,
+            'updatedAt': timestamp
         }
         
         users.append(user)
     
     return users
 
+# 大規模生成モード用の定義
+# 曜日の並び（ビット位置 = インデックス）
+WEEKDAY_KEYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+# 80名基準の目標人数を比率化したもの（日曜日は運営なし）
+WEEKDAY_TARGET_RATIOS = np.array([33, 30, 28, 32, 31, 25, 0], dtype=np.float64) / 80
+
+ADDITIONAL_SERVICE_KEYS = ['bathing', 'training', 'nutrition', 'oral']
+
+CSV_FIELDNAMES = (
+    ['id', 'name', 'address', 'wheelchair', 'pickupTime', 'notes']
+    + WEEKDAY_KEYS
+    + ['serviceCode'] + ADDITIONAL_SERVICE_KEYS
+    + ['createdAt', 'updatedAt']
+)
+
+# 0-255 の各値に立っているビット数
+POPCOUNT_TABLE = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+def draw_weekday_masks(rng, count, day_targets, open_days):
+    """
+    利用曜日をビットマスク（uint8, bit0=月曜日）で一括抽選し、
+    各曜日の人数を day_targets に合わせて調整する
+    
+    open_days は抽選対象とする曜日のインデックス配列
+    """
+    # 各利用者に1-3曜日を割り当て（乱数キーの順位で曜日を選ぶ）
+    days_per_user = rng.integers(1, 4, size=count)
+    ranks = rng.random((count, len(open_days))).argsort(axis=1).argsort(axis=1)
+    selected = ranks < days_per_user[:, None]
+    bits = np.left_shift(1, open_days).astype(np.uint8)
+    masks = (selected * bits).sum(axis=1).astype(np.uint8)
+    
+    # 各曜日の人数を目標に調整（ビット演算のみで所属を判定）
+    for day, target in enumerate(day_targets):
+        target = int(target)
+        bit = np.uint8(1 << day)
+        member = (masks & bit) != 0
+        current_count = int(member.sum())
+        
+        if current_count < target:
+            # 不足している場合、未所属の利用者にビットを立てる
+            candidates = np.flatnonzero(~member)
+            chosen = rng.choice(candidates, target - current_count, replace=False)
+            masks[chosen] |= bit
+        
+        elif current_count > target:
+            # 超過している場合、複数曜日を利用している人から優先して外す
+            day_totals = POPCOUNT_TABLE[masks]
+            removable = np.flatnonzero(member & (day_totals > 1))
+            diff = current_count - target
+            if len(removable) < diff:
+                rest = np.flatnonzero(member & (day_totals <= 1))
+                removable = np.concatenate([removable, rng.permutation(rest)[:diff - len(removable)]])
+            chosen = rng.choice(removable, diff, replace=False)
+            masks[chosen] &= ~bit
+    
+    return masks
+
+def generate_users_at_scale(total_count, chunk_size=50000, seed=None, now=None):
+    """
+    大規模な負荷試験用に利用者データをチャンク単位で生成するジェネレータ
+    
+    1チャンクごとに (利用者リスト, 曜日ビットマスク配列) を返す。
+    曜日ごとの人数は 80名基準の目標比率に合わせ、チャンク境界をまたいでも
+    累積で目標人数に一致するよう丸める。
+    seed と now（作成日時）を固定すると同じ内容を再現できる。
+    """
+    rng = np.random.default_rng(seed)
+    
+    # タイムスタンプは1回だけ取得し、IDは連番で一意にする
+    now = now or datetime.now()
+    timestamp = now.isoformat()
+    id_prefix = f"user_{now.strftime('%Y%m%d%H%M%S')}_"
+    id_width = max(7, len(str(total_count)))
+    
+    surname_pool = np.array(surnames)
+    male_pool = np.array(given_names_male)
+    female_pool = np.array(given_names_female)
+    address_pool = np.array(addresses)
+    pickup_pool = np.array(pickup_times)
+    notes_pool = np.array(notes_options)
+    service_duration = {day: '7-8h' for day in WEEKDAY_KEYS}
+    open_days = np.flatnonzero(WEEKDAY_TARGET_RATIOS > 0)
+    
+    for start in range(0, total_count, chunk_size):
+        count = min(chunk_size, total_count - start)
+        end = start + count
+        
+        # 累積目標の差分をこのチャンクの目標とする
+        day_targets = (
+            np.rint(WEEKDAY_TARGET_RATIOS * end) - np.rint(WEEKDAY_TARGET_RATIOS * start)
+        ).astype(np.int64)
+        masks = draw_weekday_masks(rng, count, day_targets, open_days)
+        
+        # 属性を一括抽選
+        is_male = rng.random(count) < 0.5
+        given_index = rng.integers(0, len(male_pool), size=count)
+        given = np.where(is_male, male_pool[given_index], female_pool[given_index])
+        names = np.char.add(np.char.add(surname_pool[rng.integers(0, len(surname_pool), size=count)], ' '), given)
+        wheelchair = rng.random(count) < 0.2
+        address_values = address_pool[rng.integers(0, len(address_pool), size=count)]
+        pickup_values = pickup_pool[rng.integers(0, len(pickup_pool), size=count)]
+        notes_values = notes_pool[rng.integers(0, len(notes_pool), size=count)]
+        services = rng.random((count, len(ADDITIONAL_SERVICE_KEYS))) < 0.5
+        day_flags = ((masks[:, None] >> np.arange(len(WEEKDAY_KEYS), dtype=np.uint8)) & 1).astype(bool)
+        
+        users = []
+        for offset, (name, address, chair, pickup, note, flags, extra) in enumerate(zip(
+            names.tolist(), address_values.tolist(), wheelchair.tolist(),
+            pickup_values.tolist(), notes_values.tolist(),
+            day_flags.tolist(), services.tolist()
+        )):
+            user = {
+                'id': f"{id_prefix}{start + offset:0{id_width}d}",
+                'name': name,
+                'address': address,
+                'wheelchair': chair,
+                'pickupTime': pickup,
+                'notes': note,
+                **dict(zip(WEEKDAY_KEYS, flags)),
+                'serviceCode': '321111',
+                'serviceDuration': service_duration,
+                'additionalServices': dict(zip(ADDITIONAL_SERVICE_KEYS, extra)),
+                'createdAt': timestamp,
+                'updatedAt': timestamp
+            }
+            users.append(user)
+        
+        yield users, masks
+
+def write_users_stream(chunks, output_file, generated_at=None):
+    """
+    チャンク列を逐次ファイルに書き出す（メモリ使用量はチャンクサイズで一定）
+    
+    拡張子が .csv ならフラットなCSV、それ以外は main() と同じ
+    userMaster 形式のJSONを出力する。曜日ごとの人数を返す。
+    generated_at（datetime）を省略すると現在時刻を書き込む。
+    """
+    weekday_counts = np.zeros(len(WEEKDAY_KEYS), dtype=np.int64)
+    bit_positions = np.arange(len(WEEKDAY_KEYS), dtype=np.uint8)
+    total = 0
+    
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        if output_file.endswith('.csv'):
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDNAMES)
+            for users, masks in chunks:
+                writer.writerows(
+                    [u['id'], u['name'], u['address'], u['wheelchair'], u['pickupTime'], u['notes']]
+                    + [u[day] for day in WEEKDAY_KEYS]
+                    + [u['serviceCode']]
+                    + [u['additionalServices'][key] for key in ADDITIONAL_SERVICE_KEYS]
+                    + [u['createdAt'], u['updatedAt']]
+                    for u in users
+                )
+                weekday_counts += ((masks[:, None] >> bit_positions) & 1).sum(axis=0, dtype=np.int64)
+                total += len(users)
+        else:
+            f.write('{"userMaster": [')
+            for users, masks in chunks:
+                if users:
+                    if total > 0:
+                        f.write(',')
+                    f.write(','.join(json.dumps(u, ensure_ascii=False) for u in users))
+                weekday_counts += ((masks[:, None] >> bit_positions) & 1).sum(axis=0, dtype=np.int64)
+                total += len(users)
+            f.write('], ')
+            f.write(f'"generated_at": {json.dumps((generated_at or datetime.now()).isoformat())}, ')
+            f.write(f'"total_count": {total}}}')
+    
+    return {day: int(count) for day, count in zip(WEEKDAY_KEYS, weekday_counts)}
+
+def main_scale(args):
+    """大規模生成モード"""
+    now = datetime.fromisoformat(args.timestamp) if args.timestamp else None
+    chunks = generate_users_at_scale(args.count, chunk_size=args.chunk_size, seed=args.seed, now=now)
+    weekday_counts = write_users_stream(chunks, args.output, generated_at=now)
+    
+    print(f"✅ {args.count}名のサンプルデータを生成しました")
+    print(f"📁 ファイル: {args.output}")
+    weekday_names = ['月曜日', '火曜日', '水曜日', '木曜日', '金曜日', '土曜日', '日曜日']
+    print("\n📊 曜日ごとの利用者数:")
+    for day_jp, count in zip(weekday_names, weekday_counts.values()):
+        print(f"  {day_jp}: {count}名")
+
 def main():
     """メイン処理"""
-    users = generate_users_with_weekday_control(80)
+    parser = argparse.ArgumentParser(description='サンプル利用者データを生成')
+    parser.add_argument('--count', type=int, default=80, help='生成する利用者数')
+    parser.add_argument('--output', help='出力ファイル（.json / .csv）')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='大規模生成時のチャンクサイズ')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    parser.add_argument('--timestamp', default=None, help='作成日時を固定する（ISO形式）')
+    args = parser.parse_args()
+    
+    # 出力先やシードが指定された場合、または大人数の場合は大規模生成モード
+    if args.output or args.seed is not None or args.timestamp or args.count > 1000:
+        if not args.output:
+            args.output = f'sample_users_{args.count}.json'
+        main_scale(args)
+        return
+    
+    users = generate_users_with_weekday_control(args.count)
     
     # JSON形式で出力
     output = {
@@ -5,7 +5,9 @@
 週1回〜週5回利用など、さまざまな利用パターンを想定
 """
 
+import argparse
 import csv
+import os
 import random
 from datetime import datetime
 
@@ -89,8 +91,13 @@ usage_patterns = [
     [0, 1, 2, 3, 4],  # 月〜金（週5回）
 ]
 
-def generate_weekly_users():
-    """曜日ごとの利用者データを生成"""
+def generate_weekly_users(rng=random, users_per_pattern=(10, 15), max_per_day=30):
+    """
+    曜日ごとの利用者データを生成
+    
+    rng に random.Random(seed) を渡すと再現可能。
+    users_per_pattern は利用パターンごとの人数の範囲、max_per_day は1日の上限
+    """
     
     # 全利用者プール（最大100名）
     all_users = []
@@ -98,27 +105,27 @@ def generate_weekly_users():
     
     # 各利用パターンごとに利用者を生成
     for pattern in usage_patterns:
-        # このパターンで10〜15名の利用者を生成
-        num_users = random.randint(10, 15)
+        # このパターンで10〜15名（users_per_pattern）の利用者を生成
+        num_users = rng.randint(*users_per_pattern)
         
         for _ in range(num_users):
             # ランダムに性別を決定
-            is_male = random.choice([True, False])
-            last_name = random.choice(last_names)
-            first_name = random.choice(first_names_male if is_male else first_names_female)
+            is_male = rng.choice([True, False])
+            last_name = rng.choice(last_names)
+            first_name = rng.choice(first_names_male if is_male else first_names_female)
             
             # ランダムに住所を選択
-            address, lat, lng = random.choice(addresses)
+            address, lat, lng = rng.choice(addresses)
             
             # 車椅子対応（30%の確率）
-            wheelchair = random.random() < 0.3
+            wheelchair = rng.random() < 0.3
             
             # 備考
-            note = random.choice(notes)
+            note = rng.choice(notes)
             
             # 送迎時刻（8:00〜8:45の間でランダム）
             pickup_hour = 8
-            pickup_minute = random.choice([0, 15, 30, 45])
+            pickup_minute = rng.choice([0, 15, 30, 45])
             
             user = {
                 "id": user_id,
@@ -143,108 +150,136 @@ def generate_weekly_users():
         # この曜日に利用する利用者を抽出
         day_users = [u for u in all_users if day_index in u["usage_pattern"]]
         
-        # 最大30名に制限
-        if len(day_users) > 30:
-            day_users = random.sample(day_users, 30)
+        # 最大30名（max_per_day）に制限
+        if len(day_users) > max_per_day:
+            day_users = rng.sample(day_users, max_per_day)
         
         weekly_data[weekday] = day_users
     
     return weekly_data
 
-def save_weekly_data(weekly_data):
+def write_weekly_csv(filename, users):
+    """1曜日分の利用者をCSVファイルに書き出す"""
+    with open(filename, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "氏名", "住所", "緯度", "経度", "車椅子", "備考", "送迎時刻", "帰宅時刻"])
+        
+        for user in users:
+            writer.writerow([
+                user["id"],
+                user["name"],
+                user["address"],
+                user["lat"],
+                user["lng"],
+                "要" if user["wheelchair"] else "",
+                user["note"],
+                user["pickup_time"],
+                user["return_time"]
+            ])
+
+def save_weekly_data(weekly_data, output_dir="weekly_data"):
     """曜日ごとのデータをCSVファイルに保存"""
     
-    import os
-    os.makedirs("weekly_data", exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
     
     for weekday, users in weekly_data.items():
-        filename = f"weekly_data/{weekday}.csv"
-        
-        with open(filename, "w", encoding="utf-8", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["ID", "氏名", "住所", "緯度", "経度", "車椅子", "備考", "送迎時刻", "帰宅時刻"])
-            
-            for user in users:
-                writer.writerow([
-                    user["id"],
-                    user["name"],
-                    user["address"],
-                    user["lat"],
-                    user["lng"],
-                    "要" if user["wheelchair"] else "",
-                    user["note"],
-                    user["pickup_time"],
-                    user["return_time"]
-                ])
-        
+        write_weekly_csv(os.path.join(output_dir, f"{weekday}.csv"), users)
         print(f"{weekday}: {len(users)}名のデータを生成しました")
 
-def save_as_javascript(weekly_data):
-    """JavaScriptファイルとして保存"""
+# 事業所情報
+facility_info = {
+    "name": "デイサービスさくら",
+    "address": "荒川区西日暮里2-10-5",
+    "lat": 35.7328,
+    "lng": 139.7645,
+}
+
+# 車両情報
+vehicles_data = [
+    {"id": 1, "name": "送迎車1号", "driver": "佐藤 花子", "capacity": 8, "wheelchairCapacity": 2},
+    {"id": 2, "name": "送迎車2号", "driver": "中村 次郎", "capacity": 6, "wheelchairCapacity": 1},
+    {"id": 3, "name": "送迎車3号", "driver": "田中 三郎", "capacity": 8, "wheelchairCapacity": 2},
+    {"id": 4, "name": "送迎車4号", "driver": "山田 美咲", "capacity": 7, "wheelchairCapacity": 1},
+    {"id": 5, "name": "送迎車5号", "driver": "鈴木 健太", "capacity": 6, "wheelchairCapacity": 1},
+]
+
+def build_javascript(weekly_data, facility=None, vehicles=None):
+    """weeklyData.js の内容を文字列として作成"""
+    facility = facility or facility_info
+    vehicles = vehicles or vehicles_data
     
-    js_content = "// 曜日ごとの利用者データ\n"
-    js_content += "export const weeklyData = {\n"
+    parts = ["// 曜日ごとの利用者データ\n", "export const weeklyData = {\n"]
     
     for weekday, users in weekly_data.items():
-        js_content += f'  "{weekday}": [\n'
+        parts.append(f'  "{weekday}": [\n')
         
         for user in users:
-            js_content += "    {\n"
-            js_content += f'      id: {user["id"]},\n'
-            js_content += f'      name: "{user["name"]}",\n'
-            js_content += f'      address: "{user["address"]}",\n'
-            js_content += f'      lat: {user["lat"]},\n'
-            js_content += f'      lng: {user["lng"]},\n'
-            js_content += f'      wheelchair: {str(user["wheelchair"]).lower()},\n'
-            js_content += f'      note: "{user["note"]}",\n'
-            js_content += f'      pickupTime: "{user["pickup_time"]}",\n'
-            js_content += f'      returnTime: "{user["return_time"]}",\n'
-            js_content += "    },\n"
+            parts.append(
+                "    {\n"
+                f'      id: {user["id"]},\n'
+                f'      name: "{user["name"]}",\n'
+                f'      address: "{user["address"]}",\n'
+                f'      lat: {user["lat"]},\n'
+                f'      lng: {user["lng"]},\n'
+                f'      wheelchair: {str(user["wheelchair"]).lower()},\n'
+                f'      note: "{user["note"]}",\n'
+                f'      pickupTime: "{user["pickup_time"]}",\n'
+                f'      returnTime: "{user["return_time"]}",\n'
+                "    },\n"
+            )
         
-        js_content += "  ],\n"
+        parts.append("  ],\n")
     
-    js_content += "};\n"
+    parts.append("};\n")
     
     # 事業所情報も追加
-    js_content += "\n// 事業所情報\n"
-    js_content += "export const facility = {\n"
-    js_content += '  name: "デイサービスさくら",\n'
-    js_content += '  address: "荒川区西日暮里2-10-5",\n'
-    js_content += "  lat: 35.7328,\n"
-    js_content += "  lng: 139.7645,\n"
-    js_content += "};\n"
+    parts.append(
+        "\n// 事業所情報\n"
+        "export const facility = {\n"
+        f'  name: "{facility["name"]}",\n'
+        f'  address: "{facility["address"]}",\n'
+        f'  lat: {facility["lat"]},\n'
+        f'  lng: {facility["lng"]},\n'
+        "};\n"
+    )
     
     # 車両情報も追加
-    js_content += "\n// 車両情報\n"
-    js_content += "export const vehicles = [\n"
-    vehicles_data = [
-        {"id": 1, "name": "送迎車1号", "driver": "佐藤 花子", "capacity": 8, "wheelchairCapacity": 2},
-        {"id": 2, "name": "送迎車2号", "driver": "中村 次郎", "capacity": 6, "wheelchairCapacity": 1},
-        {"id": 3, "name": "送迎車3号", "driver": "田中 三郎", "capacity": 8, "wheelchairCapacity": 2},
-        {"id": 4, "name": "送迎車4号", "driver": "山田 美咲", "capacity": 7, "wheelchairCapacity": 1},
-        {"id": 5, "name": "送迎車5号", "driver": "鈴木 健太", "capacity": 6, "wheelchairCapacity": 1},
-    ]
-    
-    for vehicle in vehicles_data:
-        js_content += "  {\n"
-        js_content += f'    id: {vehicle["id"]},\n'
-        js_content += f'    name: "{vehicle["name"]}",\n'
-        js_content += f'    driver: "{vehicle["driver"]}",\n'
-        js_content += f'    capacity: {vehicle["capacity"]},\n'
-        js_content += f'    wheelchairCapacity: {vehicle["wheelchairCapacity"]},\n'
-        js_content += "  },\n"
-    
-    js_content += "];\n"
-    
-    with open("transport-web/src/weeklyData.js", "w", encoding="utf-8") as f:
-        f.write(js_content)
-    
-    print("\nJavaScriptファイルを生成しました: transport-web/src/weeklyData.js")
+    parts.append("\n// 車両情報\n")
+    parts.append("export const vehicles = [\n")
+    
+    for vehicle in vehicles:
+        parts.append(
+            "  {\n"
+            f'    id: {vehicle["id"]},\n'
+            f'    name: "{vehicle["name"]}",\n'
+            f'    driver: "{vehicle["driver"]}",\n'
+            f'    capacity: {vehicle["capacity"]},\n'
+            f'    wheelchairCapacity: {vehicle["wheelchairCapacity"]},\n'
+            "  },\n"
+        )
+    
+    parts.append("];\n")
+    return "".join(parts)
 
-if __name__ == "__main__":
+def save_as_javascript(weekly_data, output_file="transport-web/src/weeklyData.js"):
+    """JavaScriptファイルとして保存"""
+    
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(build_javascript(weekly_data))
+    
+    print(f"\nJavaScriptファイルを生成しました: {output_file}")
+
+def main():
+    parser = argparse.ArgumentParser(description="曜日ごとの利用者データを生成")
+    parser.add_argument("--seed", type=int, default=None, help="乱数シード（省略時は毎回異なる）")
+    args = parser.parse_args()
+    
     print("曜日ごとの利用者データを生成しています...")
-    weekly_data = generate_weekly_users()
+    weekly_data = generate_weekly_users(random.Random(args.seed))
     save_weekly_data(weekly_data)
     save_as_javascript(weekly_data)
     print("\n完了しました！")
 
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ジオコーディングのキャッシュ層
+
+transport-web/src/utils/geocoding.js の geocodeAddresses は住所を1件ずつ
+0.1秒間隔で問い合わせ、キャッシュを持たない。ここでは
+- 正規化した住所をキーにSQLiteへ永続キャッシュ（有効期限・LRU削除つき）
+- キャッシュにない住所だけを asyncio で同時実行数を制限して問い合わせ
+- 問い合わせ先（プロバイダ）は差し替え可能。テスト用にローカルのスタブを用意
+を行い、ヒット率と1件あたりの所要時間（パーセンタイル）を集計する
+"""
+
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import time
+import urllib.parse
+import urllib.request
+
+import instrumentation
+from generate_weekly_data import addresses as KNOWN_ADDRESSES
+from input_normalizer import address_key
+
+DEFAULT_CACHE_PATH = "geocode_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 180 * 24 * 3600       # 住所の座標は半年有効
+DEFAULT_NEGATIVE_TTL_SECONDS = 24 * 3600    # 見つからなかった住所は1日で再問い合わせ
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_CONCURRENCY = 8
+
+# SQLiteのパラメータ数上限を超えないように分割する件数
+SQL_BATCH_SIZE = 500
+
+def normalize_address_key(address):
+    """
+    キャッシュキー用に住所を正規化
+    inputNormalizer.js の normalizeAddress と同じ変換のあと、空白を取り除く（input_normalizer.address_key）
+    """
+    return address_key(address)
+
+# ---------------------------------------------------------------------------
+# 永続キャッシュ
+# ---------------------------------------------------------------------------
+
+class GeocodeCache:
+    """
+    SQLiteによるジオコーディング結果の永続キャッシュ
+
+    - 有効期限（TTL）切れのエントリはヒット扱いにしない
+    - 件数が max_entries を超えたら最終参照が古いものから削除（LRU）
+    - 見つからなかった住所も negative_ttl の間は記録して再問い合わせを防ぐ
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS,
+                 negative_ttl=DEFAULT_NEGATIVE_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS geocode_cache ("
+            " key TEXT PRIMARY KEY,"
+            " address TEXT,"
+            " lat REAL,"
+            " lng REAL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_geocode_cache_last_access ON geocode_cache (last_access)"
+        )
+        self.connection.commit()
+
+    def get_many(self, keys, now=None):
+        """
+        キーの配列に対するキャッシュ結果を {key: {lat, lng} または None} で返す
+        キャッシュにない・期限切れのキーは結果に含めない
+        """
+        now = time.time() if now is None else now
+        found = {}
+        keys = list(keys)
+
+        for start in range(0, len(keys), SQL_BATCH_SIZE):
+            batch = keys[start:start + SQL_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(
+                f"SELECT key, lat, lng, created_at FROM geocode_cache WHERE key IN ({placeholders})",
+                batch
+            ).fetchall()
+            for key, lat, lng, created_at in rows:
+                ttl = self.ttl if lat is not None else self.negative_ttl
+                if now - created_at <= ttl:
+                    found[key] = {"lat": lat, "lng": lng} if lat is not None else None
+
+        if found:
+            self.connection.executemany(
+                "UPDATE geocode_cache SET last_access = ? WHERE key = ?",
+                [(now, key) for key in found]
+            )
+            self.connection.commit()
+        return found
+
+    def put_many(self, entries, now=None):
+        """
+        {key: (address, {lat, lng} または None)} をまとめて保存し、上限を超えた分を削除
+        """
+        now = time.time() if now is None else now
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO geocode_cache (key, address, lat, lng, created_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (key, address, coords["lat"] if coords else None, coords["lng"] if coords else None, now, now)
+                for key, (address, coords) in entries.items()
+            ]
+        )
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        """件数が上限を超えていれば最終参照の古いものから削除"""
+        count = self.connection.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self.connection.execute(
+                "DELETE FROM geocode_cache WHERE key IN ("
+                " SELECT key FROM geocode_cache ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def purge_expired(self, now=None):
+        """期限切れのエントリを削除し、削除件数を返す"""
+        now = time.time() if now is None else now
+        cursor = self.connection.execute(
+            "DELETE FROM geocode_cache WHERE"
+            " (lat IS NOT NULL AND created_at < ?) OR (lat IS NULL AND created_at < ?)",
+            (now - self.ttl, now - self.negative_ttl)
+        )
+        self.connection.commit()
+        return cursor.rowcount
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM geocode_cache").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+# ---------------------------------------------------------------------------
+# プロバイダ
+# ---------------------------------------------------------------------------
+
+class GeocodingError(RuntimeError):
+    """ジオコーディングAPIが結果なし（ZERO_RESULTS）以外の理由で失敗した"""
+
+class StubGeocodingProvider:
+    """
+    テスト用のローカルなジオコーダ（ネットワーク不要）
+
+    generate_weekly_data.py の住所リストは既知の座標を返し、
+    それ以外の住所は住所文字列のハッシュから事業所周辺（約3km以内）の座標を決定的に返す
+    latency 秒の待ちを入れてAPI呼び出しを模擬する
+    """
+
+    def __init__(self, latency=0.05, center=(35.7328, 139.7645), radius_deg=0.03, not_found=()):
+        self.latency = latency
+        self.center = center
+        self.radius_deg = radius_deg
+        self.not_found = {normalize_address_key(a) for a in not_found}
+        self.known = {normalize_address_key(a): {"lat": lat, "lng": lng} for a, lat, lng in KNOWN_ADDRESSES}
+        self.calls = 0
+
+    async def geocode(self, address):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        key = normalize_address_key(address)
+        if key in self.not_found:
+            return None
+        if key in self.known:
+            return dict(self.known[key])
+
+        digest = hashlib.sha1(key.encode("utf-8")).digest()
+        dx = int.from_bytes(digest[:4], "big") / 2 ** 32 * 2 - 1
+        dy = int.from_bytes(digest[4:8], "big") / 2 ** 32 * 2 - 1
+        return {
+            "lat": round(self.center[0] + dy * self.radius_deg, 6),
+            "lng": round(self.center[1] + dx * self.radius_deg, 6),
+        }
+
+class GoogleGeocodingProvider:
+    """
+    Google Maps Geocoding API を使うプロバイダ（geocoding.js と同じパラメータ）
+    APIキーは引数または環境変数 GOOGLE_MAPS_API_KEY で指定
+    """
+
+    ENDPOINT = "https://maps.googleapis.com/maps/api/geocode/json"
+
+    def __init__(self, api_key=None, timeout=10):
+        self.api_key = api_key or os.environ.get("GOOGLE_MAPS_API_KEY", "")
+        self.timeout = timeout
+        self.calls = 0
+
+    def _request(self, address):
+        query = urllib.parse.urlencode({
+            "address": address,
+            "key": self.api_key,
+            "language": "ja",
+            "region": "jp",
+        })
+        with urllib.request.urlopen(f"{self.ENDPOINT}?{query}", timeout=self.timeout) as response:
+            return json.loads(response.read().decode("utf-8"))
+
+    async def geocode(self, address):
+        self.calls += 1
+        data = await asyncio.to_thread(self._request, address)
+        status = data.get("status")
+        if status == "OK" and data.get("results"):
+            location = data["results"][0]["geometry"]["location"]
+            return {"lat": location["lat"], "lng": location["lng"]}
+        if status in ("OK", "ZERO_RESULTS"):
+            return None
+        # OVER_QUERY_LIMIT / REQUEST_DENIED などは「見つからない」ではないため、キャッシュしないよう例外にする
+        raise GeocodingError(f"{status}: {data.get('error_message', '')}".rstrip(": "))
+
+PROVIDERS = {
+    "stub": StubGeocodingProvider,
+    "google": GoogleGeocodingProvider,
+}
+
+# ---------------------------------------------------------------------------
+# 一括ジオコーディング
+# ---------------------------------------------------------------------------
+
+def percentile(values, q):
+    """値の配列の q パーセンタイル（線形補間）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class GeocodingStats:
+    """ヒット率と1件あたりの所要時間を集計"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.latencies = []
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        """集計結果を辞書で返す（所要時間はミリ秒）"""
+        latencies_ms = [value * 1000 for value in self.latencies]
+        return {
+            "lookups": self.hits + self.misses,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": self.hit_rate,
+            "p50_ms": percentile(latencies_ms, 50),
+            "p90_ms": percentile(latencies_ms, 90),
+            "p99_ms": percentile(latencies_ms, 99),
+            "max_ms": max(latencies_ms) if latencies_ms else 0.0,
+        }
+
+class Geocoder:
+    """キャッシュとプロバイダを組み合わせた一括ジオコーダ"""
+
+    def __init__(self, cache, provider, concurrency=DEFAULT_CONCURRENCY):
+        self.cache = cache
+        self.provider = provider
+        self.concurrency = concurrency
+        self.stats = GeocodingStats()
+
+    async def geocode_addresses(self, items, on_progress=None):
+        """
+        複数の住所を一括でジオコーディング
+
+        Args:
+            items: [{id, address}, ...]
+            on_progress: 進捗コールバック (完了件数, 全件数)
+
+        Returns:
+            geocodeAddresses と同じく [{id, lat, lng} または None, ...]
+        """
+        keys = [normalize_address_key(item["address"]) for item in items]
+        unique_keys = {}
+        for key, item in zip(keys, items):
+            if key:
+                unique_keys.setdefault(key, item["address"])
+
+        # キャッシュは一度の問い合わせでまとめて引く
+        start = time.perf_counter()
+        resolved = self.cache.get_many(unique_keys)
+        cache_seconds = time.perf_counter() - start
+        per_hit = cache_seconds / max(len(unique_keys), 1)
+        self.stats.hits += len(resolved)
+        self.stats.latencies.extend([per_hit] * len(resolved))
+
+        misses = [key for key in unique_keys if key not in resolved]
+        self.stats.misses += len(misses)
+        instrumentation.count("geocode_cache_hits", len(resolved))
+        instrumentation.count("geocode_cache_misses", len(misses))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        completed = len(resolved)
+        fetched = {}
+
+        async def lookup(key):
+            nonlocal completed
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    coords = await self.provider.geocode(unique_keys[key])
+                    fetched[key] = (unique_keys[key], coords)
+                except Exception as error:
+                    # 失敗した住所はキャッシュせず、次回再問い合わせする
+                    self.stats.errors += 1
+                    print(f"Geocoding error for address \"{unique_keys[key]}\": {error}")
+                    coords = None
+                self.stats.latencies.append(time.perf_counter() - started)
+                resolved[key] = coords
+                completed += 1
+                if on_progress:
+                    on_progress(completed, len(unique_keys))
+
+        with instrumentation.span("geocoding", addresses=len(misses)):
+            await asyncio.gather(*(lookup(key) for key in misses))
+        if fetched:
+            self.cache.put_many(fetched)
+
+        results = []
+        for key, item in zip(keys, items):
+            coords = resolved.get(key)
+            results.append({"id": item["id"], **coords} if coords else None)
+        return results
+
+def geocode_addresses(items, cache_path=DEFAULT_CACHE_PATH, provider=None, concurrency=DEFAULT_CONCURRENCY):
+    """
+    同期版の一括ジオコーディング
+
+    Returns:
+        (結果の配列, 集計結果の辞書)
+    """
+    cache = GeocodeCache(cache_path)
+    try:
+        geocoder = Geocoder(cache, provider or StubGeocodingProvider(), concurrency=concurrency)
+        results = asyncio.run(geocoder.geocode_addresses(items))
+        return results, geocoder.stats.summary()
+    finally:
+        cache.close()
+
+def main():
+    """利用者CSVの住所をジオコーディングし、lat / lng 列を付けたCSVを出力"""
+    parser = argparse.ArgumentParser(description='利用者CSVの住所に座標を付与')
+    parser.add_argument('input', help='利用者CSV（user_id, address 列を含む）')
+    parser.add_argument('output', help='出力CSV')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='キャッシュファイル')
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), default='stub', help='問い合わせ先')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='同時問い合わせ数')
+    args = parser.parse_args()
+
+    with open(args.input, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        fieldnames = list(reader.fieldnames)
+        rows = list(reader)
+
+    items = [{"id": row["user_id"], "address": row["address"]} for row in rows]
+    results, stats = geocode_addresses(
+        items, cache_path=args.cache, provider=PROVIDERS[args.provider](), concurrency=args.concurrency
+    )
+
+    for column in ("lat", "lng"):
+        if column not in fieldnames:
+            fieldnames.append(column)
+    for row, result in zip(rows, results):
+        row["lat"] = result["lat"] if result else ""
+        row["lng"] = result["lng"] if result else ""
+
+    with open(args.output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"✅ {len(rows)}件の住所を処理しました（ヒット率 {stats['hit_rate'] * 100:.1f}%）")
+    print(f"⏱  所要時間 p50={stats['p50_ms']:.2f}ms p90={stats['p90_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms")
+    print(f"📁 ファイル: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送迎計画の差分再計画
+
+clustering_function.js の handleAutoAssignWithClustering は、1名が欠席になっただけでも
+全員を最初からクラスタリングし直すため、既存の便の構成が毎回変わってしまう
+ここでは既存の割り当てに対して
+- 欠席（absent）
+- 追加（added）
+- 住所変更（address_changed）
+- 車両の運休（vehicle_disabled）
+の差分だけを適用し、影響を受けた便だけを修復する
+
+修復は、キャッシュした距離行列の上で
+1. 外れた利用者を後悔値（最良と次点の挿入コストの差）の大きい順に最安挿入
+2. 影響を受けた便どうしでの利用者の移動（relocate）
+3. 影響を受けた便ごとに route_optimizer.improve_tour で順路を改善
+の順に行う。影響を受けていない便のメンバーと乗車順は変わらない
+
+順番固定（is_order_fixed）の利用者の位置は便ごとに fixed_positions に記録しておき、
+挿入・移動は最後の固定位置より後ろだけで行う。欠席などで前の利用者が抜けた場合も、
+順路の改善の前に固定の利用者を記録した位置に戻す（便が短くなって収まらない分だけ前に詰める）
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from route_optimizer import improve_tour, is_order_fixed, nearest_neighbor_tour
+from transport_planner import (
+    build_distance_matrix,
+    estimate_time,
+    haversine_matrix,
+    load_dataset,
+    plan_day,
+    route_distance,
+)
+
+# relocate を繰り返す最大回数
+MAX_RELOCATE_PASSES = 50
+
+class IncrementalPlanner:
+    """
+    既存の送迎計画を保持し、差分を適用して影響を受けた便だけを修復する
+
+    便は (車両ID, 便番号) で識別し、乗車順に並んだ距離行列のインデックス（利用者は1始まり）を持つ
+    fixed_positions は便ごとの {順番固定の利用者: 便の中の位置}
+    """
+
+    def __init__(self, facility, users, vehicles, plan=None, dist=None, seed=None):
+        """
+        Args:
+            facility: 事業所 {lat, lng, ...}
+            users: 利用者の配列（transport_planner の辞書形式）
+            vehicles: 車両の配列 [{id, capacity, wheelchair_capacity, ...}, ...]
+            plan: 既存の計画（plan_day の結果。便の users の並びを乗車順とみなす）
+                  省略時は plan_day で作成し、各便の順路を最適化する
+            dist: build_distance_matrix で作成済みの距離行列
+            seed: plan 省略時の乱数シード
+        """
+        self.facility = facility
+        self.users = list(users)
+        self.vehicles = {v["id"]: v for v in vehicles}
+        self.disabled_vehicles = {v["id"] for v in vehicles if not v.get("is_active", True)}
+        self.index_by_id = {u["id"]: i + 1 for i, u in enumerate(self.users)}
+        self.dist = build_distance_matrix(facility, self.users) if dist is None else dist
+        self.absent = set()
+        self.unassigned = []
+
+        optimize = plan is None
+        if plan is None:
+            plan = plan_day(facility, self.users, vehicles, seed=seed, dist=self.dist)
+
+        self.trips = {}
+        self.fixed_positions = {}
+        for vehicle_id, assignment in plan["assignments"].items():
+            for trip_no, trip in enumerate(assignment["trips"]):
+                nodes = [self.index_by_id[u["id"]] for u in trip["users"]]
+                if optimize:
+                    nodes = self._optimize_order(nodes)
+                self.trips[(vehicle_id, trip_no)] = nodes
+                self.fixed_positions[(vehicle_id, trip_no)] = {
+                    n: p for p, n in enumerate(nodes) if is_order_fixed(self.users[n - 1])
+                }
+        self.unassigned = [self.index_by_id[u["id"]] for u in plan.get("unassigned", [])]
+
+    # -----------------------------------------------------------------------
+    # 距離行列
+    # -----------------------------------------------------------------------
+
+    def _coordinates(self, nodes):
+        lats = [self.facility["lat"] if n == 0 else self.users[n - 1]["lat"] for n in nodes]
+        lngs = [self.facility["lng"] if n == 0 else self.users[n - 1]["lng"] for n in nodes]
+        return lats, lngs
+
+    def _refresh_rows(self, nodes):
+        """nodes の行・列だけを計算し直す（座標が変わった利用者用）"""
+        all_lats, all_lngs = self._coordinates(range(len(self.users) + 1))
+        lats, lngs = self._coordinates(nodes)
+        block = haversine_matrix(lats, lngs, all_lats, all_lngs)
+        self.dist[nodes, :] = block
+        self.dist[:, nodes] = block.T
+
+    def _add_users(self, users):
+        """利用者を追加し、距離行列を追加分だけ拡張する"""
+        start = len(self.users) + 1
+        for user in users:
+            self.index_by_id[user["id"]] = len(self.users) + 1
+            self.users.append(user)
+        size = len(self.users) + 1
+        grown = np.empty((size, size), dtype=self.dist.dtype)
+        grown[:start, :start] = self.dist
+        self.dist = grown
+        self._refresh_rows(list(range(start, size)))
+        return list(range(start, size))
+
+    # -----------------------------------------------------------------------
+    # 便の評価
+    # -----------------------------------------------------------------------
+
+    def _is_wheelchair(self, node):
+        return bool(self.users[node - 1]["wheelchair"])
+
+    def _fits(self, trip_key, node):
+        """trip_key の便に node を追加しても定員・車椅子定員に収まるか"""
+        vehicle = self.vehicles[trip_key[0]]
+        members = self.trips[trip_key]
+        if len(members) + 1 > vehicle["capacity"]:
+            return False
+        if self._is_wheelchair(node):
+            wheelchair_count = sum(self._is_wheelchair(n) for n in members)
+            return wheelchair_count + 1 <= min(vehicle["wheelchair_capacity"], vehicle["capacity"])
+        return True
+
+    def _insertion_costs(self, nodes, node):
+        """[事業所, *nodes, 事業所] の各辺に node を挿入したときの距離の増分"""
+        path = np.array([0] + list(nodes) + [0], dtype=np.int64)
+        return (self.dist[path[:-1], node] + self.dist[node, path[1:]]
+                - self.dist[path[:-1], path[1:]])
+
+    def _first_free_position(self, trip_key):
+        """固定の利用者の位置を動かさずに挿入できる最初の位置（最後の固定位置の次）"""
+        return max(self.fixed_positions.get(trip_key, {}).values(), default=-1) + 1
+
+    def _insertion_option(self, trip_key, node):
+        """trip_key の便への最安の挿入 (コスト, 位置)。定員を超える場合は None"""
+        if not self._fits(trip_key, node):
+            return None
+        costs = self._insertion_costs(self.trips[trip_key], node)
+        costs[:self._first_free_position(trip_key)] = np.inf
+        position = int(np.argmin(costs))
+        return float(costs[position]), position
+
+    @staticmethod
+    def _best_of(options):
+        """
+        {便: (コスト, 位置) or None} から最安と次点を選ぶ
+
+        Returns:
+            (最安コスト, 便, 位置), 次点コスト
+        """
+        best = (np.inf, None, None)
+        second = np.inf
+        for trip_key, option in options.items():
+            if option is None:
+                continue
+            cost, position = option
+            if cost < best[0]:
+                second = best[0]
+                best = (cost, trip_key, position)
+            elif cost < second:
+                second = cost
+        return best, second
+
+    def _best_insertion(self, node, candidates):
+        return self._best_of({k: self._insertion_option(k, node) for k in candidates})
+
+    def _pin_fixed(self, trip_key):
+        """
+        便の順番固定の利用者を記録した位置に戻す
+
+        便が短くなって記録した位置に収まらない利用者は、順番を保ったまま末尾側に詰める
+        """
+        nodes = self.trips[trip_key]
+        fixed = sorted(self.fixed_positions.get(trip_key, {}).items(), key=lambda item: item[1])
+        if not fixed:
+            return
+        order = [None] * len(nodes)
+        pinned = {}
+        for rank, (node, position) in enumerate(fixed):
+            position = min(position, len(nodes) - (len(fixed) - rank))
+            order[position] = node
+            pinned[node] = position
+        flexible = iter(n for n in nodes if n not in pinned)
+        self.trips[trip_key] = [n if n is not None else next(flexible) for n in order]
+        self.fixed_positions[trip_key] = pinned
+
+    def _optimize_order(self, nodes):
+        fixed_positions = {p for p, n in enumerate(nodes) if is_order_fixed(self.users[n - 1])}
+        tour = nearest_neighbor_tour(self.dist, nodes, fixed_positions)
+        return improve_tour(self.dist, tour, fixed_positions)
+
+    # -----------------------------------------------------------------------
+    # 差分の適用
+    # -----------------------------------------------------------------------
+
+    def _remove(self, node, affected):
+        for trip_key, members in self.trips.items():
+            if node in members:
+                members.remove(node)
+                self.fixed_positions.get(trip_key, {}).pop(node, None)
+                affected.add(trip_key)
+                return True
+        if node in self.unassigned:
+            self.unassigned.remove(node)
+        return False
+
+    def _open_trip(self, node):
+        """
+        どの便にも入らない利用者のために新しい便を追加する
+
+        build_trip_slots と同じく、便数が最も少ない車両（同数なら定員の大きい車両）を選ぶ
+        """
+        trip_counts = {}
+        for vehicle_id, trip_no in self.trips:
+            trip_counts[vehicle_id] = max(trip_counts.get(vehicle_id, 0), trip_no + 1)
+        candidates = [
+            v for vehicle_id, v in self.vehicles.items()
+            if vehicle_id not in self.disabled_vehicles and v["capacity"] > 0
+            and (not self._is_wheelchair(node) or min(v["wheelchair_capacity"], v["capacity"]) > 0)
+        ]
+        if not candidates:
+            return None
+        vehicle = min(candidates, key=lambda v: (trip_counts.get(v["id"], 0), -v["capacity"]))
+        trip_key = (vehicle["id"], trip_counts.get(vehicle["id"], 0))
+        self.trips[trip_key] = []
+        self.fixed_positions[trip_key] = {}
+        return trip_key
+
+    def _insert_pending(self, pending, affected):
+        """
+        後悔値の大きい順に最安挿入（車椅子利用者を先に入れる）
+
+        各利用者の便ごとの挿入コストを保持し、挿入のたびに変わった便の分だけ計算し直す
+        """
+        candidates = [k for k in self.trips if k[0] not in self.disabled_vehicles]
+        options = {node: {k: self._insertion_option(k, node) for k in candidates} for node in pending}
+        while options:
+            choice = None
+            for node, node_options in options.items():
+                (cost, trip_key, position), second = self._best_of(node_options)
+                regret = (second - cost) if np.isfinite(second) else np.inf
+                key = (self._is_wheelchair(node), regret, -cost)
+                if choice is None or key > choice[0]:
+                    choice = (key, node, trip_key, position)
+
+            _, node, trip_key, position = choice
+            del options[node]
+            if trip_key is None:
+                trip_key = self._open_trip(node)
+                position = 0
+                if trip_key is None:
+                    self.unassigned.append(node)
+                    continue
+            self._insert(trip_key, position, node)
+            affected.add(trip_key)
+            for other, node_options in options.items():
+                node_options[trip_key] = self._insertion_option(trip_key, other)
+
+    def _insert(self, trip_key, position, node):
+        """便の position に node を入れる（順番固定の利用者ならその位置を記録する）"""
+        self.trips[trip_key].insert(position, node)
+        if is_order_fixed(self.users[node - 1]):
+            self.fixed_positions.setdefault(trip_key, {})[node] = position
+
+    def _relocate(self, affected):
+        """
+        影響を受けた便どうしで、利用者を1名ずつより安い便・位置へ移す
+
+        最後の固定位置より前の利用者は、抜くと固定の利用者の位置がずれるため移さない
+        """
+        keys = [k for k in affected if k in self.trips]
+        for _ in range(MAX_RELOCATE_PASSES):
+            improved = False
+            for source in keys:
+                members = self.trips[source]
+                first_free = self._first_free_position(source)
+                for position, node in enumerate(list(members)):
+                    if position < first_free:
+                        continue
+                    prev_node = members[position - 1] if position > 0 else 0
+                    next_node = members[position + 1] if position + 1 < len(members) else 0
+                    gain = (self.dist[prev_node, node] + self.dist[node, next_node]
+                            - self.dist[prev_node, next_node])
+                    (cost, target, target_position), _ = self._best_insertion(
+                        node, [k for k in keys if k != source]
+                    )
+                    if target is not None and cost < gain - 1e-9:
+                        members.pop(position)
+                        self._insert(target, target_position, node)
+                        improved = True
+                        break
+                if improved:
+                    break
+            if not improved:
+                return
+
+    def apply(self, delta):
+        """
+        差分を適用して影響を受けた便を修復する
+
+        Args:
+            delta: {
+                "absent": [利用者ID, ...],
+                "added": [利用者, ...],
+                "address_changed": [{id, address, lat, lng}, ...],
+                "vehicle_disabled": [車両ID, ...],
+            }
+
+        Returns:
+            {"changed_trips": [(車両ID, 便番号), ...], "unassigned": [利用者ID, ...], "elapsed_ms": 処理時間}
+        """
+        start = time.perf_counter()
+        affected = set()
+        pending = []
+
+        for user_id in delta.get("absent", []):
+            node = self.index_by_id.get(user_id)
+            if node is None or node in self.absent:
+                continue
+            self.absent.add(node)
+            self._remove(node, affected)
+
+        changed = []
+        for change in delta.get("address_changed", []):
+            node = self.index_by_id.get(change["id"])
+            if node is None:
+                continue
+            self.users[node - 1] = {**self.users[node - 1], **change}
+            changed.append(node)
+            if node not in self.absent:
+                self._remove(node, affected)
+                pending.append(node)
+        if changed:
+            self._refresh_rows(changed)
+
+        # 車両IDはCLIから文字列で渡されるため、文字列として一致する車両を探す
+        vehicle_by_key = {str(v): v for v in self.vehicles}
+        unknown = [v for v in delta.get("vehicle_disabled", []) if str(v) not in vehicle_by_key]
+        if unknown:
+            raise ValueError(f"不明な車両IDです: {', '.join(map(str, unknown))}")
+        for vehicle_id in (vehicle_by_key[str(v)] for v in delta.get("vehicle_disabled", [])):
+            self.disabled_vehicles.add(vehicle_id)
+            for trip_key in [k for k in self.trips if k[0] == vehicle_id]:
+                pending.extend(self.trips.pop(trip_key))
+                self.fixed_positions.pop(trip_key, None)
+                affected.add(trip_key)
+
+        added = [u for u in delta.get("added", []) if u["id"] not in self.index_by_id]
+        for user in delta.get("added", []):
+            # 欠席扱いだった利用者が再び追加された場合は元のインデックスを使う
+            node = self.index_by_id.get(user["id"])
+            if node in self.absent:
+                self.absent.discard(node)
+                pending.append(node)
+        if added:
+            pending.extend(self._add_users(added))
+
+        # 以前に割り当てられなかった利用者も、空きができた便への挿入を試す
+        if affected:
+            pending.extend(self.unassigned)
+            self.unassigned = []
+
+        self._insert_pending(pending, affected)
+        self._relocate(affected)
+        for trip_key in affected:
+            if trip_key in self.trips:
+                if self.trips[trip_key]:
+                    self._pin_fixed(trip_key)
+                    self.trips[trip_key] = self._optimize_order(self.trips[trip_key])
+                else:
+                    del self.trips[trip_key]
+                    self.fixed_positions.pop(trip_key, None)
+
+        return {
+            "changed_trips": sorted(affected, key=str),
+            "unassigned": [self.users[n - 1]["id"] for n in self.unassigned],
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+
+    # -----------------------------------------------------------------------
+    # 出力
+    # -----------------------------------------------------------------------
+
+    def total_distance(self):
+        return sum(route_distance(self.dist, nodes) for nodes in self.trips.values())
+
+    def to_plan(self):
+        """plan_day と同じ形の計画（便には乗車順の users と distance / duration を付ける）"""
+        assignments = {}
+        for (vehicle_id, _), nodes in sorted(self.trips.items(), key=lambda item: (str(item[0][0]), item[0][1])):
+            if not nodes:
+                continue
+            distance = route_distance(self.dist, nodes)
+            assignments.setdefault(vehicle_id, {"trips": []})["trips"].append({
+                "users": [self.users[n - 1] for n in nodes],
+                "distance": round(distance, 2),
+                "duration": estimate_time(distance, len(nodes)),
+            })
+        return {
+            "assignments": assignments,
+            "unassigned": [self.users[n - 1] for n in self.unassigned],
+        }
+
+def main():
+    """データを読み込んで計画を作成し、差分を適用した結果をJSONで出力"""
+    parser = argparse.ArgumentParser(description='送迎計画の差分再計画')
+    parser.add_argument('input', help='データディレクトリ（sample_data_30 など）または週間データのCSV')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    parser.add_argument('--absent', nargs='*', default=[], help='欠席になった利用者ID')
+    parser.add_argument('--disable-vehicle', nargs='*', default=[], help='運休する車両ID')
+    parser.add_argument('--output', help='出力JSONファイル（省略時は標準出力）')
+    args = parser.parse_args()
+
+    facility, users, vehicles = load_dataset(args.input)
+    planner = IncrementalPlanner(facility, users, vehicles, seed=args.seed)
+    before = planner.total_distance()
+    try:
+        result = planner.apply({"absent": args.absent, "vehicle_disabled": args.disable_vehicle})
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(f"✅ {len(result['changed_trips'])}便を修正しました（{result['elapsed_ms']:.1f}ms）"
+          f" 総距離: {before:.1f}km → {planner.total_distance():.1f}km")
+    if result["unassigned"]:
+        print(f"⚠️ 未割り当て: {', '.join(result['unassigned'])}")
+
+    output = json.dumps(planner.to_plan(), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"📁 ファイル: {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
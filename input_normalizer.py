@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+入力値の一括正規化
+
+transport-web/src/utils/inputNormalizer.js（toHalfWidth / normalizeAddress / normalizeName /
+normalizePhoneNumber / normalizeZipCode / normalizeTime）と同じ結果を返す Python 版。
+自治体の名簿など数万行のCSVを取り込むときに、重複検出やジオコーディングのキャッシュキー
+（geocoding_cache.normalize_address_key）を画面入力と同じ規則で作るために使う
+
+- 変換表（str.maketrans）と正規表現はモジュール読み込み時に作っておく
+- 名簿では同じ住所・時刻・氏名が繰り返し出てくるので、値ごとに結果を記憶して再計算しない
+- 住所は空白を除いた正規化結果（住所キー）でまとめ、重複を数える
+
+JS の正規表現の \\s と String.prototype.trim は Python の \\s / str.strip と対象の文字が異なるため、
+JS と同じ文字集合を明示している。python input_normalizer.py --check で node による JS の
+実行結果と突き合わせる
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+# JS の \s（WhiteSpace + LineTerminator）。trim() が取り除く文字も同じ
+JS_WHITESPACE = "\t\n\v\f\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+JS_SPACES_PATTERN = re.compile(f"[{JS_WHITESPACE}]+")
+JS_TRIM_PATTERN = re.compile(f"^[{JS_WHITESPACE}]+|[{JS_WHITESPACE}]+$")
+
+# toHalfWidth: ！(U+FF01) 〜 ～(U+FF5E) を 0xFEE0 ずらす
+HALF_WIDTH_TABLE = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+# normalizeAddress: 全角数字だけを半角に、全角ハイフン類を半角に
+ADDRESS_TABLE = {code: code - 0xFEE0 for code in range(0xFF10, 0xFF1A)}
+ADDRESS_TABLE.update({ord(c): "-" for c in "－―‐"})
+# normalizeName: 半角カタカナ → 全角カタカナ（濁点・半濁点は JS と同じく変換しない）
+HALF_KANA = "ｱｲｳｴｵｶｷｸｹｺｻｼｽｾｿﾀﾁﾂﾃﾄﾅﾆﾇﾈﾉﾊﾋﾌﾍﾎﾏﾐﾑﾒﾓﾔﾕﾖﾗﾘﾙﾚﾛﾜｦﾝｧｨｩｪｫｬｭｮｯｰ｡｢｣､･"
+FULL_KANA = "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワヲンァィゥェォャュョッー。「」、・"
+NAME_TABLE = str.maketrans(HALF_KANA, FULL_KANA)
+
+NON_PHONE_PATTERN = re.compile(r"[^0-9-]")
+HYPHENS_RUN_PATTERN = re.compile(r"-+")
+EDGE_HYPHENS_PATTERN = re.compile(r"^-+|-+$")
+NON_DIGIT_PATTERN = re.compile(r"[^0-9]")
+NON_TIME_PATTERN = re.compile(r"[^0-9:]")
+
+def js_trim(text):
+    """String.prototype.trim と同じ文字を両端から取り除く"""
+    return JS_TRIM_PATTERN.sub("", text)
+
+def to_half_width(text):
+    """全角英数字・記号を半角に変換（toHalfWidth）"""
+    if not text:
+        return ""
+    return text.translate(HALF_WIDTH_TABLE)
+
+def normalize_phone_number(phone):
+    """電話番号を半角数字とハイフンのみに（normalizePhoneNumber）"""
+    if not phone:
+        return ""
+    normalized = NON_PHONE_PATTERN.sub("", phone.translate(HALF_WIDTH_TABLE))
+    normalized = HYPHENS_RUN_PATTERN.sub("-", normalized)
+    return EDGE_HYPHENS_PATTERN.sub("", normalized)
+
+def normalize_zip_code(zip_code):
+    """郵便番号を半角数字に、7桁なら 3桁-4桁 に（normalizeZipCode）"""
+    if not zip_code:
+        return ""
+    normalized = NON_DIGIT_PATTERN.sub("", zip_code.translate(HALF_WIDTH_TABLE))
+    if len(normalized) == 7:
+        normalized = normalized[:3] + "-" + normalized[3:]
+    return normalized
+
+def normalize_address(address):
+    """住所の数字・ハイフンを半角に、空白を1つにまとめる（normalizeAddress）"""
+    if not address:
+        return ""
+    normalized = JS_SPACES_PATTERN.sub(" ", address.translate(ADDRESS_TABLE))
+    return js_trim(normalized)
+
+def normalize_name(name):
+    """半角カタカナを全角に、空白を全角スペース1つにまとめる（normalizeName）"""
+    if not name:
+        return ""
+    normalized = JS_SPACES_PATTERN.sub("　", name.translate(NAME_TABLE))
+    return js_trim(normalized)
+
+def normalize_time(value):
+    """時刻を HH:MM 形式に（normalizeTime）"""
+    if not value:
+        return ""
+    normalized = NON_TIME_PATTERN.sub("", value.translate(HALF_WIDTH_TABLE))
+    parts = normalized.split(":")
+    if len(parts) >= 2:
+        return f"{parts[0].rjust(2, '0')[:2]}:{parts[1].rjust(2, '0')[:2]}"
+    return normalized
+
+def address_key(address):
+    """重複検出・ジオコーディングのキャッシュキー用の住所キー（normalizeAddress の結果から空白を除く）"""
+    return normalize_address(address).replace(" ", "")
+
+def normalize_form_data(form_data):
+    """フォームデータを一括で正規化（normalizeFormData）"""
+    return {
+        **form_data,
+        "name": normalize_name(form_data.get("name")),
+        "address": normalize_address(form_data.get("address")),
+        "phone": normalize_phone_number(form_data.get("phone")),
+        "zipCode": normalize_zip_code(form_data.get("zipCode")),
+        "pickupTime": normalize_time(form_data.get("pickupTime")),
+    }
+
+# CSVの列名 → 正規化の種類（weekly_data/*.csv と sample_data_30/users.csv の両方の列名）
+COLUMN_KINDS = {
+    "氏名": "name", "name": "name",
+    "住所": "address", "address": "address",
+    "電話番号": "phone", "phone": "phone",
+    "郵便番号": "zip_code", "zip_code": "zip_code",
+    "送迎時刻": "time", "帰宅時刻": "time", "pickup_time": "time", "return_time": "time",
+}
+
+NORMALIZERS = {
+    "name": normalize_name,
+    "address": normalize_address,
+    "phone": normalize_phone_number,
+    "zip_code": normalize_zip_code,
+    "time": normalize_time,
+}
+
+ADDRESS_KEY_COLUMN = "住所キー"
+
+class RosterNormalizer:
+    """
+    名簿の行を順に正規化する
+
+    値ごとの正規化結果を種類別の辞書に記憶し、住所キーごとの行数を数える
+    """
+
+    def __init__(self, fieldnames):
+        self.fieldnames = list(fieldnames)
+        self.columns = [(position, name, NORMALIZERS[COLUMN_KINDS[name]], {})
+                        for position, name in enumerate(self.fieldnames) if name in COLUMN_KINDS]
+        self.address_position = next((position for position, name in enumerate(self.fieldnames)
+                                      if COLUMN_KINDS.get(name) == "address"), None)
+        self.address_keys = {}
+        self.address_counts = {}
+        self.rows = 0
+
+    @property
+    def output_fieldnames(self):
+        if self.address_position is None:
+            return list(self.fieldnames)
+        return self.fieldnames + [ADDRESS_KEY_COLUMN]
+
+    def normalize_values(self, values):
+        """csv.reader の1行（列の並びは fieldnames）を正規化したリストを返す（住所キーを末尾に追加）"""
+        values = list(values)
+        raw_address = values[self.address_position] if self.address_position is not None else None
+        for position, _, normalizer, memo in self.columns:
+            value = values[position]
+            result = memo.get(value)
+            if result is None:
+                result = memo[value] = normalizer(value)
+            values[position] = result
+        if self.address_position is not None:
+            key = self.address_keys.get(raw_address)
+            if key is None:
+                key = self.address_keys[raw_address] = values[self.address_position].replace(" ", "")
+            values.append(key)
+            self.address_counts[key] = self.address_counts.get(key, 0) + 1
+        self.rows += 1
+        return values
+
+    def normalize(self, row):
+        """1行（辞書）を正規化した新しい辞書を返す（住所キーの列を追加）"""
+        values = self.normalize_values(row[name] for name in self.fieldnames)
+        return dict(row, **dict(zip(self.output_fieldnames, values)))
+
+    def duplicates(self):
+        """複数の行で使われている住所キーと行数"""
+        return {key: count for key, count in self.address_counts.items() if count > 1}
+
+def normalize_csv(input_path, output_path):
+    """CSVを1行ずつ正規化して書き出す。RosterNormalizer を返す"""
+    with open(input_path, encoding="utf-8", newline="") as src, \
+            open(output_path, "w", encoding="utf-8", newline="") as dst:
+        reader = csv.reader(src)
+        normalizer = RosterNormalizer(next(reader))
+        writer = csv.writer(dst)
+        writer.writerow(normalizer.output_fieldnames)
+        writer.writerows(map(normalizer.normalize_values, reader))
+    return normalizer
+
+# ---------------------------------------------------------------------------
+# JS との突き合わせ
+# ---------------------------------------------------------------------------
+
+JS_FUNCTIONS = {
+    "toHalfWidth": to_half_width,
+    "normalizePhoneNumber": normalize_phone_number,
+    "normalizeZipCode": normalize_zip_code,
+    "normalizeAddress": normalize_address,
+    "normalizeName": normalize_name,
+    "normalizeTime": normalize_time,
+}
+
+# 境界になりやすい入力
+PARITY_SAMPLES = [
+    "", " ", "　", "荒川区町屋１－８－１４", "荒川区　町屋1‐8―14 ", "  台東区根岸2-19-5\t\n",
+    "ＡＢＣ１２３！～", "０３（１２３４）５６７８", "--03--1234--5678--", "１１６ー０００２", "1160002", "116-00021",
+    "ｻﾄｳ ﾀﾛｳ", "ｶﾞｯｺｳ", "ﾊﾟﾝ", "佐藤　　花子", "\ufeff鈴木 一郎\u00a0", "\u2003田中 次郎\u200b",
+    "８：３０", "8:5", "08:00:00", "８時３０分", ":", "1230", "12:", "７:３０ＡＭ", "\U0001F600 03-1234",
+    "\x1c区\x1f", "\x85町屋", "丁目　　番地",
+]
+
+# 乱数で作る入力の文字（全角・半角・空白類・カナ・記号を混ぜる）
+FUZZ_ALPHABET = ("0123456789０１２３４５６７８９-－―‐ー:：()（）ＡａAa 　\t\n\u00a0\u2028\u200b\ufeff\x1c\x85"
+                 "ｱｶﾞﾊﾟｯｰ｡･荒川区町屋丁目番地号佐藤タロウ")
+
+JS_RUNNER = """
+const [modulePath, inputPath] = process.argv.slice(2);
+const normalizer = await import(modulePath);
+const cases = JSON.parse(require('fs').readFileSync(inputPath, 'utf8'));
+const out = cases.map(([name, value]) => normalizer[name](value));
+process.stdout.write(JSON.stringify(out));
+"""
+
+def parity_cases(fuzz=2000, seed=0):
+    rng = random.Random(seed)
+    values = list(PARITY_SAMPLES)
+    values += ["".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(1, 16))) for _ in range(fuzz)]
+    return [(name, value) for value in values for name in JS_FUNCTIONS]
+
+def check_parity(fuzz=2000, seed=0):
+    """
+    node で inputNormalizer.js を実行し、同じ入力に対する結果を比較する
+
+    Returns:
+        (件数, 不一致のリスト [(関数名, 入力, JS, Python)])
+    """
+    node = shutil.which("node")
+    if node is None:
+        raise RuntimeError("node が見つかりません（JS との突き合わせには Node.js が必要です）")
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    module_path = os.path.join(base_dir, "transport-web", "src", "utils", "inputNormalizer.js")
+    cases = parity_cases(fuzz, seed)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, "cases.json")
+        with open(input_path, "w", encoding="utf-8") as f:
+            json.dump(cases, f, ensure_ascii=False)
+        # inputNormalizer.js は ES モジュール（package.json の type に依存しないよう .mjs にコピー）
+        module_copy = os.path.join(work_dir, "inputNormalizer.mjs")
+        shutil.copyfile(module_path, module_copy)
+        runner = os.path.join(work_dir, "runner.cjs")
+        with open(runner, "w", encoding="utf-8") as f:
+            f.write("(async () => {" + JS_RUNNER + "})();")
+        completed = subprocess.run([node, runner, "file://" + module_copy, input_path],
+                                   capture_output=True, check=True)
+    expected = json.loads(completed.stdout.decode("utf-8"))
+
+    mismatches = []
+    for (name, value), js_result in zip(cases, expected):
+        py_result = JS_FUNCTIONS[name](value)
+        if py_result != js_result:
+            mismatches.append((name, value, js_result, py_result))
+    return len(cases), mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description='名簿CSVの一括正規化（inputNormalizer.js と同じ規則）')
+    parser.add_argument('input', nargs='?', help='入力CSV（weekly_data/*.csv 形式または users.csv 形式）')
+    parser.add_argument('--output', help='出力CSV（省略時は <入力>_normalized.csv）')
+    parser.add_argument('--check', action='store_true', help='node で inputNormalizer.js と結果を突き合わせる')
+    parser.add_argument('--fuzz', type=int, default=2000, help='--check で乱数で作る入力の数')
+    args = parser.parse_args()
+
+    if args.check:
+        total, mismatches = check_parity(args.fuzz)
+        for name, value, js_result, py_result in mismatches[:20]:
+            print(f"❌ {name}({value!r}): JS={js_result!r} Python={py_result!r}")
+        if mismatches:
+            print(f"❌ {len(mismatches)}/{total} 件が一致しませんでした")
+            sys.exit(1)
+        print(f"✅ {total} 件すべて inputNormalizer.js と一致しました")
+        return
+
+    if not args.input:
+        parser.error("入力CSVを指定してください")
+    output = args.output or f"{os.path.splitext(args.input)[0]}_normalized.csv"
+    start = time.perf_counter()
+    normalizer = normalize_csv(args.input, output)
+    elapsed = time.perf_counter() - start
+
+    duplicates = normalizer.duplicates()
+    print(f"✅ {normalizer.rows:,}行を正規化しました（{elapsed:.2f}秒）")
+    print(f"   住所: {len(normalizer.address_counts):,}件（重複 {len(duplicates):,}件）")
+    print(f"📁 ファイル: {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+計画処理の計測（区間・カウンタ・メモリ）
+
+ジオコーディング・距離行列・クラスタリング・便分割・ルート順序のどこに時間がかかったかを
+調べるため、処理の区間（span）とカウンタ（距離の計算回数・K-meansの反復回数・キャッシュのヒット数など）、
+メモリ使用量を記録する。
+
+記録していないとき span() は共有の空のコンテキストを返し、count() は何もしないため、
+計測を埋め込んだままでもほぼ負荷がかからない。
+区間の入れ子はスレッドごとに管理する（asyncio の複数タスクが同時に区間を開くと入れ子の関係は正しくならない）。
+
+    with instrumentation.recording("trace.json") as recorder:
+        plan_day(facility, users, vehicles)
+    print(instrumentation.format_breakdown(recorder))
+
+trace.json は Chrome のトレース形式（chrome://tracing / Perfetto で表示できる）で、
+otherData に区間ごとの集計・カウンタ・メモリの記録も含む
+"""
+
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# 記録中の Recorder（記録していないときは None）
+_recorder = None
+
+class _NullSpan:
+    """記録していないときの span（何もしない）"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **args):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    """記録中の区間。set() で区間に付ける値を追加できる"""
+    __slots__ = ("recorder", "name", "args", "start", "child_ns")
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+        self.start = 0
+        self.child_ns = 0
+
+    def __enter__(self):
+        self.recorder._stack().append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter_ns()
+        self.recorder._finish(self, end)
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+class Recorder:
+    """
+    区間・カウンタ・メモリの記録
+
+    memory=True のときは tracemalloc を有効にし、memory_snapshot() で Python のメモリ確保量を記録する
+    （無効のときは最大RSSのみ）
+    """
+
+    def __init__(self, memory=False):
+        self.trace_memory = memory
+        self.spans = []  # (名前, 開始ns, 終了ns, スレッドID, 深さ, 値, 子区間の合計ns)
+        self.counters = {}
+        self.memory = []  # (ラベル, 時刻ns, 現在のバイト数, ピークのバイト数)
+        self.origin = time.perf_counter_ns()
+        self.started_at = time.time()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started_tracemalloc = False
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _finish(self, span, end):
+        stack = self._stack()
+        stack.pop()
+        duration = end - span.start
+        if stack:
+            stack[-1].child_ns += duration
+        with self._lock:
+            self.spans.append((span.name, span.start, end, threading.get_ident(), len(stack), span.args, span.child_ns))
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def memory_snapshot(self, label):
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+        else:
+            current = None
+            peak = max_rss_bytes()
+        with self._lock:
+            self.memory.append((label, time.perf_counter_ns(), current, peak))
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.memory_snapshot("start")
+
+    def stop(self):
+        self.memory_snapshot("end")
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def breakdown(self):
+        """
+        区間名ごとの集計（合計時間の長い順）
+
+        Returns:
+            [{name, calls, total_ms, self_ms, max_ms}, ...]
+            self_ms は内側の区間を除いた時間
+        """
+        stages = {}
+        for name, start, end, _, _, _, child_ns in self.spans:
+            stage = stages.setdefault(name, {"name": name, "calls": 0, "total_ms": 0.0, "self_ms": 0.0, "max_ms": 0.0})
+            duration_ms = (end - start) / 1e6
+            stage["calls"] += 1
+            stage["total_ms"] += duration_ms
+            stage["self_ms"] += (end - start - child_ns) / 1e6
+            stage["max_ms"] = max(stage["max_ms"], duration_ms)
+        return sorted(stages.values(), key=lambda s: -s["total_ms"])
+
+    def to_chrome_trace(self):
+        """Chrome のトレース形式（JSON Object Format）の dict"""
+        pid = os.getpid()
+        events = []
+        for name, start, end, tid, _, args, _ in sorted(self.spans, key=lambda s: (s[1], s[4])):
+            events.append({
+                "name": name, "cat": "planner", "ph": "X", "pid": pid, "tid": tid,
+                "ts": (start - self.origin) / 1e3, "dur": (end - start) / 1e3, "args": args,
+            })
+        for label, at, current, peak in self.memory:
+            values = {}
+            if peak is not None:
+                values["peak_mb"] = peak / (1024 * 1024)
+            if current is not None:
+                values["current_mb"] = current / (1024 * 1024)
+            events.append({"name": "memory", "ph": "C", "pid": pid, "tid": 0,
+                           "ts": (at - self.origin) / 1e3, "args": values})
+            events.append({"name": label, "cat": "memory", "ph": "i", "s": "p", "pid": pid, "tid": 0,
+                           "ts": (at - self.origin) / 1e3})
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "started_at": self.started_at,
+                "stages": self.breakdown(),
+                "counters": dict(sorted(self.counters.items())),
+                "memory": [{"label": label, "ms": (at - self.origin) / 1e6, "current_bytes": current,
+                            "peak_bytes": peak} for label, at, current, peak in self.memory],
+            },
+        }
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+
+def max_rss_bytes():
+    """プロセスの最大RSS（取得できない環境では None）"""
+    if resource is None:
+        return None
+    # Linux の ru_maxrss は KB 単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def is_enabled():
+    return _recorder is not None
+
+def span(name, **args):
+    """区間を記録するコンテキストマネージャ（記録していないときは何もしない）"""
+    recorder = _recorder
+    if recorder is None:
+        return NULL_SPAN
+    return Span(recorder, name, args)
+
+def count(name, value=1):
+    """カウンタに value を加える（記録していないときは何もしない）"""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.count(name, value)
+
+def memory_snapshot(label):
+    """その時点のメモリ使用量を記録する（記録していないときは何もしない）"""
+    recorder = _recorder
+    if recorder is not None:
+        recorder.memory_snapshot(label)
+
+def traced(name=None):
+    """関数の呼び出しを区間として記録するデコレータ"""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with Span(_recorder, span_name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def enable(memory=False):
+    """記録を開始して Recorder を返す"""
+    global _recorder
+    recorder = Recorder(memory=memory)
+    recorder.start()
+    _recorder = recorder
+    return recorder
+
+def disable():
+    """記録を終了して Recorder を返す"""
+    global _recorder
+    recorder = _recorder
+    _recorder = None
+    if recorder is not None:
+        recorder.stop()
+    return recorder
+
+@contextlib.contextmanager
+def recording(path=None, memory=False):
+    """
+    with の間だけ記録し、path を指定した場合は終了時にトレースを書き出す
+
+    記録中に入れ子で呼んだ場合は外側の記録を中断し、終了後に戻す
+    """
+    global _recorder
+    previous = _recorder
+    recorder = enable(memory=memory)
+    try:
+        yield recorder
+    finally:
+        disable()
+        _recorder = previous
+        if path:
+            recorder.save(path)
+
+def format_breakdown(recorder):
+    """区間ごとの集計とカウンタを表にした文字列"""
+    lines = [f"{'区間':<24} {'回数':>7} {'合計(ms)':>10} {'自身(ms)':>10} {'最大(ms)':>10}"]
+    for stage in recorder.breakdown():
+        lines.append(f"{stage['name']:<24} {stage['calls']:>7} {stage['total_ms']:>10.1f} "
+                     f"{stage['self_ms']:>10.1f} {stage['max_ms']:>10.1f}")
+    if recorder.counters:
+        lines.append("")
+        lines.append(f"{'カウンタ':<32} {'値':>12}")
+        for name, value in sorted(recorder.counters.items()):
+            lines.append(f"{name:<32} {value:>12,}")
+    peaks = [peak for _, _, _, peak in recorder.memory if peak is not None]
+    if peaks:
+        label = "Python の確保量" if recorder.trace_memory else "最大RSS"
+        lines.append("")
+        lines.append(f"メモリ（{label}のピーク）: {max(peaks) / (1024 * 1024):.1f}MB")
+    return "\n".join(lines)
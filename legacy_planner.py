@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+現行Webアプリの割り当て・ルート計算ロジックのPython移植版
+（transport-web/src/utils/geographicClustering.js / routeOptimization.js）
+
+新しい計画エンジンとの比較ベンチマーク用に、JS版と同じ手順
+（1点ずつのハバーサイン計算、K-means++、到着順の便分割、最近傍法）で実装している
+車両のキーはPython側の表記（wheelchair_capacity / is_active）を使う
+"""
+
+import math
+import random
+
+def calculate_distance(lat1, lng1, lat2, lng2):
+    """ハバーサイン公式を使用して2点間の距離を計算（km）"""
+    R = 6371  # 地球の半径（km）
+    d_lat = math.radians(lat2 - lat1)
+    d_lng = math.radians(lng2 - lng1)
+
+    a = (math.sin(d_lat / 2) * math.sin(d_lat / 2)
+         + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2))
+         * math.sin(d_lng / 2) * math.sin(d_lng / 2))
+
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+def k_means_clustering(users, k, max_iterations=100, rng=random):
+    """K-meansクラスタリングを実行（kMeansClustering の移植）"""
+    if not users or k <= 0:
+        return []
+
+    # クラスタ数が利用者数より多い場合は、利用者数に調整
+    actual_k = min(k, len(users))
+
+    centroids = initialize_centroids_kmeans_plus_plus(users, actual_k, rng)
+
+    clusters = []
+    previous_clusters = []
+    iterations = 0
+
+    while iterations < max_iterations:
+        clusters = assign_users_to_clusters(users, centroids)
+
+        # 収束判定: クラスタの割り当てが変わらなくなったら終了
+        if iterations > 0 and are_clusters_equal(clusters, previous_clusters):
+            break
+
+        centroids = update_centroids(clusters, rng)
+
+        previous_clusters = [list(cluster) for cluster in clusters]
+        iterations += 1
+
+    return clusters
+
+def initialize_centroids_kmeans_plus_plus(users, k, rng=random):
+    """K-means++法を使用して初期クラスタ中心を選択"""
+    first_index = int(rng.random() * len(users))
+    centroids = [{"lat": users[first_index]["lat"], "lng": users[first_index]["lng"]}]
+
+    for _ in range(1, k):
+        distances = [
+            min(calculate_distance(u["lat"], u["lng"], c["lat"], c["lng"]) for c in centroids)
+            for u in users
+        ]
+
+        # 距離の二乗に比例した確率で次の中心を選択
+        squared = [d * d for d in distances]
+        total = sum(squared)
+        probabilities = [d / total for d in squared] if total > 0 else [1 / len(users)] * len(users)
+
+        rand = rng.random()
+        cumulative = 0
+        selected_index = 0
+        for j, probability in enumerate(probabilities):
+            cumulative += probability
+            if rand <= cumulative:
+                selected_index = j
+                break
+
+        centroids.append({"lat": users[selected_index]["lat"], "lng": users[selected_index]["lng"]})
+
+    return centroids
+
+def assign_users_to_clusters(users, centroids):
+    """各利用者を最も近いクラスタ中心に割り当て"""
+    clusters = [[] for _ in centroids]
+
+    for user in users:
+        min_distance = math.inf
+        closest = 0
+        for index, centroid in enumerate(centroids):
+            distance = calculate_distance(user["lat"], user["lng"], centroid["lat"], centroid["lng"])
+            if distance < min_distance:
+                min_distance = distance
+                closest = index
+        clusters[closest].append(user)
+
+    return clusters
+
+def update_centroids(clusters, rng=random):
+    """各クラスタの新しい中心座標を計算"""
+    centroids = []
+    for cluster in clusters:
+        if not cluster:
+            # 空のクラスタの場合は、ランダムな座標を返す（JS版と同じ挙動）
+            centroids.append({
+                "lat": 35.6284 + (rng.random() - 0.5) * 0.1,
+                "lng": 139.6489 + (rng.random() - 0.5) * 0.1,
+            })
+            continue
+        centroids.append({
+            "lat": sum(u["lat"] for u in cluster) / len(cluster),
+            "lng": sum(u["lng"] for u in cluster) / len(cluster),
+        })
+    return centroids
+
+def are_clusters_equal(clusters1, clusters2):
+    """2つのクラスタ配列が等しいかどうかを判定（IDをソートして比較）"""
+    if len(clusters1) != len(clusters2):
+        return False
+
+    for a, b in zip(clusters1, clusters2):
+        if len(a) != len(b):
+            return False
+        if sorted(str(u["id"]) for u in a) != sorted(str(u["id"]) for u in b):
+            return False
+
+    return True
+
+def split_into_trips(users, capacity, wheelchair_capacity):
+    """利用者を到着順に便へ分割（splitIntoTrips の移植）"""
+    trips = []
+    current_trip = {"users": []}
+    current_wheelchair_count = 0
+
+    for user in users:
+        can_add = (
+            len(current_trip["users"]) < capacity
+            and (not user["wheelchair"] or current_wheelchair_count < wheelchair_capacity)
+        )
+
+        if can_add:
+            current_trip["users"].append(user)
+            if user["wheelchair"]:
+                current_wheelchair_count += 1
+        else:
+            # 現在の便を保存して新しい便を開始
+            if current_trip["users"]:
+                trips.append(current_trip)
+            current_trip = {"users": [user]}
+            current_wheelchair_count = 1 if user["wheelchair"] else 0
+
+    if current_trip["users"]:
+        trips.append(current_trip)
+
+    return trips
+
+def assign_users_to_vehicles_with_clustering(users, vehicles, rng=random):
+    """
+    地理的クラスタリングを使用して利用者を車両に自動割り当て
+    （assignUsersToVehiclesWithClustering の移植）
+    """
+    if not users:
+        return {}
+
+    active_vehicles = [v for v in vehicles if v.get("is_active", True)]
+    if not active_vehicles:
+        return {}
+
+    wheelchair_users = [u for u in users if u["wheelchair"]]
+    regular_users = [u for u in users if not u["wheelchair"]]
+
+    wheelchair_vehicles = [v for v in active_vehicles if v["wheelchair_capacity"] > 0]
+    regular_vehicles = active_vehicles
+
+    assignments = {}
+
+    # 車椅子利用者を車椅子対応車両にクラスタリング
+    if wheelchair_users and wheelchair_vehicles:
+        clusters = k_means_clustering(wheelchair_users, len(wheelchair_vehicles), rng=rng)
+        for index, cluster in enumerate(clusters):
+            if cluster and index < len(wheelchair_vehicles):
+                vehicle = wheelchair_vehicles[index]
+                assignments.setdefault(vehicle["id"], {"trips": []})
+                assignments[vehicle["id"]]["trips"] = split_into_trips(
+                    cluster, vehicle["capacity"], vehicle["wheelchair_capacity"]
+                )
+
+    # 一般利用者を全車両にクラスタリング
+    if regular_users and regular_vehicles:
+        clusters = k_means_clustering(regular_users, len(regular_vehicles), rng=rng)
+        for index, cluster in enumerate(clusters):
+            if cluster and index < len(regular_vehicles):
+                vehicle = regular_vehicles[index]
+                assignments.setdefault(vehicle["id"], {"trips": []})
+
+                # 既存の便に空きがあれば追加（JS版と同じく車椅子数は確認しない）
+                remaining = list(cluster)
+                for trip in assignments[vehicle["id"]]["trips"]:
+                    available = vehicle["capacity"] - len(trip["users"])
+                    if available > 0 and remaining:
+                        trip["users"].extend(remaining[:available])
+                        remaining = remaining[available:]
+
+                # 残りの利用者を新しい便に追加
+                if remaining:
+                    assignments[vehicle["id"]]["trips"].extend(
+                        split_into_trips(remaining, vehicle["capacity"], 0)
+                    )
+
+    return assignments
+
+def optimize_route(facility, users):
+    """
+    最近傍法で送迎ルートを計算（routeOptimization.js の optimizeRoute の移植）
+    順番固定（is_order_fixed / isOrderFixed）の利用者は元の位置を維持
+    """
+    if not users:
+        return {"route": [], "totalDistance": 0, "order": [], "estimatedTime": 0}
+
+    def fixed(user):
+        return user.get("is_order_fixed", user.get("isOrderFixed", False))
+
+    def distance(a, b):
+        return calculate_distance(a["lat"], a["lng"], b["lat"], b["lng"])
+
+    fixed_users = [(index, user) for index, user in enumerate(users) if fixed(user)]
+    unvisited = [user for user in users if not fixed(user)]
+    visited = []
+    current = facility
+
+    # 最近傍法：柔軟な利用者のみを最適化
+    while unvisited:
+        nearest_index = 0
+        nearest_distance = math.inf
+        for i, user in enumerate(unvisited):
+            d = distance(current, user)
+            if d < nearest_distance:
+                nearest_distance = d
+                nearest_index = i
+        current = unvisited.pop(nearest_index)
+        visited.append(current)
+
+    # 固定された利用者を元の位置に挿入
+    final_order = []
+    flexible_index = 0
+    for i in range(len(users)):
+        fixed_item = next((item for item in fixed_users if item[0] == i), None)
+        if fixed_item:
+            final_order.append(fixed_item[1])
+        elif flexible_index < len(visited):
+            final_order.append(visited[flexible_index])
+            flexible_index += 1
+
+    # 距離とルートを再計算
+    route = [[facility["lat"], facility["lng"]]]
+    total_distance = 0
+    current = facility
+    for user in final_order:
+        total_distance += distance(current, user)
+        route.append([user["lat"], user["lng"]])
+        current = user
+    total_distance += distance(current, facility)
+    route.append([facility["lat"], facility["lng"]])
+
+    # 推定所要時間（平均速度20km/h + 各停車地で3分）
+    estimated_time = math.ceil(total_distance / 20 * 60 + len(final_order) * 3)
+
+    return {
+        "route": route,
+        "totalDistance": round(total_distance, 2),
+        "order": final_order,
+        "estimatedTime": estimated_time,
+    }
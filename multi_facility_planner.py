@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数事業所・車両共有の送迎計画
+
+facility.csv / generate_sample_data.py / save_as_javascript は事業所が1か所である前提だが、
+複数のデイサービス事業所で車両をまとめて運用する場合に対応する
+- 利用者は通う事業所（facility_id）を持ち、その事業所への便に乗る
+- 車両は所属事業所（home_facility）から出発し、送迎時間帯（window_min 分）の中で
+  複数の事業所の便を続けて担当できる（事業所間の回送距離・時間を数える）
+
+全事業所をまとめた1つの問題としては解かず、
+1. 調整: 事業所ごとの必要な便数を見積もり、車両の便（スロット）を事業所に配る
+2. 分解: 事業所ごとに、配られた便だけで plan_day と順路の改善を行う（並列実行可）
+3. 調整: 実際の所要時間で車両の行程を確認し、乗れなかった利用者がいる事業所に
+   時間に余裕のある車両の便を追加して、その事業所だけを解き直す
+を繰り返す
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from route_optimizer import improve_tour, is_order_fixed, nearest_neighbor_tour
+from transport_planner import (
+    AVERAGE_SPEED_KMH,
+    DEFAULT_VEHICLES,
+    build_distance_matrix,
+    estimate_time,
+    haversine_matrix,
+    load_schedules_csv,
+    load_users_csv,
+    load_vehicles_csv,
+    parse_float,
+    plan_day,
+    route_distance,
+)
+
+MORNING_WINDOW_MIN = 150  # 送迎時間帯の長さ（分）。各車両の行程はこの中に収める
+MAX_COORDINATION_ROUNDS = 4
+
+# 合成データの事業所（荒川区周辺）
+FACILITY_SITES = [
+    ("F1", "デイサービスさくら", "荒川区西日暮里2-10-5", 35.7328, 139.7645),
+    ("F2", "デイサービスあじさい", "荒川区南千住5-12-3", 35.7335, 139.7990),
+    ("F3", "デイサービスひまわり", "荒川区町屋2-3-4", 35.7420, 139.7810),
+    ("F4", "デイサービスすみれ", "北区田端1-21-8", 35.7380, 139.7600),
+    ("F5", "デイサービスつばき", "台東区根岸3-4-5", 35.7230, 139.7830),
+    ("F6", "デイサービスもみじ", "足立区千住2-11-1", 35.7500, 139.8040),
+]
+
+# ---------------------------------------------------------------------------
+# 合成データ
+# ---------------------------------------------------------------------------
+
+def make_multi_facility_day(num_facilities=5, users_per_facility=200, num_vehicles=None, seed=0,
+                            wheelchair_rate=0.2, spread_km=1.0):
+    """
+    複数事業所の1日分の合成データ
+
+    利用者は各事業所の周囲 spread_km 程度に分布し（隣の事業所の利用者と地域が重なる）、
+    事業所ごとの人数は users_per_facility の ±40% でばらつかせる。
+    車両の所属事業所は人数と無関係に割り振るため、車両が足りない事業所と余る事業所ができる
+
+    Returns:
+        (facilities, users, vehicles)
+    """
+    rng = np.random.default_rng(seed)
+    facilities = []
+    for i in range(num_facilities):
+        site_id, name, address, lat, lng = FACILITY_SITES[i % len(FACILITY_SITES)]
+        if i >= len(FACILITY_SITES):
+            # 事業所の候補より多い場合は少しずらした位置に置く
+            site_id = f"F{i + 1}"
+            name = f"{name}{i // len(FACILITY_SITES) + 1}"
+            lat += rng.uniform(-0.01, 0.01)
+            lng += rng.uniform(-0.01, 0.01)
+        facilities.append({"id": site_id, "name": name, "address": address, "lat": lat, "lng": lng})
+
+    spread_deg = spread_km / 111.0
+    counts = np.maximum(1, np.rint(users_per_facility * rng.uniform(0.6, 1.4, size=num_facilities))).astype(int)
+    counts = np.maximum(1, np.rint(counts * users_per_facility * num_facilities / counts.sum())).astype(int)
+    users = []
+    for facility, count in zip(facilities, counts.tolist()):
+        lats = facility["lat"] + rng.normal(0, spread_deg, size=count)
+        lngs = facility["lng"] + rng.normal(0, spread_deg, size=count)
+        wheelchair = rng.random(count) < wheelchair_rate
+        minutes = rng.choice([0, 15, 30, 45], size=count)
+        for i in range(count):
+            number = len(users) + 1
+            users.append({
+                "id": f"U{number:05d}",
+                "name": f"利用者{number}",
+                "address": "",
+                "lat": round(float(lats[i]), 6),
+                "lng": round(float(lngs[i]), 6),
+                "wheelchair": bool(wheelchair[i]),
+                "notes": "",
+                "pickup_time": f"08:{int(minutes[i]):02d}",
+                "return_time": "16:00",
+                "facility_id": facility["id"],
+            })
+
+    if num_vehicles is None:
+        # 1便あたり平均7名・1台あたり3便で全員を運べる台数
+        num_vehicles = math.ceil(len(users) / 21)
+    homes = rng.permutation(np.arange(num_vehicles) % num_facilities)
+    vehicles = []
+    for i in range(num_vehicles):
+        template = DEFAULT_VEHICLES[i % len(DEFAULT_VEHICLES)]
+        vehicles.append({
+            **template,
+            "id": f"V{i + 1:03d}",
+            "name": f"送迎車{i + 1}号",
+            "home_facility": facilities[homes[i]]["id"],
+        })
+    return facilities, users, vehicles
+
+def save_dataset(directory, facilities, users, vehicles, date="2025-10-14"):
+    """sample_data_30 と同じ形式のCSVに、事業所の列（facility_id / home_facility）を加えて保存"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "facilities.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["facility_id", "facility_name", "address", "phone", "lat", "lng"])
+        for facility in facilities:
+            writer.writerow([facility["id"], facility["name"], facility["address"], facility.get("phone", ""),
+                             facility["lat"], facility["lng"]])
+    with open(os.path.join(directory, "users.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["user_id", "name", "address", "phone", "wheelchair", "notes", "lat", "lng", "facility_id"])
+        for user in users:
+            writer.writerow([user["id"], user["name"], user["address"], user.get("phone", ""),
+                             "TRUE" if user["wheelchair"] else "FALSE", user["notes"], user["lat"], user["lng"],
+                             user["facility_id"]])
+    with open(os.path.join(directory, "schedules.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["user_id", "date", "pickup_time", "return_time", "status"])
+        for user in users:
+            writer.writerow([user["id"], date, user["pickup_time"], user["return_time"], "予定"])
+    with open(os.path.join(directory, "vehicles.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["vehicle_id", "vehicle_name", "capacity", "wheelchair_capacity", "driver_name",
+                         "home_facility"])
+        for vehicle in vehicles:
+            writer.writerow([vehicle["id"], vehicle["name"], vehicle["capacity"], vehicle["wheelchair_capacity"],
+                             vehicle.get("driver", ""), vehicle["home_facility"]])
+
+def load_dataset(directory):
+    """save_dataset の形式を読み込む。Returns: (facilities, users, vehicles)"""
+    facilities = []
+    with open(os.path.join(directory, "facilities.csv"), encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            facilities.append({
+                "id": row["facility_id"],
+                "name": row["facility_name"],
+                "address": row["address"],
+                "phone": row.get("phone", ""),
+                "lat": parse_float(row["lat"]),
+                "lng": parse_float(row["lng"]),
+            })
+    users = load_users_csv(os.path.join(directory, "users.csv"))
+    schedules_path = os.path.join(directory, "schedules.csv")
+    if os.path.exists(schedules_path):
+        schedules = load_schedules_csv(schedules_path)
+        for user in users:
+            schedule = schedules.get(user["id"])
+            if schedule:
+                user["pickup_time"] = schedule["pickup_time"]
+                user["return_time"] = schedule["return_time"]
+    vehicles = load_vehicles_csv(os.path.join(directory, "vehicles.csv"))
+    return facilities, users, vehicles
+
+# ---------------------------------------------------------------------------
+# 事業所ごとの計画（分解）
+# ---------------------------------------------------------------------------
+
+def plan_facility(facility, users, slot_vehicles, seed=None):
+    """
+    1事業所分の計画。slot_vehicles は配られた便ごとの車両（便1つにつき1件）
+
+    Returns:
+        {"trips": [(便の番号, 乗車順の利用者ID, 距離km, 所要分), ...], "unassigned": [利用者ID]}
+    """
+    if not users:
+        return {"trips": [], "unassigned": []}
+    dist = build_distance_matrix(facility, users)
+    # 便ごとに別の車両として渡し、結果の車両IDから便の番号に戻す
+    virtual = [{**vehicle, "id": slot, "is_active": True} for slot, vehicle in enumerate(slot_vehicles)]
+    plan = plan_day(facility, users, virtual, seed=seed, dist=dist,
+                    slots=[(slot, 0) for slot in range(len(virtual))])
+    index_by_id = {u["id"]: i + 1 for i, u in enumerate(users)}
+
+    trips = []
+    for slot, assignment in plan["assignments"].items():
+        for trip in assignment["trips"]:
+            nodes = [index_by_id[u["id"]] for u in trip["users"]]
+            fixed = {p for p, n in enumerate(nodes) if is_order_fixed(users[n - 1])}
+            nodes = improve_tour(dist, nearest_neighbor_tour(dist, nodes, fixed), fixed)
+            distance = route_distance(dist, nodes)
+            trips.append((slot, [users[n - 1]["id"] for n in nodes], distance, estimate_time(distance, len(nodes))))
+    return {"trips": trips, "unassigned": [u["id"] for u in plan["unassigned"]]}
+
+def _plan_facility_task(args):
+    return plan_facility(*args)
+
+# ---------------------------------------------------------------------------
+# 車両の便の配分（調整）
+# ---------------------------------------------------------------------------
+
+class MultiFacilityPlanner:
+    """
+    複数事業所の計画
+
+    車両ごとに行程（legs: 担当する便の事業所の並び）を持ち、
+    各事業所には行程の中の便（車両, 行程内の位置）が配られる
+    """
+
+    def __init__(self, facilities, users, vehicles, window_min=MORNING_WINDOW_MIN, share_vehicles=True,
+                 seed=None, workers=1):
+        self.facilities = list(facilities)
+        self.facility_index = {f["id"]: i for i, f in enumerate(self.facilities)}
+        self.vehicles = [v for v in vehicles if v.get("is_active", True)]
+        self.window_min = window_min
+        self.share_vehicles = share_vehicles
+        self.seed = seed
+        self.workers = workers
+
+        # 事業所間の回送距離（km）
+        lats = [f["lat"] for f in self.facilities]
+        lngs = [f["lng"] for f in self.facilities]
+        self.depot_km = haversine_matrix(lats, lngs)
+
+        # 事業所が未設定・不明の利用者は最寄りの事業所に通うものとする
+        self.users_by_facility = [[] for _ in self.facilities]
+        for user in users:
+            index = self.facility_index.get(user.get("facility_id"))
+            if index is None:
+                index = int(np.argmin(haversine_matrix([user["lat"]], [user["lng"]], lats, lngs)[0]))
+            self.users_by_facility[index].append(user)
+
+        self.homes = []
+        for vehicle in self.vehicles:
+            home = self.facility_index.get(vehicle.get("home_facility"))
+            self.homes.append(home if home is not None else 0)
+        self.legs = [[] for _ in self.vehicles]        # 車両ごとの担当事業所の並び
+        self.leg_minutes = [[] for _ in self.vehicles]  # 便の所要時間（見積もり → 計画後は実績）
+        self.results = [None] * len(self.facilities)
+
+    # -- 行程の時間 ------------------------------------------------------
+
+    def _deadhead_min(self, a, b):
+        return self.depot_km[a, b] / AVERAGE_SPEED_KMH * 60
+
+    def chain_minutes(self, v, legs=None, leg_minutes=None):
+        """車両 v の行程の所要時間（所属事業所から出発し、各事業所への回送を含む。帰りの回送は含めない）"""
+        legs = self.legs[v] if legs is None else legs
+        leg_minutes = self.leg_minutes[v] if leg_minutes is None else leg_minutes
+        position = self.homes[v]
+        total = 0.0
+        for facility, minutes in zip(legs, leg_minutes):
+            total += self._deadhead_min(position, facility) + minutes
+            position = facility
+        return total
+
+    def estimate_trip_minutes(self, f):
+        """事業所 f の1便の所要時間の見積もり（事業所からの平均距離の往復 + 定員分の停車）"""
+        users = self.users_by_facility[f]
+        if not users:
+            return 0.0
+        facility = self.facilities[f]
+        radial = haversine_matrix([facility["lat"]], [facility["lng"]],
+                                  [u["lat"] for u in users], [u["lng"] for u in users])[0]
+        capacity = np.mean([v["capacity"] for v in self.vehicles]) if self.vehicles else 0
+        return estimate_time(2 * float(np.mean(radial)) + 1.0, int(round(capacity)))
+
+    # -- 便の配分 --------------------------------------------------------
+
+    def allocate(self, facilities=None, estimates=None):
+        """
+        不足している事業所に便を配る
+
+        残りの必要座席（一般・車椅子）がある事業所に対し、行程が送迎時間帯に収まる車両のうち
+        回送距離が最も短いもの（同じなら所属事業所の車両、行程の短い車両）から順に便を追加する
+        """
+        facilities = range(len(self.facilities)) if facilities is None else facilities
+        estimates = estimates or {f: self.estimate_trip_minutes(f) for f in facilities}
+        need = {}
+        for f in facilities:
+            users = self.users_by_facility[f]
+            if self.results[f] is None:
+                slots = [self.vehicles[v] for v, _ in self.slots_of(f)]
+                need[f] = [len(users) - sum(v["capacity"] for v in slots),
+                           sum(1 for u in users if u["wheelchair"])
+                           - sum(min(v["wheelchair_capacity"], v["capacity"]) for v in slots)]
+            else:
+                # 計画済みの事業所は乗れなかった利用者の分だけ追加する
+                unassigned = set(self.results[f]["unassigned"])
+                need[f] = [len(unassigned), sum(1 for u in users if u["wheelchair"] and u["id"] in unassigned)]
+
+        chain = [self.chain_minutes(v) for v in range(len(self.vehicles))]
+        added = []
+        while True:
+            best = None
+            for f, (seats, wheelchair_seats) in need.items():
+                if seats <= 0 and wheelchair_seats <= 0:
+                    continue
+                for v, vehicle in enumerate(self.vehicles):
+                    if vehicle["capacity"] <= 0 or (not self.share_vehicles and self.homes[v] != f):
+                        continue
+                    if seats <= 0 and vehicle["wheelchair_capacity"] <= 0:
+                        continue
+                    position = self.legs[v][-1] if self.legs[v] else self.homes[v]
+                    finish = chain[v] + self._deadhead_min(position, f) + estimates[f]
+                    if finish > self.window_min:
+                        continue
+                    key = (self.depot_km[position, f], self.homes[v] != f, chain[v], v)
+                    if best is None or key < best[0]:
+                        best = (key, v, f, finish)
+            if best is None:
+                break
+            _, v, f, finish = best
+            self.legs[v].append(f)
+            self.leg_minutes[v].append(estimates[f])
+            chain[v] = finish
+            vehicle = self.vehicles[v]
+            need[f][0] -= vehicle["capacity"]
+            need[f][1] -= min(vehicle["wheelchair_capacity"], vehicle["capacity"])
+            added.append((v, len(self.legs[v]) - 1))
+        return added
+
+    def slots_of(self, f):
+        """事業所 f に配られた便 [(車両, 行程内の位置), ...]"""
+        return [(v, position) for v, legs in enumerate(self.legs) for position, leg in enumerate(legs) if leg == f]
+
+    # -- 計画 ------------------------------------------------------------
+
+    def _solve(self, facilities):
+        tasks = []
+        for f in facilities:
+            slot_vehicles = [self.vehicles[v] for v, _ in self.slots_of(f)]
+            tasks.append((self.facilities[f], self.users_by_facility[f], slot_vehicles, self.seed))
+        if self.workers == 1 or len(tasks) <= 1:
+            results = [_plan_facility_task(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(_plan_facility_task, tasks))
+        for f, result in zip(facilities, results):
+            self.results[f] = result
+
+    def solve(self, max_rounds=MAX_COORDINATION_ROUNDS):
+        """配分 → 事業所ごとの計画 → 不足分の追加配分と再計画 を繰り返す"""
+        start = time.perf_counter()
+        self.allocate()
+        self._solve(range(len(self.facilities)))
+        self._normalize()
+        self.rounds = 1
+        for _ in range(max_rounds - 1):
+            short = [f for f, result in enumerate(self.results) if result["unassigned"]]
+            if not short:
+                break
+            # 実績の所要時間の平均で見積もり直して追加配分する
+            estimates = {}
+            for f in short:
+                minutes = [m for _, _, _, m in self.results[f]["trips"]]
+                estimates[f] = float(np.mean(minutes)) if minutes else self.estimate_trip_minutes(f)
+            if not self.allocate(short, estimates):
+                break
+            self._solve(short)
+            self._normalize()
+            self.rounds += 1
+        self.elapsed = time.perf_counter() - start
+        return self
+
+    def _normalize(self):
+        """
+        計画結果を (車両, 行程内の位置) で持ち直し、使われなかった便を行程から外して
+        所要時間を実績に置き換える。送迎時間帯を超えた便は外す
+        """
+        trips = {}
+        for f, result in enumerate(self.results):
+            if result is None:
+                continue
+            slots = self.slots_of(f)
+            for slot, ids, km, minutes in result["trips"]:
+                trips[slots[slot]] = (f, ids, km, minutes)
+        self.trips = {}
+        for v in range(len(self.vehicles)):
+            positions = sorted(position for (tv, position) in trips if tv == v)
+            self.legs[v] = [trips[(v, p)][0] for p in positions]
+            self.leg_minutes[v] = [trips[(v, p)][3] for p in positions]
+            # 実際の所要時間で送迎時間帯を超える行程は、後ろの便から外して乗れなかった利用者に戻す
+            while self.legs[v] and self.chain_minutes(v) > self.window_min:
+                f, ids, _, _ = trips[(v, positions.pop())]
+                self.legs[v].pop()
+                self.leg_minutes[v].pop()
+                self.results[f]["unassigned"].extend(ids)
+            for new, old in enumerate(positions):
+                self.trips[(v, new)] = trips[(v, old)]
+        # 便の番号（slots_of の並び）を新しい行程に合わせる
+        for f, result in enumerate(self.results):
+            if result is None:
+                continue
+            slots = self.slots_of(f)
+            slot_of = {slot: i for i, slot in enumerate(slots)}
+            result["trips"] = [(slot_of[key], ids, km, minutes)
+                               for key, (tf, ids, km, minutes) in sorted(self.trips.items()) if tf == f]
+
+    # -- 結果 ------------------------------------------------------------
+
+    def summary(self):
+        trip_km = sum(km for _, _, km, _ in self.trips.values())
+        deadhead_km = 0.0
+        overtime = 0
+        for v, legs in enumerate(self.legs):
+            position = self.homes[v]
+            for f in legs:
+                deadhead_km += self.depot_km[position, f]
+                position = f
+            deadhead_km += self.depot_km[position, self.homes[v]]  # 所属事業所に戻る
+            if self.chain_minutes(v) > self.window_min:
+                overtime += 1
+        shared = sum(1 for v, legs in enumerate(self.legs) if any(f != self.homes[v] for f in legs))
+        return {
+            "trips": len(self.trips),
+            "km": float(trip_km + deadhead_km),
+            "deadhead_km": float(deadhead_km),
+            "unassigned": sum(len(r["unassigned"]) for r in self.results if r is not None),
+            "vehicles_used": sum(1 for legs in self.legs if legs),
+            "shared_vehicles": shared,
+            "overtime_vehicles": overtime,
+            "rounds": self.rounds,
+            "seconds": self.elapsed,
+        }
+
+    def to_plan(self):
+        """事業所ごとの計画（plan_day の形）と車両ごとの行程"""
+        users_by_id = {u["id"]: u for users in self.users_by_facility for u in users}
+        facilities = {}
+        for f, facility in enumerate(self.facilities):
+            facilities[facility["id"]] = {"assignments": {}, "unassigned": [
+                users_by_id[i] for i in (self.results[f]["unassigned"] if self.results[f] else [])]}
+        schedules = {}
+        for (v, _), (f, ids, km, minutes) in sorted(self.trips.items()):
+            vehicle_id = self.vehicles[v]["id"]
+            plan = facilities[self.facilities[f]["id"]]
+            plan["assignments"].setdefault(vehicle_id, {"trips": []})["trips"].append({
+                "users": [users_by_id[i] for i in ids],
+                "distance": round(km, 2),
+                "duration": minutes,
+            })
+            schedules.setdefault(vehicle_id, []).append({
+                "facility_id": self.facilities[f]["id"],
+                "users": len(ids),
+                "distance": round(km, 2),
+                "duration": minutes,
+            })
+        return {"facilities": facilities, "vehicle_schedules": schedules}
+
+def plan_multi_facility(facilities, users, vehicles, seed=None, window_min=MORNING_WINDOW_MIN,
+                        share_vehicles=True, workers=1):
+    """複数事業所の計画を作成（事業所ごとの plan_day の形 + 車両ごとの行程）"""
+    planner = MultiFacilityPlanner(facilities, users, vehicles, window_min=window_min,
+                                   share_vehicles=share_vehicles, seed=seed, workers=workers)
+    return planner.solve().to_plan()
+
+def main():
+    parser = argparse.ArgumentParser(description='複数事業所・車両共有の送迎計画')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='複数事業所の合成データを作成')
+    generate_parser.add_argument('output', help='出力ディレクトリ')
+    generate_parser.add_argument('--facilities', type=int, default=5, help='事業所数')
+    generate_parser.add_argument('--users', type=int, default=200, help='事業所あたりの平均利用者数')
+    generate_parser.add_argument('--vehicles', type=int, default=None, help='車両数（省略時は人数から決める）')
+    generate_parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    plan_parser = subparsers.add_parser('plan', help='複数事業所の計画を作成')
+    plan_parser.add_argument('input', help='generate で作成したディレクトリ')
+    plan_parser.add_argument('--window', type=int, default=MORNING_WINDOW_MIN, help='送迎時間帯の長さ（分）')
+    plan_parser.add_argument('--no-sharing', action='store_true', help='車両を所属事業所の便だけに使う')
+    plan_parser.add_argument('--workers', type=int, default=1, help='事業所ごとの計画を並列に行うプロセス数')
+    plan_parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    plan_parser.add_argument('--output', help='出力JSONファイル（省略時は標準出力）')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        facilities, users, vehicles = make_multi_facility_day(args.facilities, args.users, args.vehicles, args.seed)
+        save_dataset(args.output, facilities, users, vehicles)
+        print(f"✅ {len(facilities)}事業所・{len(users)}名・{len(vehicles)}台のデータを作成しました")
+        print(f"📁 ディレクトリ: {args.output}")
+        return
+
+    facilities, users, vehicles = load_dataset(args.input)
+    planner = MultiFacilityPlanner(facilities, users, vehicles, window_min=args.window,
+                                   share_vehicles=not args.no_sharing, seed=args.seed, workers=args.workers)
+    stats = planner.solve().summary()
+    output = json.dumps(planner.to_plan(), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✅ {len(users)}名を{stats['trips']}便に割り当てました（未割り当て: {stats['unassigned']}名、"
+              f"総距離 {stats['km']:.1f}km、うち回送 {stats['deadhead_km']:.1f}km）")
+        print(f"📁 ファイル: {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+複数の初期値から定員制約付きクラスタリング（capacitated_clustering）を行い、最良の結果を選ぶ
+
+kMeansClustering は K-means++ の初期値を1回だけ選ぶため、初期値しだいで結果が大きく変わる。
+ここでは初期値（乱数の系列）を変えて何度も解き、
+    (割り当てられなかった人数, 各クラスタのメドイドから各メンバーへの距離の合計)
+が最小の結果を返す。1回ごとの収束判定（ラベル配列の一致）と空クラスタの分割
+（最大クラスタの最も遠いメンバーを移す）は capacitated_clustering が行う
+
+- 最良の値が patience 回続けて（PLATEAU_TOLERANCE 以上）改善しなければ打ち切る
+- time_budget（秒）を過ぎたら、それまでの最良の結果を返す
+- workers > 1 ならプロセスプールで並列に解く。
+  結果は初期値の順に評価するため、時間制限がなければ workers によらず同じ結果になる
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import instrumentation
+from transport_planner import capacitated_clustering
+
+DEFAULT_STARTS = 16
+DEFAULT_PATIENCE = 4
+# 最良の距離の合計がこの割合以上短くならなければ改善なしとみなす
+PLATEAU_TOLERANCE = 1e-3
+
+def clustering_cost(dist, labels, demand=None):
+    """
+    クラスタリング結果の評価値（demand を指定した場合は各要素の人数で重み付け）
+
+    Returns:
+        (割り当てられなかった人数, 各クラスタのメドイドから各メンバーへの距離の合計 km)
+    """
+    if demand is None:
+        unassigned = int((labels < 0).sum())
+    else:
+        unassigned = int(demand[labels < 0].sum())
+    total = 0.0
+    for cluster in np.unique(labels[labels >= 0]):
+        members = np.flatnonzero(labels == cluster)
+        within = dist[np.ix_(members, members)]
+        total += float((within.sum(axis=1) if demand is None else within @ demand[members]).min())
+    return unassigned, total
+
+def _run_start(problem, seed_sequence, max_iterations):
+    dist, wheelchair, capacities, wheelchair_capacities, demand = problem
+    labels = capacitated_clustering(dist, wheelchair, capacities, wheelchair_capacities,
+                                    rng=np.random.default_rng(seed_sequence), max_iterations=max_iterations,
+                                    demand=demand)
+    return labels, clustering_cost(dist, labels, demand)
+
+# プロセスプールの各ワーカーが持つ問題（距離行列はワーカーごとに1回だけ送る）
+_worker_problem = None
+
+def _init_worker(problem):
+    global _worker_problem
+    _worker_problem = problem
+
+def _run_start_in_worker(args):
+    return _run_start(_worker_problem, *args)
+
+def multi_start_clustering(dist, wheelchair, capacities, wheelchair_capacities, starts=DEFAULT_STARTS, seed=None,
+                           time_budget=None, patience=DEFAULT_PATIENCE, workers=1, max_iterations=20, demand=None):
+    """
+    初期値を変えて starts 回まで解き、最良のクラスタリングを返す
+
+    Args:
+        dist, wheelchair, capacities, wheelchair_capacities: capacitated_clustering と同じ
+        starts: 初期値の数の上限
+        seed: 乱数シード（各初期値の乱数はここから導く）
+        time_budget: 計算時間の上限（秒）。少なくとも1回は解く
+        patience: 最良の値が改善しない回数がこれに達したら打ち切る（None なら打ち切らない）
+        workers: プロセス数（1 の場合はプロセスプールを使わずに実行）
+        max_iterations: 1回あたりの最大反復回数
+        demand: 各要素の座席数（capacitated_clustering と同じ）
+
+    Returns:
+        (labels, info)
+        info: {starts（実際に解いた回数）, best_start, unassigned, cost_km, seconds,
+               stopped（"starts" / "plateau" / "time_budget"）, history（各回の後の最良の距離の合計）}
+    """
+    started = time.perf_counter()
+    if demand is None:
+        wheelchair = np.asarray(wheelchair, dtype=bool)
+    else:
+        wheelchair = np.asarray(wheelchair, dtype=np.int64)
+        demand = np.asarray(demand, dtype=np.int64)
+    problem = (dist, wheelchair, np.asarray(capacities), np.asarray(wheelchair_capacities), demand)
+    children = np.random.SeedSequence(seed).spawn(starts)
+    best_labels = None
+    best_key = None
+    best_start = None
+    history = []
+    stale = 0
+    stopped = "starts"
+
+    def batches(executor):
+        # 1プロセスなら1回ずつ、並列なら workers 回ずつ解く（途中で打ち切れるようにまとめて投げない）
+        size = 1 if executor is None else workers
+        for first in range(0, starts, size):
+            chunk = children[first:first + size]
+            if executor is None:
+                yield [_run_start(problem, chunk[0], max_iterations)]
+            else:
+                yield list(executor.map(_run_start_in_worker, [(child, max_iterations) for child in chunk]))
+
+    executor = None if workers == 1 else ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                               initargs=(problem,))
+    try:
+        with instrumentation.span("multi_start_clustering", starts=starts, workers=workers):
+            index = 0
+            for results in batches(executor):
+                for labels, key in results:
+                    instrumentation.count("clustering_starts")
+                    significant = best_key is None or key[0] < best_key[0] or (
+                        key[0] == best_key[0] and key[1] < best_key[1] * (1 - PLATEAU_TOLERANCE))
+                    if best_key is None or key < best_key:
+                        best_labels, best_key, best_start = labels, key, index
+                    stale = 0 if significant else stale + 1
+                    history.append(best_key[1])
+                    index += 1
+                    if patience is not None and stale >= patience:
+                        stopped = "plateau"
+                        break
+                    if time_budget is not None and time.perf_counter() - started >= time_budget:
+                        stopped = "time_budget"
+                        break
+                if stopped != "starts":
+                    break
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return best_labels, {
+        "starts": len(history),
+        "best_start": best_start,
+        "unassigned": best_key[0],
+        "cost_km": best_key[1],
+        "seconds": time.perf_counter() - started,
+        "stopped": stopped,
+        "history": history,
+    }
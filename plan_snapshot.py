@@ -0,0 +1,488 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+週間送迎計画のバイナリスナップショット形式
+
+利用者・車両・曜日ごとの利用者名簿・便の割り当てを、固定長レコードと文字列表で
+1つのファイルに保存する。読み込みは mmap + numpy.frombuffer で行うため、
+ファイルを開いてもレコードはコピーされず、必要な部分だけがディスクから読まれる
+
+ファイル構成（リトルエンディアン）:
+    ヘッダ      : マジック(8) バージョン(u4) セクション数(u4)
+                  セクション表 [オフセット(u8) 件数(u8)] × セクション数
+    各セクション: 8バイト境界に揃えて SECTION_NAMES の順に配置
+
+CSV / JSON / weeklyData.js への書き出しにも対応する
+"""
+
+import argparse
+import csv
+import glob
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from generate_weekly_data import build_javascript, weekdays as WEEKDAY_NAMES
+from transport_planner import load_users_csv
+
+MAGIC = b"DSPLAN\x00\x00"
+FORMAT_VERSION = 1
+
+SECTION_NAMES = [
+    "string_offsets",   # 文字列表の各文字列の開始位置（件数+1）
+    "string_data",      # UTF-8 の文字列本体
+    "facility",         # 事業所（1件）
+    "users",            # 利用者
+    "vehicles",         # 車両
+    "roster_offsets",   # 曜日ごとの名簿の開始位置（8件）
+    "roster_members",   # 曜日ごとの名簿（利用者の行番号）
+    "trips",            # 便
+    "trip_members",     # 便ごとの乗車順の利用者の行番号
+]
+
+HEADER = struct.Struct("<8sII")
+SECTION_ENTRY = struct.Struct("<QQ")
+
+# 文字列は文字列表の番号（u4）で持つ
+FACILITY_DTYPE = np.dtype([
+    ("name", "<u4"), ("address", "<u4"), ("lat", "<f8"), ("lng", "<f8"),
+])
+USER_DTYPE = np.dtype([
+    ("id", "<u4"), ("name", "<u4"), ("address", "<u4"), ("notes", "<u4"),
+    ("lat", "<f8"), ("lng", "<f8"),
+    ("pickup_minutes", "<i2"), ("return_minutes", "<i2"),
+    ("wheelchair", "u1"), ("weekday_mask", "u1"), ("reserved", "V2"),
+])
+VEHICLE_DTYPE = np.dtype([
+    ("id", "<u4"), ("name", "<u4"), ("driver", "<u4"),
+    ("capacity", "<u2"), ("wheelchair_capacity", "<u2"),
+])
+TRIP_DTYPE = np.dtype([
+    ("weekday", "u1"), ("reserved", "V1"), ("trip_no", "<u2"), ("vehicle", "<u4"),
+    ("member_start", "<u4"), ("member_count", "<u4"),
+    ("distance_km", "<f4"), ("duration_min", "<f4"),
+])
+
+SECTION_DTYPES = {
+    "string_offsets": np.dtype("<u8"),
+    "string_data": np.dtype("u1"),
+    "facility": FACILITY_DTYPE,
+    "users": USER_DTYPE,
+    "vehicles": VEHICLE_DTYPE,
+    "roster_offsets": np.dtype("<u8"),
+    "roster_members": np.dtype("<u4"),
+    "trips": TRIP_DTYPE,
+    "trip_members": np.dtype("<u4"),
+}
+
+def time_to_minutes(value):
+    """"HH:MM" を0時からの分に変換（空欄は -1）"""
+    if not value:
+        return -1
+    hour, _, minute = str(value).partition(":")
+    return int(hour) * 60 + int(minute or 0)
+
+def minutes_to_time(minutes):
+    """分を "HH:MM" に戻す（-1 は空欄）"""
+    minutes = int(minutes)
+    return f"{minutes // 60:02d}:{minutes % 60:02d}" if minutes >= 0 else ""
+
+class StringTableBuilder:
+    """書き込み用の文字列表（同じ文字列は1回だけ格納）"""
+
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def add(self, value):
+        value = "" if value is None else str(value)
+        code = self.index.get(value)
+        if code is None:
+            code = len(self.values)
+            self.index[value] = code
+            self.values.append(value)
+        return code
+
+    def arrays(self):
+        encoded = [value.encode("utf-8") for value in self.values]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        np.cumsum([len(data) for data in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+# ---------------------------------------------------------------------------
+# 書き込み
+# ---------------------------------------------------------------------------
+
+def write_snapshot(path, facility, users, vehicles, rosters=None, plans=None):
+    """
+    スナップショットを書き出す
+
+    Args:
+        facility: 事業所 {name, address, lat, lng}
+        users: 利用者の配列（transport_planner の辞書形式）
+        vehicles: 車両の配列（transport_planner の辞書形式）
+        rosters: {曜日番号(0=月曜日): [利用者の行番号, ...]}（曜日ごとの並び順を保持）
+        plans: {曜日番号: plan_day の結果}
+    """
+    rosters = rosters or {}
+    plans = plans or {}
+    strings = StringTableBuilder()
+
+    facility_records = np.zeros(1, dtype=FACILITY_DTYPE)
+    facility_records[0] = (
+        strings.add(facility.get("name")), strings.add(facility.get("address")),
+        facility.get("lat") or np.nan, facility.get("lng") or np.nan,
+    )
+
+    user_records = np.zeros(len(users), dtype=USER_DTYPE)
+    row_by_id = {}
+    weekday_masks = np.zeros(len(users), dtype=np.uint8)
+    for day, members in rosters.items():
+        weekday_masks[np.asarray(members, dtype=np.int64)] |= np.uint8(1 << day)
+    for i, user in enumerate(users):
+        row_by_id[str(user["id"])] = i
+        lat, lng = user.get("lat"), user.get("lng")
+        user_records[i] = (
+            strings.add(user["id"]), strings.add(user.get("name")),
+            strings.add(user.get("address")), strings.add(user.get("notes")),
+            np.nan if lat is None else lat, np.nan if lng is None else lng,
+            time_to_minutes(user.get("pickup_time")), time_to_minutes(user.get("return_time")),
+            bool(user.get("wheelchair")), weekday_masks[i], b"\x00\x00",
+        )
+
+    vehicle_records = np.zeros(len(vehicles), dtype=VEHICLE_DTYPE)
+    vehicle_row_by_id = {}
+    for i, vehicle in enumerate(vehicles):
+        vehicle_row_by_id[str(vehicle["id"])] = i
+        vehicle_records[i] = (
+            strings.add(vehicle["id"]), strings.add(vehicle.get("name")), strings.add(vehicle.get("driver")),
+            vehicle["capacity"], vehicle["wheelchair_capacity"],
+        )
+
+    roster_offsets = np.zeros(len(WEEKDAY_NAMES) + 1, dtype="<u8")
+    roster_parts = []
+    for day in range(len(WEEKDAY_NAMES)):
+        members = np.asarray(rosters.get(day, []), dtype="<u4")
+        roster_parts.append(members)
+        roster_offsets[day + 1] = roster_offsets[day] + len(members)
+    roster_members = np.concatenate(roster_parts) if roster_parts else np.zeros(0, dtype="<u4")
+
+    trip_rows = []
+    trip_member_parts = []
+    member_start = 0
+    for day in sorted(plans):
+        for vehicle_id, assignment in plans[day]["assignments"].items():
+            for trip_no, trip in enumerate(assignment["trips"]):
+                members = [row_by_id[str(u["id"])] for u in trip["users"]]
+                trip_rows.append((
+                    day, b"\x00", trip_no, vehicle_row_by_id[str(vehicle_id)],
+                    member_start, len(members),
+                    trip.get("distance", 0.0), trip.get("duration", 0.0),
+                ))
+                trip_member_parts.append(np.asarray(members, dtype="<u4"))
+                member_start += len(members)
+    trip_records = np.array(trip_rows, dtype=TRIP_DTYPE)
+    trip_members = np.concatenate(trip_member_parts) if trip_member_parts else np.zeros(0, dtype="<u4")
+
+    string_offsets, string_data = strings.arrays()
+    sections = {
+        "string_offsets": string_offsets,
+        "string_data": string_data,
+        "facility": facility_records,
+        "users": user_records,
+        "vehicles": vehicle_records,
+        "roster_offsets": roster_offsets,
+        "roster_members": roster_members,
+        "trips": trip_records,
+        "trip_members": trip_members,
+    }
+
+    # ヘッダの後ろに各セクションを8バイト境界で並べる
+    position = HEADER.size + SECTION_ENTRY.size * len(SECTION_NAMES)
+    table = []
+    for name in SECTION_NAMES:
+        position = (position + 7) // 8 * 8
+        table.append((position, len(sections[name])))
+        position += sections[name].nbytes
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(SECTION_NAMES)))
+        for offset, count in table:
+            f.write(SECTION_ENTRY.pack(offset, count))
+        for name, (offset, _) in zip(SECTION_NAMES, table):
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(np.ascontiguousarray(sections[name], dtype=SECTION_DTYPES[name]).tobytes())
+
+# ---------------------------------------------------------------------------
+# 読み込み
+# ---------------------------------------------------------------------------
+
+class PlanSnapshot:
+    """
+    mmap したスナップショット
+
+    users / vehicles / trips などはファイルを直接参照する読み取り専用の
+    NumPy構造化配列で、開いた時点ではコピーが発生しない
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, section_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"スナップショットファイルではありません: {path}")
+        if version > FORMAT_VERSION:
+            raise ValueError(f"未対応のバージョンです: {version}（対応: {FORMAT_VERSION}まで）")
+
+        self.version = version
+        self.section_offsets = {}
+        for i, name in enumerate(SECTION_NAMES[:section_count]):
+            offset, count = SECTION_ENTRY.unpack_from(self._mmap, HEADER.size + SECTION_ENTRY.size * i)
+            self.section_offsets[name] = offset
+            setattr(self, name, np.frombuffer(self._mmap, dtype=SECTION_DTYPES[name], count=count, offset=offset))
+        self._string_base = self.section_offsets["string_data"]
+
+    def close(self):
+        # 配列がmmapを参照しているので、先に参照を外してから閉じる
+        for name in SECTION_NAMES:
+            self.__dict__.pop(name, None)
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 取り出した配列がまだ残っている場合は、それらが解放された時点で閉じられる
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def string(self, code):
+        """文字列表の code 番目の文字列"""
+        start = self._string_base + int(self.string_offsets[code])
+        end = self._string_base + int(self.string_offsets[code + 1])
+        return self._mmap[start:end].decode("utf-8")
+
+    def facility_dict(self):
+        record = self.facility[0]
+        return {
+            "name": self.string(record["name"]),
+            "address": self.string(record["address"]),
+            "lat": float(record["lat"]),
+            "lng": float(record["lng"]),
+        }
+
+    def user_dict(self, row):
+        """row 行目の利用者を transport_planner の辞書形式で返す"""
+        record = self.users[row]
+        return {
+            "id": self.string(record["id"]),
+            "name": self.string(record["name"]),
+            "address": self.string(record["address"]),
+            "notes": self.string(record["notes"]),
+            "lat": float(record["lat"]),
+            "lng": float(record["lng"]),
+            "wheelchair": bool(record["wheelchair"]),
+            "pickup_time": minutes_to_time(record["pickup_minutes"]),
+            "return_time": minutes_to_time(record["return_minutes"]),
+        }
+
+    def to_users(self, rows=None):
+        """
+        複数の利用者をまとめて辞書形式に展開する
+
+        列ごとに tolist() し、文字列は使われる番号だけを1回ずつ復号するので
+        user_dict を1件ずつ呼ぶより速い
+        """
+        records = self.users if rows is None else self.users[np.asarray(rows, dtype=np.int64)]
+        string_columns = ["id", "name", "address", "notes"]
+        codes = np.unique(np.concatenate([records[name] for name in string_columns]))
+        decoded = dict(zip(codes.tolist(), map(self.string, codes.tolist())))
+
+        columns = {name: [decoded[code] for code in records[name].tolist()] for name in string_columns}
+        pickup = [minutes_to_time(m) for m in records["pickup_minutes"].tolist()]
+        return_ = [minutes_to_time(m) for m in records["return_minutes"].tolist()]
+        return [
+            {
+                "id": user_id, "name": name, "address": address, "notes": notes,
+                "lat": lat, "lng": lng, "wheelchair": wheelchair,
+                "pickup_time": pickup_time, "return_time": return_time,
+            }
+            for user_id, name, address, notes, lat, lng, wheelchair, pickup_time, return_time in zip(
+                columns["id"], columns["name"], columns["address"], columns["notes"],
+                records["lat"].tolist(), records["lng"].tolist(), records["wheelchair"].astype(bool).tolist(),
+                pickup, return_,
+            )
+        ]
+
+    def vehicle_dict(self, row):
+        record = self.vehicles[row]
+        return {
+            "id": self.string(record["id"]),
+            "name": self.string(record["name"]),
+            "driver": self.string(record["driver"]),
+            "capacity": int(record["capacity"]),
+            "wheelchair_capacity": int(record["wheelchair_capacity"]),
+        }
+
+    def roster(self, weekday):
+        """曜日（0=月曜日）の名簿（利用者の行番号の配列）"""
+        return self.roster_members[self.roster_offsets[weekday]:self.roster_offsets[weekday + 1]]
+
+    def trip_members_of(self, trip_row):
+        record = self.trips[trip_row]
+        start = int(record["member_start"])
+        return self.trip_members[start:start + int(record["member_count"])]
+
+    def plan_dict(self, weekday):
+        """曜日の便割り当てを {車両ID: {"trips": [{"userIds": [...], ...}]}} で返す"""
+        assignments = {}
+        for trip_row in np.flatnonzero(self.trips["weekday"] == weekday):
+            record = self.trips[trip_row]
+            vehicle_id = self.string(self.vehicles[record["vehicle"]]["id"])
+            assignments.setdefault(vehicle_id, {"trips": []})["trips"].append({
+                "userIds": [self.string(self.users[row]["id"]) for row in self.trip_members_of(trip_row)],
+                "distance": float(record["distance_km"]),
+                "duration": float(record["duration_min"]),
+            })
+        return assignments
+
+# ---------------------------------------------------------------------------
+# 変換
+# ---------------------------------------------------------------------------
+
+def load_weekly_dir(directory):
+    """
+    weekly_data ディレクトリを読み込み、スナップショットの入力形式に変換
+
+    Returns:
+        (users, rosters)
+    """
+    users = []
+    row_by_id = {}
+    rosters = {}
+    for path in glob.glob(os.path.join(directory, "*.csv")):
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name not in WEEKDAY_NAMES:
+            continue
+        day = WEEKDAY_NAMES.index(name)
+        rosters[day] = []
+        for user in load_users_csv(path):
+            row = row_by_id.get(user["id"])
+            if row is None:
+                row = row_by_id[user["id"]] = len(users)
+                users.append(user)
+            rosters[day].append(row)
+    return users, rosters
+
+def _js_id(value):
+    """数字だけのIDは weeklyData.js と同じく数値として出力する"""
+    return int(value) if str(value).isdigit() else json.dumps(value, ensure_ascii=False)
+
+def export_weekly_csv(snapshot, directory):
+    """generate_weekly_data.save_weekly_data と同じ形式で曜日ごとのCSVを書き出す"""
+    os.makedirs(directory, exist_ok=True)
+    for day, weekday in enumerate(WEEKDAY_NAMES):
+        with open(os.path.join(directory, f"{weekday}.csv"), "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["ID", "氏名", "住所", "緯度", "経度", "車椅子", "備考", "送迎時刻", "帰宅時刻"])
+            for user in snapshot.to_users(snapshot.roster(day)):
+                writer.writerow([
+                    user["id"], user["name"], user["address"], user["lat"], user["lng"],
+                    "要" if user["wheelchair"] else "", user["notes"],
+                    user["pickup_time"], user["return_time"],
+                ])
+
+def export_json(snapshot, path, indent=None):
+    """事業所・車両・曜日ごとの名簿・便割り当てをJSONで書き出す"""
+    data = {
+        "facility": snapshot.facility_dict(),
+        "vehicles": [snapshot.vehicle_dict(i) for i in range(len(snapshot.vehicles))],
+        "weeklyData": {
+            weekday: snapshot.to_users(snapshot.roster(day))
+            for day, weekday in enumerate(WEEKDAY_NAMES)
+        },
+        "plans": {
+            weekday: snapshot.plan_dict(day)
+            for day, weekday in enumerate(WEEKDAY_NAMES)
+            if np.any(snapshot.trips["weekday"] == day)
+        },
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+
+def export_javascript(snapshot, path):
+    """generate_weekly_data.save_as_javascript と同じ形式の weeklyData.js を書き出す"""
+    weekly_data = {}
+    for day, weekday in enumerate(WEEKDAY_NAMES):
+        weekly_data[weekday] = []
+        for user in snapshot.to_users(snapshot.roster(day)):
+            weekly_data[weekday].append({
+                "id": _js_id(user["id"]),
+                "name": user["name"],
+                "address": user["address"],
+                "lat": user["lat"],
+                "lng": user["lng"],
+                "wheelchair": user["wheelchair"],
+                "note": user["notes"],
+                "pickup_time": user["pickup_time"],
+                "return_time": user["return_time"],
+            })
+    vehicles = [
+        {**v, "id": _js_id(v["id"]), "wheelchairCapacity": v["wheelchair_capacity"]}
+        for v in (snapshot.vehicle_dict(i) for i in range(len(snapshot.vehicles)))
+    ]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(build_javascript(weekly_data, facility=snapshot.facility_dict(), vehicles=vehicles))
+
+def main():
+    parser = argparse.ArgumentParser(description='週間送迎計画のバイナリスナップショット')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help='weekly_data からスナップショットを作成')
+    build.add_argument('input', help='weekly_data ディレクトリ')
+    build.add_argument('output', help='出力ファイル（.dsplan）')
+    build.add_argument('--plan', action='store_true', help='各曜日の送迎計画も作成して保存')
+    build.add_argument('--seed', type=int, default=None, help='計画作成時の乱数シード')
+
+    export = subparsers.add_parser('export', help='スナップショットを CSV / JSON / JS に書き出す')
+    export.add_argument('input', help='スナップショットファイル')
+    export.add_argument('--csv', help='曜日ごとのCSVを書き出すディレクトリ')
+    export.add_argument('--json', help='JSONファイル')
+    export.add_argument('--js', help='weeklyData.js 形式のファイル')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES, plan_day
+
+        users, rosters = load_weekly_dir(args.input)
+        plans = {}
+        if args.plan:
+            for day, members in rosters.items():
+                if members:
+                    plans[day] = plan_day(DEFAULT_FACILITY, [users[i] for i in members], DEFAULT_VEHICLES, seed=args.seed)
+        write_snapshot(args.output, DEFAULT_FACILITY, users, DEFAULT_VEHICLES, rosters, plans)
+        print(f"✅ 利用者{len(users)}名のスナップショットを作成しました")
+        print(f"📁 ファイル: {args.output}（{os.path.getsize(args.output):,} bytes）")
+        return
+
+    with PlanSnapshot(args.input) as snapshot:
+        if args.csv:
+            export_weekly_csv(snapshot, args.csv)
+            print(f"📁 CSV: {args.csv}/")
+        if args.json:
+            export_json(snapshot, args.json)
+            print(f"📁 JSON: {args.json}")
+        if args.js:
+            export_javascript(snapshot, args.js)
+            print(f"📁 JS: {args.js}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送迎計画のローカルHTTPサービス（asyncio）
+
+App.jsx は optimizeRoute などをブラウザのメインスレッドで同期的に呼ぶため、大きな日は画面が固まる。
+ここでは計画（plan_day）とルート順序（optimize_route）をHTTPで受け付け、
+- 同じ入力の計算中のリクエストは1回の計算にまとめる（結果を待っている全員に同じ結果を返す）
+- 結果は (種類, 事業所, 利用者, 車両, パラメータ) のハッシュをキーにLRUで保持する
+- 計算はワーカープールで行い、イベントループを止めない
+- リクエストごとに期限（deadline_seconds）を付けられる。期限切れは 504 を返す。
+  接続が切れた・期限が切れたことで待っている人がいなくなった計算は、まだ始まっていなければ取り消す
+  （始まった計算は止められないので最後まで行い、結果をキャッシュに入れる）
+外部への通信は行わない（距離は座標から計算する）
+
+    POST /plan   {"facility": {...}, "users": [...], "vehicles": [...], "params": {...}, "deadline_seconds": 30}
+    POST /route  {"facility": {...}, "users": [...], "params": {...}}
+    GET  /stats  キャッシュ・計算・待ち時間の集計
+    GET  /health
+
+応答ヘッダ X-Plan-Cache は hit（キャッシュ）/ coalesced（計算中の結果を共有）/ miss（新しく計算）
+
+使い方:
+    python planning_service.py --port 8765 --workers 4
+"""
+
+import argparse
+import asyncio
+import collections
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from geocoding_cache import percentile
+from route_optimizer import optimize_route
+from transport_planner import DEFAULT_FACILITY, plan_day
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_ENTRIES = 256
+DEFAULT_DEADLINE_SECONDS = 60.0
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# 計算を待つ間に接続が切れていないかを確かめる間隔（秒）
+DISCONNECT_POLL_SECONDS = 0.05
+# p50 / p99 の計算に使う直近の応答時間の件数（長く動かしてもメモリが増えないよう上限を設ける）
+LATENCY_WINDOW = 10000
+
+# 種類ごとに受け付けるパラメータと既定値（既定値を埋めてからハッシュを取るため、省略しても同じキーになる）
+PARAMETERS = {
+    "plan": {"seed": 0, "max_iterations": 20, "starts": 1, "time_budget": None, "aggregate": False},
+    "route": {"max_route_time": None, "time_limit": None},
+}
+
+STATUS_TEXT = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+               422: "Unprocessable Entity", 504: "Gateway Timeout"}
+
+class RequestError(Exception):
+    """HTTPのエラー応答にするエラー"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+def normalize_request(kind, body):
+    """
+    リクエストの本文から計算に渡す入力を作る
+
+    Returns:
+        (payload, deadline_seconds)
+        payload: {facility, users, vehicles, params}（vehicles は plan のみ）
+    """
+    if not isinstance(body, dict):
+        raise RequestError(400, "本文はJSONオブジェクトで指定してください")
+    users = body.get("users")
+    if not isinstance(users, list):
+        raise RequestError(400, "users（配列）が必要です")
+    requested = body.get("params") or {}
+    if not isinstance(requested, dict):
+        raise RequestError(400, "params はJSONオブジェクトで指定してください")
+    params = dict(PARAMETERS[kind])
+    unknown = set(requested) - set(params)
+    if unknown:
+        raise RequestError(400, f"不明なパラメータ: {', '.join(sorted(unknown))}")
+    params.update(requested)
+
+    payload = {"facility": body.get("facility") or DEFAULT_FACILITY, "users": users, "params": params}
+    if kind == "plan":
+        vehicles = body.get("vehicles")
+        if not isinstance(vehicles, list):
+            raise RequestError(400, "vehicles（配列）が必要です")
+        payload["vehicles"] = vehicles
+
+    deadline = body.get("deadline_seconds", DEFAULT_DEADLINE_SECONDS)
+    if deadline is not None and (not isinstance(deadline, (int, float)) or deadline <= 0):
+        raise RequestError(400, "deadline_seconds は正の数で指定してください")
+    return payload, deadline
+
+def request_key(kind, payload):
+    """入力のハッシュ（キーの順序・空白によらない）"""
+    canonical = json.dumps({"kind": kind, **payload}, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def solve(kind, payload):
+    """ワーカーで実行する計算（結果はJSONのバイト列で返し、待っている全員で共有する）"""
+    params = payload["params"]
+    if kind == "plan":
+        result = plan_day(payload["facility"], payload["users"], payload["vehicles"], **params)
+    else:
+        result = optimize_route(payload["facility"], payload["users"], **params)
+    return json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+class ResultCache:
+    """計算結果のLRUキャッシュ"""
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+class _Job:
+    """計算中の1件（同じ入力のリクエストはこれを共有して待つ）"""
+    __slots__ = ("future", "async_future", "waiters")
+
+    def __init__(self, future):
+        self.future = future
+        self.async_future = asyncio.wrap_future(future)
+        self.waiters = 0
+
+class PlanningService:
+    """
+    計算の重複排除・結果キャッシュ・ワーカープール
+
+    workers が1のときはスレッド1本で計算する（プロセスを起動しない）。
+    ワーカープロセスは最初の計算のときに起動する
+    """
+
+    def __init__(self, workers=1, cache_entries=DEFAULT_CACHE_ENTRIES):
+        self.workers = workers
+        if workers == 1:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        else:
+            # fork だと受け付け中の接続のソケットをワーカーが引き継ぎ、応答後も接続が閉じなくなる
+            self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        self.cache = ResultCache(cache_entries)
+        self.in_flight = {}
+        self.counts = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+
+    async def submit(self, kind, payload, deadline=None):
+        """
+        計算結果を返す（キャッシュ・計算中の同じ入力があればそれを使う）
+
+        Returns:
+            (結果のJSONバイト列, "hit" / "coalesced" / "miss")
+        Raises:
+            asyncio.TimeoutError: 期限切れ
+            RequestError: 入力の誤りで計算できなかった
+        """
+        started = time.perf_counter()
+        self.counts["requests"] += 1
+        key = request_key(kind, payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.latencies.append(time.perf_counter() - started)
+            return cached, "hit"
+
+        job = self.in_flight.get(key)
+        if job is None:
+            source = "miss"
+            self.counts["solves"] += 1
+            job = self.in_flight[key] = _Job(self.executor.submit(solve, kind, payload))
+            job.async_future.add_done_callback(lambda _, key=key, job=job: self._finish(key, job))
+        else:
+            source = "coalesced"
+            self.counts["coalesced"] += 1
+
+        job.waiters += 1
+        try:
+            # shield: 1人が期限切れ・切断で取り消されても、他の待っている人の計算は続ける
+            result = await asyncio.wait_for(asyncio.shield(job.async_future), deadline)
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            raise
+        except asyncio.CancelledError:
+            self.counts["disconnects"] += 1
+            raise
+        except Exception as error:
+            raise RequestError(422, f"計算できませんでした: {error}") from None
+        finally:
+            job.waiters -= 1
+            if job.waiters == 0 and not job.future.done() and job.future.cancel():
+                # まだ始まっていない計算は、待っている人がいなければ取り消す
+                del self.in_flight[key]
+                self.counts["cancelled"] += 1
+        self.latencies.append(time.perf_counter() - started)
+        return result, source
+
+    def _finish(self, key, job):
+        if self.in_flight.get(key) is job:
+            del self.in_flight[key]
+        if job.future.cancelled():
+            return
+        if job.future.exception() is not None:
+            self.counts["errors"] += 1
+            return
+        self.cache.put(key, job.future.result())
+
+    def stats(self):
+        latencies_ms = [value * 1000 for value in self.latencies]
+        return {
+            "workers": self.workers,
+            "requests": self.counts["requests"],
+            "solves": self.counts["solves"],
+            "coalesced": self.counts["coalesced"],
+            "cache_hits": self.cache.hits,
+            "cache_entries": len(self.cache.entries),
+            "cache_evictions": self.cache.evictions,
+            "in_flight": len(self.in_flight),
+            "timeouts": self.counts["timeouts"],
+            "disconnects": self.counts["disconnects"],
+            "cancelled": self.counts["cancelled"],
+            "errors": self.counts["errors"],
+            # 直近 LATENCY_WINDOW 件の応答時間
+            "p50_ms": percentile(latencies_ms, 50),
+            "p99_ms": percentile(latencies_ms, 99),
+        }
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+async def read_request(reader):
+    """HTTP/1.1 のリクエストを1件読む（接続が閉じていれば None）"""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    try:
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise RequestError(400, "不正なリクエスト行です") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise RequestError(400, "Content-Length が不正です") from None
+    if length < 0:
+        raise RequestError(400, "Content-Length が不正です")
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, "本文が大きすぎます")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), urlsplit(target).path, headers, body
+
+def write_response(writer, status, body=b"", headers=None, keep_alive=True):
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+             "Content-Type: application/json; charset=utf-8",
+             f"Content-Length: {len(body)}",
+             # 画面（別のオリジン）から呼べるようにする
+             "Access-Control-Allow-Origin: *",
+             "Access-Control-Allow-Methods: GET, POST, OPTIONS",
+             "Access-Control-Allow-Headers: Content-Type",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+def json_body(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+class PlanningServer:
+    """PlanningService をHTTPで公開する"""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except RequestError as error:
+                    write_response(writer, error.status, json_body({"error": str(error)}), keep_alive=False)
+                    break
+                except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                response = await self.dispatch(method, path, body, reader)
+                if response is None:
+                    # 計算の完了前に接続が切れた
+                    break
+                status, payload, extra = response
+                write_response(writer, status, payload, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body, reader):
+        """Returns: (status, 本文, 追加ヘッダ)。接続が切れた場合は None"""
+        if method == "OPTIONS":
+            return 204, b"", None
+        if method == "GET" and path == "/health":
+            return 200, json_body({"status": "ok"}), None
+        if method == "GET" and path == "/stats":
+            return 200, json_body(self.service.stats()), None
+        kind = path.strip("/")
+        if method != "POST" or kind not in PARAMETERS:
+            return 404, json_body({"error": f"{method} {path} はありません"}), None
+
+        try:
+            payload, deadline = normalize_request(kind, json.loads(body or b"null"))
+        except json.JSONDecodeError as error:
+            return 400, json_body({"error": f"JSONを読めません: {error}"}), None
+        except RequestError as error:
+            return error.status, json_body({"error": str(error)}), None
+
+        task = asyncio.ensure_future(self.service.submit(kind, payload, deadline))
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if not task.done() and reader.at_eof():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                return None
+        try:
+            result, source = task.result()
+        except asyncio.TimeoutError:
+            return 504, json_body({"error": f"{deadline}秒以内に計算が終わりませんでした"}), None
+        except RequestError as error:
+            return error.status, json_body({"error": str(error)}), None
+        return 200, result, {"X-Plan-Cache": source}
+
+async def start_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """サーバーを起動して asyncio.Server を返す（port=0 なら空いているポート）"""
+    server = PlanningServer(service)
+    return await asyncio.start_server(server.handle_connection, host, port)
+
+async def request_json(host, port, method, path, body=None, timeout=None):
+    """
+    サービスへの簡易クライアント（1リクエストごとに接続する）
+
+    Returns:
+        (status, 応答のJSON, ヘッダの dict)
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        data = json_body(body) if body is not None else b""
+        writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                      f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+        raw = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status, json.loads(payload) if payload else None, headers
+
+def main():
+    parser = argparse.ArgumentParser(description='送迎計画のローカルHTTPサービス')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='待ち受けるアドレス')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='待ち受けるポート')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='計算に使うプロセス数')
+    parser.add_argument('--cache-entries', type=int, default=DEFAULT_CACHE_ENTRIES, help='保持する結果の件数')
+    args = parser.parse_args()
+
+    async def serve():
+        service = PlanningService(workers=args.workers, cache_entries=args.cache_entries)
+        server = await start_server(service, args.host, args.port)
+        print(f"✅ 送迎計画サービスを起動しました: http://{args.host}:{args.port}（ワーカー {args.workers}）")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
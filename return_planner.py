@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送り（帰りの便）の計画を、迎えの計画から作る
+
+optimizeRoute は 事業所 → 利用者 → 事業所 の迎えだけを計算し、帰りの便は手作業で組んでいる。
+送りでは同じ利用者を同じ事業所から送るため、迎えの距離行列と便の組み合わせ（近くに住む利用者のまとまり）が
+そのまま使える。ここでは
+1. 迎えの各便を帰宅時刻ごとに分け、訪問順を逆にした便を同じ車両の送りの便とする
+   （車両ごとに帰宅時刻の早い便から走らせる）
+2. VrptwSolver（mode="return"）に読み込み、帰宅時刻より前に出発できない・帰宅時刻から
+   MAX_RIDE_MIN 分以内に送り届ける、の時間枠を守れない利用者だけを挿入し直す
+3. --time-limit を指定したときだけ、その時間で大近傍探索を行う
+の手順で計画する。既定は 2 までで、迎えの計算時間と同程度で終わる（大近傍探索は総距離を縮めるが、
+時間上限いっぱいまで探索するため、迎えの数倍の時間がかかる）。距離行列は迎えと共有し、移動時間の行列（travel）は非対称でもよい
+（道路ネットワークでは行きと帰りで所要時間が異なる）
+
+    python return_planner.py sample_data_30 --output plan.json
+"""
+
+import argparse
+import json
+import time
+
+import instrumentation
+from route_optimizer import optimize_route
+from transport_planner import build_distance_matrix, load_dataset, plan_day
+from vrptw_solver import VrptwSolver, to_minutes
+
+# 送りの大近傍探索の既定の時間上限（秒）。0 なら時間枠の修正だけ行う（大近傍探索は指定したときだけ）
+DEFAULT_TIME_LIMIT = 0
+
+def order_pickup_trips(facility, users, plan, dist):
+    """plan_day の各便の利用者を optimize_route の訪問順に並べ替える（dist は1日全体の距離行列）"""
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    for assignment in plan["assignments"].values():
+        for trip in assignment["trips"]:
+            indices = [index_by_id[u["id"]] for u in trip["users"]]
+            trip["users"] = optimize_route(facility, trip["users"], dist=dist, indices=indices)["order"]
+    return plan
+
+def reverse_plan(pickup_plan):
+    """
+    迎えの計画から送りの初期解を作る
+
+    各便を帰宅時刻ごとに分けて訪問順を逆にし、車両ごとに帰宅時刻（便の中で最も遅い時刻）の早い順に並べる
+    """
+    assignments = {}
+    for vehicle_id, assignment in pickup_plan["assignments"].items():
+        trips = []
+        for trip in assignment["trips"]:
+            groups = {}
+            for user in reversed(trip["users"]):
+                groups.setdefault(user.get("return_time") or "", []).append(user)
+            trips += [{"users": members} for members in groups.values()]
+        trips.sort(key=lambda t: max(to_minutes(u.get("return_time")) or 0 for u in t["users"]))
+        assignments[vehicle_id] = {"trips": trips}
+    return {"assignments": assignments, "unassigned": list(pickup_plan.get("unassigned", []))}
+
+@instrumentation.traced("plan_return")
+def plan_return(facility, users, vehicles, pickup_plan, dist=None, travel=None, seed=None,
+                time_limit=DEFAULT_TIME_LIMIT, max_iterations=10000):
+    """
+    迎えの計画（便の users は訪問順）を初期解にして送りの計画を作る
+
+    Args:
+        dist: 迎えで使った距離行列（事業所がインデックス0、利用者は users の順）
+        travel: 移動時間（分）の行列。非対称でもよい（省略時は dist と平均速度から計算）
+        time_limit / max_iterations: 大近傍探索の上限（0 なら時間枠の修正だけ行う）
+
+    Returns:
+        (plan_day と同じ形 + 時刻の計画, VrptwSolver.summary())
+    """
+    solver = VrptwSolver(facility, users, vehicles, mode="return", dist=dist, travel=travel, seed=seed)
+    solver.load_plan(reverse_plan(pickup_plan))
+    with instrumentation.span("return_repair"):
+        solver.repair()
+    if time_limit > 0 and max_iterations > 0:
+        with instrumentation.span("vrptw_improve"):
+            solver.improve(time_limit=time_limit, max_iterations=max_iterations)
+    return solver.to_plan(), solver.summary()
+
+def plan_round_trip(facility, users, vehicles, seed=None, time_limit=DEFAULT_TIME_LIMIT, travel=None):
+    """
+    迎え（plan_day + 便ごとのルート改善）と送りを、同じ距離行列で続けて計画する
+    （travel は送りの移動時間の行列。省略時は距離と平均速度から計算）
+
+    Returns:
+        {"pickup": 迎えの計画, "return": 送りの計画, "return_summary": 送りの集計, "seconds": {pickup, return}}
+    """
+    start = time.perf_counter()
+    dist = build_distance_matrix(facility, users)
+    pickup = order_pickup_trips(facility, users, plan_day(facility, users, vehicles, seed=seed, dist=dist), dist)
+    pickup_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dropoff, summary = plan_return(facility, users, vehicles, pickup, dist=dist, travel=travel, seed=seed,
+                                   time_limit=time_limit)
+    return {
+        "pickup": pickup,
+        "return": dropoff,
+        "return_summary": summary,
+        "seconds": {"pickup": pickup_seconds, "return": time.perf_counter() - start},
+    }
+
+def main():
+    """CSVを読み込んで迎えと送りの計画を作成し、JSONで出力"""
+    parser = argparse.ArgumentParser(description='迎えの計画から送り（帰りの便）の計画を作成')
+    parser.add_argument('input', help='データディレクトリ（sample_data_30 など）または週間データのCSV')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT, help='送りの大近傍探索の時間上限（秒、0 なら時間枠の修正のみ）')
+    parser.add_argument('--output', help='出力JSONファイル（省略時は標準出力）')
+    args = parser.parse_args()
+
+    facility, users, vehicles = load_dataset(args.input)
+    result = plan_round_trip(facility, users, vehicles, seed=args.seed, time_limit=args.time_limit)
+    stats = result["return_summary"]
+
+    output = json.dumps({"pickup": result["pickup"], "return": result["return"]}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✅ {len(users)}名の迎え・送りを計画しました（迎え {result['seconds']['pickup']:.2f}秒 / "
+              f"送り {result['seconds']['return']:.2f}秒）")
+        print(f"   送り: {stats['trips']}便 / 総距離 {stats['km']:.1f}km / 遅れ {stats['late_stops']}地点・"
+              f"{stats['lateness_min']:.0f}分 / 未割り当て {stats['unassigned']}名")
+        print(f"📁 ファイル: {args.output}")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+道路ネットワークによる移動時間行列
+
+calculateDistance（geographicClustering.js / routeOptimization.js）は直線距離（ハバーサイン）で、
+optimizeRoute は一律 20km/h + 停車3分で時間に換算している。
+隅田川・荒川をまたぐ移動は橋まで回り込むため、直線距離では大きく過小評価になる
+
+ここでは OSM の抽出ファイル（.osm / .osm.gz の XML）を読み込んだ道路グラフ上で
+ダイクストラ法により多対多の移動時間（分）と走行距離（km）の行列を計算する
+- 各地点は最寄りの道路ノードに吸着（spatial_index.GridIndex を使用）
+- 道路の種類（highway タグ）ごとの速度、maxspeed タグがあればそれを使う
+- 時間帯（TIME_BANDS）ごとの混雑係数を掛ける
+- 地点集合（順不同）× 時間帯 × グラフをキーに、メモリ（LRU）とディスク（.npz）にキャッシュする
+- グラフが読み込まれていない場合や到達できない組み合わせはハバーサイン距離にフォールバックする
+
+PBF 形式は読み込めないため、osmium 等で XML に変換してから使う
+"""
+
+import argparse
+import gzip
+import hashlib
+import heapq
+import os
+import time
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+import numpy as np
+
+import instrumentation
+from spatial_index import GridIndex
+from transport_planner import AVERAGE_SPEED_KMH, EARTH_RADIUS_KM, haversine_matrix
+
+# highway タグごとの速度（km/h）
+HIGHWAY_SPEEDS_KMH = {
+    "motorway": 60, "motorway_link": 40,
+    "trunk": 50, "trunk_link": 35,
+    "primary": 40, "primary_link": 30,
+    "secondary": 35, "secondary_link": 30,
+    "tertiary": 30, "tertiary_link": 25,
+    "unclassified": 25, "residential": 20,
+    "living_street": 10, "service": 15,
+}
+DEFAULT_ROAD_SPEED_KMH = 20  # 吸着距離（地点 → 最寄りの道路ノード）の換算速度
+
+# 時間帯: (名前, 開始(分), 終了(分), 混雑係数)
+TIME_BANDS = [
+    ("early", 0, 7 * 60, 1.0),
+    ("morning_peak", 7 * 60, 10 * 60, 1.35),
+    ("daytime", 10 * 60, 15 * 60, 1.1),
+    ("evening_peak", 15 * 60, 19 * 60, 1.3),
+    ("night", 19 * 60, 24 * 60, 1.0),
+]
+
+# キャッシュキーに使う座標の丸め桁数（約1m）
+COORDINATE_DECIMALS = 5
+
+def time_band(depart):
+    """
+    出発時刻（"HH:MM" / 分 / 時間帯名 / None）から (時間帯名, 混雑係数) を返す
+
+    None の場合は混雑なし（係数1.0）の "free" とする
+    """
+    if depart is None:
+        return "free", 1.0
+    if isinstance(depart, str) and ":" not in depart:
+        for name, _, _, factor in TIME_BANDS:
+            if name == depart:
+                return name, factor
+        raise ValueError(f"不明な時間帯です: {depart}")
+    if isinstance(depart, str):
+        hour, _, minute = depart.partition(":")
+        depart = int(hour) * 60 + int(minute or 0)
+    minutes = int(depart) % (24 * 60)
+    for name, start, end, factor in TIME_BANDS:
+        if start <= minutes < end:
+            return name, factor
+    return TIME_BANDS[-1][0], TIME_BANDS[-1][3]
+
+def _parse_speed(value):
+    """maxspeed タグ（"40" / "40 km/h" / "25 mph"）を km/h に変換"""
+    if not value:
+        return None
+    text = value.strip().lower()
+    try:
+        if text.endswith("mph"):
+            return float(text[:-3].strip()) * 1.609
+        return float(text.replace("km/h", "").strip())
+    except ValueError:
+        return None
+
+class RoadGraph:
+    """
+    有向の道路グラフ（CSR形式）
+
+    辺ごとに距離（km）と所要時間（分、混雑なし）を持つ
+    """
+
+    def __init__(self, node_lats, node_lngs, edge_from, edge_to, edge_km, edge_minutes):
+        self.lats = np.asarray(node_lats, dtype=np.float64)
+        self.lngs = np.asarray(node_lngs, dtype=np.float64)
+        edge_from = np.asarray(edge_from, dtype=np.int64)
+        order = np.argsort(edge_from, kind="stable")
+        self.indptr = np.searchsorted(edge_from[order], np.arange(len(self.lats) + 1))
+        self.targets = np.asarray(edge_to, dtype=np.int64)[order]
+        self.edge_km = np.asarray(edge_km, dtype=np.float64)[order]
+        self.edge_minutes = np.asarray(edge_minutes, dtype=np.float64)[order]
+        self.index = GridIndex(self.lats, self.lngs)
+
+        digest = hashlib.sha1()
+        for array in (self.lats, self.lngs, self.indptr, self.targets, self.edge_minutes):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        self.fingerprint = digest.hexdigest()[:16]
+
+        # ダイクストラ法の内側のループは Python のリストの方が速い
+        self._adjacency = [
+            list(zip(self.targets[s:e].tolist(), self.edge_minutes[s:e].tolist(), self.edge_km[s:e].tolist()))
+            for s, e in zip(self.indptr[:-1].tolist(), self.indptr[1:].tolist())
+        ]
+
+    def __len__(self):
+        return len(self.lats)
+
+    @classmethod
+    def from_osm(cls, path):
+        """OSM XML（.osm / .osm.gz）から車が通れる道路だけを読み込む"""
+        opener = gzip.open if path.endswith(".gz") else open
+        node_coordinates = {}
+        ways = []
+        with opener(path, "rb") as f:
+            for _, element in ET.iterparse(f, events=("end",)):
+                if element.tag == "node":
+                    node_coordinates[element.get("id")] = (float(element.get("lat")), float(element.get("lon")))
+                    element.clear()
+                elif element.tag == "way":
+                    tags = {tag.get("k"): tag.get("v") for tag in element.iter("tag")}
+                    highway = tags.get("highway")
+                    if highway in HIGHWAY_SPEEDS_KMH:
+                        refs = [nd.get("ref") for nd in element.iter("nd")]
+                        speed = _parse_speed(tags.get("maxspeed")) or HIGHWAY_SPEEDS_KMH[highway]
+                        oneway = tags.get("oneway", "no")
+                        if tags.get("junction") == "roundabout" and oneway == "no":
+                            oneway = "yes"
+                        ways.append((refs, speed, oneway))
+                    element.clear()
+
+        node_index = {}
+        lats, lngs = [], []
+        edge_from, edge_to, speeds = [], [], []
+        for refs, speed, oneway in ways:
+            refs = [ref for ref in refs if ref in node_coordinates]
+            if oneway == "-1":
+                refs = refs[::-1]
+            for a, b in zip(refs[:-1], refs[1:]):
+                for ref in (a, b):
+                    if ref not in node_index:
+                        node_index[ref] = len(lats)
+                        lat, lng = node_coordinates[ref]
+                        lats.append(lat)
+                        lngs.append(lng)
+                edge_from.append(node_index[a])
+                edge_to.append(node_index[b])
+                speeds.append(speed)
+                if oneway not in ("yes", "true", "1", "-1"):
+                    edge_from.append(node_index[b])
+                    edge_to.append(node_index[a])
+                    speeds.append(speed)
+        return cls.from_edges(lats, lngs, edge_from, edge_to, speeds)
+
+    @classmethod
+    def from_edges(cls, lats, lngs, edge_from, edge_to, speeds_kmh):
+        """ノード座標と辺（速度付き）からグラフを作る（辺の長さはハバーサイン距離）"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        edge_from = np.asarray(edge_from, dtype=np.int64)
+        edge_to = np.asarray(edge_to, dtype=np.int64)
+        lat1, lat2 = np.radians(lats[edge_from]), np.radians(lats[edge_to])
+        dlng = np.radians(lngs[edge_to] - lngs[edge_from])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+        edge_km = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+        edge_minutes = edge_km / np.asarray(speeds_kmh, dtype=np.float64) * 60
+        return cls(lats, lngs, edge_from, edge_to, edge_km, edge_minutes)
+
+    def snap(self, lats, lngs):
+        """各地点の最寄りの道路ノードと、そこまでの距離（km）"""
+        nodes, distances = self.index.knn_batch(lats, lngs, 1)
+        return nodes[:, 0], distances[:, 0]
+
+    def dijkstra(self, source, targets):
+        """
+        source から targets までの最短時間（分）とその経路の距離（km）
+
+        targets がすべて確定した時点で打ち切る。到達できないノードは inf
+        """
+        adjacency = self._adjacency
+        best = {source: 0.0}
+        km = {source: 0.0}
+        remaining = set(targets)
+        remaining.discard(source)
+        settled = set()
+        heap = [(0.0, source)]
+        while heap and remaining:
+            minutes, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            remaining.discard(node)
+            node_km = km[node]
+            for neighbor, edge_minutes, edge_km in adjacency[node]:
+                candidate = minutes + edge_minutes
+                if candidate < best.get(neighbor, np.inf):
+                    best[neighbor] = candidate
+                    km[neighbor] = node_km + edge_km
+                    heapq.heappush(heap, (candidate, neighbor))
+        times = np.array([best.get(t, np.inf) if t in settled or t == source else np.inf for t in targets])
+        distances = np.array([km.get(t, np.inf) if t in settled or t == source else np.inf for t in targets])
+        return times, distances
+
+class TravelTimeMatrix:
+    """
+    移動時間・走行距離の行列を計算してキャッシュする
+
+    graph を省略した場合はハバーサイン距離 + 一律速度（AVERAGE_SPEED_KMH）で計算する
+    """
+
+    def __init__(self, graph=None, cache_dir=None, max_entries=64):
+        self.graph = graph
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, lats, lngs, band):
+        """地点集合（順不同）・時間帯・グラフのキーと、キャッシュ上の並び順"""
+        rounded = np.round(np.column_stack((lats, lngs)), COORDINATE_DECIMALS)
+        order = np.lexsort((rounded[:, 1], rounded[:, 0]))
+        digest = hashlib.sha1()
+        digest.update((self.graph.fingerprint if self.graph else "haversine").encode())
+        digest.update(band.encode())
+        digest.update(np.ascontiguousarray(rounded[order]).tobytes())
+        return digest.hexdigest(), order
+
+    def matrices(self, lats, lngs, depart=None):
+        """
+        地点間の移動時間（分）と走行距離（km）の行列
+
+        Args:
+            lats, lngs: 地点の座標
+            depart: 出発時刻（"HH:MM" / 分）または時間帯名。None は混雑なし
+
+        Returns:
+            (minutes, km) いずれも n×n
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        band, factor = time_band(depart)
+        key, order = self._key(lats, lngs, band)
+
+        cached = self._load(key)
+        if cached is None:
+            self.misses += 1
+            instrumentation.count("travel_matrix_cache_misses")
+            with instrumentation.span("travel_matrix", points=len(lats), band=band):
+                minutes, km = self._compute(lats[order], lngs[order], factor)
+            self._store(key, minutes, km)
+        else:
+            minutes, km = cached
+
+        # キャッシュは並べ替えた順で持つので、呼び出し側の順に戻す
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        return minutes[np.ix_(inverse, inverse)], km[np.ix_(inverse, inverse)]
+
+    def _load(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            instrumentation.count("travel_matrix_cache_hits")
+            return self.memory[key]
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{key}.npz")
+            if os.path.exists(path):
+                with np.load(path) as data:
+                    value = (data["minutes"], data["km"])
+                self._remember(key, value)
+                self.disk_hits += 1
+                instrumentation.count("travel_matrix_cache_disk_hits")
+                return value
+        return None
+
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _store(self, key, minutes, km):
+        self._remember(key, (minutes, km))
+        if self.cache_dir:
+            path = os.path.join(self.cache_dir, f"{key}.npz")
+            temporary = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(temporary, minutes=minutes, km=km)
+            os.replace(temporary, path)
+
+    def _compute(self, lats, lngs, factor):
+        straight_km = haversine_matrix(lats, lngs)
+        fallback_minutes = straight_km / AVERAGE_SPEED_KMH * 60 * factor
+        if self.graph is None:
+            return fallback_minutes, straight_km
+
+        nodes, snap_km = self.graph.snap(lats, lngs)
+        unique_nodes, inverse = np.unique(nodes, return_inverse=True)
+        targets = unique_nodes.tolist()
+        node_minutes = np.empty((len(unique_nodes), len(unique_nodes)))
+        node_km = np.empty_like(node_minutes)
+        instrumentation.count("dijkstra_runs", len(targets))
+        for i, source in enumerate(targets):
+            node_minutes[i], node_km[i] = self.graph.dijkstra(source, targets)
+
+        # 地点 → 道路ノード、道路ノード → 地点 の吸着距離を加える
+        snap_minutes = snap_km / DEFAULT_ROAD_SPEED_KMH * 60
+        minutes = node_minutes[np.ix_(inverse, inverse)] * factor
+        minutes += (snap_minutes[:, None] + snap_minutes[None, :]) * factor
+        km = node_km[np.ix_(inverse, inverse)] + snap_km[:, None] + snap_km[None, :]
+
+        unreachable = ~np.isfinite(minutes)
+        minutes[unreachable] = fallback_minutes[unreachable]
+        km[unreachable] = straight_km[unreachable]
+        np.fill_diagonal(minutes, 0.0)
+        np.fill_diagonal(km, 0.0)
+        return minutes, km
+
+    def stats(self):
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+        }
+
+def build_travel_matrices(facility, users, service, depart=None):
+    """
+    事業所をインデックス0、利用者を1..nとした (移動時間(分), 走行距離(km)) の行列
+    （transport_planner.build_distance_matrix と同じ並び）
+    """
+    lats = [facility["lat"]] + [u["lat"] for u in users]
+    lngs = [facility["lng"]] + [u["lng"] for u in users]
+    return service.matrices(lats, lngs, depart)
+
+def main():
+    """CSVの利用者について移動時間行列を計算し、.npz に保存"""
+    from transport_planner import load_dataset
+
+    parser = argparse.ArgumentParser(description='道路ネットワークによる移動時間行列')
+    parser.add_argument('input', help='データディレクトリ（sample_data_30 など）または週間データのCSV')
+    parser.add_argument('--osm', help='OSM XML ファイル（.osm / .osm.gz）。省略時はハバーサイン距離')
+    parser.add_argument('--depart', default=None, help='出発時刻（HH:MM）または時間帯名')
+    parser.add_argument('--cache-dir', default='travel_time_cache', help='キャッシュディレクトリ')
+    parser.add_argument('--output', default='travel_matrix.npz', help='出力ファイル')
+    args = parser.parse_args()
+
+    graph = RoadGraph.from_osm(args.osm) if args.osm else None
+    service = TravelTimeMatrix(graph, cache_dir=args.cache_dir)
+    facility, users, _ = load_dataset(args.input)
+
+    start = time.perf_counter()
+    minutes, km = build_travel_matrices(facility, users, service, args.depart)
+    elapsed = time.perf_counter() - start
+    np.savez(args.output, minutes=minutes, km=km, ids=np.array(["facility"] + [str(u["id"]) for u in users]))
+
+    source = f"道路グラフ（{len(graph):,}ノード）" if graph else "ハバーサイン距離"
+    print(f"✅ {len(users) + 1}地点の移動時間行列を作成しました（{source}, {elapsed:.3f}秒）")
+    print(f"📁 ファイル: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送迎ルート改善エンジン
+
+routeOptimization.js の optimizeRoute と同じく最近傍法で初期ルートを作り、
+2-opt と Or-opt（固定位置がある場合は交換も）の近傍探索で総距離を短縮する
+各移動の評価は事前計算した距離行列上の差分（増減分）だけで行う
+
+順番固定（is_order_fixed / isOrderFixed）の利用者は元の位置を維持し、
+改善操作は固定位置に挟まれた区間の中だけで行う
+
+最大所要時間（max_route_time）は停車数が変わらないため、総距離を短くすれば所要時間も短くなる
+（改善操作は総距離を縮める移動だけを行うので、上限内の初期ルートが上限を超えることはない）。
+改善後も上限を超える場合は結果の exceedsMaxTimeBy（超過分）と warning で知らせる
+"""
+
+import time
+
+import numpy as np
+
+import instrumentation
+from spatial_index import nearest_neighbor_order, path_distance
+from transport_planner import (
+    DENSE_MATRIX_MAX_USERS,
+    build_distance_matrix,
+    estimate_time,
+    route_distance,
+)
+
+# Or-opt で移動する区間の最大長
+OR_OPT_MAX_SEGMENT = 3
+
+def is_order_fixed(user):
+    """順番固定フラグ（Python表記・JS表記の両方に対応）"""
+    return bool(user.get("is_order_fixed", user.get("isOrderFixed", False)))
+
+def check_max_route_time(result, max_route_time):
+    """
+    結果に withinMaxTime を付け、上限を超える場合は exceedsMaxTimeBy（分）と warning も付ける
+
+    max_route_time が None なら何もしない
+    """
+    if max_route_time is None:
+        return result
+    over = result["estimatedTime"] - max_route_time
+    result["withinMaxTime"] = over <= 0
+    if over > 0:
+        result["exceedsMaxTimeBy"] = over
+        result["warning"] = (f"推定所要時間 {result['estimatedTime']}分 が最大所要時間 {max_route_time}分 を"
+                             f" {over}分 超えています")
+    return result
+
+def nearest_neighbor_tour(dist, nodes, fixed_positions=None):
+    """
+    最近傍法で初期ルートを作成
+
+    固定位置（ルート上の位置 → ノード）の利用者を除いて最近傍法で並べ、
+    固定された利用者は元の位置に戻す（optimizeRoute と同じ手順）
+
+    Args:
+        dist: 事業所をインデックス0とする距離行列
+        nodes: ルートに含めるノード（距離行列のインデックス）の元の並び
+        fixed_positions: 固定位置の集合
+
+    Returns:
+        ノードの並び（事業所は含まない）
+    """
+    fixed_positions = fixed_positions or set()
+    flexible = np.array([n for p, n in enumerate(nodes) if p not in fixed_positions], dtype=np.int64)
+
+    visited = []
+    remaining = np.ones(len(flexible), dtype=bool)
+    current = 0
+    for _ in range(len(flexible)):
+        candidates = np.where(remaining, dist[current, flexible], np.inf)
+        nearest = int(np.argmin(candidates))
+        remaining[nearest] = False
+        current = int(flexible[nearest])
+        visited.append(current)
+
+    tour = []
+    flexible_iter = iter(visited)
+    for position, node in enumerate(nodes):
+        tour.append(node if position in fixed_positions else next(flexible_iter))
+    return tour
+
+def free_runs(length, fixed_positions):
+    """固定位置で区切られた、並べ替え可能な連続区間 [(開始, 終了), ...] を返す"""
+    runs = []
+    start = None
+    for position in range(length):
+        if position in fixed_positions:
+            if start is not None:
+                runs.append((start, position - 1))
+                start = None
+        elif start is None:
+            start = position
+    if start is not None:
+        runs.append((start, length - 1))
+    return runs
+
+def _prefix_costs(dist, path):
+    """経路の順方向・逆方向の累積コスト（非対称行列での区間反転の評価に使う）"""
+    path = np.asarray(path)
+    forward = np.concatenate(([0.0], np.cumsum(dist[path[:-1], path[1:]])))
+    backward = np.concatenate(([0.0], np.cumsum(dist[path[1:], path[:-1]])))
+    return forward, backward
+
+def two_opt_pass(dist, path, runs):
+    """
+    2-opt: 区間 path[i..j] を反転して改善する移動を1つ探して適用
+
+    path は事業所(0)を両端に含む経路、runs は path 上のインデックスでの可動区間
+    改善した場合は True を返す
+    """
+    forward, backward = _prefix_costs(dist, path)
+    path_array = np.asarray(path)
+
+    for start, end in runs:
+        for i in range(start, end):
+            j = np.arange(i + 1, end + 1)
+            a, b = path_array[i - 1], path_array[i]
+            c, d = path_array[j], path_array[j + 1]
+            # 区間内部の向きが変わる分（対称行列なら0）
+            internal = (backward[j] - backward[i]) - (forward[j] - forward[i])
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d] + internal
+            best = int(np.argmin(delta))
+            if delta[best] < -1e-9:
+                k = int(j[best])
+                path[i:k + 1] = path[i:k + 1][::-1]
+                return True
+    return False
+
+def or_opt_pass(dist, path, runs):
+    """
+    Or-opt: 長さ1〜3の区間を同じ可動区間内の別の位置へ（必要なら反転して）移動
+
+    改善した場合は True を返す
+    """
+    for start, end in runs:
+        for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+            for i in range(start, end - length + 2):
+                j = i + length - 1
+                prev_node, next_node = path[i - 1], path[j + 1]
+                first, last = path[i], path[j]
+                segment = path[i:j + 1]
+                forward_cost = sum(dist[segment[t], segment[t + 1]] for t in range(length - 1))
+                backward_cost = sum(dist[segment[t + 1], segment[t]] for t in range(length - 1))
+                removal_gain = dist[prev_node, first] + dist[last, next_node] - dist[prev_node, next_node]
+
+                # 挿入先の辺 (path[k], path[k+1])。区間に接する辺は除く
+                for k in range(start - 1, end + 1):
+                    if i - 1 <= k <= j:
+                        continue
+                    u, v = path[k], path[k + 1]
+                    base = dist[u, v]
+                    insert_forward = dist[u, first] + dist[last, v] - base
+                    insert_reverse = dist[u, last] + dist[first, v] - base + backward_cost - forward_cost
+                    reverse = insert_reverse < insert_forward
+                    delta = min(insert_forward, insert_reverse) - removal_gain
+                    if delta < -1e-9:
+                        moved = segment[::-1] if reverse else segment
+                        remaining = path[:i] + path[j + 1:]
+                        insert_at = k + 1 if k < i else k + 1 - length
+                        path[:] = remaining[:insert_at] + moved + remaining[insert_at:]
+                        return True
+    return False
+
+def swap_pass(dist, path, flexible):
+    """
+    交換: 2つの柔軟な利用者の位置を入れ替える
+
+    固定位置をまたいだ並べ替えは 2-opt / Or-opt ではできないため、
+    位置を変えずに済む交換で補う。flexible は path 上の可動インデックス
+    改善した場合は True を返す
+    """
+    for x, i in enumerate(flexible):
+        for j in flexible[x + 1:]:
+            a, b, c = path[i - 1], path[i], path[i + 1]
+            d, e, f = path[j - 1], path[j], path[j + 1]
+            if j == i + 1:
+                # 隣接: a-b-e-f → a-e-b-f
+                delta = (dist[a, e] + dist[e, b] + dist[b, f]) - (dist[a, b] + dist[b, e] + dist[e, f])
+            else:
+                delta = (dist[a, e] + dist[e, c] + dist[d, b] + dist[b, f]
+                         - dist[a, b] - dist[b, c] - dist[d, e] - dist[e, f])
+            if delta < -1e-9:
+                path[i], path[j] = path[j], path[i]
+                return True
+    return False
+
+def improve_tour(dist, tour, fixed_positions=None, time_limit=None, max_passes=1000):
+    """
+    2-opt・Or-opt・交換を改善がなくなるまで（または時間制限まで）繰り返す
+
+    Args:
+        dist: 事業所をインデックス0とする距離行列
+        tour: 初期ルート（事業所を含まないノードの並び）
+        fixed_positions: 動かさないルート上の位置の集合
+        time_limit: 計算時間の上限（秒）
+        max_passes: 改善操作の最大回数
+
+    Returns:
+        改善後のルート（事業所を含まない）
+    """
+    fixed_positions = fixed_positions or set()
+    path = [0] + list(tour) + [0]
+    # path 上のインデックスに変換した可動区間（長さ2以上のみ意味がある）
+    runs = [(s + 1, e + 1) for s, e in free_runs(len(tour), fixed_positions) if e > s]
+    flexible = [p + 1 for p in range(len(tour)) if p not in fixed_positions]
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+
+    for _ in range(max_passes):
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        instrumentation.count("route_improvement_passes")
+        if two_opt_pass(dist, path, runs):
+            continue
+        if or_opt_pass(dist, path, runs):
+            continue
+        if fixed_positions and swap_pass(dist, path, flexible):
+            continue
+        break
+
+    return path[1:-1]
+
+def build_route_result(facility, users, order_indices, dist, max_route_time=None):
+    """
+    optimizeRoute と同じ形 {route, totalDistance, order, estimatedTime} の結果を作る
+
+    order_indices は users のインデックス（0始まり）の並び
+    max_route_time（分）を指定した場合は withinMaxTime も付ける（超過時は check_max_route_time の項目も）
+    """
+    ordered = [users[i] for i in order_indices]
+    total_distance = route_distance(dist, [i + 1 for i in order_indices])
+    route = [[facility["lat"], facility["lng"]]]
+    route += [[u["lat"], u["lng"]] for u in ordered]
+    route.append([facility["lat"], facility["lng"]])
+
+    result = {
+        "route": route,
+        "totalDistance": round(total_distance, 2),
+        "order": ordered,
+        "estimatedTime": estimate_time(total_distance, len(ordered)),
+    }
+    return check_max_route_time(result, max_route_time)
+
+def optimize_route(facility, users, dist=None, indices=None, max_route_time=None, time_limit=None):
+    """
+    送迎ルートを最近傍法 + 2-opt / Or-opt で最適化
+
+    Args:
+        facility: 事業所の座標 {lat, lng, name}
+        users: 利用者の配列（並び順は順番固定の利用者の位置として使う）
+        dist: 距離行列（省略時は計算）
+        indices: dist が1日全体の行列の場合の、各利用者の行インデックス（事業所は0）
+        max_route_time: ルートの最大所要時間（分）。上限内に収まったかを結果の withinMaxTime で返す
+        time_limit: 改善計算の時間上限（秒）
+
+    Returns:
+        {route, totalDistance, order, estimatedTime}（max_route_time 指定時は withinMaxTime、
+        上限を超える場合は exceedsMaxTimeBy（分）と warning も）
+    """
+    if not users:
+        return {"route": [], "totalDistance": 0, "order": [], "estimatedTime": 0}
+
+    fixed_positions = {p for p, u in enumerate(users) if is_order_fixed(u)}
+    if dist is None and len(users) > DENSE_MATRIX_MAX_USERS and not fixed_positions:
+        return optimize_large_route(facility, users, max_route_time)
+
+    if dist is None:
+        dist = build_distance_matrix(facility, users)
+    elif indices is not None:
+        rows = [0] + list(indices)
+        dist = dist[np.ix_(rows, rows)]
+
+    nodes = list(range(1, len(users) + 1))
+    with instrumentation.span("route_ordering", stops=len(users)):
+        tour = nearest_neighbor_tour(dist, nodes, fixed_positions)
+        tour = improve_tour(dist, tour, fixed_positions, time_limit=time_limit)
+
+    return build_route_result(facility, users, [n - 1 for n in tour], dist, max_route_time)
+
+def optimize_large_route(facility, users, max_route_time=None):
+    """
+    距離行列を作れない規模のルート（DENSE_MATRIX_MAX_USERS 名超）
+
+    空間インデックスで未訪問の最寄りをたどる最近傍法の順路を返す（2-opt / Or-opt は行わない）
+    """
+    lats = np.array([u["lat"] for u in users], dtype=np.float64)
+    lngs = np.array([u["lng"] for u in users], dtype=np.float64)
+    order = nearest_neighbor_order(facility["lat"], facility["lng"], lats, lngs)
+    total_distance = path_distance(facility["lat"], facility["lng"], lats, lngs, order)
+
+    ordered = [users[i] for i in order]
+    result = {
+        "route": [[facility["lat"], facility["lng"]]] + [[u["lat"], u["lng"]] for u in ordered]
+                 + [[facility["lat"], facility["lng"]]],
+        "totalDistance": round(total_distance, 2),
+        "order": ordered,
+        "estimatedTime": estimate_time(total_distance, len(ordered)),
+    }
+    return check_max_route_time(result, max_route_time)
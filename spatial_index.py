@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+利用者座標の空間インデックス
+
+geographicClustering.js / routeOptimization.js の calculateDistance は全組み合わせの
+総当たりで使われている（重心への割り当て、K-means++の初期化、最近傍探索）
+ここでは緯度経度を正方形のセル（グリッド）に分けて登録し、
+- k近傍（knn / knn_batch）
+- 半径内の検索（radius）
+- 未訪問の中で最も近い点（nearest + remove）
+を、近くのセルだけを調べることで高速に求める。距離はハバーサイン公式で計算する
+
+セル間の距離は、緯度方向は一定・経度方向はデータ中で最も高緯度の位置の縮尺で測るため、
+実際の距離以下（下限）になり、探索を打ち切っても取りこぼしは起きない
+
+このインデックスを使った
+- 定員制約付きK-meansクラスタリング（capacitated_kmeans）
+- 最近傍法の巡回順（nearest_neighbor_order）
+は、距離行列（n×n）を作らずに1万地点以上を扱うため transport_planner / route_optimizer から使う
+"""
+
+import numpy as np
+
+import instrumentation
+from transport_planner import EARTH_RADIUS_KM, haversine_matrix
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+
+# セルの大きさを自動で決めるときの1セルあたりの平均点数
+POINTS_PER_CELL = 4
+
+def haversine_to_point(lat, lng, lats, lngs):
+    """1点から複数点へのハバーサイン距離（km）"""
+    return haversine_matrix([lat], [lng], lats, lngs)[0]
+
+class GridIndex:
+    """
+    緯度経度のグリッドインデックス
+
+    点は登録順のインデックス（0始まり）で識別する
+    remove で削除した点は以降の検索結果に含まれない
+    """
+
+    def __init__(self, lats, lngs, cell_km=None):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        n = len(self.lats)
+
+        self.min_lat = float(self.lats.min()) if n else 0.0
+        self.min_lng = float(self.lngs.min()) if n else 0.0
+        max_abs_lat = float(np.abs(self.lats).max()) if n else 0.0
+        self.km_per_lat = KM_PER_DEGREE
+        self.km_per_lng = KM_PER_DEGREE * max(np.cos(np.radians(max_abs_lat)), 1e-6)
+
+        x, y = self._plane(self.lats, self.lngs)
+        width = float(x.max()) if n else 0.0
+        height = float(y.max()) if n else 0.0
+        if cell_km is None:
+            cell_km = max(np.sqrt(max(width * height, 1e-6) / max(n, 1) * POINTS_PER_CELL), 1e-3)
+        self.cell_km = float(cell_km)
+
+        # セル数が点数に比べて多すぎる場合はセルを広げる
+        max_cells = 4 * n + 1024
+        while (width / self.cell_km + 1) * (height / self.cell_km + 1) > max_cells:
+            self.cell_km *= 2
+
+        cx = np.floor(x / self.cell_km).astype(np.int64)
+        cy = np.floor(y / self.cell_km).astype(np.int64)
+        self.columns = int(cx.max()) + 1 if n else 1
+        self.rows = int(cy.max()) + 1 if n else 1
+        cell_ids = cy * self.columns + cx
+
+        # セルごとの点を連続して並べ（CSR形式）、セル番号 c の点は order[cell_starts[c]:cell_starts[c + 1]]
+        # 同じ行の隣り合うセルは連続しているので、行ごとに1回のスライスで取り出せる
+        self.order = np.argsort(cell_ids, kind="stable")
+        self.cell_starts = np.searchsorted(cell_ids[self.order], np.arange(self.columns * self.rows + 1))
+        self.alive = np.ones(n, dtype=bool)
+        self.alive_counts = np.diff(self.cell_starts)
+        self.point_cell = cell_ids
+        self.size = n
+
+    def __len__(self):
+        return self.size
+
+    def _plane(self, lats, lngs):
+        """平面座標（km）に変換"""
+        x = (np.asarray(lngs, dtype=np.float64) - self.min_lng) * self.km_per_lng
+        y = (np.asarray(lats, dtype=np.float64) - self.min_lat) * self.km_per_lat
+        return x, y
+
+    def _cell_of(self, lat, lng):
+        x, y = self._plane(lat, lng)
+        return int(np.floor(x / self.cell_km)), int(np.floor(y / self.cell_km))
+
+    def _max_ring(self, cx, cy):
+        """(cx, cy) から全セルを覆うのに必要なリング数"""
+        return max(abs(cx), abs(cx - self.columns + 1), abs(cy), abs(cy - self.rows + 1))
+
+    def _row_points(self, y, x0, x1, parts):
+        """y 行目の x0〜x1 列のセルにある生存点を parts に追加"""
+        if not 0 <= y < self.rows:
+            return
+        x0, x1 = max(x0, 0), min(x1, self.columns - 1)
+        if x0 > x1:
+            return
+        start = self.cell_starts[y * self.columns + x0]
+        end = self.cell_starts[y * self.columns + x1 + 1]
+        if start < end:
+            points = self.order[start:end]
+            parts.append(points[self.alive[points]] if self.size < len(self.alive) else points)
+
+    def _block_points(self, cx, cy, ring):
+        """(cx, cy) からチェビシェフ距離 ring 以内のセルにある生存点"""
+        parts = []
+        for y in range(cy - ring, cy + ring + 1):
+            self._row_points(y, cx - ring, cx + ring, parts)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _ring_points(self, cx, cy, ring):
+        """(cx, cy) からチェビシェフ距離ちょうど ring のセルにある生存点"""
+        if ring == 0:
+            return self._block_points(cx, cy, 0)
+        parts = []
+        self._row_points(cy - ring, cx - ring, cx + ring, parts)
+        self._row_points(cy + ring, cx - ring, cx + ring, parts)
+        for y in range(max(cy - ring + 1, 0), min(cy + ring, self.rows)):
+            self._row_points(y, cx - ring, cx - ring, parts)
+            self._row_points(y, cx + ring, cx + ring, parts)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def remove(self, index):
+        """点を削除（以降の検索で返さない）"""
+        if self.alive[index]:
+            self.alive[index] = False
+            self.alive_counts[self.point_cell[index]] -= 1
+            self.size -= 1
+
+    def knn(self, lat, lng, k):
+        """
+        (lat, lng) に近い順に k 点を返す
+
+        Returns:
+            (インデックスの配列, 距離(km)の配列)
+        """
+        cx, cy = self._cell_of(lat, lng)
+        max_ring = self._max_ring(cx, cy)
+        found = np.zeros(0, dtype=np.int64)
+        distances = np.zeros(0)
+        for ring in range(max_ring + 1):
+            points = self._ring_points(cx, cy, ring)
+            if len(points):
+                found = np.concatenate((found, points))
+                distances = np.concatenate((distances, haversine_to_point(lat, lng, self.lats[points], self.lngs[points])))
+            # 次のリングより外の点は ring × セル幅 より遠い
+            if len(found) >= k and np.partition(distances, k - 1)[k - 1] <= ring * self.cell_km:
+                break
+        take = min(k, len(found))
+        nearest = np.argsort(distances)[:take]
+        return found[nearest], distances[nearest]
+
+    def nearest(self, lat, lng):
+        """最も近い生存点 (インデックス, 距離)。生存点がなければ (-1, inf)"""
+        if self.size == 0:
+            return -1, np.inf
+        indices, distances = self.knn(lat, lng, 1)
+        return int(indices[0]), float(distances[0])
+
+    def radius(self, lat, lng, radius_km):
+        """半径 radius_km 以内の点のインデックスと距離（近い順）"""
+        cx, cy = self._cell_of(lat, lng)
+        rings = min(int(np.ceil(radius_km / self.cell_km)) + 1, self._max_ring(cx, cy))
+        points = self._block_points(cx, cy, rings)
+        distances = haversine_to_point(lat, lng, self.lats[points], self.lngs[points])
+        inside = distances <= radius_km
+        order = np.argsort(distances[inside])
+        return points[inside][order], distances[inside][order]
+
+    def knn_batch(self, lats, lngs, k):
+        """
+        複数の問い合わせ点それぞれの k 近傍
+
+        同じセルにある問い合わせ点は候補を共有し、距離はまとめて計算する
+
+        Returns:
+            (インデックス n×k, 距離 n×k)。点が k 個に満たない分は -1 / inf
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        n = len(lats)
+        result_indices = np.full((n, k), -1, dtype=np.int64)
+        result_distances = np.full((n, k), np.inf)
+        if n == 0 or self.size == 0:
+            return result_indices, result_distances
+
+        x, y = self._plane(lats, lngs)
+        cx = np.floor(x / self.cell_km).astype(np.int64)
+        cy = np.floor(y / self.cell_km).astype(np.int64)
+        _, groups = np.unique(np.stack((cy, cx), axis=1), axis=0, return_inverse=True)
+        groups = groups.ravel()
+        order = np.argsort(groups, kind="stable")
+        bounds = np.append(np.flatnonzero(np.diff(groups[order], prepend=-1)), n)
+
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            queries = order[start:end]
+            qx, qy = int(cx[queries[0]]), int(cy[queries[0]])
+            max_ring = self._max_ring(qx, qy)
+            candidates = []
+            for ring in range(max_ring + 1):
+                candidates.append(self._ring_points(qx, qy, ring))
+                points = np.concatenate(candidates)
+                if len(points) < k and ring < max_ring:
+                    continue
+                if len(points) == 0:
+                    break
+                distances = haversine_matrix(lats[queries], lngs[queries], self.lats[points], self.lngs[points])
+                take = min(k, len(points))
+                if take < len(points):
+                    nearest = np.argpartition(distances, take - 1, axis=1)[:, :take]
+                else:
+                    nearest = np.broadcast_to(np.arange(take), (len(queries), take))
+                nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+                if ring == max_ring or nearest_distances.max() <= ring * self.cell_km:
+                    ranked = np.argsort(nearest_distances, axis=1)
+                    result_indices[queries, :take] = points[np.take_along_axis(nearest, ranked, axis=1)]
+                    result_distances[queries, :take] = np.take_along_axis(nearest_distances, ranked, axis=1)
+                    break
+
+        return result_indices, result_distances
+
+# ---------------------------------------------------------------------------
+# ルート（最近傍法）
+# ---------------------------------------------------------------------------
+
+def nearest_neighbor_order(start_lat, start_lng, lats, lngs):
+    """
+    (start_lat, start_lng) から未訪問の最も近い点をたどる巡回順
+
+    Returns:
+        点のインデックス（0始まり）の並び
+    """
+    index = GridIndex(lats, lngs)
+    order = []
+    lat, lng = start_lat, start_lng
+    while len(index):
+        point, _ = index.nearest(lat, lng)
+        index.remove(point)
+        order.append(point)
+        lat, lng = index.lats[point], index.lngs[point]
+    return order
+
+def path_distance(start_lat, start_lng, lats, lngs, order):
+    """起点 → order の順 → 起点 の総距離（km）"""
+    if len(order) == 0:
+        return 0.0
+    path_lats = np.concatenate(([start_lat], np.asarray(lats)[order], [start_lat]))
+    path_lngs = np.concatenate(([start_lng], np.asarray(lngs)[order], [start_lng]))
+    lat1, lat2 = np.radians(path_lats[:-1]), np.radians(path_lats[1:])
+    dlng = np.radians(path_lngs[1:] - path_lngs[:-1])
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return float((2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))).sum())
+
+# ---------------------------------------------------------------------------
+# 定員制約付きK-means（距離行列なし）
+# ---------------------------------------------------------------------------
+
+def morton_order(lats, lngs, bits=16):
+    """Zオーダー曲線（モートン順）で並べたインデックス（近い点が近い順番になる）"""
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    scale = (1 << bits) - 1
+
+    def quantize(values):
+        span = values.max() - values.min()
+        return ((values - values.min()) / (span if span > 0 else 1) * scale).astype(np.uint64)
+
+    def spread(values):
+        values = values & np.uint64(0xFFFF)
+        values = (values | (values << np.uint64(8))) & np.uint64(0x00FF00FF)
+        values = (values | (values << np.uint64(4))) & np.uint64(0x0F0F0F0F)
+        values = (values | (values << np.uint64(2))) & np.uint64(0x33333333)
+        values = (values | (values << np.uint64(1))) & np.uint64(0x55555555)
+        return values
+
+    codes = spread(quantize(lngs)) | (spread(quantize(lats)) << np.uint64(1))
+    return np.argsort(codes, kind="stable")
+
+def assign_with_candidates(candidates, candidate_cost, wheelchair, capacities, wheelchair_capacities,
+                           fallback_cost):
+    """
+    transport_planner.assign_with_capacity の候補限定版
+
+    各利用者は近い順の候補クラスタ（candidates）から空きのある最初のクラスタに入る
+    候補がすべて満員の場合だけ fallback_cost(利用者) で全クラスタへの距離を計算する
+    """
+    n = len(candidates)
+    if candidates.shape[1] > 1:
+        regret = candidate_cost[:, 1] - candidate_cost[:, 0]
+        regret[~np.isfinite(regret)] = np.inf
+    else:
+        regret = np.zeros(n)
+    order = np.lexsort((-regret, ~wheelchair))
+
+    seats = capacities.copy()
+    wheelchair_seats = wheelchair_capacities.copy()
+    labels = np.full(n, -1, dtype=np.int64)
+    candidate_lists = candidates.tolist()
+    is_wheelchair = wheelchair.tolist()
+
+    for user in order.tolist():
+        needs_wheelchair = is_wheelchair[user]
+        chosen = -1
+        for cluster in candidate_lists[user]:
+            if cluster >= 0 and seats[cluster] > 0 and (not needs_wheelchair or wheelchair_seats[cluster] > 0):
+                chosen = cluster
+                break
+        if chosen < 0:
+            open_clusters = (seats > 0) & ((not needs_wheelchair) | (wheelchair_seats > 0))
+            if open_clusters.any():
+                cost = np.where(open_clusters, fallback_cost(user), np.inf)
+                chosen = int(np.argmin(cost))
+        if chosen >= 0:
+            labels[user] = chosen
+            seats[chosen] -= 1
+            if needs_wheelchair:
+                wheelchair_seats[chosen] -= 1
+
+    return labels
+
+def capacitated_kmeans(lats, lngs, wheelchair, capacities, wheelchair_capacities, max_iterations=20, candidates=8):
+    """
+    定員制約付きK-means（transport_planner.capacitated_clustering の距離行列を使わない版）
+
+    初期の重心はモートン順に並べた利用者を便の定員の比率で区切った各区間の平均
+    各反復では重心のグリッドインデックスから利用者ごとに近い candidates 個のクラスタだけを
+    候補にするため、1反復あたり O(n × candidates) で済む
+
+    Returns:
+        各利用者のクラスタ番号の配列（割り当て不能は -1）
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    wheelchair = np.asarray(wheelchair, dtype=bool)
+    n = len(lats)
+    k = min(len(capacities), n)
+    if k == 0:
+        return np.full(n, -1, dtype=np.int64)
+    capacities = np.asarray(capacities[:k])
+    wheelchair_capacities = np.asarray(wheelchair_capacities[:k])
+
+    order = morton_order(lats, lngs)
+    bounds = np.round(np.cumsum(capacities) / capacities.sum() * n).astype(np.int64)
+    labels = np.empty(n, dtype=np.int64)
+    labels[order] = np.minimum(np.searchsorted(bounds, np.arange(n), side="right"), k - 1)
+    centroid_lats, centroid_lngs = _centroids(lats, lngs, labels, k)
+    labels = None
+
+    for _ in range(max_iterations):
+        instrumentation.count("kmeans_iterations")
+        index = GridIndex(centroid_lats, centroid_lngs)
+        nearest, nearest_cost = index.knn_batch(lats, lngs, min(candidates, k))
+
+        def fallback_cost(user):
+            return haversine_to_point(lats[user], lngs[user], centroid_lats, centroid_lngs)
+
+        new_labels = assign_with_candidates(
+            nearest, nearest_cost, wheelchair, capacities, wheelchair_capacities, fallback_cost
+        )
+        # 収束判定: ラベル配列が変わらなくなったら終了
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centroid_lats, centroid_lngs = _centroids(lats, lngs, labels, k)
+
+    return labels
+
+def _centroids(lats, lngs, labels, k):
+    """
+    各クラスタの重心
+
+    空のクラスタは最大クラスタの重心から最も遠いメンバーの位置に置き直す
+    """
+    assigned = labels >= 0
+    counts = np.bincount(labels[assigned], minlength=k)
+    sum_lats = np.bincount(labels[assigned], weights=lats[assigned], minlength=k)
+    sum_lngs = np.bincount(labels[assigned], weights=lngs[assigned], minlength=k)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroid_lats = sum_lats / counts
+        centroid_lngs = sum_lngs / counts
+
+    for cluster in np.flatnonzero(counts == 0):
+        largest = int(np.argmax(counts))
+        if counts[largest] < 2:
+            centroid_lats[cluster], centroid_lngs[cluster] = lats.mean(), lngs.mean()
+            continue
+        members = np.flatnonzero(labels == largest)
+        distances = haversine_to_point(centroid_lats[largest], centroid_lngs[largest], lats[members], lngs[members])
+        farthest = members[int(np.argmax(distances))]
+        centroid_lats[cluster], centroid_lngs[cluster] = lats[farthest], lngs[farthest]
+        counts[largest] -= 1
+        counts[cluster] = 1
+
+    return centroid_lats, centroid_lngs
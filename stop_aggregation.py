@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同じ場所の利用者を1つの停車地にまとめてから計画する
+
+利用者の住所は少数の住所から選ばれることが多く（generate_weekly_data.addresses は36件）、
+marker_overlap_issue.md のように同じ住所の利用者が同じ便に3人乗ることもある。
+クラスタリング・ルート順序では利用者ごとに1地点として扱うため、同じ地点が何度も計算に入る。
+ここでは
+1. 正規化した住所（input_normalizer.address_key）が同じ、または座標が tolerance_m 以内の利用者を
+   1つの停車地にまとめる（停車地は人数（座席数）と車椅子利用者数を持つ）
+2. 停車地の距離行列で定員制約付きクラスタリング・ルート順序を計算する
+3. 停車地を利用者に戻す（停車地の中の順序は元の並び順）
+の手順で、小さい問題を解いて同じ形の結果を返す
+
+- 同じ住所でも座標が tolerance_m より離れている利用者はまとめない（ジオコーディングの誤りを広げない）
+- 停車地の人数は最も小さい車両の定員、車椅子利用者数は最も小さい車椅子枠までにする
+  （どの便にも入れられない停車地を作らない）
+- まとめたことで便に入らなくなった停車地は、利用者1人ずつ空いている便に入れ直す
+- 順番固定の利用者はまとめない
+"""
+
+import math
+
+import numpy as np
+
+from input_normalizer import address_key
+from route_optimizer import check_max_route_time, is_order_fixed, optimize_route
+from transport_planner import (
+    DENSE_MATRIX_MAX_USERS, build_distance_matrix, build_trip_slots, capacitated_clustering, check_coordinates,
+    estimate_time, plan_day,
+)
+
+# 同じ停車地とみなす距離（m）
+DEFAULT_TOLERANCE_M = 30.0
+MODES = ("address", "coordinates")
+
+METERS_PER_DEGREE = 111320.0
+
+def aggregate_stops(users, mode="address", tolerance_m=DEFAULT_TOLERANCE_M, max_seats=None, max_wheelchair=None):
+    """
+    利用者を停車地にまとめる
+
+    Args:
+        users: 利用者の配列 [{lat, lng, address, wheelchair, ...}, ...]
+        mode: "address"（正規化した住所が同じ利用者。住所がなければ座標）/ "coordinates"（座標のみ）
+        tolerance_m: 同じ停車地とみなす距離（m）
+        max_seats: 1つの停車地の最大人数（None なら上限なし）
+        max_wheelchair: 1つの停車地の最大車椅子利用者数（None なら上限なし）
+
+    Returns:
+        停車地の配列 [{lat, lng, address, members（users のインデックス）, wheelchair（車椅子利用者数）}, ...]
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode は {' / '.join(MODES)} のいずれかです: {mode}")
+    stops = []
+    by_address = {}
+    by_cell = {}
+    cell_size = tolerance_m / METERS_PER_DEGREE
+
+    def cell_of(lat, lng):
+        return (math.floor(lat / cell_size), math.floor(lng / cell_size)) if cell_size > 0 else (lat, lng)
+
+    def near(stop, lat, lng):
+        dy = (lat - stop["lat"]) * METERS_PER_DEGREE
+        dx = (lng - stop["lng"]) * METERS_PER_DEGREE * math.cos(math.radians(lat))
+        return dx * dx + dy * dy <= tolerance_m * tolerance_m
+
+    def has_room(stop, wheelchair):
+        if max_seats is not None and len(stop["members"]) >= max_seats:
+            return False
+        return not wheelchair or max_wheelchair is None or stop["wheelchair"] < max_wheelchair
+
+    for index, user in enumerate(users):
+        lat, lng = user["lat"], user["lng"]
+        wheelchair = bool(user["wheelchair"])
+        key = address_key(user.get("address") or "") if mode == "address" else ""
+        if is_order_fixed(user):
+            candidates = []
+        elif key:
+            candidates = by_address.get(key, [])
+        else:
+            row, col = cell_of(lat, lng)
+            candidates = [s for dr in (-1, 0, 1) for dc in (-1, 0, 1) for s in by_cell.get((row + dr, col + dc), [])]
+
+        stop = next((stops[s] for s in candidates if near(stops[s], lat, lng) and has_room(stops[s], wheelchair)), None)
+        if stop is None:
+            stop = {"lat": lat, "lng": lng, "address": user.get("address", ""), "members": [], "wheelchair": 0}
+            if not is_order_fixed(user):
+                if key:
+                    by_address.setdefault(key, []).append(len(stops))
+                else:
+                    by_cell.setdefault(cell_of(lat, lng), []).append(len(stops))
+            stops.append(stop)
+        stop["members"].append(index)
+        stop["wheelchair"] += wheelchair
+    return stops
+
+def stop_limits(vehicles):
+    """どの便にも入る停車地の大きさ (最大人数, 最大車椅子利用者数)"""
+    capacities = [v["capacity"] for v in vehicles if v["capacity"] > 0]
+    wheelchair_capacities = [min(v["wheelchair_capacity"], v["capacity"])
+                             for v in vehicles if min(v["wheelchair_capacity"], v["capacity"]) > 0]
+    return (min(capacities) if capacities else 1), (min(wheelchair_capacities) if wheelchair_capacities else 1)
+
+def _place_leftovers(stop_dist, stops, users, labels, capacities, wheelchair_capacities):
+    """
+    便に入らなかった停車地の利用者を1人ずつ、空きのある便のうち最も近い停車地を含む便へ入れる
+
+    Returns:
+        利用者ごとの便の配列（入らなかった利用者は -1）
+    """
+    user_labels = np.full(len(users), -1, dtype=np.int64)
+    seats = capacities.copy()
+    wheelchair_seats = wheelchair_capacities.copy()
+    stops_by_slot = [[] for _ in range(len(capacities))]
+    leftovers = []
+    for s, (stop, label) in enumerate(zip(stops, labels)):
+        if label < 0:
+            leftovers += [(not users[i]["wheelchair"], i, s) for i in stop["members"]]
+            continue
+        user_labels[stop["members"]] = label
+        seats[label] -= len(stop["members"])
+        wheelchair_seats[label] -= stop["wheelchair"]
+        stops_by_slot[label].append(s)
+
+    # 車椅子利用者（車椅子枠が希少）から入れる
+    for _, i, s in sorted(leftovers):
+        wheelchair = bool(users[i]["wheelchair"])
+        best = None
+        for slot in range(len(capacities)):
+            if seats[slot] < 1 or (wheelchair and wheelchair_seats[slot] < 1):
+                continue
+            cost = float(stop_dist[s, stops_by_slot[slot]].min()) if stops_by_slot[slot] else math.inf
+            if best is None or cost < best[0]:
+                best = (cost, slot)
+        if best is None:
+            continue
+        slot = best[1]
+        user_labels[i] = slot
+        seats[slot] -= 1
+        wheelchair_seats[slot] -= wheelchair
+        stops_by_slot[slot].append(s)
+    return user_labels
+
+def plan_day_aggregated(facility, users, vehicles, seed=None, max_iterations=20, starts=1, time_budget=None,
+                        mode="address", tolerance_m=DEFAULT_TOLERANCE_M):
+    """
+    停車地にまとめてから plan_day と同じ計画を作る（引数・結果の形は plan_day と同じ）
+
+    まとめられる利用者がいない場合と、停車地が DENSE_MATRIX_MAX_USERS を超える場合は plan_day で計算する
+    """
+    check_coordinates(facility, users)
+    active_vehicles = [v for v in vehicles if v.get("is_active", True)]
+    max_seats, max_wheelchair = stop_limits(active_vehicles)
+    stops = aggregate_stops(users, mode, tolerance_m, max_seats, max_wheelchair)
+    if len(stops) == len(users) or len(stops) > DENSE_MATRIX_MAX_USERS:
+        return plan_day(facility, users, vehicles, seed=seed, max_iterations=max_iterations, starts=starts,
+                        time_budget=time_budget)
+
+    num_wheelchair = sum(1 for u in users if u["wheelchair"])
+    slots, capacities, wheelchair_capacities = build_trip_slots(active_vehicles, len(users), num_wheelchair)
+    if not slots:
+        return {"assignments": {}, "unassigned": list(users)}
+
+    dist = build_distance_matrix(facility, stops)
+    demand = np.array([len(stop["members"]) for stop in stops], dtype=np.int64)
+    wheelchair = np.array([stop["wheelchair"] for stop in stops], dtype=np.int64)
+    if starts > 1:
+        from multi_start_clustering import multi_start_clustering
+
+        labels, _ = multi_start_clustering(
+            dist[1:, 1:], wheelchair, capacities, wheelchair_capacities, starts=starts, seed=seed,
+            time_budget=time_budget, max_iterations=max_iterations, demand=demand
+        )
+    else:
+        labels = capacitated_clustering(
+            dist[1:, 1:], wheelchair, capacities, wheelchair_capacities,
+            rng=np.random.default_rng(seed), max_iterations=max_iterations, demand=demand
+        )
+    user_labels = _place_leftovers(dist[1:, 1:], stops, users, labels, capacities, wheelchair_capacities)
+
+    assignments = {}
+    for slot, (vehicle_index, _) in enumerate(slots):
+        members = np.flatnonzero(user_labels == slot)
+        if len(members) == 0:
+            continue
+        vehicle_id = active_vehicles[vehicle_index]["id"]
+        trip = {"users": [users[i] for i in members]}
+        assignments.setdefault(vehicle_id, {"trips": []})["trips"].append(trip)
+
+    unassigned = [users[i] for i in np.flatnonzero(user_labels < 0)]
+    return {"assignments": assignments, "unassigned": unassigned}
+
+def optimize_route_aggregated(facility, users, max_route_time=None, time_limit=None, mode="address",
+                              tolerance_m=DEFAULT_TOLERANCE_M):
+    """
+    停車地にまとめてから optimize_route と同じ形の結果を返す
+
+    同じ停車地の利用者は続けて訪問する。順番固定の利用者がいる場合はまとめずに optimize_route で計算する
+    """
+    if not users or any(is_order_fixed(u) for u in users):
+        return optimize_route(facility, users, max_route_time=max_route_time, time_limit=time_limit)
+    check_coordinates(facility, users)
+    stops = aggregate_stops(users, mode, tolerance_m)
+    if len(stops) == len(users):
+        return optimize_route(facility, users, max_route_time=max_route_time, time_limit=time_limit)
+
+    points = [{"id": s, "lat": stop["lat"], "lng": stop["lng"]} for s, stop in enumerate(stops)]
+    result = optimize_route(facility, points, time_limit=time_limit)
+    ordered = [users[i] for point in result["order"] for i in stops[point["id"]]["members"]]
+
+    route = [[facility["lat"], facility["lng"]]]
+    route += [[u["lat"], u["lng"]] for u in ordered]
+    route.append([facility["lat"], facility["lng"]])
+    aggregated = {
+        "route": route,
+        "totalDistance": result["totalDistance"],
+        "order": ordered,
+        "estimatedTime": estimate_time(result["totalDistance"], len(ordered)),
+    }
+    return check_max_route_time(aggregated, max_route_time)
@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+送迎計画エンジン
+generate_sample_data.py / generate_weekly_data.py が出力するCSVを読み込み、
+定員（一般・車椅子）を考慮した地理的クラスタリングで利用者を車両の便に割り当てる
+
+距離はハバーサイン公式の距離行列をNumPyで一度だけ計算して使い回す
+実行には NumPy が必要
+"""
+
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+import instrumentation
+
+EARTH_RADIUS_KM = 6371.0  # 地球の半径（km）
+
+# 推定所要時間の計算に使う値（routeOptimization.js と同じ）
+AVERAGE_SPEED_KMH = 20
+STOP_TIME_MIN = 3
+
+# これより多い利用者は距離行列（n×n）を作らず、空間インデックス（spatial_index.py）で計画する
+DENSE_MATRIX_MAX_USERS = 3000
+
+# 週間データ（weekly_data/*.csv）には事業所・車両が含まれないため、
+# generate_weekly_data.save_as_javascript と同じ値を既定値として使う
+DEFAULT_FACILITY = {
+    "name": "デイサービスさくら",
+    "address": "荒川区西日暮里2-10-5",
+    "lat": 35.7328,
+    "lng": 139.7645,
+}
+
+DEFAULT_VEHICLES = [
+    {"id": 1, "name": "送迎車1号", "driver": "佐藤 花子", "capacity": 8, "wheelchair_capacity": 2},
+    {"id": 2, "name": "送迎車2号", "driver": "中村 次郎", "capacity": 6, "wheelchair_capacity": 1},
+    {"id": 3, "name": "送迎車3号", "driver": "田中 三郎", "capacity": 8, "wheelchair_capacity": 2},
+    {"id": 4, "name": "送迎車4号", "driver": "山田 美咲", "capacity": 7, "wheelchair_capacity": 1},
+    {"id": 5, "name": "送迎車5号", "driver": "鈴木 健太", "capacity": 6, "wheelchair_capacity": 1},
+]
+
+# CSVの真偽値表記（"TRUE" / "要" など）
+TRUE_VALUES = {"true", "1", "要", "yes", "はい"}
+
+def parse_bool(value):
+    """CSVの真偽値表記をboolに変換"""
+    return str(value).strip().lower() in TRUE_VALUES
+
+def parse_float(value):
+    """空欄はNoneとして数値に変換"""
+    value = (value or "").strip()
+    return float(value) if value else None
+
+# ---------------------------------------------------------------------------
+# CSV読み込み
+# ---------------------------------------------------------------------------
+
+def load_users_csv(path):
+    """
+    利用者CSVを読み込む
+
+    sample_data_30/users.csv 形式（user_id, name, ...）と
+    weekly_data/*.csv 形式（ID, 氏名, ...）の両方に対応
+    """
+    users = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if "ID" in row:
+                users.append({
+                    "id": row["ID"],
+                    "name": row["氏名"],
+                    "address": row["住所"],
+                    "lat": parse_float(row["緯度"]),
+                    "lng": parse_float(row["経度"]),
+                    "wheelchair": parse_bool(row["車椅子"]),
+                    "notes": row["備考"],
+                    "pickup_time": row["送迎時刻"],
+                    "return_time": row["帰宅時刻"],
+                })
+            else:
+                users.append({
+                    "id": row["user_id"],
+                    "name": row["name"],
+                    "address": row["address"],
+                    "phone": row.get("phone", ""),
+                    "lat": parse_float(row.get("lat")),
+                    "lng": parse_float(row.get("lng")),
+                    "wheelchair": parse_bool(row["wheelchair"]),
+                    "notes": row.get("notes", ""),
+                })
+            # 複数事業所のデータ（multi_facility_planner.py）では利用者ごとに通う事業所を持つ
+            if row.get("facility_id"):
+                users[-1]["facility_id"] = row["facility_id"]
+    return users
+
+def load_schedules_csv(path):
+    """利用予定CSVを user_id をキーとする辞書として読み込む"""
+    with open(path, encoding="utf-8", newline="") as f:
+        return {row["user_id"]: row for row in csv.DictReader(f)}
+
+def load_vehicles_csv(path):
+    """車両CSVを読み込む"""
+    vehicles = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            vehicles.append({
+                "id": row["vehicle_id"],
+                "name": row["vehicle_name"],
+                "driver": row.get("driver_name", ""),
+                "capacity": int(row["capacity"]),
+                "wheelchair_capacity": int(row["wheelchair_capacity"]),
+            })
+            if row.get("home_facility"):
+                vehicles[-1]["home_facility"] = row["home_facility"]
+    return vehicles
+
+def load_facility_csv(path):
+    """事業所CSV（1行目）を読み込む"""
+    with open(path, encoding="utf-8", newline="") as f:
+        row = next(csv.DictReader(f))
+    return {
+        "name": row["facility_name"],
+        "address": row["address"],
+        "phone": row.get("phone", ""),
+        "lat": parse_float(row.get("lat")),
+        "lng": parse_float(row.get("lng")),
+    }
+
+@instrumentation.traced("load_dataset")
+def load_dataset(path):
+    """
+    1日分の計画入力を読み込む
+
+    path がディレクトリなら users.csv / schedules.csv / vehicles.csv / facility.csv を、
+    CSVファイルなら週間データ形式の利用者ファイルとして読み込み、
+    事業所・車両は既定値を使う
+
+    Returns:
+        (facility, users, vehicles)
+    """
+    if os.path.isdir(path):
+        users = load_users_csv(os.path.join(path, "users.csv"))
+
+        schedules_path = os.path.join(path, "schedules.csv")
+        if os.path.exists(schedules_path):
+            schedules = load_schedules_csv(schedules_path)
+            for user in users:
+                schedule = schedules.get(user["id"])
+                if schedule:
+                    user["pickup_time"] = schedule["pickup_time"]
+                    user["return_time"] = schedule["return_time"]
+
+        vehicles_path = os.path.join(path, "vehicles.csv")
+        vehicles = load_vehicles_csv(vehicles_path) if os.path.exists(vehicles_path) else [dict(v) for v in DEFAULT_VEHICLES]
+
+        facility_path = os.path.join(path, "facility.csv")
+        facility = load_facility_csv(facility_path) if os.path.exists(facility_path) else dict(DEFAULT_FACILITY)
+    else:
+        users = load_users_csv(path)
+        vehicles = [dict(v) for v in DEFAULT_VEHICLES]
+        facility = dict(DEFAULT_FACILITY)
+
+    return facility, users, vehicles
+
+# ---------------------------------------------------------------------------
+# 距離計算
+# ---------------------------------------------------------------------------
+
+def haversine_matrix(lats_a, lngs_a, lats_b=None, lngs_b=None):
+    """
+    ハバーサイン公式で距離行列（km）を一括計算
+
+    lats_b / lngs_b を省略した場合は a 同士の正方行列を返す
+    """
+    lat_a = np.radians(np.asarray(lats_a, dtype=np.float64))[:, None]
+    lng_a = np.radians(np.asarray(lngs_a, dtype=np.float64))[:, None]
+    if lats_b is None:
+        lat_b, lng_b = lat_a.T, lng_a.T
+    else:
+        lat_b = np.radians(np.asarray(lats_b, dtype=np.float64))[None, :]
+        lng_b = np.radians(np.asarray(lngs_b, dtype=np.float64))[None, :]
+
+    a = (np.sin((lat_b - lat_a) / 2) ** 2
+         + np.cos(lat_a) * np.cos(lat_b) * np.sin((lng_b - lng_a) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def check_coordinates(facility, users):
+    """事業所・利用者の座標がすべて設定されているかを確認"""
+    missing = [u["id"] for u in users if u.get("lat") is None or u.get("lng") is None]
+    if missing or facility.get("lat") is None:
+        raise ValueError(f"座標が未設定のデータがあります（ジオコーディングが必要）: {missing[:5]}")
+
+def build_distance_matrix(facility, users):
+    """
+    事業所をインデックス0、利用者を1..nとした距離行列を作成
+    """
+    check_coordinates(facility, users)
+
+    with instrumentation.span("distance_matrix", size=len(users) + 1):
+        instrumentation.count("distance_evaluations", (len(users) + 1) ** 2)
+        lats = [facility["lat"]] + [u["lat"] for u in users]
+        lngs = [facility["lng"]] + [u["lng"] for u in users]
+        return haversine_matrix(lats, lngs)
+
+def route_distance(dist, order):
+    """
+    事業所(0) → order の順 → 事業所(0) の総距離（km）
+    order は距離行列のインデックス（利用者は1始まり）
+    """
+    if len(order) == 0:
+        return 0.0
+    path = np.concatenate(([0], np.asarray(order), [0]))
+    return float(dist[path[:-1], path[1:]].sum())
+
+def estimate_time(distance_km, num_stops):
+    """推定所要時間（分）: 平均速度20km/h + 各停車地で3分"""
+    return int(np.ceil(distance_km / AVERAGE_SPEED_KMH * 60 + num_stops * STOP_TIME_MIN))
+
+# ---------------------------------------------------------------------------
+# 定員制約付きクラスタリング
+# ---------------------------------------------------------------------------
+
+def build_trip_slots(vehicles, num_users, num_wheelchair):
+    """
+    全員を乗せられるだけの便（スロット）を車両に順番に追加していく
+
+    便数が最も少ない車両（同数なら定員の大きい車両）から追加するため、
+    各車両の便数はほぼ均等になる
+
+    Returns:
+        [(車両インデックス, 便番号), ...], 定員配列, 車椅子定員配列
+    """
+    slots = []
+    seat_total = 0
+    wheelchair_total = 0
+    trip_counts = [0] * len(vehicles)
+
+    # 車椅子定員のない車両しかない場合、車椅子利用者は割り当て不能
+    wheelchair_possible = any(v["wheelchair_capacity"] > 0 for v in vehicles)
+
+    while seat_total < num_users or (wheelchair_possible and wheelchair_total < num_wheelchair):
+        need_wheelchair = wheelchair_possible and wheelchair_total < num_wheelchair
+        candidates = [
+            i for i, v in enumerate(vehicles)
+            if v["capacity"] > 0 and (not need_wheelchair or v["wheelchair_capacity"] > 0)
+        ]
+        if not candidates:
+            break
+        index = min(candidates, key=lambda i: (trip_counts[i], -vehicles[i]["capacity"], i))
+        slots.append((index, trip_counts[index]))
+        trip_counts[index] += 1
+        seat_total += vehicles[index]["capacity"]
+        wheelchair_total += min(vehicles[index]["wheelchair_capacity"], vehicles[index]["capacity"])
+
+    capacities, wheelchair_capacities = slot_capacities(vehicles, slots)
+    return slots, capacities, wheelchair_capacities
+
+def slot_capacities(vehicles, slots):
+    """便（スロット）ごとの定員配列・車椅子定員配列"""
+    capacities = np.array([vehicles[i]["capacity"] for i, _ in slots], dtype=np.int64)
+    wheelchair_capacities = np.array(
+        [min(vehicles[i]["wheelchair_capacity"], vehicles[i]["capacity"]) for i, _ in slots],
+        dtype=np.int64
+    )
+    return capacities, wheelchair_capacities
+
+def init_medoids_kmeans_plus_plus(dist, k, rng):
+    """K-means++法で初期メドイド（代表利用者）を選択（距離行列を使用）"""
+    n = dist.shape[0]
+    medoids = [int(rng.integers(n))]
+    min_dist = dist[medoids[0]].copy()
+
+    for _ in range(1, k):
+        weights = min_dist ** 2
+        total = weights.sum()
+        if total <= 0:
+            # 全員が既存の中心と同じ地点にいる場合は未選択の利用者から選ぶ
+            remaining = np.setdiff1d(np.arange(n), medoids)
+            next_index = int(rng.choice(remaining))
+        else:
+            next_index = int(rng.choice(n, p=weights / total))
+        medoids.append(next_index)
+        np.minimum(min_dist, dist[next_index], out=min_dist)
+
+    return np.array(medoids, dtype=np.int64)
+
+def assign_with_capacity(cost, wheelchair, capacities, wheelchair_capacities, demand=None):
+    """
+    各利用者を定員に空きのある最も近いクラスタへ割り当て
+
+    車椅子利用者（車椅子枠が希少）を先に、その中では
+    「最寄りと2番目の差（後悔値）」が大きい利用者から順に確定する
+    空きがない利用者のラベルは -1
+
+    demand を指定した場合、各要素は複数人の停車地（stop_aggregation）で、
+    demand が座席数、wheelchair が車椅子利用者数になる（座席数の多い停車地から確定する）
+    """
+    n, k = cost.shape
+    preferences = np.argsort(cost, axis=1)
+    if k > 1:
+        sorted_cost = np.take_along_axis(cost, preferences[:, :2], axis=1)
+        regret = sorted_cost[:, 1] - sorted_cost[:, 0]
+    else:
+        regret = np.zeros(n)
+    if demand is None:
+        order = np.lexsort((-regret, ~wheelchair))
+    else:
+        order = np.lexsort((-regret, -demand, wheelchair == 0))
+
+    seats = capacities.copy()
+    wheelchair_seats = wheelchair_capacities.copy()
+    labels = np.full(n, -1, dtype=np.int64)
+    preference_lists = preferences.tolist()
+    needs_wheelchair = np.asarray(wheelchair, dtype=np.int64).tolist()
+    needs_seats = [1] * n if demand is None else np.asarray(demand, dtype=np.int64).tolist()
+
+    for user in order.tolist():
+        wheelchair_demand = needs_wheelchair[user]
+        seat_demand = needs_seats[user]
+        for cluster in preference_lists[user]:
+            if seats[cluster] >= seat_demand and wheelchair_seats[cluster] >= wheelchair_demand:
+                labels[user] = cluster
+                seats[cluster] -= seat_demand
+                wheelchair_seats[cluster] -= wheelchair_demand
+                break
+
+    return labels
+
+def update_medoids(dist, labels, medoids, demand=None):
+    """
+    各クラスタ内で他メンバーへの距離の合計が最小の利用者を新しいメドイドにする
+    （demand を指定した場合は各メンバーの座席数で重み付けした合計）
+    空のクラスタは最大クラスタのメドイドから最も遠いメンバーで分割する
+    """
+    new_medoids = medoids.copy()
+    members_by_cluster = [np.flatnonzero(labels == c) for c in range(len(medoids))]
+
+    for cluster, members in enumerate(members_by_cluster):
+        if len(members) > 0:
+            if demand is None:
+                within = dist[np.ix_(members, members)].sum(axis=1)
+            else:
+                within = dist[np.ix_(members, members)] @ demand[members]
+            new_medoids[cluster] = members[np.argmin(within)]
+
+    for cluster, members in enumerate(members_by_cluster):
+        if len(members) == 0:
+            sizes = [len(m) for m in members_by_cluster]
+            largest = int(np.argmax(sizes))
+            if sizes[largest] < 2:
+                continue
+            donor = members_by_cluster[largest]
+            farthest = donor[np.argmax(dist[new_medoids[largest], donor])]
+            new_medoids[cluster] = farthest
+            members_by_cluster[largest] = donor[donor != farthest]
+            members_by_cluster[cluster] = np.array([farthest])
+
+    return new_medoids
+
+def capacitated_clustering(dist, wheelchair, capacities, wheelchair_capacities, rng=None, max_iterations=20,
+                           demand=None):
+    """
+    定員制約付きK-medoidsクラスタリング
+
+    Args:
+        dist: 利用者間の距離行列（n×n）
+        wheelchair: 車椅子利用者フラグ（長さn）
+        capacities: 各クラスタ（便）の定員
+        wheelchair_capacities: 各クラスタ（便）の車椅子定員
+        rng: numpy.random.Generator
+        max_iterations: 最大反復回数
+        demand: 各要素の座席数（複数人の停車地の場合。wheelchair は車椅子利用者数を渡す）
+
+    Returns:
+        各利用者のクラスタ番号の配列（割り当て不能は -1）
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    if demand is None:
+        wheelchair = np.asarray(wheelchair, dtype=bool)
+    else:
+        wheelchair = np.asarray(wheelchair, dtype=np.int64)
+        demand = np.asarray(demand, dtype=np.int64)
+    n = dist.shape[0]
+    k = min(len(capacities), n)
+    if k == 0:
+        return np.full(n, -1, dtype=np.int64)
+    capacities = capacities[:k]
+    wheelchair_capacities = wheelchair_capacities[:k]
+
+    medoids = init_medoids_kmeans_plus_plus(dist, k, rng)
+    labels = None
+
+    for _ in range(max_iterations):
+        instrumentation.count("kmeans_iterations")
+        new_labels = assign_with_capacity(dist[:, medoids], wheelchair, capacities, wheelchair_capacities, demand)
+
+        # 収束判定: ラベル配列が変わらなくなったら終了
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        medoids = update_medoids(dist, labels, medoids, demand)
+
+    return labels
+
+@instrumentation.traced("plan_day")
+def plan_day(facility, users, vehicles, seed=None, dist=None, max_iterations=20, slots=None, starts=1,
+             time_budget=None, aggregate=False):
+    """
+    1日分の送迎計画（車両・便への割り当て）を作成
+
+    Args:
+        facility: 事業所 {lat, lng, ...}
+        users: 利用者の配列 [{id, lat, lng, wheelchair, ...}, ...]
+        vehicles: 車両の配列 [{id, capacity, wheelchair_capacity, ...}, ...]
+        seed: 乱数シード
+        dist: build_distance_matrix で作成済みの距離行列
+              （省略時は計算。DENSE_MATRIX_MAX_USERS 名を超える場合は作らずに空間インデックスを使う）
+        max_iterations: クラスタリングの最大反復回数
+        slots: 使える便 [(稼働車両のインデックス, 便番号), ...]
+               （省略時は build_trip_slots で全員を乗せられるだけ用意する）
+        starts: クラスタリングの初期値の数。2以上なら multi_start_clustering で最良の結果を選ぶ
+                （距離行列を使う場合のみ）
+        time_budget: starts が2以上のときのクラスタリングの計算時間の上限（秒）
+        aggregate: True なら同じ場所の利用者を停車地にまとめてから計算する
+                   （stop_aggregation.plan_day_aggregated。dist・slots は使わない）
+
+    Returns:
+        {
+            "assignments": {車両ID: {"trips": [{"users": [...]}, ...]}},
+            "unassigned": [割り当てられなかった利用者]
+        }
+    """
+    if not users:
+        return {"assignments": {}, "unassigned": []}
+    if aggregate:
+        from stop_aggregation import plan_day_aggregated
+
+        return plan_day_aggregated(facility, users, vehicles, seed=seed, max_iterations=max_iterations,
+                                   starts=starts, time_budget=time_budget)
+
+    active_vehicles = [v for v in vehicles if v.get("is_active", True)]
+    wheelchair = np.array([bool(u["wheelchair"]) for u in users])
+    with instrumentation.span("trip_slots"):
+        if slots is None:
+            slots, capacities, wheelchair_capacities = build_trip_slots(
+                active_vehicles, len(users), int(wheelchair.sum())
+            )
+        else:
+            capacities, wheelchair_capacities = slot_capacities(active_vehicles, slots)
+    if not slots:
+        return {"assignments": {}, "unassigned": list(users)}
+
+    if dist is None and len(users) > DENSE_MATRIX_MAX_USERS:
+        from spatial_index import capacitated_kmeans
+
+        check_coordinates(facility, users)
+        with instrumentation.span("clustering", users=len(users), slots=len(slots), dense=False):
+            labels = capacitated_kmeans(
+                [u["lat"] for u in users], [u["lng"] for u in users], wheelchair,
+                capacities, wheelchair_capacities, max_iterations=max_iterations
+            )
+    else:
+        if dist is None:
+            dist = build_distance_matrix(facility, users)
+        instrumentation.memory_snapshot("distance_matrix")
+        with instrumentation.span("clustering", users=len(users), slots=len(slots), dense=True):
+            if starts > 1:
+                from multi_start_clustering import multi_start_clustering
+
+                labels, _ = multi_start_clustering(
+                    dist[1:, 1:], wheelchair, capacities, wheelchair_capacities, starts=starts, seed=seed,
+                    time_budget=time_budget, max_iterations=max_iterations
+                )
+            else:
+                labels = capacitated_clustering(
+                    dist[1:, 1:], wheelchair, capacities, wheelchair_capacities,
+                    rng=np.random.default_rng(seed), max_iterations=max_iterations
+                )
+    instrumentation.memory_snapshot("clustering")
+
+    assignments = {}
+    for slot, (vehicle_index, _) in enumerate(slots):
+        members = np.flatnonzero(labels == slot)
+        if len(members) == 0:
+            continue
+        vehicle_id = active_vehicles[vehicle_index]["id"]
+        trip = {"users": [users[i] for i in members]}
+        assignments.setdefault(vehicle_id, {"trips": []})["trips"].append(trip)
+
+    unassigned = [users[i] for i in np.flatnonzero(labels < 0)]
+    return {"assignments": assignments, "unassigned": unassigned}
+
+def main():
+    """CSVを読み込んで計画を作成し、JSONで出力"""
+    parser = argparse.ArgumentParser(description='定員制約付きクラスタリングで送迎計画を作成')
+    parser.add_argument('input', help='データディレクトリ（sample_data_30 など）または週間データのCSV')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    parser.add_argument('--output', help='出力JSONファイル（省略時は標準出力）')
+    parser.add_argument('--starts', type=int, default=1, help='クラスタリングの初期値の数（2以上で最良の結果を選ぶ）')
+    parser.add_argument('--time-budget', type=float, default=None, help='クラスタリングの計算時間の上限（秒）')
+    parser.add_argument('--aggregate', action='store_true', help='同じ場所の利用者を停車地にまとめてから計算する')
+    parser.add_argument('--trace', help='処理ごとの時間・カウンタを記録するファイル（Chrome のトレース形式）')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Python のメモリ確保量も記録する（tracemalloc を使うため処理が遅くなる）')
+    args = parser.parse_args()
+
+    tracing = instrumentation.recording(args.trace, memory=args.trace_memory) if args.trace else contextlib.nullcontext()
+    with tracing as recorder:
+        facility, users, vehicles = load_dataset(args.input)
+        result = plan_day(facility, users, vehicles, seed=args.seed, starts=args.starts, time_budget=args.time_budget,
+                          aggregate=args.aggregate)
+
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        trip_count = sum(len(a["trips"]) for a in result["assignments"].values())
+        print(f"✅ {len(users)}名を{trip_count}便に割り当てました（未割り当て: {len(result['unassigned'])}名）")
+        print(f"📁 ファイル: {args.output}")
+    else:
+        print(output)
+    if recorder is not None:
+        print(instrumentation.format_breakdown(recorder), file=sys.stderr)
+        print(f"📁 トレース: {args.trace}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
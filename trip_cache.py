@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+解いた便の訪問順を週をまたいでキャッシュする
+
+利用者の多くは決まった曜日に通う（generate_weekly_data.usage_patterns の 月・水・金、週5回 など）ため、
+同じ顔ぶれの便が毎週現れるが、これまでは毎日ゼロからルート順序を計算していた。ここでは
+- (停車地の集合, 車両の種類, 事業所, 時間帯) の正規化したハッシュをキーに、解いた訪問順をSQLiteへ永続キャッシュ
+- 同じ便があれば保存した訪問順をそのまま返す（ヒット）
+- 停車地が max_diff 地点以内しか違わない便があれば、その訪問順から来ない地点を除き、
+  新しい地点を最小挿入してから 2-opt / Or-opt で改善する（ウォームスタート）。
+  WARM_START_MIN_STOPS 地点未満の便はゼロから解くほうが速いため、近い便は探さない
+- どちらもなければ optimize_route と同じ計算を行い、結果を保存する（ミス）
+を行い、件数が max_entries を超えたら最終参照の古いものから削除する（LRU）
+キャッシュは開くときに全件をメモリに読み込み、検索はメモリ上の辞書で行う。
+保存・参照時刻の更新は flush でまとめてSQLiteに書き込む
+
+停車地は座標（road_network.COORDINATE_DECIMALS 桁に丸める）で表し、同じ座標の利用者は元の並び順で続けて訪問する
+順番固定の利用者を含む便は入力の並び順に依存するためキャッシュしない
+訪問順は総距離だけで決まり最大所要時間（max_route_time）には依存しないため、キーには含めない。
+上限を超えていないかは、ヒットを含むすべての場合に build_route_result で毎回判定する
+
+    python trip_cache.py weekly_data --cache trip_cache.sqlite3
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import sqlite3
+import time
+from collections import Counter
+
+import numpy as np
+
+import instrumentation
+from generate_weekly_data import weekdays as WEEKDAY_NAMES
+from plan_snapshot import load_weekly_dir
+from road_network import COORDINATE_DECIMALS, time_band
+from route_optimizer import (
+    build_route_result,
+    improve_tour,
+    is_order_fixed,
+    nearest_neighbor_tour,
+    optimize_route,
+)
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES, build_distance_matrix, plan_day
+
+DEFAULT_CACHE_PATH = "trip_cache.sqlite3"
+DEFAULT_MAX_ENTRIES = 50000
+# ウォームスタートに使う便の最大の違い（来なくなった地点 + 新しい地点の数）
+DEFAULT_MAX_DIFF = 3
+# 近い便の候補として調べる件数（共通の地点が多い順）
+NEAR_CANDIDATES = 5
+# ウォームスタートを使う最小の停車地数（これより小さい便はゼロから解くほうが速い）
+WARM_START_MIN_STOPS = 8
+
+def stop_key(user):
+    """停車地のキー（丸めた座標）"""
+    return f"{user['lat']:.{COORDINATE_DECIMALS}f},{user['lng']:.{COORDINATE_DECIMALS}f}"
+
+def trip_context(facility, vehicle=None, band=None):
+    """
+    便の条件（事業所・車両の種類・時間帯）のキー
+
+    車両の種類は (定員, 車椅子枠)、時間帯は road_network.time_band の時間帯名
+    """
+    vehicle_type = f"{vehicle['capacity']}/{vehicle['wheelchair_capacity']}" if vehicle else "-"
+    return f"{stop_key(facility)}|{vehicle_type}|{time_band(band)[0]}"
+
+def trip_key(context, stops):
+    """(停車地の集合, 便の条件) のハッシュ。停車地は並べ替えてから使う（順不同）"""
+    digest = hashlib.sha1(context.encode("utf-8"))
+    digest.update("\n".join(sorted(stops)).encode("utf-8"))
+    return digest.hexdigest()
+
+class TripCache:
+    """
+    SQLiteによる便の訪問順の永続キャッシュ
+
+    開くときに trips の全件を entries（キー → [条件, 訪問順, 距離, 作成時刻, 最終参照時刻]）に読み込み、
+    (条件, 停車地) → キーの集合 の索引から共通の停車地が多い便を近い便の候補として探す
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_diff=DEFAULT_MAX_DIFF):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_diff = max_diff
+        self.hits = 0
+        self.warm_starts = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS trips ("
+            " key TEXT PRIMARY KEY,"
+            " context TEXT NOT NULL,"
+            " stops TEXT NOT NULL,"
+            " distance REAL NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_trips_last_access ON trips (last_access)")
+        self.connection.commit()
+
+        self.entries = {}
+        self.keys_by_stop = {}
+        for key, context, stops, distance, created_at, last_access in self.connection.execute(
+                "SELECT key, context, stops, distance, created_at, last_access FROM trips"):
+            self._add(key, [context, json.loads(stops), distance, created_at, last_access])
+        # flush で書き込む便（保存したもの / 参照時刻だけ更新したもの / 削除したもの）
+        self._stored = set()
+        self._touched = set()
+        self._deleted = set()
+
+    def _add(self, key, entry):
+        self.entries[key] = entry
+        for stop in set(entry[1]):
+            self.keys_by_stop.setdefault((entry[0], stop), set()).add(key)
+
+    def _remove(self, key):
+        context, order = self.entries.pop(key)[:2]
+        for stop in set(order):
+            keys = self.keys_by_stop[(context, stop)]
+            keys.discard(key)
+            if not keys:
+                del self.keys_by_stop[(context, stop)]
+
+    def lookup(self, context, stops, now=None, near=True):
+        """
+        便の訪問順を探す（near=False なら近い便は探さない）
+
+        Returns:
+            ("hit", 訪問順) / ("near", 近い便の訪問順) / ("miss", None)
+            訪問順は停車地キーの配列
+        """
+        now = time.time() if now is None else now
+        key = trip_key(context, stops)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self._touch(key, now)
+            self.hits += 1
+            instrumentation.count("trip_cache_hits")
+            return "hit", entry[1]
+
+        found = self._nearest(context, stops) if near else None
+        if found is not None:
+            self._touch(found[0], now)
+            self.warm_starts += 1
+            instrumentation.count("trip_cache_warm_starts")
+            return "near", found[1]
+
+        self.misses += 1
+        instrumentation.count("trip_cache_misses")
+        return "miss", None
+
+    def _nearest(self, context, stops):
+        """停車地の違いが max_diff 以内で最も小さい便 (キー, 訪問順)（なければ None）"""
+        distinct = set(stops)
+        if self.max_diff <= 0 or not distinct:
+            return None
+        common = Counter()
+        for stop in distinct:
+            common.update(self.keys_by_stop.get((context, stop), ()))
+
+        wanted = Counter(stops)
+        best = None
+        for key, _ in common.most_common(NEAR_CANDIDATES):
+            order = self.entries[key][1]
+            have = Counter(order)
+            diff = sum(((have - wanted) + (wanted - have)).values())
+            if diff <= self.max_diff and (best is None or diff < best[0]):
+                best = (diff, key, order)
+        return None if best is None else (best[1], best[2])
+
+    def _touch(self, key, now):
+        self.entries[key][4] = now
+        self._touched.add(key)
+
+    def store(self, context, order, distance, now=None):
+        """便の訪問順（停車地キーの配列）を保存し、上限を超えた分を削除（ファイルへの書き込みは flush で行う）"""
+        now = time.time() if now is None else now
+        key = trip_key(context, order)
+        if key in self.entries:
+            self._remove(key)
+        self._add(key, [context, list(order), float(distance), now, now])
+        self._stored.add(key)
+        self._deleted.discard(key)
+        self.evict()
+
+    def flush(self):
+        """保存・参照時刻の更新・削除をまとめてファイルに書き込む"""
+        self.connection.executemany("DELETE FROM trips WHERE key = ?", [(k,) for k in self._deleted])
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO trips (key, context, stops, distance, created_at, last_access)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            [(k, e[0], json.dumps(e[1]), e[2], e[3], e[4]) for k, e in
+             ((k, self.entries[k]) for k in self._stored)]
+        )
+        self.connection.executemany(
+            "UPDATE trips SET last_access = ? WHERE key = ?",
+            [(self.entries[k][4], k) for k in self._touched - self._stored if k in self.entries]
+        )
+        self.connection.commit()
+        self._stored.clear()
+        self._touched.clear()
+        self._deleted.clear()
+
+    def evict(self):
+        """件数が上限を超えていれば最終参照の古いものから削除"""
+        overflow = len(self) - self.max_entries
+        if overflow <= 0:
+            return
+        keys = heapq.nsmallest(overflow, self.entries, key=lambda k: self.entries[k][4])
+        for key in keys:
+            self._remove(key)
+            self._stored.discard(key)
+            self._deleted.add(key)
+        self.evictions += len(keys)
+        instrumentation.count("trip_cache_evictions", len(keys))
+
+    def stats(self):
+        total = self.hits + self.warm_starts + self.misses
+        return {
+            "hits": self.hits,
+            "warm_starts": self.warm_starts,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self),
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+def _warm_start_tour(dist, cached_order, keys):
+    """
+    近い便の訪問順から初期ルートを作る
+
+    来なくなった停車地を除き、新しい利用者を追加距離が最小の位置に入れる
+    （keys は利用者ごとの停車地キー、ノードは利用者のインデックス + 1）
+    """
+    nodes_by_key = {}
+    for node, key in enumerate(keys, start=1):
+        nodes_by_key.setdefault(key, []).append(node)
+    tour = [nodes_by_key[key].pop(0) for key in cached_order if nodes_by_key.get(key)]
+    for node in (n for nodes in nodes_by_key.values() for n in nodes):
+        path = np.array([0] + tour + [0])
+        costs = dist[path[:-1], node] + dist[node, path[1:]] - dist[path[:-1], path[1:]]
+        tour.insert(int(np.argmin(costs)), node)
+    return tour
+
+def optimize_route_cached(facility, users, cache, vehicle=None, band=None, dist=None, indices=None,
+                          max_route_time=None, time_limit=None):
+    """
+    キャッシュを使って optimize_route と同じ結果の形を返す
+
+    Args:
+        cache: TripCache
+        vehicle: 便を走らせる車両（定員・車椅子枠をキーに使う）
+        band: 出発時刻（"HH:MM" / 分）または時間帯名（road_network.time_band）
+        dist / indices / max_route_time / time_limit: optimize_route と同じ
+            （max_route_time はキャッシュのキーに含めず、ヒットした訪問順もその上限で判定し直す）
+
+    Returns:
+        ({route, totalDistance, order, estimatedTime}, "hit" / "near" / "miss" / "skip")
+        max_route_time 指定時は withinMaxTime、上限を超える場合は exceedsMaxTimeBy と warning も付く
+    """
+    if not users or any(is_order_fixed(u) for u in users):
+        return optimize_route(facility, users, dist=dist, indices=indices, max_route_time=max_route_time,
+                              time_limit=time_limit), "skip"
+
+    if dist is None:
+        dist = build_distance_matrix(facility, users)
+    elif indices is not None:
+        rows = [0] + list(indices)
+        dist = dist[np.ix_(rows, rows)]
+
+    context = trip_context(facility, vehicle, band)
+    keys = [stop_key(u) for u in users]
+    status, cached_order = cache.lookup(context, keys, near=len(users) >= WARM_START_MIN_STOPS)
+    with instrumentation.span("cached_route_ordering", stops=len(users), status=status):
+        if status == "hit":
+            tour = _warm_start_tour(dist, cached_order, keys)
+        elif status == "near":
+            tour = improve_tour(dist, _warm_start_tour(dist, cached_order, keys), time_limit=time_limit)
+        else:
+            tour = nearest_neighbor_tour(dist, list(range(1, len(users) + 1)))
+            tour = improve_tour(dist, tour, time_limit=time_limit)
+
+    # ヒットでも、保存したときとは別の max_route_time で呼ばれることがあるため、ここで毎回判定する
+    result = build_route_result(facility, users, [n - 1 for n in tour], dist, max_route_time)
+    if status != "hit":
+        cache.store(context, [keys[n - 1] for n in tour], result["totalDistance"])
+    return result, status
+
+def order_plan_cached(facility, users, vehicles, plan, cache, dist=None, band=None):
+    """
+    plan_day の計画の各便を optimize_route_cached の訪問順に並べ替え、距離を付ける
+
+    Returns:
+        {"hit": 件数, "near": 件数, "miss": 件数, "skip": 件数}
+    """
+    if dist is None:
+        dist = build_distance_matrix(facility, users)
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    vehicle_by_id = {v["id"]: v for v in vehicles}
+    counts = {"hit": 0, "near": 0, "miss": 0, "skip": 0}
+    for vehicle_id, assignment in plan["assignments"].items():
+        for trip in assignment["trips"]:
+            indices = [index_by_id[u["id"]] for u in trip["users"]]
+            result, status = optimize_route_cached(facility, trip["users"], cache, vehicle=vehicle_by_id.get(vehicle_id),
+                                                   band=band, dist=dist, indices=indices)
+            trip["users"] = result["order"]
+            trip["distance"] = result["totalDistance"]
+            counts[status] += 1
+    cache.flush()
+    return counts
+
+def main():
+    """weekly_data 形式のディレクトリの全曜日を計画し、便の訪問順をキャッシュから求める"""
+    parser = argparse.ArgumentParser(description='便の訪問順を週をまたいでキャッシュして週間計画を作成')
+    parser.add_argument('input', help='weekly_data 形式のディレクトリ')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='キャッシュファイル（SQLite）')
+    parser.add_argument('--max-entries', type=int, default=DEFAULT_MAX_ENTRIES, help='キャッシュの最大件数')
+    parser.add_argument('--max-diff', type=int, default=DEFAULT_MAX_DIFF, help='ウォームスタートに使う便の最大の違い（地点数）')
+    parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+    args = parser.parse_args()
+
+    users, rosters = load_weekly_dir(args.input)
+    cache = TripCache(args.cache, max_entries=args.max_entries, max_diff=args.max_diff)
+    start = time.perf_counter()
+    days = 0
+    for day in sorted(rosters):
+        day_users = [users[row] for row in rosters[day]]
+        if not day_users:
+            continue
+        days += 1
+        plan = plan_day(DEFAULT_FACILITY, day_users, DEFAULT_VEHICLES, seed=args.seed)
+        counts = order_plan_cached(DEFAULT_FACILITY, day_users, DEFAULT_VEHICLES, plan, cache)
+        print(f"  {WEEKDAY_NAMES[day]}: {len(day_users)}名 → ヒット {counts['hit']}便 / ウォームスタート {counts['near']}便"
+              f" / 計算 {counts['miss'] + counts['skip']}便")
+    elapsed = time.perf_counter() - start
+    stats = cache.stats()
+    cache.close()
+
+    print(f"✅ {days}日分の便の訪問順を求めました（{elapsed:.2f}秒, ヒット率 {stats['hit_rate']:.0%}）")
+    print(f"📁 キャッシュ: {args.cache}（{stats['entries']}件）")
+
+if __name__ == "__main__":
+    main()
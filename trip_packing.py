@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+車両ごとの利用者を最少の便数に詰める（便分割）
+
+splitIntoTrips（legacy_planner.split_into_trips）は到着順に詰め、定員か車椅子枠の
+どちらかに達するたびに新しい便を始めるため、便数が必要以上に増える（1便ごとに事業所との往復が増える）。
+また一般利用者は既存の便に車椅子数を確認せずに追加される。
+
+ここでは1人が座席1つ（車椅子利用者はさらに車椅子枠1つ）を使うため、
+    max(⌈人数 / 定員⌉, ⌈車椅子利用者数 / 車椅子枠⌉)
+便あれば必ず全員を乗せられる。この便数に固定し、
+1. 事業所から遠い利用者を各便の起点に選び（互いに離れるように）、
+   車椅子利用者 → 一般利用者（それぞれ事業所から遠い順）に、空きのある便のうち
+   ルートへの挿入距離が最小の便へ入れる（first-fit-decreasing）
+2. 別の便への移動・2人の入れ替えで総距離が短くなる限り繰り返す
+3. 各便の順路を 2-opt / Or-opt で改善する
+の手順で、便ごとにまとまった（総距離の短い）分け方を作る
+"""
+
+import math
+
+import numpy as np
+
+from route_optimizer import improve_tour
+from transport_planner import build_distance_matrix, route_distance
+
+# 局所改善の最大周回数
+MAX_IMPROVEMENT_ROUNDS = 50
+
+def min_trip_count(num_users, num_wheelchair, capacity, wheelchair_capacity):
+    """
+    全員を乗せるのに必要な最少の便数（車椅子枠がなく車椅子利用者がいる場合は None）
+    """
+    wheelchair_capacity = min(wheelchair_capacity, capacity)
+    if num_users == 0:
+        return 0
+    if capacity <= 0 or (num_wheelchair > 0 and wheelchair_capacity <= 0):
+        return None
+    trips = math.ceil(num_users / capacity)
+    if num_wheelchair > 0:
+        trips = max(trips, math.ceil(num_wheelchair / wheelchair_capacity))
+    return trips
+
+def _insertion(dist, tour, node):
+    """tour（事業所を含まない）に node を入れる最小の追加距離と位置"""
+    path = np.array([0] + tour + [0])
+    costs = dist[path[:-1], node] + dist[node, path[1:]] - dist[path[:-1], path[1:]]
+    position = int(np.argmin(costs))
+    return float(costs[position]), position
+
+def _removal(dist, tour, position):
+    """tour の position の地点を外したときに減る距離"""
+    prev = tour[position - 1] if position > 0 else 0
+    nxt = tour[position + 1] if position + 1 < len(tour) else 0
+    node = tour[position]
+    return float(dist[prev, node] + dist[node, nxt] - dist[prev, nxt])
+
+def _seed_nodes(dist, nodes, count):
+    """各便の起点: 事業所から最も遠い利用者から始め、既に選んだ起点から最も遠い利用者を順に選ぶ"""
+    nodes = np.asarray(nodes)
+    seeds = [int(nodes[np.argmax(dist[0, nodes])])]
+    nearest = dist[seeds[0], nodes].copy()
+    for _ in range(1, count):
+        seeds.append(int(nodes[np.argmax(nearest)]))
+        np.minimum(nearest, dist[seeds[-1], nodes], out=nearest)
+    return seeds
+
+def pack_trips(dist, nodes, wheelchair, capacity, wheelchair_capacity, max_rounds=MAX_IMPROVEMENT_ROUNDS):
+    """
+    利用者（距離行列のインデックス）を最少の便数に分け、各便の訪問順を返す
+
+    Args:
+        dist: 事業所をインデックス0とする距離行列
+        nodes: 利用者のインデックス（1始まり）
+        wheelchair: nodes と同じ並びの車椅子利用者フラグ
+        capacity, wheelchair_capacity: 車両の定員・車椅子枠
+        max_rounds: 局所改善の最大周回数
+
+    Returns:
+        (tours, unplaced)
+        tours: 便ごとの訪問順 [[インデックス, ...], ...]
+        unplaced: 車椅子枠がないため乗せられなかった利用者のインデックス
+    """
+    nodes = [int(n) for n in nodes]
+    is_wheelchair = {n: bool(w) for n, w in zip(nodes, wheelchair)}
+    wheelchair_capacity = min(wheelchair_capacity, capacity)
+    unplaced = []
+    if wheelchair_capacity <= 0:
+        unplaced = [n for n in nodes if is_wheelchair[n]]
+        nodes = [n for n in nodes if not is_wheelchair[n]]
+    count = min_trip_count(len(nodes), sum(is_wheelchair[n] for n in nodes), capacity, wheelchair_capacity)
+    if not count:
+        return [], unplaced + ([] if count == 0 else nodes)
+
+    # 1. first-fit-decreasing: 車椅子利用者 → 一般利用者、それぞれ事業所から遠い順
+    seeds = _seed_nodes(dist, nodes, count)
+    tours = [[seed] for seed in seeds]
+    seats = [capacity - 1] * count
+    wheelchair_seats = [wheelchair_capacity - is_wheelchair[seed] for seed in seeds]
+    seeded = set(seeds)
+    rest = sorted((n for n in nodes if n not in seeded), key=lambda n: (not is_wheelchair[n], -dist[0, n], n))
+    for node in rest:
+        best = None
+        for t, tour in enumerate(tours):
+            if seats[t] <= 0 or (is_wheelchair[node] and wheelchair_seats[t] <= 0):
+                continue
+            cost, position = _insertion(dist, tour, node)
+            if best is None or cost < best[0]:
+                best = (cost, t, position)
+        if best is None:
+            # 起点の選び方によって車椅子枠が偏った場合（通常は起こらない）
+            unplaced.append(node)
+            continue
+        _, t, position = best
+        tours[t].insert(position, node)
+        seats[t] -= 1
+        wheelchair_seats[t] -= is_wheelchair[node]
+
+    # 2. 局所改善: 別の便への移動・2人の入れ替え
+    for _ in range(max_rounds):
+        improved = False
+        for a in range(count):
+            position = 0
+            while position < len(tours[a]):
+                if _relocate_or_swap(dist, tours, seats, wheelchair_seats, is_wheelchair, a, position):
+                    improved = True
+                    continue
+                position += 1
+        if not improved:
+            break
+
+    # 3. 各便の順路を改善
+    tours = [improve_tour(dist, tour) for tour in tours if tour]
+    return tours, unplaced
+
+def _relocate_or_swap(dist, tours, seats, wheelchair_seats, is_wheelchair, a, position):
+    """tours[a][position] の利用者を別の便へ移すか入れ替えて総距離が短くなるなら適用する"""
+    node = tours[a][position]
+    gain = _removal(dist, tours[a], position)
+    reduced_a = tours[a][:position] + tours[a][position + 1:]
+    best = None
+
+    for b, tour in enumerate(tours):
+        if b == a:
+            continue
+        # 移動
+        if seats[b] > 0 and (not is_wheelchair[node] or wheelchair_seats[b] > 0):
+            cost, insert_at = _insertion(dist, tour, node)
+            delta = cost - gain
+            if delta < -1e-9 and (best is None or delta < best[0]):
+                best = (delta, b, None, insert_at, None)
+        # 入れ替え（車椅子枠の増減を確認）
+        for other_position, other in enumerate(tour):
+            change = is_wheelchair[other] - is_wheelchair[node]
+            if change > 0 and wheelchair_seats[a] < change:
+                continue
+            if change < 0 and wheelchair_seats[b] < -change:
+                continue
+            reduced_b = tour[:other_position] + tour[other_position + 1:]
+            cost_a, insert_a = _insertion(dist, reduced_a, other)
+            cost_b, insert_b = _insertion(dist, reduced_b, node)
+            delta = cost_a + cost_b - gain - _removal(dist, tour, other_position)
+            if delta < -1e-9 and (best is None or delta < best[0]):
+                best = (delta, b, other_position, insert_b, insert_a)
+
+    if best is None:
+        return False
+    _, b, other_position, insert_b, insert_a = best
+    tours[a] = reduced_a
+    if other_position is None:
+        tours[b].insert(insert_b, node)
+        seats[a] += 1
+        seats[b] -= 1
+        wheelchair_seats[a] += is_wheelchair[node]
+        wheelchair_seats[b] -= is_wheelchair[node]
+    else:
+        other = tours[b].pop(other_position)
+        tours[b].insert(insert_b, node)
+        tours[a].insert(insert_a, other)
+        change = is_wheelchair[other] - is_wheelchair[node]
+        wheelchair_seats[a] -= change
+        wheelchair_seats[b] += change
+    return True
+
+def pack_into_trips(facility, users, capacity, wheelchair_capacity, dist=None, indices=None):
+    """
+    split_into_trips と同じ形 [{"users": [...]}, ...] で利用者を最少の便数に分ける
+    （便の users は訪問順。車椅子枠がなく乗せられない利用者は含まない）
+
+    dist が1日全体の距離行列の場合は indices に各利用者の行インデックス（事業所は0）を渡す
+    """
+    if not users:
+        return []
+    if dist is None:
+        dist = build_distance_matrix(facility, users)
+        indices = range(1, len(users) + 1)
+    elif indices is None:
+        indices = range(1, len(users) + 1)
+    user_by_index = dict(zip(indices, users))
+    tours, _ = pack_trips(dist, list(user_by_index), [u["wheelchair"] for u in user_by_index.values()],
+                          capacity, wheelchair_capacity)
+    return [{"users": [user_by_index[n] for n in tour]} for tour in tours]
+
+def repack_assignments(facility, users, vehicles, assignments, dist=None):
+    """
+    割り当て結果（{車両ID: {"trips": [...]}}）の車両ごとの利用者を pack_into_trips で詰め直す
+
+    Returns:
+        (詰め直した割り当て, 車椅子枠がないため乗せられなかった利用者)
+        元の assignments は変更しない
+    """
+    if dist is None:
+        dist = build_distance_matrix(facility, users)
+    index_by_id = {u["id"]: i for i, u in enumerate(users, start=1)}
+    vehicle_by_id = {v["id"]: v for v in vehicles}
+    repacked = {}
+    unplaced = []
+    for vehicle_id, assignment in assignments.items():
+        members = [u for trip in assignment["trips"] for u in trip["users"]]
+        vehicle = vehicle_by_id[vehicle_id]
+        trips = pack_into_trips(facility, members, vehicle["capacity"], vehicle["wheelchair_capacity"],
+                                dist=dist, indices=[index_by_id[u["id"]] for u in members])
+        repacked[vehicle_id] = {**assignment, "trips": trips}
+        placed = {u["id"] for trip in trips for u in trip["users"]}
+        unplaced += [u for u in members if u["id"] not in placed]
+    return repacked, unplaced
+
+def trips_distance(dist, tours):
+    """便ごとの訪問順（事業所から出て戻る）の総距離（km）"""
+    return sum(route_distance(dist, tour) for tour in tours)
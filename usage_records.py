@@ -0,0 +1,486 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+利用実績（UsageRecord）の追記型ストアと月次集計
+
+usageRecordUtils.js の saveUsageRecords は利用実績を localStorage の JSON 配列として保存し、
+保存のたびに全件を読み直して書き直す。1年分・複数事業所の請求集計には向かないため、
+ここでは利用実績を月ごとのディレクトリに列ごとの .npy として追記していく
+
+ディレクトリ構成:
+    <store>/meta.json          形式のバージョン・次の通し番号・加算コードの並び
+    <store>/strings.jsonl      利用者ID・事業所・サービスコード・車両IDの文字列表（1行1文字列、追記のみ）
+    <store>/2025-10/000001/    追記1回分（セグメント）。RECORD_COLUMNS の列ごとに <列名>.npy
+
+追記は
+1. 全ての月のセグメントを一時ディレクトリ（.000001.tmp）に書く
+2. 新しい文字列を strings.jsonl に追記し、進めた next_sequence と公開待ちのセグメント
+   （pending_segments）を meta.json に書く
+3. 一時ディレクトリを正式な名前に変え、pending_segments を消す
+の順に行う。途中で止まった場合、開くときに 2 より前なら一時ディレクトリを消し（追記はなかったことになる）、
+2 より後なら残りの名前の変更を済ませる（複数月への追記もまとめて反映される）。
+通し番号が使われずに飛ぶことはあるが、重複はしない
+
+同じ利用者・同じ利用日・同じ事業所の実績は saveUsageRecords と同じく後から保存したものが有効で、
+集計時に通し番号の大きい方を残す（compact で古いものを物理的に取り除ける）
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+FORMAT_VERSION = 1
+
+DEFAULT_SERVICE_TYPE = "通常規模型デイサービス"
+DEFAULT_SERVICE_CODE = "321111"
+STATUSES = ["利用予定", "利用済", "欠席", "キャンセル"]
+BILLABLE_STATUSES = ["利用済"]
+
+# 加算・減算コード（ServiceCodeManager.jsx の既定値）と generate_sample_users_v2.py の
+# additionalServices のキー。ビットの位置はこの並び（meta.json に保存し、未知のコードは後ろに追加）
+ADDITIONAL_SERVICES = [
+    ("bathing", "322101"),       # 入浴介助加算
+    ("training", "322201"),      # 個別機能訓練加算（Ⅰ）
+    ("no_transport", "322301"),  # 送迎減算
+    ("nutrition", "322401"),     # 栄養改善加算
+    ("oral", "322501"),          # 口腔機能向上加算
+]
+MAX_ADDITIONAL_CODES = 16
+
+RECORD_COLUMNS = {
+    "usage_day": np.int32,          # 1970-01-01 からの日数
+    "user": np.int32,               # 文字列表の番号
+    "facility": np.int32,           # 文字列表の番号
+    "service_code": np.int32,       # 文字列表の番号
+    "additional_mask": np.uint16,   # 加算コードのビット
+    "status": np.uint8,             # STATUSES の番号
+    "vehicle": np.int32,            # 文字列表の番号（未割当は空文字列の0）
+    "pickup_minutes": np.int16,     # 送迎時刻（0時からの分、空欄は -1）
+    "sequence": np.int64,           # 追記の通し番号
+}
+
+# 集計のキーにできる列（month は usage_day から作る）
+GROUP_COLUMNS = ["user", "facility", "service_code", "status", "vehicle", "month"]
+STRING_GROUP_COLUMNS = {"user", "facility", "service_code", "vehicle"}
+
+def to_days(dates):
+    """ISO 8601 の日付（"2025-10-01"）の配列を 1970-01-01 からの日数に変換"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64).astype(np.int32)
+
+def month_of_days(days):
+    """日数の配列を月（1970-01 からの月数）に変換"""
+    return np.asarray(days).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+
+def month_label(month):
+    """1970-01 からの月数を "2025-10" 形式に"""
+    return str(np.datetime64(int(month), "M"))
+
+def _to_minutes(value):
+    if not value:
+        return -1
+    hour, _, minute = value.partition(":")
+    return int(hour) * 60 + int(minute or 0)
+
+class UsageRecordStore:
+    """月ごとに分割した列指向の利用実績ストア（追記のみ）"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        meta_path = os.path.join(directory, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+            if self.meta["format_version"] != FORMAT_VERSION:
+                raise ValueError(f"未対応の形式です: version {self.meta['format_version']}")
+        else:
+            self.meta = {
+                "format_version": FORMAT_VERSION,
+                "next_sequence": 0,
+                "additional_codes": [code for _, code in ADDITIONAL_SERVICES],
+            }
+        self.strings = [""]
+        self.string_index = {"": 0}
+        strings_path = os.path.join(directory, "strings.jsonl")
+        if os.path.exists(strings_path):
+            with open(strings_path, encoding="utf-8") as f:
+                for line in f:
+                    value = json.loads(line)
+                    self.string_index[value] = len(self.strings)
+                    self.strings.append(value)
+        self._new_strings = []
+        self._recover()
+
+    def _recover(self):
+        """途中で止まった追記を片付ける（公開待ちのセグメントは反映し、それ以外の一時ディレクトリは消す）"""
+        pending = {os.path.join(self.directory, temporary) for temporary, _ in self.meta.get("pending_segments", [])}
+        if pending:
+            self._publish_pending()
+        for month in self.months():
+            month_dir = os.path.join(self.directory, month)
+            for name in os.listdir(month_dir):
+                path = os.path.join(month_dir, name)
+                if name.startswith(".") and name.endswith(".tmp") and path not in pending:
+                    shutil.rmtree(path)
+
+    # -- 文字列表・メタデータ ---------------------------------------------
+
+    def _encode(self, values):
+        """文字列の配列を文字列表の番号（int32）に変換（未登録の文字列は追記対象にする）"""
+        index = self.string_index
+        for value in set(values).difference(index):
+            index[value] = len(self.strings)
+            self.strings.append(value)
+            self._new_strings.append(value)
+        return np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=len(values))
+
+    def additional_bit(self, code):
+        """加算コードのビット位置（未登録なら追加）"""
+        codes = self.meta["additional_codes"]
+        if code not in codes:
+            if len(codes) >= MAX_ADDITIONAL_CODES:
+                raise ValueError(f"加算コードは{MAX_ADDITIONAL_CODES}種類までです: {code}")
+            codes.append(code)
+        return codes.index(code)
+
+    def _commit_meta(self):
+        """
+        新しい文字列を追記し、meta.json を置き換える
+
+        セグメントを公開する（一時ディレクトリの名前を変える）前に呼ぶ。
+        公開したセグメントが参照する文字列と通し番号が、先にファイルに残るようにするため
+        """
+        if self._new_strings:
+            with open(os.path.join(self.directory, "strings.jsonl"), "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(value, ensure_ascii=False) + "\n" for value in self._new_strings)
+            self._new_strings = []
+        meta_path = os.path.join(self.directory, "meta.json")
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False, indent=2)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    # -- 追記 -------------------------------------------------------------
+
+    def append_columns(self, usage_dates, user_ids, facility="", service_codes=DEFAULT_SERVICE_CODE,
+                       additional_masks=0, statuses="利用予定", vehicle_ids="", pickup_times=""):
+        """
+        列ごとの配列で利用実績を追記する
+
+        usage_dates は ISO 8601 の日付（または datetime64[D]）、user_ids 以外は
+        1つの値を渡すと全件に同じ値を使う。additional_masks は加算コードのビット（additional_bit）
+
+        Returns:
+            追記した件数
+        """
+        days = to_days(usage_dates)
+        count = len(days)
+        if count == 0:
+            return 0
+
+        def expand(values):
+            return [values] * count if isinstance(values, str) else list(values)
+
+        status_index = {status: i for i, status in enumerate(STATUSES)}
+        statuses = expand(statuses)
+        unknown = set(statuses).difference(status_index)
+        if unknown:
+            raise ValueError(f"不明なステータスです: {sorted(unknown)}")
+        pickup_table = {value: _to_minutes(value) for value in set(expand(pickup_times))}
+        sequence_start = self.meta["next_sequence"]
+        columns = {
+            "usage_day": days,
+            "user": self._encode(list(user_ids)),
+            "facility": self._encode(expand(facility)),
+            "service_code": self._encode(expand(service_codes)),
+            "additional_mask": np.broadcast_to(np.asarray(additional_masks, dtype=np.uint16), (count,)),
+            "status": np.fromiter(map(status_index.__getitem__, statuses), dtype=np.uint8, count=count),
+            "vehicle": self._encode(expand(vehicle_ids)),
+            "pickup_minutes": np.fromiter(map(pickup_table.__getitem__, expand(pickup_times)),
+                                          dtype=np.int16, count=count),
+            "sequence": np.arange(sequence_start, sequence_start + count, dtype=np.int64),
+        }
+
+        # 月ごとに分けて、それぞれ新しいセグメントとして書く
+        months = month_of_days(days)
+        order = np.argsort(months, kind="stable")
+        boundaries = np.flatnonzero(np.diff(months[order])) + 1
+        pending = []
+        for part in np.split(order, boundaries):
+            pending.append(self._write_segment(month_label(months[part[0]]), {
+                name: np.ascontiguousarray(values[part]).astype(RECORD_COLUMNS[name], copy=False)
+                for name, values in columns.items()
+            }))
+        self.meta["next_sequence"] = sequence_start + count
+        self.meta["pending_segments"] = pending
+        self._commit_meta()
+        self._publish_pending()
+        return count
+
+    def append_records(self, records, facility=""):
+        """UsageRecord.toJSON() 形式の辞書のリストを追記する"""
+        records = list(records)
+        masks = []
+        for record in records:
+            mask = 0
+            for code in record.get("additional_codes") or []:
+                mask |= 1 << self.additional_bit(code)
+            masks.append(mask)
+        return self.append_columns(
+            [r["usage_date"] for r in records],
+            [str(r["user_id"]) for r in records],
+            facility=[r.get("facility", facility) for r in records],
+            service_codes=[r.get("service_code") or DEFAULT_SERVICE_CODE for r in records],
+            additional_masks=np.array(masks, dtype=np.uint16),
+            statuses=[r.get("status") or "利用予定" for r in records],
+            vehicle_ids=[str(r.get("vehicle_id") or "") for r in records],
+            pickup_times=[r.get("pickup_time") or "" for r in records],
+        )
+
+    def _write_segment(self, month, columns):
+        """
+        セグメントを一時ディレクトリに書く（書きかけのセグメントが読まれないよう、名前の変更は後で行う）
+
+        Returns:
+            [一時ディレクトリ, 正式な名前]（ストアのディレクトリからの相対パス）
+        """
+        month_dir = os.path.join(self.directory, month)
+        os.makedirs(month_dir, exist_ok=True)
+        existing = [int(name) for name in os.listdir(month_dir) if name.isdigit()]
+        name = f"{max(existing, default=0) + 1:06d}"
+        temporary = os.path.join(month_dir, f".{name}.tmp")
+        os.makedirs(temporary)
+        for column, values in columns.items():
+            np.save(os.path.join(temporary, f"{column}.npy"), values)
+        return [os.path.join(month, f".{name}.tmp"), os.path.join(month, name)]
+
+    def _publish_pending(self):
+        """meta.json の公開待ちのセグメントの名前を変えて読めるようにする"""
+        for temporary, final in self.meta.pop("pending_segments", []):
+            temporary = os.path.join(self.directory, temporary)
+            if os.path.exists(temporary):
+                os.rename(temporary, os.path.join(self.directory, final))
+        self._commit_meta()
+
+    # -- 読み込み ---------------------------------------------------------
+
+    def months(self):
+        """保存されている月（"2025-10" 形式）の一覧"""
+        return sorted(name for name in os.listdir(self.directory)
+                      if len(name) == 7 and name[4] == "-" and os.path.isdir(os.path.join(self.directory, name)))
+
+    def _segments(self, month):
+        month_dir = os.path.join(self.directory, month)
+        return [os.path.join(month_dir, name) for name in sorted(os.listdir(month_dir)) if name.isdigit()]
+
+    def load_columns(self, start_month=None, end_month=None, columns=None):
+        """
+        期間（"2025-01" 〜 "2025-12"、両端を含む）の列を連結して返す
+
+        各セグメントの .npy はメモリマップで開き、必要な列だけを読む
+        """
+        columns = list(columns or RECORD_COLUMNS)
+        parts = {name: [] for name in columns}
+        for month in self.months():
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            for segment in self._segments(month):
+                for name in columns:
+                    parts[name].append(np.load(os.path.join(segment, f"{name}.npy"), mmap_mode="r"))
+        return {
+            name: np.concatenate(arrays) if arrays else np.zeros(0, dtype=RECORD_COLUMNS[name])
+            for name, arrays in parts.items()
+        }
+
+    @staticmethod
+    def latest_mask(columns):
+        """同じ利用者・利用日・事業所の実績のうち、最後に保存したものだけを True にする"""
+        count = len(columns["sequence"])
+        if count == 0:
+            return np.zeros(0, dtype=bool)
+        order = np.lexsort((columns["sequence"], columns["usage_day"], columns["user"], columns["facility"]))
+        user, day, facility = columns["user"][order], columns["usage_day"][order], columns["facility"][order]
+        last = np.ones(count, dtype=bool)
+        last[:-1] = (user[1:] != user[:-1]) | (day[1:] != day[:-1]) | (facility[1:] != facility[:-1])
+        mask = np.zeros(count, dtype=bool)
+        mask[order[last]] = True
+        return mask
+
+    # -- 集計 -------------------------------------------------------------
+
+    def aggregate(self, start_month=None, end_month=None, by=("user", "service_code"),
+                  statuses=BILLABLE_STATUSES, facility=None, latest_only=True):
+        """
+        利用実績を by の列ごとに集計する
+
+        Args:
+            start_month, end_month: 期間（"2025-01" 形式、両端を含む。省略時は全期間）
+            by: 集計キー（GROUP_COLUMNS から選ぶ）
+            statuses: 集計対象のステータス（None なら全件）
+            facility: 事業所で絞り込む（None なら全事業所）
+            latest_only: 同じ利用者・利用日の実績は最後に保存したものだけを数える
+
+        Returns:
+            [{キーの列..., "days": 利用日数, <加算のキー>: 算定日数, ...}] をキーの順に並べたリスト
+        """
+        by = list(by)
+        unknown = set(by).difference(GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"集計キーにできない列です: {sorted(unknown)}")
+        columns = self.load_columns(start_month, end_month)
+        keep = self.latest_mask(columns) if latest_only else np.ones(len(columns["sequence"]), dtype=bool)
+        if statuses is not None:
+            keep &= np.isin(columns["status"], [STATUSES.index(s) for s in statuses])
+        if facility is not None:
+            keep &= columns["facility"] == self.string_index.get(facility, -1)
+
+        selected = {name: np.asarray(values)[keep] for name, values in columns.items()}
+        selected["month"] = month_of_days(selected["usage_day"])
+        count = int(keep.sum())
+
+        # キーの列を混合基数で1つの整数にまとめ、np.unique でグループ番号を振る
+        combined = np.zeros(count, dtype=np.int64)
+        bases = []
+        for name in by:
+            values = selected[name].astype(np.int64)
+            low = int(values.min()) if count else 0
+            base = int(values.max()) - low + 1 if count else 1
+            combined = combined * base + (values - low)
+            bases.append((name, low, base))
+        groups, inverse = np.unique(combined, return_inverse=True)
+
+        totals = {"days": np.bincount(inverse, minlength=len(groups))}
+        masks = selected["additional_mask"]
+        names = dict((code, key) for key, code in ADDITIONAL_SERVICES)
+        for bit, code in enumerate(self.meta["additional_codes"]):
+            flags = (masks >> bit) & 1
+            if flags.any() or code in names:
+                totals[names.get(code, code)] = np.bincount(inverse, weights=flags, minlength=len(groups)).astype(np.int64)
+
+        # グループ番号からキーの値に戻す
+        decoded = {}
+        remainder = groups.copy()
+        for name, low, base in reversed(bases):
+            decoded[name] = remainder % base + low
+            remainder //= base
+        result = []
+        for g in range(len(groups)):
+            row = {}
+            for name in by:
+                value = int(decoded[name][g])
+                if name in STRING_GROUP_COLUMNS:
+                    row[name] = self.strings[value]
+                elif name == "status":
+                    row[name] = STATUSES[value]
+                else:
+                    row[name] = month_label(value)
+            for key, values in totals.items():
+                row[key] = int(values[g])
+            result.append(row)
+        return result
+
+    # -- 保守 -------------------------------------------------------------
+
+    def compact(self, month):
+        """月のセグメントを1つにまとめ、上書きされた古い実績を取り除く"""
+        segments = self._segments(month)
+        if len(segments) <= 1:
+            return
+        columns = self.load_columns(month, month)
+        keep = self.latest_mask(columns)
+        # まとめたセグメントを書き終えてから古いセグメントを消す（通し番号はそのまま残す）
+        self.meta["pending_segments"] = [
+            self._write_segment(month, {name: np.asarray(values)[keep] for name, values in columns.items()})
+        ]
+        self._commit_meta()
+        self._publish_pending()
+        for segment in segments:
+            shutil.rmtree(segment)
+
+def records_from_plan(plan, usage_date, vehicle_prefix="", service_codes=None):
+    """
+    送迎計画（plan_day の形）から利用実績を作る（generateUsageRecordsFromPlan に相当）
+
+    JS 版は加算コードを空で作るが、ここでは利用者の additionalServices（bathing など）から
+    加算コードを付ける
+    """
+    codes = dict((key, code) for key, code in ADDITIONAL_SERVICES)
+    default_code = (service_codes or {}).get("basic", DEFAULT_SERVICE_CODE)
+    records = []
+    for vehicle_id, assignment in plan["assignments"].items():
+        for trip_no, trip in enumerate(assignment["trips"], start=1):
+            for user in trip["users"]:
+                services = user.get("additionalServices") or {}
+                records.append({
+                    "user_id": str(user.get("user_id") or user["id"]),
+                    "usage_date": usage_date,
+                    "service_type": DEFAULT_SERVICE_TYPE,
+                    "service_code": user.get("serviceCode") or default_code,
+                    "additional_codes": [codes[key] for key in codes if services.get(key)],
+                    "status": "利用予定",
+                    "vehicle_id": f"{vehicle_prefix}{vehicle_id}",
+                    "route_id": f"route_vehicle{vehicle_id}_trip{trip_no}",
+                    "pickup_time": user.get("pickupTime") or user.get("pickup_time") or "08:00",
+                    "notes": user.get("notes", ""),
+                })
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description='利用実績の追記型ストアと月次集計')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='利用実績のJSON（UsageRecordManager のエクスポート形式）を追記')
+    import_parser.add_argument('store', help='ストアのディレクトリ')
+    import_parser.add_argument('input', nargs='+', help='JSONファイル')
+    import_parser.add_argument('--facility', default='', help='事業所名')
+
+    aggregate_parser = subparsers.add_parser('aggregate', help='期間の利用実績を集計')
+    aggregate_parser.add_argument('store', help='ストアのディレクトリ')
+    aggregate_parser.add_argument('--from', dest='start', help='開始月（2025-01 形式）')
+    aggregate_parser.add_argument('--to', dest='end', help='終了月（2025-12 形式）')
+    aggregate_parser.add_argument('--by', nargs='+', default=['user', 'service_code'], choices=GROUP_COLUMNS,
+                                  help='集計キー')
+    aggregate_parser.add_argument('--facility', help='事業所で絞り込む')
+    aggregate_parser.add_argument('--all-statuses', action='store_true', help='利用済以外のステータスも数える')
+    aggregate_parser.add_argument('--output', help='出力CSV（省略時は標準出力）')
+
+    compact_parser = subparsers.add_parser('compact', help='月ごとのセグメントをまとめる')
+    compact_parser.add_argument('store', help='ストアのディレクトリ')
+    args = parser.parse_args()
+
+    store = UsageRecordStore(args.store)
+    if args.command == 'import':
+        total = 0
+        for path in args.input:
+            with open(path, encoding="utf-8") as f:
+                total += store.append_records(json.load(f), facility=args.facility)
+        print(f"✅ {total:,}件の利用実績を追記しました")
+    elif args.command == 'aggregate':
+        start = time.perf_counter()
+        rows = store.aggregate(args.start, args.end, by=args.by, facility=args.facility,
+                               statuses=None if args.all_statuses else BILLABLE_STATUSES)
+        elapsed = time.perf_counter() - start
+        fieldnames = list(rows[0]) if rows else list(args.by) + ["days"]
+        if args.output:
+            with open(args.output, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+            print(f"✅ {len(rows):,}行に集計しました（{elapsed:.2f}秒）")
+            print(f"📁 ファイル: {args.output}")
+        else:
+            writer = csv.DictWriter(sys.stdout, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        for month in store.months():
+            store.compact(month)
+        print(f"✅ {len(store.months())}か月分のセグメントをまとめました")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+週間一括送迎計画
+
+1つ以上の事業所の週間データ（月曜日〜日曜日の名簿）について、
+全曜日の送迎計画をプロセスプールで並列に作成し、曜日ごとのJSONに書き出す
+
+入力はバイナリスナップショット（plan_snapshot.py）で各プロセスに共有する
+各タスクに渡すのはファイルパスと曜日番号だけで、利用者データは各プロセスが
+同じファイルを mmap して読むため、タスクごとの pickle は発生しない
+weekly_data 形式のディレクトリを渡した場合は、先にスナップショットへ変換する
+
+出力: <出力先>/<事業所>/<曜日>.json（plan_day と同じ形 + 乗車順・距離・所要時間）
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from generate_weekly_data import weekdays as WEEKDAY_NAMES
+from incremental_planner import IncrementalPlanner
+from plan_snapshot import PlanSnapshot, load_weekly_dir, write_snapshot
+from transport_planner import DEFAULT_FACILITY, DEFAULT_VEHICLES
+
+# ワーカープロセスごとに開いたスナップショット（パス → PlanSnapshot）
+_open_snapshots = {}
+
+def _snapshot(path):
+    snapshot = _open_snapshots.get(path)
+    if snapshot is None:
+        snapshot = _open_snapshots[path] = PlanSnapshot(path)
+    return snapshot
+
+def plan_weekday(snapshot_path, weekday, output_path, seed=None):
+    """
+    スナップショットの1曜日分を計画してJSONに書き出す（ワーカープロセスで実行）
+
+    Returns:
+        {snapshot, weekday, users, trips, unassigned, distance, seconds}
+    """
+    start = time.perf_counter()
+    snapshot = _snapshot(snapshot_path)
+    users = snapshot.to_users(snapshot.roster(weekday))
+    vehicles = [snapshot.vehicle_dict(i) for i in range(len(snapshot.vehicles))]
+    facility = snapshot.facility_dict()
+
+    summary = {"snapshot": snapshot_path, "weekday": weekday, "users": len(users),
+               "trips": 0, "unassigned": 0, "distance": 0.0}
+    plan = {"assignments": {}, "unassigned": []}
+    if users:
+        planner = IncrementalPlanner(facility, users, vehicles, seed=seed)
+        plan = planner.to_plan()
+        summary["trips"] = len(planner.trips)
+        summary["unassigned"] = len(plan["unassigned"])
+        summary["distance"] = round(planner.total_distance(), 2)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+def build_tasks(snapshot_paths, output_dir, seed=None):
+    """
+    (スナップショット, 曜日) ごとのタスクを作成
+
+    名簿の大きい曜日から順に投入し、最後に大きなタスクが残って待たされないようにする
+    """
+    tasks = []
+    for path in snapshot_paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with PlanSnapshot(path) as snapshot:
+            for weekday, weekday_name in enumerate(WEEKDAY_NAMES):
+                size = len(snapshot.roster(weekday))
+                if size == 0:
+                    continue
+                output_path = os.path.join(output_dir, name, f"{weekday_name}.json")
+                tasks.append((size, (path, weekday, output_path, seed)))
+    tasks.sort(key=lambda task: -task[0])
+    return [args for _, args in tasks]
+
+def plan_week(snapshot_paths, output_dir, workers=None, seed=None):
+    """
+    全スナップショット × 全曜日を並列に計画する
+
+    Args:
+        snapshot_paths: スナップショットファイルのパス（事業所ごと）
+        output_dir: 出力ディレクトリ
+        workers: プロセス数（1 の場合はプロセスプールを使わずに実行）
+        seed: 乱数シード
+
+    Returns:
+        タスクごとの集計の配列
+    """
+    tasks = build_tasks(snapshot_paths, output_dir, seed)
+    if workers == 1:
+        return [plan_weekday(*task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(plan_weekday, *task) for task in tasks]
+        return [future.result() for future in futures]
+
+def prepare_snapshots(inputs, work_dir):
+    """weekly_data 形式のディレクトリはスナップショットに変換し、全入力のパスを返す"""
+    paths = []
+    for path in inputs:
+        if os.path.isdir(path):
+            users, rosters = load_weekly_dir(path)
+            name = os.path.basename(os.path.normpath(path))
+            snapshot_path = os.path.join(work_dir, f"{name}.dsplan")
+            write_snapshot(snapshot_path, DEFAULT_FACILITY, users, DEFAULT_VEHICLES, rosters)
+            paths.append(snapshot_path)
+        else:
+            paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='週間送迎計画を曜日ごとに並列作成')
+    parser.add_argument('inputs', nargs='+', help='スナップショット（.dsplan）または weekly_data 形式のディレクトリ')
+    parser.add_argument('--output', default='weekly_plans', help='出力ディレクトリ')
+    parser.add_argument('--workers', type=int, default=None, help='プロセス数（省略時はCPUコア数）')
+    parser.add_argument('--seed', type=int, default=None, help='乱数シード')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        snapshot_paths = prepare_snapshots(args.inputs, work_dir)
+        start = time.perf_counter()
+        summaries = plan_week(snapshot_paths, args.output, workers=args.workers, seed=args.seed)
+        elapsed = time.perf_counter() - start
+
+    for summary in sorted(summaries, key=lambda s: (s["snapshot"], s["weekday"])):
+        name = os.path.splitext(os.path.basename(summary["snapshot"]))[0]
+        print(f"  {name} {WEEKDAY_NAMES[summary['weekday']]}: {summary['users']}名 → {summary['trips']}便"
+              f" {summary['distance']:.1f}km（未割り当て {summary['unassigned']}名, {summary['seconds']:.2f}秒）")
+    print(f"✅ {len(summaries)}日分の計画を作成しました（{elapsed:.2f}秒）")
+    print(f"📁 出力先: {args.output}/")
+
+if __name__ == "__main__":
+    main()